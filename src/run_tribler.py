@@ -1,5 +1,6 @@
 import asyncio
 import logging.config
+import multiprocessing
 import os
 import signal
 import sys
@@ -86,6 +87,10 @@ def start_tribler_core(base_path, api_port, api_key, root_state_dir):
 
 
 if __name__ == "__main__":
+    # The Core spawns worker processes (e.g. for checking metadata signatures), which requires special
+    # handling in frozen builds
+    multiprocessing.freeze_support()
+
     # Get root state directory (e.g. from environment variable or from system default)
     root_state_dir = get_root_state_directory()
 
@@ -34,6 +34,7 @@ UPLOAD = 'up'
 DOWNLOAD = 'down'
 
 STATEDIR_CHECKPOINT_DIR = u'dlcheckpoints'
+STATEDIR_METAINFO_CACHE_DIR = u'metainfo_cache'
 STATEDIR_WALLET_DIR = u'wallet'
 STATEDIR_CHANNELS_DIR = u'channels'
 STATEDIR_DB_DIR = u"sqlite"
@@ -83,6 +84,10 @@ STATE_READABLE_STARTED = 'Started'
 # sends updates over the Events endpoints with this UUID when new toplevel channels discovered.
 CHANNELS_VIEW_UUID = UUID('094e5bb7-d6b4-4662-825a-4a8c5948ea56')
 
+# The media type of the compact table format of the metadata listings of the REST API. The GUI asks for it in
+# the Accept header; the results are then sent as lists of values, with the keys listed once per metadata type.
+METADATA_TABLE_MEDIA_TYPE = 'application/vnd.tribler.table+json'
+
 
 class NTFY(Enum):
     TORRENT_FINISHED = "torrent_finished"
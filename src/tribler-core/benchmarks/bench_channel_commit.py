@@ -0,0 +1,95 @@
+"""
+This script measures how long it takes to commit a personal channel with many new entries,
+with the signing and serialization done inline and by the worker processes.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from ipv8.database import database_blob
+from ipv8.keyvault.crypto import default_eccrypto
+
+from pony.orm import db_session
+
+from tribler_core.modules.metadata_store.orm_bindings.channel_node import NEW
+from tribler_core.modules.metadata_store.serialization import call_with_worker_key, sign_data
+from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.utilities.path_util import Path
+
+
+def populate_channel(mds, num_entries):
+    """
+    Create a channel with the given number of new, not yet signed torrents.
+    The entries are signed at the commit, so the measurement includes the signing.
+    """
+    public_key = database_blob(mds.my_key.pub().key_to_bin()[10:])
+    with db_session:
+        channel = mds.ChannelMetadata.create_channel("bench channel")
+        for index in range(num_entries):
+            mds.TorrentMetadata(
+                origin_id=channel.id_,
+                public_key=public_key,
+                signature=None,
+                skip_key_check=True,
+                infohash=database_blob(os.urandom(20)),
+                size=random.randint(1, 1 << 32),
+                title="bench entry %i" % index,
+                tags="video",
+                status=NEW,
+            )
+            if index % 10000 == 9999:
+                mds._db.commit()
+
+
+def measure(temp_dir, key, num_entries, workers):
+    mds = MetadataStore(Path(temp_dir) / ("bench_%i_%i.db" % (num_entries, workers)), Path(temp_dir), key)
+    if workers:
+        mds.verification_pool_threshold = 0
+        mds.verification_workers = workers
+    else:
+        mds.verification_pool_threshold = num_entries + 1
+    populate_channel(mds, num_entries)
+    if workers:
+        # Warm up the pool, so the startup time of the processes is not measured
+        pool = mds._get_verification_pool()
+        for future in [pool.submit(call_with_worker_key, sign_data, [b""]) for _ in range(workers)]:
+            future.result()
+
+    start = time.time()
+    with db_session:
+        channel = mds.ChannelMetadata.get_my_channels().first()
+        channel.commit_channel_torrent()
+    elapsed = time.time() - start
+    mds.shutdown()
+    return elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the commit of a personal channel')
+    parser.add_argument(
+        '--entries', type=int, nargs='+', default=[10000, 100000, 1000000], help='Channel sizes to commit'
+    )
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    args = parser.parse_args(argv)
+
+    key = default_eccrypto.generate_key(u"curve25519")
+    for num_entries in args.entries:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for workers in (0, args.workers):
+                elapsed = measure(temp_dir, key, num_entries, workers)
+                print(
+                    "%8i entries, %s: %8.2f s, %8.0f entries/sec"
+                    % (
+                        num_entries,
+                        ("%2i worker(s)" % workers) if workers else "inline      ",
+                        elapsed,
+                        num_entries / elapsed,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+"""
+This script compares the Aho-Corasick based family filter and stoplist against the implementations
+that check the terms one by one.
+"""
+import argparse
+import random
+import sys
+import time
+
+from tribler_core.modules.category_filter import l2_filter
+from tribler_core.modules.category_filter.family_filter import WORDS_REGEXP, XXXFilter
+
+WORDS = ["the", "big", "bang", "theory", "720p", "x264", "ubuntu", "desktop", "amd64", "live", "concert", "hdtv"]
+
+
+class LegacyXXXFilter(XXXFilter):
+    """
+    The family filter as it was before the automaton was introduced
+    """
+
+    def isXXX(self, s, isFilename=True, nonXXXFormat=False):
+        if not s:
+            return False
+
+        s = s.lower()
+        if self.isXXXTerm(s):
+            return True
+        if not self.isAudio(s) and self.foundXXXTerm(s):
+            return True
+        words = [a.lower() for a in WORDS_REGEXP.findall(s)]
+        words2 = [' '.join(words[i : i + 2]) for i in range(0, len(words) - 1)]
+        num_xxx = len([w for w in words + words2 if self.isXXXTerm(w, s)])
+        if nonXXXFormat or (isFilename and self.isAudio(s)):
+            return num_xxx > 2
+        return num_xxx > 0
+
+
+def generate_titles(num_titles, dirty_ratio):
+    terms = sorted(XXXFilter.xxx_terms)
+    titles = []
+    for index in range(num_titles):
+        words = random.sample(WORDS, random.randint(3, 8))
+        if random.random() < dirty_ratio:
+            words.insert(random.randint(0, len(words)), random.choice(terms))
+        titles.append(".".join(words) + " [%i]" % index)
+    return titles
+
+
+def measure(func, titles, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(titles)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(titles) / best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the family filter and the stoplist')
+    parser.add_argument('--titles', type=int, default=20000, help='Number of titles to classify')
+    parser.add_argument('--dirty', type=float, default=0.05, help='Ratio of titles that contain a filter term')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per implementation')
+    args = parser.parse_args(argv)
+
+    titles = generate_titles(args.titles, args.dirty)
+    legacy_filter, automaton_filter = LegacyXXXFilter(), XXXFilter()
+    automaton_filter.classify_many(titles[:1])  # Load the automaton, so the loading is not measured
+
+    results = (
+        ("family filter, one by one ", lambda t: [legacy_filter.isXXX(title) for title in t]),
+        ("family filter, automaton  ", automaton_filter.classify_many),
+        ("stoplist, regex           ", lambda t: [bool(l2_filter.stoplist_expression.search(title)) for title in t]),
+        ("stoplist, automaton       ", l2_filter.classify_many),
+    )
+    for name, func in results:
+        print("%s: %10.0f titles/sec" % (name, measure(func, titles, args.repeat)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
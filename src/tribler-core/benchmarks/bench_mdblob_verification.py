@@ -0,0 +1,76 @@
+"""
+This script measures how fast the metadata store checks the signatures of a big mdblob,
+depending on the number of worker processes.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+
+from tribler_core.modules.metadata_store.serialization import REGULAR_TORRENT, TorrentMetadataPayload
+from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.utilities.path_util import Path
+
+
+def generate_blob(num_entries):
+    key = default_eccrypto.generate_key(u"curve25519")
+    public_key = key.pub().key_to_bin()[10:]
+    payloads = [
+        TorrentMetadataPayload(
+            REGULAR_TORRENT, 0, public_key,
+            random.getrandbits(63), 0, index + 1,
+            os.urandom(20), random.randint(1, 1 << 32), 0, "bench entry %i" % index, "video", "",
+            key=key,
+        )
+        for index in range(num_entries)
+    ]
+    return b''.join(payload.serialized() for payload in payloads)
+
+
+def measure(mds, blob, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        num_payloads = len(mds.verify_squashed_mdblob(blob))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return num_payloads / best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the mdblob signature verification stage')
+    parser.add_argument('--entries', type=int, default=20000, help='Number of payloads in the blob')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per configuration')
+    parser.add_argument('--batch-size', type=int, default=250, help='Number of payloads per worker batch')
+    args = parser.parse_args(argv)
+
+    print("Generating a blob with %i entries..." % args.entries)
+    blob = generate_blob(args.entries)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        key = default_eccrypto.generate_key(u"curve25519")
+
+        mds = MetadataStore(":memory:", Path(temp_dir), key)
+        mds.verification_pool_threshold = args.entries + 1
+        print("inline        : %10.0f payloads/sec" % measure(mds, blob, args.repeat))
+        mds.shutdown()
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            mds = MetadataStore(":memory:", Path(temp_dir), key)
+            mds.verification_pool_threshold = 0
+            mds.verification_batch_size = args.batch_size
+            mds.verification_workers = workers
+            # Warm up the pool, so the startup time of the processes is not measured
+            mds.verify_squashed_mdblob(blob)
+            print("%2i worker(s)  : %10.0f payloads/sec" % (workers, measure(mds, blob, args.repeat)))
+            mds.shutdown()
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
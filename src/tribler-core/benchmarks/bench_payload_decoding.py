@@ -0,0 +1,94 @@
+"""
+This script compares the single-pass payload decoder against the generic ipv8 serializer
+that unpacks every payload and packs it again to get the signed data.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.messaging.serialization import default_serializer
+
+from tribler_core.modules.metadata_store.serialization import (
+    CHANNEL_TORRENT,
+    ChannelMetadataPayload,
+    REGULAR_TORRENT,
+    SIGNATURE_SIZE,
+    TorrentMetadataPayload,
+    split_signed_blob,
+)
+
+
+def generate_blob(size):
+    key = default_eccrypto.generate_key(u"curve25519")
+    public_key = key.pub().key_to_bin()[10:]
+    chunks = [
+        ChannelMetadataPayload(
+            CHANNEL_TORRENT, 0, public_key,
+            random.getrandbits(63), 0, 1,
+            os.urandom(20), 0, 0, "bench channel", "", "",
+            100, 0,
+            key=key,
+        ).serialized()
+    ]
+    blob_size = len(chunks[0])
+    while blob_size < size:
+        chunk = TorrentMetadataPayload(
+            REGULAR_TORRENT, 0, public_key,
+            random.getrandbits(63), 0, len(chunks) + 1,
+            os.urandom(20), random.randint(1, 1 << 32), 0, "bench entry %i" % len(chunks), "video", "",
+            key=key,
+        ).serialized()
+        chunks.append(chunk)
+        blob_size += len(chunk)
+    return b''.join(chunks)
+
+
+def decode_generic(blob):
+    """
+    The decoding procedure as it was before the precompiled layouts were introduced
+    """
+    payloads = []
+    offset = 0
+    while offset < len(blob):
+        cls = ChannelMetadataPayload if not offset else TorrentMetadataPayload
+        unpack_list, end_offset = default_serializer.unpack_multiple(cls.format_list, blob, offset=offset)
+        payload = cls.from_unpack_list(
+            *unpack_list, signature=blob[end_offset : end_offset + SIGNATURE_SIZE], skip_key_check=True
+        )
+        # Get the signed data by serializing the payload again
+        default_serializer.pack_multiple(payload.to_pack_list())
+        payloads.append(payload)
+        offset = end_offset + SIGNATURE_SIZE
+    return payloads
+
+
+def measure(func, blob, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        num_payloads = len(func(blob))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return num_payloads, best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the decoding of a synthetic mdblob')
+    parser.add_argument('--size', type=int, default=1 << 20, help='Size of the blob in bytes')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs per decoder')
+    args = parser.parse_args(argv)
+
+    blob = generate_blob(args.size)
+    for name, func in (("generic serializer", decode_generic), ("precompiled layout", split_signed_blob)):
+        num_payloads, elapsed = measure(func, blob, args.repeat)
+        print(
+            "%s: %i payloads in %.3f s, %.1f MB/s, %.0f payloads/sec"
+            % (name, num_payloads, elapsed, len(blob) / elapsed / (1 << 20), num_payloads / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+"""
+This script measures the latency of the channel listings of the REST API under concurrent load, together with the
+delay of a busy overlay that shares the event loop, with the queries run inline and by the query executor.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, web
+
+from ipv8.database import database_blob
+from ipv8.keyvault.crypto import default_eccrypto
+
+from pony.orm import db_session
+
+from tribler_core.modules.metadata_store.restapi.channels_endpoint import ChannelsEndpoint
+from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.utilities.path_util import Path
+
+# How often the simulated overlay handles a packet, in seconds
+OVERLAY_INTERVAL = 0.005
+
+
+def populate_channels(mds, num_channels, num_entries):
+    """
+    Create channels with torrents that are listed by the benchmark.
+    """
+    with db_session:
+        for channel_index in range(num_channels):
+            key = default_eccrypto.generate_key(u"curve25519")
+            channel = mds.ChannelMetadata(
+                title="bench channel %i" % channel_index, infohash=database_blob(os.urandom(20)), sign_with=key
+            )
+            for index in range(num_entries):
+                mds.TorrentMetadata(
+                    origin_id=channel.id_,
+                    infohash=database_blob(os.urandom(20)),
+                    size=random.randint(1, 1 << 32),
+                    title="bench entry %i %i" % (channel_index, index),
+                    tags="video",
+                    sign_with=key,
+                )
+            mds._db.commit()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+async def overlay(stop, delays):
+    """
+    Simulate an overlay that handles a packet at a fixed interval, and record how late every packet is handled.
+    """
+    while not stop.is_set():
+        expected = time.time() + OVERLAY_INTERVAL
+        await asyncio.sleep(OVERLAY_INTERVAL)
+        delays.append(time.time() - expected)
+
+
+async def client(url, num_requests, latencies):
+    async with ClientSession() as session:
+        for _ in range(num_requests):
+            start = time.time()
+            async with session.get(url) as response:
+                await response.read()
+            latencies.append(time.time() - start)
+
+
+async def measure(mds, port, inline, clients, num_requests, page_size):
+    endpoint = ChannelsEndpoint(SimpleNamespace(mds=mds))
+    if inline:
+        # Run the queries on the event loop, as the handlers did before they used the query executor
+        async def run_inline(func, *args, **_):
+            return func(*args)
+
+        endpoint.run_read = run_inline
+
+    runner = web.AppRunner(endpoint.app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, 'localhost', port)
+    await site.start()
+
+    stop = asyncio.Event()
+    delays = []
+    latencies = []
+    overlay_task = asyncio.ensure_future(overlay(stop, delays))
+    url = 'http://localhost:%i/?first=1&last=%i&sort_by=size&include_total=1' % (port, page_size)
+    await asyncio.gather(*[client(url, num_requests, latencies) for _ in range(clients)])
+    stop.set()
+    await overlay_task
+    await runner.cleanup()
+    return latencies, delays
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the latency of the REST API next to a busy overlay')
+    parser.add_argument('--channels', type=int, default=200, help='Number of channels in the database')
+    parser.add_argument('--entries', type=int, default=100, help='Number of torrents in every channel')
+    parser.add_argument('--clients', type=int, default=8, help='Number of concurrent REST clients')
+    parser.add_argument('--requests', type=int, default=20, help='Number of requests of every client')
+    parser.add_argument('--page-size', type=int, default=50, help='Number of channels in every listing')
+    parser.add_argument('--port', type=int, default=8123, help='Port of the REST API')
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mds = MetadataStore(
+            Path(temp_dir) / "bench.db", Path(temp_dir), default_eccrypto.generate_key(u"curve25519")
+        )
+        populate_channels(mds, args.channels, args.entries)
+        for inline in (True, False):
+            latencies, delays = loop.run_until_complete(
+                measure(mds, args.port, inline, args.clients, args.requests, args.page_size)
+            )
+            print(
+                "%s: request p50 %7.1f ms, p99 %7.1f ms | overlay delay p50 %7.1f ms, p99 %7.1f ms, max %7.1f ms"
+                % (
+                    "inline  " if inline else "executor",
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.99) * 1000,
+                    percentile(delays, 0.5) * 1000,
+                    percentile(delays, 0.99) * 1000,
+                    max(delays, default=0) * 1000,
+                )
+            )
+        mds.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -141,6 +141,8 @@ class TestTriblerConfig(TriblerCoreTest):
         """
         self.tribler_config.set_torrent_checking_enabled(True)
         self.assertEqual(self.tribler_config.get_torrent_checking_enabled(), True)
+        self.tribler_config.set_torrent_checking_batches_per_minute(6)
+        self.assertEqual(self.tribler_config.get_torrent_checking_batches_per_minute(), 6)
 
     def test_get_set_methods_rest_api(self):
         """
@@ -202,6 +204,8 @@ class TestTriblerConfig(TriblerCoreTest):
         self.assertEqual(self.tribler_config.get_libtorrent_max_download_rate(), True)
         self.tribler_config.set_libtorrent_dht_enabled(False)
         self.assertFalse(self.tribler_config.get_libtorrent_dht_enabled())
+        self.tribler_config.set_libtorrent_metainfo_cache_size(1024)
+        self.assertEqual(self.tribler_config.get_libtorrent_metainfo_cache_size(), 1024)
 
     def test_get_set_methods_tunnel_community(self):
         """
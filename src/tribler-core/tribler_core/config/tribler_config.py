@@ -218,6 +218,12 @@ class TriblerConfig(object):
     def get_torrent_checking_enabled(self):
         return self.config['torrent_checking']['enabled']
 
+    def set_torrent_checking_batches_per_minute(self, value):
+        self.config['torrent_checking']['batches_per_minute'] = value
+
+    def get_torrent_checking_batches_per_minute(self):
+        return self.config['torrent_checking']['batches_per_minute']
+
     # REST API
 
     def set_api_http_enabled(self, http_enabled):
@@ -321,6 +327,12 @@ class TriblerConfig(object):
     def get_libtorrent_dht_readiness_timeout(self):
         return self.config['libtorrent']['dht_readiness_timeout']
 
+    def set_libtorrent_metainfo_cache_size(self, value):
+        self.config['libtorrent']['metainfo_cache_size'] = value
+
+    def get_libtorrent_metainfo_cache_size(self):
+        return self.config['libtorrent']['metainfo_cache_size']
+
     def set_anon_listen_port(self, listen_port=None):
         self.config['libtorrent']['anon_listen_port'] = listen_port
 
@@ -44,6 +44,7 @@ testnet = boolean(default=False)
 
 [torrent_checking]
 enabled = boolean(default=True)
+batches_per_minute = integer(min=1, default=3)
 
 [libtorrent]
 enabled = boolean(default=True)
@@ -57,6 +58,7 @@ max_upload_rate = integer(default=0)
 utp = boolean(default=True)
 dht = boolean(default=True)
 dht_readiness_timeout = integer(default=30)
+metainfo_cache_size = integer(min=0, default=52428800)
 
 anon_listen_port = integer(min=-1, max=65536, default=-1)
 anon_proxy_type = integer(min=0, max=5, default=0)
@@ -84,3 +84,10 @@ class TrustGraphException(TriblerException):
 
     def __init__(self, msg=None):
         TriblerException.__init__(self, msg)
+
+
+class QueryTimeoutError(TriblerException):
+    """A database query of the REST API did not finish in time."""
+
+    def __init__(self, msg=None):
+        TriblerException.__init__(self, msg)
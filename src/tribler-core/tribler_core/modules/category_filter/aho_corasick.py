@@ -0,0 +1,72 @@
+"""
+Aho-Corasick automaton that finds all the occurrences of many patterns in a text in a single pass.
+"""
+from collections import deque
+
+
+class Automaton(object):
+    """
+    Aho-Corasick automaton built from a dictionary of patterns.
+
+    The failure links are resolved when the automaton is built, so the text is scanned with one dictionary lookup
+    per character. To keep the tables small, a state only stores the transitions that differ from the transitions
+    of the root state.
+    """
+
+    def __init__(self, patterns):
+        """
+        :param patterns: a dictionary that maps the non-empty patterns to the values reported when they are found
+        """
+        # Build the trie of the patterns
+        goto = [{}]
+        values = [None]
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    values.append(None)
+                state = next_state
+            values[state] = value
+
+        # Walk the trie breadth-first, so the failure state of every state is done before the state itself
+        root = goto[0]
+        transitions = [{}] * len(goto)
+        outputs = [()] * len(goto)
+        fail = [0] * len(goto)
+        queue = deque(root.values())
+        while queue:
+            state = queue.popleft()
+            fail_transitions = transitions[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = fail_transitions.get(char) or root.get(char, 0)
+                queue.append(child)
+            # The leaves share the tables of their failure states
+            transitions[state] = dict(fail_transitions, **goto[state]) if goto[state] else fail_transitions
+            own = (values[state],) if values[state] is not None else ()
+            outputs[state] = own + outputs[fail[state]]
+
+        self._root = root
+        self._transitions = transitions
+        self._outputs = outputs
+
+    @property
+    def num_states(self):
+        return len(self._transitions)
+
+    def iter_matches(self, text):
+        """
+        Find all the occurrences of the patterns in a text, including the overlapping ones.
+        :param text: the text to search in
+        :return: a generator of (end index, value) tuples, in the order of the end indexes
+        """
+        transitions, root, outputs = self._transitions, self._root, self._outputs
+        state = 0
+        for end, char in enumerate(text):
+            # An exception never leads to the root state, so the "or" is safe
+            state = transitions[state].get(char) or root.get(char, 0)
+            if outputs[state]:
+                for value in outputs[state]:
+                    yield end, value
@@ -6,16 +6,49 @@ Author(s): Jelle Roozenburg
 import logging
 import re
 
+from tribler_core.modules.category_filter.aho_corasick import Automaton
 from tribler_core.utilities.install_dir import get_lib_path
 
 WORDS_REGEXP = re.compile('[a-zA-Z0-9]+')
 
 termfilename = get_lib_path() / 'modules' / 'category_filter' / 'filter_terms.filter'
 
+# The kinds of patterns in the automaton
+SEARCH_TERM = 1  # found anywhere in the text
+WORD_TERM = 2  # only found as a whole word or a pair of words
+
+
+class TermSet(set):
+    """
+    Set of filter terms that counts its changes, so the automaton built from it can be rebuilt when it changes.
+    """
+
+    version = 0
+
+    def add(self, term):
+        super(TermSet, self).add(term)
+        self.version += 1
+
+    def discard(self, term):
+        super(TermSet, self).discard(term)
+        self.version += 1
+
+    def remove(self, term):
+        super(TermSet, self).remove(term)
+        self.version += 1
+
+    def update(self, *terms):
+        super(TermSet, self).update(*terms)
+        self.version += 1
+
+    def clear(self):
+        super(TermSet, self).clear()
+        self.version += 1
+
 
 def initTerms(filename):
-    terms = set()
-    searchterms = set()
+    terms = TermSet()
+    searchterms = TermSet()
 
     try:
         with open(filename, 'r') as f:
@@ -23,19 +56,73 @@ def initTerms(filename):
 
             for line in lines:
                 if line.startswith('*'):
-                    searchterms.add(line[1:])
+                    set.add(searchterms, line[1:])
                 else:
-                    terms.add(line)
+                    set.add(terms, line)
     except IOError:
         raise IOError(u"Could not open %s, initTerms failed.", filename)
 
     return terms, searchterms
 
 
+def get_word_term_variants(term):
+    """
+    Get the words that isXXXTerm considers dirty because of the given term.
+    :param term: the filter term
+    :return: the list of the words, or an empty list if the term can not match a word or a pair of words
+    """
+    words = WORDS_REGEXP.findall(term)
+    if not 0 < len(words) <= 2 or ' '.join(words) != term:
+        return []
+    variants = [term, term + 'es', term + 'n']
+    # isXXXTerm only strips "es" from the words that end with "es"
+    if not term.endswith('e'):
+        variants.append(term + 's')
+    return variants
+
+
+def build_automaton(terms, searchterms):
+    """
+    Build the automaton that finds the terms in the words of a text, separated by single spaces.
+    A search term that only consists of word characters can only be found inside a single word of a text,
+    so it is found in the words just like in the text itself.
+    :param terms: the terms that are only dirty as a whole word or a pair of words
+    :param searchterms: the terms that are dirty anywhere in a text
+    :return: the Automaton. The values of its patterns are (pattern kind, pattern length) tuples.
+    """
+    kinds = {}
+    for term in searchterms:
+        if WORDS_REGEXP.fullmatch(term):
+            kinds[term] = SEARCH_TERM
+    for term in terms:
+        for variant in get_word_term_variants(term):
+            kinds[variant] = kinds.get(variant, 0) | WORD_TERM
+    return Automaton({pattern: (kind, len(pattern)) for pattern, kind in kinds.items()})
+
+
 class XXXFilter(object):
     _logger = logging.getLogger("XXXFilter")
 
     xxx_terms, xxx_searchterms = initTerms(termfilename)
+    # Building the automaton of the default terms only takes a few milliseconds
+    default_automaton = build_automaton(xxx_terms, xxx_searchterms)
+
+    def __init__(self):
+        self._automaton = None
+        self._automaton_versions = None
+        self._other_searchterms = []
+
+    def _get_automaton(self):
+        versions = (self.xxx_terms.version, self.xxx_searchterms.version)
+        if self._automaton_versions != versions:
+            if versions == (0, 0):
+                self._automaton = self.default_automaton
+            else:
+                self._automaton = build_automaton(self.xxx_terms, self.xxx_searchterms)
+            # The search terms with other characters are not in the automaton, so they are looked for one by one
+            self._other_searchterms = [term for term in self.xxx_searchterms if not WORDS_REGEXP.fullmatch(term)]
+            self._automaton_versions = versions
+        return self._automaton
 
     def _getWords(self, string):
         return [a.lower() for a in WORDS_REGEXP.findall(string)]
@@ -70,14 +157,32 @@ class XXXFilter(object):
         s = s.lower()
         if self.isXXXTerm(s):  # We have also put some full titles in the filter file
             return True
-        if not self.isAudio(s) and self.foundXXXTerm(s):
+        is_audio = self.isAudio(s)
+        num_needed = 3 if nonXXXFormat or (isFilename and is_audio) else 1  # almost never classify mp3 as porn
+
+        automaton = self._get_automaton()
+        if not is_audio and any(term in s for term in self._other_searchterms):
             return True
-        words = self._getWords(s)
-        words2 = [' '.join(words[i:i + 2]) for i in range(0, len(words) - 1)]
-        num_xxx = len([w for w in words + words2 if self.isXXXTerm(w, s)])
-        if nonXXXFormat or (isFilename and self.isAudio(s)):
-            return num_xxx > 2  # almost never classify mp3 as porn
-        return num_xxx > 0
+
+        # All the terms are looked for in a single pass over the words of the text, separated by single spaces
+        text = ' %s ' % ' '.join(WORDS_REGEXP.findall(s))
+        num_xxx = 0
+        for end, (kind, length) in automaton.iter_matches(text):
+            if kind & SEARCH_TERM and not is_audio:
+                return True
+            if kind & WORD_TERM and text[end - length] == ' ' and text[end + 1] == ' ':
+                num_xxx += 1
+                if num_xxx >= num_needed:
+                    return True
+        return False
+
+    def classify_many(self, titles):
+        """
+        Classify many titles, e.g. all the titles from an mdblob, at once.
+        :param titles: an iterable of titles
+        :return: the list of isXXX results for the titles
+        """
+        return [self.isXXX(title) for title in titles]
 
     def foundXXXTerm(self, s):
         for term in self.xxx_searchterms:
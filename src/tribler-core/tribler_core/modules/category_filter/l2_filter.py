@@ -1,13 +1,133 @@
 import re
 
+from tribler_core.modules.category_filter.aho_corasick import Automaton
 from tribler_core.utilities.install_dir import get_lib_path
 
+
+def _parse_atoms(expression):
+    """
+    Split a regex without top-level alternatives into atoms.
+    :return: a list of (literal character or None, quantified) tuples. Classes, groups, anchors and escape
+        sequences like \\d are not literal.
+    """
+    atoms = []
+    index = 0
+    while index < len(expression):
+        char = expression[index]
+        if char == '\\':
+            escaped = expression[index + 1]
+            atoms.append((None if escaped.isalnum() else escaped, False))
+            index += 2
+        elif char in '[(':
+            depth = 0
+            while True:
+                if expression[index] == '\\':
+                    index += 1
+                elif expression[index] in '[(':
+                    depth += 1
+                elif expression[index] in '])':
+                    depth -= 1
+                index += 1
+                if not depth:
+                    break
+            atoms.append((None, False))
+        elif char in '.^$':
+            atoms.append((None, False))
+            index += 1
+        elif char in '?*+{':
+            atoms[-1] = (atoms[-1][0], True)
+            index = expression.index('}', index) + 1 if char == '{' else index + 1
+        else:
+            atoms.append((char, False))
+            index += 1
+    return atoms
+
+
+def split_alternatives(regex):
+    """
+    Split a regex into its top-level alternatives.
+    """
+    alternatives = ['']
+    depth = 0
+    index = 0
+    while index < len(regex):
+        char = regex[index]
+        if char == '\\':
+            alternatives[-1] += regex[index : index + 2]
+            index += 2
+            continue
+        if char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        if char == '|' and not depth:
+            alternatives.append('')
+        else:
+            alternatives[-1] += char
+        index += 1
+    return alternatives
+
+
+def build_stoplist_matcher(regex):
+    """
+    Split the stoplist regex into plain words, which are found by an Aho-Corasick automaton, and the remaining
+    alternatives. Those are checked with a smaller regex, but only if the automaton finds a part that every
+    match of them must contain.
+    :param regex: the stoplist regex
+    :return: a tuple of the automaton, the regex of the remaining alternatives (or None), and whether that regex
+        has to be checked even if the automaton finds nothing
+    """
+    words = {}
+    residual = []
+    always_check_residual = False
+    for alternative in split_alternatives(regex):
+        atoms = _parse_atoms(alternative)
+        if all(literal is not None and not quantified for literal, quantified in atoms):
+            words[''.join(literal for literal, _ in atoms).lower()] = True
+            continue
+        residual.append(alternative)
+        # The longest run of unquantified literal characters is a part of every match
+        runs = ['']
+        for literal, quantified in atoms:
+            if literal is None or quantified:
+                runs.append('')
+            else:
+                runs[-1] += literal.lower()
+        required = max(runs, key=len)
+        if required:
+            words.setdefault(required, False)
+        else:
+            always_check_residual = True
+    residual_expression = re.compile('|'.join(residual), re.IGNORECASE) if residual else None
+    return Automaton(words), residual_expression, always_check_residual
+
+
 # !ACHTUNG! We must first read the line into a file, then release the lock, and only then pass it to regex compiler.
 # Otherwise, there is an annoying race condition that reads in an empty file!
 with open(get_lib_path() / 'modules' / 'category_filter' / 'level2.regex', encoding="utf-8") as f:
     regex = f.read().strip()
     stoplist_expression = re.compile(regex, re.IGNORECASE)
+    stoplist_automaton, residual_expression, always_check_residual = build_stoplist_matcher(regex)
 
 
 def is_forbidden(txt):
-    return bool(stoplist_expression.search(txt))
+    # str.lower does not fold all the characters the way re.IGNORECASE does (e.g. "İ" becomes "i" and a combining
+    # dot), so only ASCII texts are matched with the automaton
+    if not txt.isascii():
+        return bool(stoplist_expression.search(txt))
+    txt = txt.lower()
+    check_residual = always_check_residual
+    for _, is_word in stoplist_automaton.iter_matches(txt):
+        if is_word:
+            return True
+        check_residual = True
+    return bool(check_residual and residual_expression.search(txt))
+
+
+def classify_many(texts):
+    """
+    Check many texts, e.g. the titles of all the entries of an mdblob, against the stoplist at once.
+    :param texts: an iterable of texts
+    :return: the list of is_forbidden results for the texts
+    """
+    return [is_forbidden(txt) for txt in texts]
@@ -0,0 +1,17 @@
+from tribler_core.modules.category_filter.aho_corasick import Automaton
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+
+
+class TestAutomaton(TriblerCoreTest):
+    def test_iter_matches(self):
+        """
+        Test that all the occurrences of the patterns are found, including the overlapping ones
+        """
+        automaton = Automaton({"he": 1, "she": 2, "his": 3, "hers": 4})
+        self.assertListEqual([(3, 2), (3, 1), (5, 4)], list(automaton.iter_matches("ushers")))
+        self.assertListEqual([(2, 3)], list(automaton.iter_matches("his")))
+        self.assertListEqual([], list(automaton.iter_matches("xyz")))
+
+    def test_repeated_characters(self):
+        automaton = Automaton({"aa": 1, "aab": 2})
+        self.assertListEqual([(1, 1), (2, 1), (3, 2)], list(automaton.iter_matches("aaab")))
@@ -1,5 +1,5 @@
 from tribler_core.modules.category_filter.family_filter import XXXFilter
-from tribler_core.modules.category_filter.l2_filter import is_forbidden
+from tribler_core.modules.category_filter.l2_filter import build_stoplist_matcher, classify_many, is_forbidden
 from tribler_core.tests.tools.test_as_server import AbstractServer
 
 
@@ -18,6 +18,28 @@ class TriblerCategoryTestFamilyFilter(AbstractServer):
         self.assertFalse(self.family_filter.isXXX("term0"))
         self.assertTrue(self.family_filter.isXXX("term3"))
 
+    def test_is_xxx_words(self):
+        self.assertTrue(self.family_filter.isXXX("some term1 movie"))
+        self.assertTrue(self.family_filter.isXXX("some.term1es.movie"))
+        self.assertFalse(self.family_filter.isXXX("some.term1x.movie"))
+        self.assertTrue(self.family_filter.isXXX("some xterm3x movie"))
+        self.assertFalse(self.family_filter.isXXX("some xterm3x.mp3"))
+        self.assertFalse(self.family_filter.isXXX("term1 term2 song.mp3"))
+        self.assertTrue(self.family_filter.isXXX("term1 term2 term1 song.mp3"))
+
+    def test_is_xxx_terms_changed(self):
+        """
+        Test that the filter notices the changes of the terms
+        """
+        self.assertFalse(self.family_filter.isXXX("some term4 movie"))
+        self.family_filter.xxx_terms.add("term4")
+        self.assertTrue(self.family_filter.isXXX("some term4 movie"))
+        self.family_filter.xxx_terms.discard("term4")
+        self.assertFalse(self.family_filter.isXXX("some term4 movie"))
+
+    def test_classify_many(self):
+        self.assertListEqual([True, False, True], self.family_filter.classify_many(["term1", "term0", "a term2"]))
+
     def test_is_xxx_term(self):
         self.assertTrue(self.family_filter.isXXXTerm("term1es"))
         self.assertFalse(self.family_filter.isXXXTerm("term0es"))
@@ -36,3 +58,24 @@ class TriblerCategoryTestFamilyFilter(AbstractServer):
         self.assertTrue(is_forbidden("9yo ponies"))
         self.assertTrue(is_forbidden("12yo ponies"))
         self.assertFalse(is_forbidden("18yo ponies"))
+        self.assertTrue(is_forbidden("PTHC ponies"))
+        self.assertFalse(is_forbidden("tokyo ponies"))
+        self.assertListEqual([True, False], classify_many(["loli", "ponies"]))
+
+    def test_l2_filter_non_ascii(self):
+        """
+        Test that the stoplist folds the case of non-ASCII texts like a case-insensitive regex does
+        """
+        self.assertTrue(is_forbidden("İncest video"))
+        self.assertTrue(is_forbidden("ПЕДО video"))
+        self.assertListEqual([True, False], classify_many(["İncest", "ponies ümlaut"]))
+
+    def test_stoplist_matcher(self):
+        """
+        Test that the stoplist regex is split into plain words and the alternatives that need a regex
+        """
+        automaton, residual, always_check_residual = build_stoplist_matcher(r"abc|x\.y|[0-9]+de|[fg]")
+        self.assertEqual("[0-9]+de|[fg]", residual.pattern)
+        self.assertTrue(always_check_residual)
+        matches = sorted(value for _, value in automaton.iter_matches("abc x.y de"))
+        self.assertListEqual([False, True, True], matches)
@@ -1,7 +1,7 @@
 import math
 from asyncio import Future
+from bisect import bisect_left, insort
 
-from ipv8.dht.routing import distance
 from ipv8.taskmanager import TaskManager
 
 import libtorrent as lt
@@ -9,6 +9,53 @@ import libtorrent as lt
 from tribler_core.utilities.unicode import hexlify
 
 
+class LookupFutures(dict):
+    """
+    Map from binary infohash to lookup future. The infohashes are also kept sorted by their numeric value, so the
+    infohash that is the closest to a node ID in the XOR metric is found without going through all of them.
+    """
+
+    def __init__(self):
+        super(LookupFutures, self).__init__()
+        self._sorted_keys = []  # (numeric value, infohash) tuples
+
+    def __setitem__(self, infohash, future):
+        if infohash not in self:
+            insort(self._sorted_keys, (int.from_bytes(infohash, 'big'), infohash))
+        super(LookupFutures, self).__setitem__(infohash, future)
+
+    def __delitem__(self, infohash):
+        super(LookupFutures, self).__delitem__(infohash)
+        del self._sorted_keys[bisect_left(self._sorted_keys, (int.from_bytes(infohash, 'big'), infohash))]
+
+    def pop(self, infohash, *default):
+        if infohash in self:
+            del self._sorted_keys[bisect_left(self._sorted_keys, (int.from_bytes(infohash, 'big'), infohash))]
+        return super(LookupFutures, self).pop(infohash, *default)
+
+    def closest(self, node_id):
+        """
+        Find the infohash that is the closest to the given node ID in the XOR metric.
+        :param node_id: The binary node ID.
+        :return: The closest infohash, or None if there are no infohashes.
+        """
+        keys = self._sorted_keys
+        if not keys:
+            return None
+        target = int.from_bytes(node_id, 'big')
+        low, high = 0, len(keys)
+        while high - low > 1:
+            # The keys in the range share all the bits above the highest bit in which the first and the last key
+            # differ. The keys with that bit cleared come first, and the closest key has the same bit as the target.
+            bit = (keys[low][0] ^ keys[high - 1][0]).bit_length() - 1
+            split = bisect_left(keys, ((keys[high - 1][0] >> bit) << bit,), low, high)
+            if (target >> bit) & 1:
+                low = split
+            else:
+                high = split
+        return keys[low][1]
+
+
 class DHTHealthManager(TaskManager):
     """
     This class manages BEP33 health requests to the libtorrent DHT.
@@ -20,7 +67,7 @@ class DHTHealthManager(TaskManager):
         :param lt_session: The session used to perform health lookups.
         """
         TaskManager.__init__(self)
-        self.lookup_futures = {}    # Map from binary infohash to future
+        self.lookup_futures = LookupFutures()    # Map from binary infohash to future
         self.bf_seeders = {}        # Map from infohash to (final) seeders bloomfilter
         self.bf_peers = {}          # Map from infohash to (final) peers bloomfilter
         self.lt_session = lt_session
@@ -80,10 +127,8 @@ class DHTHealthManager(TaskManager):
         :return: A bytearray with the combined bloomfilter.
         """
         final_bf_len = min(len(bf1), len(bf2))
-        final_bf = bytearray(final_bf_len)
-        for bf_index in range(final_bf_len):
-            final_bf[bf_index] = bf1[bf_index] | bf2[bf_index]
-        return final_bf
+        final_bf = int.from_bytes(bf1[:final_bf_len], 'big') | int.from_bytes(bf2[:final_bf_len], 'big')
+        return bytearray(final_bf.to_bytes(final_bf_len, 'big'))
 
     @staticmethod
     def get_size_from_bloomfilter(bf):
@@ -92,20 +137,7 @@ class DHTHealthManager(TaskManager):
         :param bf: The bloom filter of which we estimate the size.
         :return: A rounded integer, approximating the number of items in the filter.
         """
-        def tobits(s):
-            result = []
-            for c in s:
-                num = ord(c) if isinstance(c, str) else c
-                bits = bin(num)[2:]
-                bits = '00000000'[len(bits):] + bits
-                result.extend([int(b) for b in bits])
-            return result
-
-        bits_array = tobits(bytes(bf))
-        total_zeros = 0
-        for bit in bits_array:
-            if bit == 0:
-                total_zeros += 1
+        total_zeros = len(bf) * 8 - bin(int.from_bytes(bf, 'big')).count('1')
 
         if total_zeros == 0:
             return 6000  # The maximum capacity of the bloom filter used in BEP33
@@ -121,17 +153,9 @@ class DHTHealthManager(TaskManager):
         :param bf_seeds: The bloom filter indicating the IP addresses of the seeders.
         :param bf_peers: The bloom filter indicating the IP addresses of the peers (leechers).
         """
-        min_distance = -1
-        closest_infohash = None
-
-        # We do not know to which infohash the received get_peers response belongs so we have to manually go through
-        # the infohashes and find the infohash that is the closest to the node id that sent us the message.
-        for infohash in self.lookup_futures:
-            ih_distance = distance(infohash, node_id)
-            if ih_distance < min_distance or min_distance == -1:
-                min_distance = ih_distance
-                closest_infohash = infohash
-
+        # We do not know to which infohash the received get_peers response belongs so we have to find
+        # the infohash that is the closest to the node id that sent us the message.
+        closest_infohash = self.lookup_futures.closest(node_id)
         if not closest_infohash:
             self._logger.info("Could not find lookup infohash for incoming BEP33 bloomfilters")
             return
@@ -49,6 +49,7 @@ class Download(TaskManager):
         # Libtorrent status
         self.lt_status = None
         self.error = None
+        self._state = None
         self.pause_after_next_hashcheck = False
         self.checkpoint_after_next_hashcheck = False
         self.tracker_status = {}  # {url: [num_peers, status_str]}
@@ -417,10 +418,13 @@ class Download(TaskManager):
             self.handle.force_recheck()
 
     def get_state(self):
-        """ Returns a snapshot of the current state of the download
+        """ Returns a snapshot of the current state of the download. The snapshot is cached until
+        libtorrent reports a new status.
         @return DownloadState
         """
-        return DownloadState(self, self.lt_status, self.error)
+        if self._state is None or self._state.lt_status is not self.lt_status or self._state.error is not self.error:
+            self._state = DownloadState(self, self.lt_status, self.error)
+        return self._state
 
     @task
     async def save_resume_data(self, timeout=10):
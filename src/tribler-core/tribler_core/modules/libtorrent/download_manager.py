@@ -18,11 +18,12 @@ from ipv8.taskmanager import TaskManager, task
 
 import libtorrent as lt
 
-from tribler_common.simpledefs import DLSTATUS_SEEDING, STATEDIR_CHECKPOINT_DIR
+from tribler_common.simpledefs import DLSTATUS_SEEDING, STATEDIR_CHECKPOINT_DIR, STATEDIR_METAINFO_CACHE_DIR
 
 from tribler_core.modules.dht_health_manager import DHTHealthManager
 from tribler_core.modules.libtorrent.download import Download
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
+from tribler_core.modules.libtorrent.metainfo_cache import MetainfoCache
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
 from tribler_core.utilities import path_util, torrent_utils
 from tribler_core.utilities.path_util import mkdtemp
@@ -31,7 +32,8 @@ from tribler_core.utilities.utilities import bdecode_compat, has_bep33_support,
 from tribler_core.version import version_id
 
 LTSTATE_FILENAME = "lt.state"
-METAINFO_CACHE_PERIOD = 5 * 60
+# The number of checkpoints that are parsed together in a worker thread, and resumed together on the event loop
+CHECKPOINT_BATCH_SIZE = 50
 DEFAULT_DHT_ROUTERS = [
     ("dht.libtorrent.org", 25401),
     ("router.bittorrent.com", 6881),
@@ -76,13 +78,20 @@ class DownloadManager(TaskManager):
         # Dictionary that maps infohashes to download instances. These include only downloads that have
         # been made specifically for fetching metainfo, and will be removed afterwards.
         self.metainfo_requests = {}
-        self.metainfo_cache = {}  # Dictionary that maps infohashes to cached metainfo items
+        # Disk-backed cache that maps infohashes to the metainfo fetched before
+        self.metainfo_cache = MetainfoCache(tribler_session.config.get_state_dir() / STATEDIR_METAINFO_CACHE_DIR,
+                                            tribler_session.config.get_libtorrent_metainfo_cache_size())
 
         self.default_alert_mask = lt.alert.category_t.error_notification | lt.alert.category_t.status_notification | \
                                   lt.alert.category_t.storage_notification | lt.alert.category_t.performance_warning | \
                                   lt.alert.category_t.tracker_notification | lt.alert.category_t.debug_notification
         self.session_stats_callback = None
         self.state_cb_count = 0
+        self.checkpoint_stats = {}
+        # Infohashes of the downloads that libtorrent reported a new status for since the last invocation of the
+        # download states callback, and of the downloads of which the peers changed since the last peer scan.
+        self.updated_states = set()
+        self.changed_peers = set()
 
         # Status of libtorrent session to indicate if it can safely close and no pending writes to disk exists.
         self.lt_session_shutdown_ready = {}
@@ -116,7 +125,6 @@ class DownloadManager(TaskManager):
         if self.dht_readiness_timeout > 0:
             self._dht_ready_task = self.register_task("check_dht_ready", self._check_dht_ready)
         self.register_task("request_torrent_updates", self._request_torrent_updates, interval=1)
-        self.register_task('task_cleanup_metacache', self._task_cleanup_metainfo_cache, interval=60, delay=0)
 
         self.set_download_states_callback(self.sesscb_states_callback)
 
@@ -338,7 +346,13 @@ class DownloadManager(TaskManager):
                 if infohash not in self.downloads:
                     self._logger.debug("Got state_update for unknown torrent %s", hexlify(infohash))
                     continue
-                self.downloads[infohash].update_lt_status(status)
+                download = self.downloads[infohash]
+                previous = download.lt_status
+                if previous is None or previous.num_peers != status.num_peers \
+                        or previous.total_payload_download != status.total_payload_download:
+                    self.changed_peers.add(infohash)
+                download.update_lt_status(status)
+                self.updated_states.add(infohash)
 
         infohash = unhexlify(str(alert.handle.info_hash() if hasattr(alert, 'handle') and alert.handle.is_valid()
                                  else getattr(alert, 'info_hash', '')))
@@ -353,6 +367,9 @@ class DownloadManager(TaskManager):
         elif infohash:
             self._logger.debug("Got alert for unknown download %s: %s", hexlify(infohash), alert)
 
+        if download and alert_type in ('peer_connect_alert', 'peer_disconnected_alert'):
+            self.changed_peers.add(infohash)
+
         if alert_type == 'listen_succeeded_alert':
             # The ``port`` attribute was added in libtorrent 1.1.14.
             # Older versions (most notably libtorrent 1.1.13 - the default  on Ubuntu 20.04) do not have this attribute.
@@ -402,9 +419,14 @@ class DownloadManager(TaskManager):
         :return: The metainfo
         """
         infohash_hex = hexlify(infohash)
-        if infohash in self.metainfo_cache:
+        metainfo = await self.metainfo_cache.get(infohash)
+        if metainfo is not None:
             self._logger.info('Returning metainfo from cache for %s', infohash_hex)
-            return self.metainfo_cache[infohash]['meta_info']
+            return metainfo
+        hops = self.tribler_session.config.get_default_number_hops() if hops is None else hops
+        if self.metainfo_cache.is_missing(infohash, timeout, hops) and infohash not in self.downloads:
+            self._logger.info('Skipping metainfo lookup for %s, it failed recently', infohash_hex)
+            return None
 
         self._logger.info('Trying to fetch metainfo for %s', infohash_hex)
         if infohash in self.metainfo_requests:
@@ -415,7 +437,7 @@ class DownloadManager(TaskManager):
         else:
             tdef = TorrentDefNoMetainfo(infohash, 'metainfo request', url=url)
             dcfg = DownloadConfig()
-            dcfg.set_hops(self.tribler_session.config.get_default_number_hops() if hops is None else hops)
+            dcfg.set_hops(hops)
             dcfg.set_upload_mode(True)  # Upload mode should prevent libtorrent from creating files
             dcfg.set_dest_dir(self.metadata_tmpdir)
             try:
@@ -427,10 +449,13 @@ class DownloadManager(TaskManager):
         try:
             metainfo = download.tdef.get_metainfo() or await wait_for(shield(download.future_metainfo), timeout)
             self._logger.info('Successfully retrieved metainfo for %s', infohash_hex)
-            self.metainfo_cache[infohash] = {'time': timemod.time(), 'meta_info': metainfo}
-        except (CancelledError, asyncio.TimeoutError):
+        except asyncio.TimeoutError:
             metainfo = None
             self._logger.info('Failed to retrieve metainfo for %s', infohash_hex)
+            self.metainfo_cache.add_missing(infohash, timeout, hops)
+        except CancelledError:
+            metainfo = None
+            self._logger.info('Cancelled the metainfo lookup for %s', infohash_hex)
 
         if infohash in self.metainfo_requests:
             self.metainfo_requests[infohash][1] -= 1
@@ -438,16 +463,11 @@ class DownloadManager(TaskManager):
                 await self.remove_download(download, remove_content=True)
                 self.metainfo_requests.pop(infohash)
 
+        # The metainfo is only cached after the lookup is cleaned up, so a cancelled put does not leak the download
+        if metainfo is not None:
+            await self.metainfo_cache.put(infohash, metainfo)
         return metainfo
 
-    def _task_cleanup_metainfo_cache(self):
-        oldest_time = timemod.time() - METAINFO_CACHE_PERIOD
-
-        for info_hash, cache_entry in list(self.metainfo_cache.items()):
-            last_time = cache_entry['time']
-            if last_time < oldest_time:
-                del self.metainfo_cache[info_hash]
-
     def _request_torrent_updates(self):
         for ltsession in self.ltsessions.values():
             if ltsession:
@@ -478,8 +498,9 @@ class DownloadManager(TaskManager):
             name, infohash, _ = parse_magnetlink(uri)
             if infohash is None:
                 raise RuntimeError("Missing infohash")
-            if infohash in self.metainfo_cache:
-                tdef = TorrentDef.load_from_dict(self.metainfo_cache[infohash]['meta_info'])
+            metainfo = await self.metainfo_cache.get(infohash)
+            if metainfo is not None:
+                tdef = TorrentDef.load_from_dict(metainfo)
             else:
                 tdef = TorrentDefNoMetainfo(infohash, "Unknown name" if name is None else name, url=uri)
             return self.start_download(tdef=tdef, config=config)
@@ -707,14 +728,11 @@ class DownloadManager(TaskManager):
     def set_download_states_callback(self, user_callback, interval=1.0):
         """
         Set the download state callback. Remove any old callback if it's present.
-        Calls user_callback with a list of
-        DownloadStates, one for each Download in the Session as first argument.
-        The user_callback must return a tuple (when, getpeerlist) that indicates
-        when to invoke the callback again (as a number of seconds from now,
-        or < 0.0 if not at all) and whether to also include the details of
-        the connected peers in the DownloadStates on that next call.
-
-        :param user_callback: a function adhering to the above spec
+        Calls user_callback with a list of the DownloadStates of the Downloads that libtorrent reported
+        a new status for since the previous call, so the callback only has to process the changes.
+        Use get_download_states to get the states of all Downloads.
+
+        :param user_callback: a function that accepts a list of DownloadStates
         :param interval: time in between the download states callback's
         """
         self._logger.debug("Starting the download state callback with interval %f", interval)
@@ -723,62 +741,127 @@ class DownloadManager(TaskManager):
     def stop_download_states_callback(self):
         return self.cancel_pending_task("download_states_lc")
 
+    def get_download_states(self):
+        """
+        Get the cached states of all downloads.
+        """
+        return [download.get_state() for download in self.downloads.values()]
+
     async def _invoke_states_cb(self, callback):
         """
-        Invoke the download states callback with a list of the download states.
+        Invoke the download states callback with a list of the download states that changed since the last call.
         """
-        result = callback([download.get_state() for download in self.downloads.values()])
+        updated, self.updated_states = self.updated_states, set()
+        result = callback([self.downloads[infohash].get_state() for infohash in updated if infohash in self.downloads])
         if iscoroutine(result):
             await result
 
     async def sesscb_states_callback(self, states_list):
         """
-        This method is periodically (every second) called with a list of the download states of the active downloads.
+        This method is periodically (every second) called with a list of the download states that changed.
         """
         # TODO: refactor this method. It is too long and tightly coupled with higher-level modules.
         self.state_cb_count += 1
 
         for ds in states_list:
             download = ds.get_download()
-            infohash = download.get_def().get_infohash()
-
             if ds.get_status() == DLSTATUS_SEEDING:
                 if download.config.get_hops() == 0 and download.config.get_safe_seeding():
                     # Re-add the download with anonymity enabled
                     hops = self.tribler_session.config.get_default_number_hops()
                     await self.update_hops(download, hops)
 
-            # Check the peers of this download every five seconds and add them to the payout manager when
-            # this peer runs a Tribler instance
-            if self.state_cb_count % 5 == 0 and download.config.get_hops() == 0 and self.tribler_session.payout_manager:
-                for peer in download.get_peerlist():
-                    if str(peer["extended_version"]).startswith('Tribler'):
-                        self.tribler_session.payout_manager.update_peer(unhexlify(peer["id"]), infohash, peer["dtotal"])
+        # Check the peers of the downloads every five seconds and add them to the payout manager when
+        # this peer runs a Tribler instance
+        if self.state_cb_count % 5 == 0 and self.tribler_session.payout_manager:
+            self.update_payout_peers()
 
         if self.state_cb_count % 4 == 0:
             if self.tribler_session.tunnel_community:
-                self.tribler_session.tunnel_community.monitor_downloads(states_list)
+                self.tribler_session.tunnel_community.monitor_downloads(self.get_download_states())
+
+    def update_payout_peers(self):
+        """
+        Add the Tribler peers of the non-anonymous downloads to the payout manager. Only the downloads of which
+        the peers changed, or that downloaded from their peers, since the last call are scanned.
+        """
+        changed, self.changed_peers = self.changed_peers, set()
+        for infohash in changed:
+            download = self.downloads.get(infohash)
+            if not download or download.config.get_hops() != 0:
+                continue
+            for peer in download.get_peerlist():
+                if str(peer["extended_version"]).startswith('Tribler'):
+                    self.tribler_session.payout_manager.update_peer(unhexlify(peer["id"]), infohash, peer["dtotal"])
 
     async def load_checkpoints(self):
-        for filename in self.get_checkpoint_dir().glob('*.conf'):
-            self.load_checkpoint(filename)
-            await sleep(.01)
+        """
+        Resume the downloads from the checkpoints. The checkpoints are parsed in batches by a worker thread, while the
+        downloads of the previous batch are added to libtorrent, so downloads become active progressively.
+        """
+        start_time = timemod.time()
+        filenames = list(self.get_checkpoint_dir().glob('*.conf'))
+        self.checkpoint_stats = {'total': len(filenames), 'resumed': 0, 'failed': 0,
+                                 'parse_time': 0, 'first_resume_time': None, 'duration': None}
+        batches = [filenames[i:i + CHECKPOINT_BATCH_SIZE] for i in range(0, len(filenames), CHECKPOINT_BATCH_SIZE)]
+
+        loop = asyncio.get_event_loop()
+        next_batch = loop.run_in_executor(None, self._parse_checkpoints, batches[0]) if batches else None
+        for index in range(len(batches)):
+            parsed, parse_time = await next_batch
+            self.checkpoint_stats['parse_time'] += parse_time
+            if index + 1 < len(batches):
+                next_batch = loop.run_in_executor(None, self._parse_checkpoints, batches[index + 1])
+
+            for filename, checkpoint in parsed:
+                if checkpoint and self.resume_checkpoint(filename, *checkpoint):
+                    self.checkpoint_stats['resumed'] += 1
+                    if self.checkpoint_stats['first_resume_time'] is None:
+                        self.checkpoint_stats['first_resume_time'] = timemod.time() - start_time
+                else:
+                    self.checkpoint_stats['failed'] += 1
+            # Let the event loop handle the add_torrent_alerts of this batch before resuming the next one
+            await sleep(0)
+
+        self.checkpoint_stats['duration'] = timemod.time() - start_time
+        self._logger.info("Resumed %d of %d checkpoints in %.2f seconds (%.2f seconds spent parsing)",
+                          self.checkpoint_stats['resumed'], self.checkpoint_stats['total'],
+                          self.checkpoint_stats['duration'], self.checkpoint_stats['parse_time'])
+
+    def _parse_checkpoints(self, filenames):
+        """
+        Parse a batch of checkpoints. This method is called from a worker thread.
+        :return: a list of (filename, (config, tdef) or None) tuples, and the time it took
+        """
+        start_time = timemod.time()
+        parsed = [(filename, self.parse_checkpoint(filename)) for filename in filenames]
+        return parsed, timemod.time() - start_time
 
     def load_checkpoint(self, filename):
+        checkpoint = self.parse_checkpoint(filename)
+        if checkpoint:
+            self.resume_checkpoint(filename, *checkpoint)
+
+    def parse_checkpoint(self, filename):
+        """
+        Load the config and torrent definition of a checkpoint. This method does not touch the download manager,
+        so it can be called from a worker thread.
+        :return: a (config, tdef) tuple, or None if the checkpoint is invalid
+        """
         try:
             config = DownloadConfig.load(filename)
         except Exception:
             self._logger.exception("Could not open checkpoint file %s", filename)
-            return
+            return None
 
         metainfo = config.get_metainfo()
         if not metainfo:
             self._logger.error("Could not resume checkpoint %s; metainfo not found", filename)
-            return
+            return None
         if not isinstance(metainfo, dict):
             self._logger.error("Could not resume checkpoint %s; metainfo is not dict %s %s",
                                filename, type(metainfo), repr(metainfo))
-            return
+            return None
 
         try:
             url = metainfo.get(b'url', None)
@@ -787,26 +870,34 @@ class DownloadManager(TaskManager):
                     if b'infohash' in metainfo else TorrentDef.load_from_dict(metainfo))
         except (KeyError, ValueError) as e:
             self._logger.exception("Could not restore tdef from metainfo dict: %s %s ", e, metainfo)
-            return
+            return None
+        return config, tdef
 
+    def resume_checkpoint(self, filename, config, tdef):
+        """
+        Start the download of a parsed checkpoint.
+        :return: whether the download was started
+        """
         if config.get_bootstrap_download():
             if hexlify(tdef.get_infohash()) != self.tribler_session.config.get_bootstrap_infohash():
                 self.remove_config(tdef.get_infohash())
-                return
+                return False
 
         config.state_dir = self.tribler_session.config.get_state_dir()
         if config.get_dest_dir() == '':  # removed torrent ignoring
             self._logger.info("Removing checkpoint %s destdir is %s", filename, config.get_dest_dir())
             os.remove(filename)
-            return
+            return False
 
         try:
             if self.download_exists(tdef.get_infohash()):
                 self._logger.info("Not resuming checkpoint because download has already been added")
-            else:
-                self.start_download(tdef=tdef, config=config)
+                return False
+            self.start_download(tdef=tdef, config=config)
         except Exception:
             self._logger.exception("Not resume checkpoint due to exception while adding download")
+            return False
+        return True
 
     def remove_config(self, infohash):
         if infohash not in self.downloads:
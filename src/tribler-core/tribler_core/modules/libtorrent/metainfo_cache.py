@@ -0,0 +1,245 @@
+"""
+This module contains the disk-backed cache of the metainfo that the download manager fetched from the swarms.
+"""
+import logging
+import os
+import time
+from asyncio import Lock, ensure_future, get_event_loop, shield
+from binascii import unhexlify
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import libtorrent as lt
+
+from tribler_core.utilities.path_util import Path
+from tribler_core.utilities.unicode import hexlify
+from tribler_core.utilities.utilities import bdecode_compat
+
+# The default number of bytes of metainfo that is kept on disk
+METAINFO_CACHE_SIZE = 50 * 1024 * 1024
+
+# How long a failed metainfo lookup is remembered, in seconds
+NEGATIVE_TTL = 5 * 60
+
+# The maximum number of failed metainfo lookups that are remembered
+MAX_NEGATIVE_ENTRIES = 1000
+
+
+class MetainfoCache(object):
+    """
+    Least-recently-used cache of bencoded metainfo, stored as one file per infohash.
+
+    The index of the cached infohashes and their sizes is kept in memory, and is built from the modification times
+    of the files when the cache is first used. The files are read and written on the default executor of the event
+    loop, only the index is changed on the event loop itself. The changes of the file of an infohash are serialized,
+    so a file that is written is never removed by an eviction that started before. The cache also remembers
+    for a while which lookups failed, so they are not retried right away.
+    """
+
+    def __init__(self, directory, max_size=METAINFO_CACHE_SIZE, negative_ttl=NEGATIVE_TTL):
+        """
+        :param directory: the directory in which the metainfo files are stored
+        :param max_size: the maximum number of bytes of metainfo that is kept
+        :param negative_ttl: how long a failed lookup is remembered, in seconds
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+
+        # infohash -> file size, from the least to the most recently used
+        self._entries = OrderedDict()
+        self._size = 0
+        # infohash -> (time, timeout, hops) of the failed lookup, from the oldest to the newest
+        self._missing = OrderedDict()
+        self._load_task = None
+        # infohash -> [lock, number of users] of the file of the infohash
+        self._locks = {}
+
+    def __contains__(self, infohash):
+        return infohash in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    def _get_path(self, infohash):
+        return self.directory / (hexlify(infohash) + '.torrent')
+
+    @staticmethod
+    def _scan_directory(directory):
+        """
+        Get the (modification time, infohash, size) tuples of the metainfo files. This method is called on an executor.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in directory.glob('*.torrent'):
+            try:
+                infohash = unhexlify(path.stem)
+                stat = path.stat()
+            except (ValueError, OSError):
+                continue
+            if len(infohash) == 20:
+                files.append((stat.st_mtime, infohash, stat.st_size))
+        return files
+
+    @staticmethod
+    def _read_file(path):
+        """
+        Read and decode a metainfo file, and touch it. This method is called on an executor.
+        :return: the metainfo, or None if the file is unreadable
+        """
+        try:
+            with open(path, 'rb') as metainfo_file:
+                metainfo = bdecode_compat(metainfo_file.read())
+        except OSError:
+            return None
+        if metainfo is None:
+            return None
+        try:
+            # The modification time persists the recency of the entry across restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return metainfo
+
+    @staticmethod
+    def _write_file(path, metainfo, max_size):
+        """
+        Encode and write a metainfo file. This method is called on an executor.
+        :return: the size of the file, or None if the metainfo is too large or could not be written
+        """
+        data = lt.bencode(metainfo)
+        if len(data) > max_size:
+            return None
+        with open(path, 'wb') as metainfo_file:
+            metainfo_file.write(data)
+        return len(data)
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    async def _run(self, func, *args):
+        return await get_event_loop().run_in_executor(None, func, *args)
+
+    async def _load_index(self):
+        files = await self._run(self._scan_directory, self.directory)
+        for _, infohash, size in sorted(files):
+            self._entries[infohash] = size
+            self._size += size
+        await self._evict()
+
+    async def load(self):
+        """
+        Build the index of the cached metainfo from the files in the directory, if that was not done yet.
+        """
+        if self._load_task is None:
+            self._load_task = ensure_future(self._load_index())
+        # Cancelling one of the lookups should not cancel the loading of the index for the others
+        await shield(self._load_task)
+
+    async def get(self, infohash):
+        """
+        Get the cached metainfo of a torrent.
+        :return: the metainfo, or None if it is not cached
+        """
+        await self.load()
+        if infohash not in self._entries:
+            return None
+        path = self._get_path(infohash)
+        metainfo = await self._run(self._read_file, path)
+        if metainfo is None:
+            self._logger.warning("Dropping unreadable cached metainfo %s", path)
+            await self.remove(infohash)
+            return None
+        if infohash in self._entries:
+            self._entries.move_to_end(infohash)
+        return metainfo
+
+    async def put(self, infohash, metainfo):
+        """
+        Store the metainfo of a torrent, and evict the least recently used metainfo if the cache is full.
+        """
+        await self.load()
+        self._missing.pop(infohash, None)
+        async with self._lock_file(infohash):
+            try:
+                size = await self._run(self._write_file, self._get_path(infohash), metainfo, self.max_size)
+            except OSError:
+                self._logger.exception("Could not cache the metainfo of %s", hexlify(infohash))
+                return
+            if size is None:
+                return
+            self._size += size - self._entries.pop(infohash, 0)
+            self._entries[infohash] = size
+        await self._evict()
+
+    @asynccontextmanager
+    async def _lock_file(self, infohash):
+        lock_users = self._locks.setdefault(infohash, [Lock(), 0])
+        lock_users[1] += 1
+        try:
+            async with lock_users[0]:
+                yield
+        finally:
+            lock_users[1] -= 1
+            if not lock_users[1]:
+                del self._locks[infohash]
+
+    def _pop_entry(self, infohash):
+        size = self._entries.pop(infohash, None)
+        if size is None:
+            return False
+        self._size -= size
+        return True
+
+    async def _remove_dropped_file(self, infohash):
+        async with self._lock_file(infohash):
+            # The metainfo may have been stored again while we waited for the lock
+            if infohash not in self._entries:
+                await self._run(self._remove_file, self._get_path(infohash))
+
+    async def remove(self, infohash):
+        if self._pop_entry(infohash):
+            await self._remove_dropped_file(infohash)
+
+    async def _evict(self):
+        evicted = []
+        while self._size > self.max_size and self._entries:
+            infohash = next(iter(self._entries))
+            self._pop_entry(infohash)
+            evicted.append(infohash)
+        for infohash in evicted:
+            await self._remove_dropped_file(infohash)
+
+    def add_missing(self, infohash, timeout, hops, now=None):
+        """
+        Remember that the metainfo of a torrent could not be found.
+        :param timeout: the timeout of the lookup that failed, in seconds
+        :param hops: the number of hops the lookup used
+        """
+        self._missing.pop(infohash, None)
+        self._missing[infohash] = (time.time() if now is None else now, timeout, hops)
+        while len(self._missing) > MAX_NEGATIVE_ENTRIES:
+            self._missing.popitem(last=False)
+
+    def is_missing(self, infohash, timeout, hops, now=None):
+        """
+        Check whether a lookup of the metainfo of a torrent failed recently. A lookup that failed with other hops,
+        or with a shorter timeout than the given one, does not count.
+        """
+        missing = self._missing.get(infohash)
+        if missing is None:
+            return False
+        timestamp, missing_timeout, missing_hops = missing
+        if (time.time() if now is None else now) - timestamp >= self.negative_ttl:
+            del self._missing[infohash]
+            return False
+        return missing_hops == hops and missing_timeout >= timeout
@@ -1,6 +1,8 @@
+import os
 from asyncio import CancelledError, TimeoutError as AsyncTimeoutError, wait_for
 from binascii import unhexlify
 from contextlib import suppress
+from functools import partial
 from urllib.parse import unquote_plus
 from urllib.request import url2pathname
 
@@ -28,6 +30,7 @@ from tribler_core.restapi.rest_endpoint import (
     HTTP_BAD_REQUEST,
     HTTP_INTERNAL_SERVER_ERROR,
     HTTP_NOT_FOUND,
+    HTTP_NOT_MODIFIED,
     RESTEndpoint,
     RESTResponse,
     RESTStreamResponse,
@@ -55,6 +58,106 @@ def _safe_extended_peer_info(ext_peer_info):
         return u''.join([chr(c) for c in ext_peer_info])
 
 
+# How many removed downloads are remembered for the clients that poll for changes
+MAX_REMOVED_DOWNLOADS = 1000
+
+
+class DownloadsRevisions(object):
+    """
+    Keeps the last JSON of every download that was served, and the revision at which it last changed, so clients can
+    poll for the downloads that changed since the revision they have. The piece bitmap is tracked separately, since
+    it is large and changes less often than the rest of the download.
+
+    A revision token also holds a random identifier of this object, so that tokens from before a restart, or for other
+    query parameters, are not mistaken for valid ones.
+    """
+
+    def __init__(self):
+        self.identifier = hexlify(os.urandom(4))
+        self.revision = 0
+        # infohash -> [json, revision, pieces marker, pieces, pieces revision, json marker]
+        self.entries = {}
+        # infohash -> revision at which the download was removed
+        self.removed = {}
+        # The clients with a revision before this one may have missed a removal
+        self.removed_horizon = 0
+
+    @property
+    def token(self):
+        return "%s-%d" % (self.identifier, self.revision)
+
+    def parse_token(self, token):
+        """
+        Get the revision of a token that was handed out by this object.
+        :return: the revision, or None if the token is not valid (anymore)
+        """
+        identifier, _, revision = (token or '').partition('-')
+        if identifier != self.identifier or not revision.isdigit():
+            return None
+        revision = int(revision)
+        if revision > self.revision or revision < self.removed_horizon:
+            return None
+        return revision
+
+    def update(self, infohash, marker, get_json, pieces_marker=None, get_pieces=None):
+        """
+        Store the current JSON of a download, and bump the revision if it changed.
+        :param marker: a value that changes whenever the JSON of the download may have changed
+        :param get_json: a function that returns the JSON of the download, only called when the marker changed
+        :param pieces_marker: a value that changes whenever the piece bitmap may have changed
+        :param get_pieces: a function that returns the piece bitmap, only called when the marker changed
+        """
+        entry = self.entries.get(infohash)
+        if entry is None:
+            self.removed.pop(infohash, None)
+            self.revision += 1
+            entry = self.entries[infohash] = [get_json(), self.revision, None, None, self.revision, marker]
+        elif entry[5] != marker:
+            download_json = get_json()
+            entry[5] = marker
+            if entry[0] != download_json:
+                self.revision += 1
+                entry[0], entry[1] = download_json, self.revision
+
+        if get_pieces is not None and (entry[3] is None or entry[2] != pieces_marker):
+            pieces = get_pieces()
+            entry[2] = pieces_marker
+            if pieces != entry[3]:
+                self.revision += 1
+                entry[3], entry[4] = pieces, self.revision
+
+    def retain(self, infohashes):
+        """
+        Forget the downloads that are not in the given set of infohashes.
+        """
+        for infohash in set(self.entries) - set(infohashes):
+            del self.entries[infohash]
+            self.revision += 1
+            self.removed[infohash] = self.revision
+        while len(self.removed) > MAX_REMOVED_DOWNLOADS:
+            infohash = min(self.removed, key=self.removed.get)
+            self.removed_horizon = self.removed.pop(infohash)
+
+    def get_downloads(self, since=None):
+        """
+        Get the JSON of the downloads that changed after a revision, including their piece bitmap if that changed.
+        :param since: the revision, or None to get all downloads
+        :return: a list of the download JSON dictionaries
+        """
+        downloads = []
+        for download_json, revision, _, pieces, pieces_revision, _ in self.entries.values():
+            if since is not None and revision <= since and pieces_revision <= since:
+                continue
+            download_json = dict(download_json)
+            if pieces is not None and (since is None or pieces_revision > since):
+                download_json["pieces"] = pieces
+            downloads.append(download_json)
+        return downloads
+
+    def get_removed(self, since):
+        return [hexlify(infohash) for infohash, revision in self.removed.items() if revision > since]
+
+
 class DownloadsEndpoint(RESTEndpoint):
     """
     This endpoint is responsible for all requests regarding downloads. Examples include getting all downloads,
@@ -63,6 +166,8 @@ class DownloadsEndpoint(RESTEndpoint):
 
     def __init__(self, *args, **kwargs):
         super(DownloadsEndpoint, self).__init__(*args, **kwargs)
+        # (get_peers, get_pieces, get_files) -> DownloadsRevisions
+        self.revisions = {}
 
         self.app.on_shutdown.append(self.on_shutdown)
 
@@ -158,10 +263,22 @@ class DownloadsEndpoint(RESTEndpoint):
             'description': 'Flag indicating whether or not to include files',
             'type': 'boolean',
             'required': False
+        },
+        {
+            'in': 'query',
+            'name': 'revision',
+            'description': 'The revision of the downloads that the client has. Only the downloads that changed '
+                           'since this revision are returned. Pass an empty value to get all downloads and the '
+                           'current revision.',
+            'type': 'string',
+            'required': False
         }],
         responses={
             200: {
                 "schema": schema(DownloadsResponse={
+                    'revision': String,
+                    'delta': Boolean,
+                    'removed': [String],
                     'downloads': schema(Download={
                         'name': String,
                         'progress': Float,
@@ -194,6 +311,10 @@ class DownloadsEndpoint(RESTEndpoint):
                         'time_added': Integer
                     })
                 }),
+            },
+            304: {
+                'description': 'None of the downloads changed since the given revision, or since the entity tag '
+                               'in the If-None-Match header'
             }
         },
         description="This endpoint returns all downloads in Tribler, both active and inactive. The progress "
@@ -202,100 +323,162 @@ class DownloadsEndpoint(RESTEndpoint):
                     "in bytes. The estimated time assumed is given in seconds.\n\n"
                     "Detailed information about peers and pieces is only requested when the get_peers and/or "
                     "get_pieces flag is set. Note that setting this flag has a negative impact on performance "
-                    "and should only be used in situations where this data is required. "
+                    "and should only be used in situations where this data is required.\n\n"
+                    "Clients that poll this endpoint should pass the revision from the previous response. If it is "
+                    "still valid, the response is a delta: it only holds the downloads that changed, the infohashes "
+                    "of the removed downloads, and the piece bitmaps that changed. "
     )
     async def get_downloads(self, request):
         get_peers = request.query.get('get_peers', '0') == '1'
         get_pieces = request.query.get('get_pieces', '0') == '1'
         get_files = request.query.get('get_files', '0') == '1'
+        revisions = self.revisions.setdefault((get_peers, get_pieces, get_files), DownloadsRevisions())
 
-        downloads_json = []
-        downloads = self.session.dlmgr.get_downloads()
-        for download in downloads:
-            if download.hidden and not download.config.get_channel_download():
-                # We still want to send channel downloads since they are displayed in the GUI
-                continue
-            state = download.get_state()
-            tdef = download.get_def()
-
-            # Create tracker information of the download
-            tracker_info = []
-            for url, url_info in download.get_tracker_status().items():
-                tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
+        # We still want to send channel downloads since they are displayed in the GUI
+        downloads = [download for download in self.session.dlmgr.get_downloads()
+                     if not download.hidden or download.config.get_channel_download()]
+        names = await self.get_download_names(downloads)
 
-            num_seeds, num_peers = state.get_num_seeds_peers()
-            num_connected_seeds, num_connected_peers = download.get_num_connected_seeds_peers()
-
-            if download.config.get_channel_download():
-                download_name = self.session.mds.ChannelMetadata.get_channel_name_cached(
-                    tdef.get_name_utf8(), tdef.get_infohash())
+        for download in downloads:
+            infohash = download.get_def().get_infohash()
+            marker = self.get_download_marker(download, names[infohash])
+            get_json = partial(self.get_download_json, download, names[infohash], get_peers, get_files)
+            if get_pieces:
+                state = download.get_state()
+                revisions.update(infohash, marker, get_json, (state.get_status(), state.get_progress()),
+                                 lambda d=download: d.get_pieces_base64().decode('utf-8'))
             else:
-                download_name = self.session.mds.TorrentMetadata.get_torrent_title(tdef.get_infohash()) or \
-                                tdef.get_name_utf8()
-
-            download_json = {
-                "name": download_name,
-                "progress": state.get_progress(),
-                "infohash": hexlify(tdef.get_infohash()),
-                "speed_down": state.get_current_payload_speed(DOWNLOAD),
-                "speed_up": state.get_current_payload_speed(UPLOAD),
-                "status": dlstatus_strings[state.get_status()],
-                "size": tdef.get_length(),
-                "eta": state.get_eta(),
-                "num_peers": num_peers,
-                "num_seeds": num_seeds,
-                "num_connected_peers": num_connected_peers,
-                "num_connected_seeds": num_connected_seeds,
-                "total_up": state.get_total_transferred(UPLOAD),
-                "total_down": state.get_total_transferred(DOWNLOAD),
-                "ratio": state.get_seeding_ratio(),
-                "trackers": tracker_info,
-                "hops": download.config.get_hops(),
-                "anon_download": download.get_anon_mode(),
-                "safe_seeding": download.config.get_safe_seeding(),
-                # Maximum upload/download rates are set for entire sessions
-                "max_upload_speed": self.session.config.get_libtorrent_max_upload_rate(),
-                "max_download_speed": self.session.config.get_libtorrent_max_download_rate(),
-                "destination": str(download.config.get_dest_dir()),
-                "availability": state.get_availability(),
-                "total_pieces": tdef.get_nr_pieces(),
-                "vod_prebuffering_progress": download.stream.prebuffprogress,
-                "vod_prebuffering_progress_consec": download.stream.prebuffprogress_consec,
-                "vod_header_progress": download.stream.headerprogress,
-                "vod_footer_progress": download.stream.footerprogress,
-                "vod_mode": download.stream.enabled,
-                "error": repr(state.get_error()) if state.get_error() else "",
-                "time_added": download.config.get_time_added(),
-                "channel_download": download.config.get_channel_download()
-            }
+                revisions.update(infohash, marker, get_json)
+        revisions.retain(names)
+
+        headers = {'ETag': '"%s"' % revisions.token}
+        if self.matches_etag(request, revisions.token):
+            return RESTResponse(status=HTTP_NOT_MODIFIED, headers=headers)
+        if 'revision' not in request.query:
+            return RESTResponse({"downloads": revisions.get_downloads()}, headers=headers)
+
+        since = revisions.parse_token(request.query['revision'])
+        if since is None:
+            return RESTResponse({"downloads": revisions.get_downloads(), "revision": revisions.token, "delta": False},
+                                headers=headers)
+        if since == revisions.revision:
+            return RESTResponse(status=HTTP_NOT_MODIFIED, headers=headers)
+        return RESTResponse({"downloads": revisions.get_downloads(since), "removed": revisions.get_removed(since),
+                             "revision": revisions.token, "delta": True}, headers=headers)
 
-            # Add peers information if requested
-            if get_peers:
-                peer_list = state.get_peerlist()
-                for peer_info in peer_list:  # Remove have field since it is very large to transmit.
-                    del peer_info['have']
-                    if 'extended_version' in peer_info:
-                        peer_info['extended_version'] = _safe_extended_peer_info(peer_info['extended_version'])
-                    # Does this peer represent a hidden servicecs circuit?
-                    if peer_info.get('port') == CIRCUIT_ID_PORT:
-                        tc = self.session.tunnel_community
-                        circuit_id = tc.ip_to_circuit_id(peer_info['ip'])
-                        circuit = tc.circuits.get(circuit_id, None)
-                        if circuit:
-                            peer_info['circuit'] = circuit_id
-
-                download_json["peers"] = peer_list
-
-            # Add piece information if requested
-            if get_pieces:
-                download_json["pieces"] = download.get_pieces_base64().decode('utf-8')
+    @staticmethod
+    def matches_etag(request, token):
+        """
+        Check whether the If-None-Match header of a request holds the entity tag of a revision token.
+        """
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        for etag in if_none_match.split(','):
+            etag = etag.strip()
+            if etag.startswith('W/'):
+                etag = etag[2:]
+            if etag == '*' or etag.strip('"') == token:
+                return True
+        return False
+
+    def get_download_marker(self, download, download_name):
+        """
+        Get a value that changes whenever the JSON of a download may have changed, without querying libtorrent.
+        The download state is cached until libtorrent reports a new status for the download, so the JSON of the
+        downloads that libtorrent did not report as changed is not built again.
+        """
+        config = download.config
+        return (download.get_state(), download_name, tuple(download.tracker_status.items()),
+                download.stream.infohash, download.stream.fileindex, config.get_hops(), config.get_safe_seeding(),
+                config.get_dest_dir(), tuple(config.get_selected_files()),
+                self.session.config.get_libtorrent_max_upload_rate(),
+                self.session.config.get_libtorrent_max_download_rate())
+
+    async def get_download_names(self, downloads):
+        """
+        Get the names under which downloads are shown. These are the titles from the metadata store, if available.
+        :return: a dictionary that maps the infohashes of the downloads to their names
+        """
+        requests = [(download.get_def().get_infohash(), download.get_def().get_name_utf8(),
+                     download.config.get_channel_download()) for download in downloads]
+        if self.session.download_name_cache is None:
+            return {infohash: dl_name for infohash, dl_name, _ in requests}
+        return await self.session.download_name_cache.get_names(requests)
 
-            # Add files if requested
-            if get_files:
-                download_json["files"] = self.get_files_info_json(download)
+    def get_download_json(self, download, download_name, get_peers=False, get_files=False):
+        """
+        Return the JSON of a download, without the piece bitmap.
+        """
+        state = download.get_state()
+        tdef = download.get_def()
+
+        # Create tracker information of the download
+        tracker_info = []
+        for url, url_info in download.get_tracker_status().items():
+            tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
+
+        num_seeds, num_peers = state.get_num_seeds_peers()
+        num_connected_seeds, num_connected_peers = download.get_num_connected_seeds_peers()
+
+        download_json = {
+            "name": download_name,
+            "progress": state.get_progress(),
+            "infohash": hexlify(tdef.get_infohash()),
+            "speed_down": state.get_current_payload_speed(DOWNLOAD),
+            "speed_up": state.get_current_payload_speed(UPLOAD),
+            "status": dlstatus_strings[state.get_status()],
+            "size": tdef.get_length(),
+            "eta": state.get_eta(),
+            "num_peers": num_peers,
+            "num_seeds": num_seeds,
+            "num_connected_peers": num_connected_peers,
+            "num_connected_seeds": num_connected_seeds,
+            "total_up": state.get_total_transferred(UPLOAD),
+            "total_down": state.get_total_transferred(DOWNLOAD),
+            "ratio": state.get_seeding_ratio(),
+            "trackers": tracker_info,
+            "hops": download.config.get_hops(),
+            "anon_download": download.get_anon_mode(),
+            "safe_seeding": download.config.get_safe_seeding(),
+            # Maximum upload/download rates are set for entire sessions
+            "max_upload_speed": self.session.config.get_libtorrent_max_upload_rate(),
+            "max_download_speed": self.session.config.get_libtorrent_max_download_rate(),
+            "destination": str(download.config.get_dest_dir()),
+            "availability": state.get_availability(),
+            "total_pieces": tdef.get_nr_pieces(),
+            "vod_prebuffering_progress": download.stream.prebuffprogress,
+            "vod_prebuffering_progress_consec": download.stream.prebuffprogress_consec,
+            "vod_header_progress": download.stream.headerprogress,
+            "vod_footer_progress": download.stream.footerprogress,
+            "vod_mode": download.stream.enabled,
+            "error": repr(state.get_error()) if state.get_error() else "",
+            "time_added": download.config.get_time_added(),
+            "channel_download": download.config.get_channel_download()
+        }
 
-            downloads_json.append(download_json)
-        return RESTResponse({"downloads": downloads_json})
+        # Add peers information if requested
+        if get_peers:
+            peer_list = state.get_peerlist()
+            for peer_info in peer_list:  # Remove have field since it is very large to transmit.
+                del peer_info['have']
+                if 'extended_version' in peer_info:
+                    peer_info['extended_version'] = _safe_extended_peer_info(peer_info['extended_version'])
+                # Does this peer represent a hidden servicecs circuit?
+                if peer_info.get('port') == CIRCUIT_ID_PORT:
+                    tc = self.session.tunnel_community
+                    circuit_id = tc.ip_to_circuit_id(peer_info['ip'])
+                    circuit = tc.circuits.get(circuit_id, None)
+                    if circuit:
+                        peer_info['circuit'] = circuit_id
+
+            download_json["peers"] = peer_list
+
+        # Add files if requested
+        if get_files:
+            download_json["files"] = self.get_files_info_json(download)
+
+        return download_json
 
     @docs(
         tags=["Libtorrent"],
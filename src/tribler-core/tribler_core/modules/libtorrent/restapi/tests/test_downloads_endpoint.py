@@ -2,6 +2,7 @@ import os
 from asyncio import ensure_future
 from binascii import unhexlify
 from tempfile import mkstemp
+from unittest.mock import Mock
 
 from libtorrent import bencode
 
@@ -13,9 +14,10 @@ from tribler_core.modules.libtorrent.download import Download
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
 from tribler_core.modules.libtorrent.download_manager import DownloadManager
 from tribler_core.modules.libtorrent.download_state import DownloadState
+from tribler_core.modules.libtorrent.restapi.downloads_endpoint import DownloadsRevisions
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.restapi.base_api_test import AbstractApiTest
-from tribler_core.tests.tools.base_test import MockObject
+from tribler_core.tests.tools.base_test import MockObject, TriblerCoreTest
 from tribler_core.tests.tools.common import TESTS_DATA_DIR, TESTS_DIR, UBUNTU_1504_INFOHASH
 from tribler_core.tests.tools.tools import timeout
 from tribler_core.utilities.path_util import Path, pathname2url
@@ -80,6 +82,62 @@ class TestDownloadsEndpoint(TestDownloadsBaseEndpoint):
         downloads = await self.do_request('downloads', expected_code=200)
         self.assertEqual(len(downloads['downloads']), 2)
 
+    @timeout(10)
+    async def test_get_downloads_delta(self):
+        """
+        Testing whether the API only returns the downloads that changed since a revision
+        """
+        downloads = [self.add_mock_download() for _ in range(2)]
+
+        response = await self.do_request('downloads?revision=', expected_code=200)
+        self.assertEqual(len(response['downloads']), 2)
+        self.assertFalse(response['delta'])
+        revision = response['revision']
+
+        await self.do_request('downloads?revision=%s' % revision, expected_code=304, json_response=False)
+
+        self.session.dlmgr.downloads.pop(downloads[0].get_def().get_infohash())
+        downloads[1].config.set_hops(2)
+        response = await self.do_request('downloads?revision=%s' % revision, expected_code=200)
+        self.assertTrue(response['delta'])
+        self.assertEqual([download['hops'] for download in response['downloads']], [2])
+        self.assertEqual(response['removed'], [get_hex_infohash(downloads[0].get_def())])
+
+        response = await self.do_request('downloads?revision=unknown-1', expected_code=200)
+        self.assertFalse(response['delta'])
+        self.assertEqual(len(response['downloads']), 1)
+
+    @timeout(10)
+    async def test_get_downloads_unchanged_state(self):
+        """
+        Testing whether the JSON of a download is not built again while libtorrent reports no new status for it
+        """
+        download = self.add_mock_download()
+        state = DownloadState(download, {}, None)
+        download.get_state = lambda: state
+        endpoint = self.session.api_manager.root_endpoint.endpoints['/downloads']
+        endpoint.get_download_json = Mock(wraps=endpoint.get_download_json)
+
+        await self.do_request('downloads', expected_code=200)
+        await self.do_request('downloads', expected_code=200)
+        self.assertEqual(endpoint.get_download_json.call_count, 1)
+
+        state = DownloadState(download, {}, None)
+        await self.do_request('downloads', expected_code=200)
+        self.assertEqual(endpoint.get_download_json.call_count, 2)
+
+    @timeout(10)
+    async def test_get_downloads_if_none_match(self):
+        """
+        Testing whether the API honours the entity tag in the If-None-Match header
+        """
+        self.add_mock_download()
+        revision = (await self.do_request('downloads?revision=', expected_code=200))['revision']
+
+        await self.do_request('downloads', expected_code=304, headers={'If-None-Match': '"%s"' % revision},
+                              json_response=False)
+        await self.do_request('downloads', expected_code=200, headers={'If-None-Match': '"unknown-1"'})
+
     @timeout(20)
     async def test_get_downloads_with_files(self):
         """
@@ -719,3 +777,58 @@ class TestMetadataDownloadEndpoint(TestDownloadsBaseEndpoint):
         self.assertEqual(len(downloads['downloads']), 3)
         self.assertEqual(test_channel_name,
                          [d for d in downloads["downloads"] if d["channel_download"]][0]["name"])
+
+
+class TestDownloadsRevisions(TriblerCoreTest):
+
+    def test_pieces_only_when_changed(self):
+        """
+        Test whether the piece bitmap is only fetched when the marker changes, and only returned when it changed
+        """
+        revisions = DownloadsRevisions()
+        get_pieces = MockObject()
+        get_pieces.calls = 0
+
+        def pieces():
+            get_pieces.calls += 1
+            return "AA==" if get_pieces.calls < 3 else "gA=="
+
+        revisions.update(b'a' * 20, 0, lambda: {"progress": 0}, 0, pieces)
+        since = revisions.revision
+        revisions.update(b'a' * 20, 1, lambda: {"progress": 0}, 0, pieces)
+        self.assertEqual(get_pieces.calls, 1)
+        self.assertEqual(revisions.get_downloads(since), [])
+        self.assertEqual(revisions.get_downloads(), [{"progress": 0, "pieces": "AA=="}])
+
+        revisions.update(b'a' * 20, 2, lambda: {"progress": 0.1}, 0.1, pieces)
+        self.assertEqual(revisions.get_downloads(since), [{"progress": 0.1}])
+
+        revisions.update(b'a' * 20, 3, lambda: {"progress": 0.1}, 0.2, pieces)
+        self.assertEqual(revisions.get_downloads(since), [{"progress": 0.1, "pieces": "gA=="}])
+
+    def test_json_only_when_changed(self):
+        """
+        Test whether the JSON of a download is only built when its marker changes
+        """
+        revisions = DownloadsRevisions()
+        get_json = Mock(return_value={"progress": 0})
+
+        revisions.update(b'a' * 20, 0, get_json)
+        revisions.update(b'a' * 20, 0, get_json)
+        self.assertEqual(get_json.call_count, 1)
+
+        since = revisions.revision
+        revisions.update(b'a' * 20, 1, get_json)
+        self.assertEqual(get_json.call_count, 2)
+        self.assertEqual(revisions.revision, since)
+
+    def test_parse_token(self):
+        """
+        Test whether only the tokens of the current revisions are accepted
+        """
+        revisions = DownloadsRevisions()
+        revisions.update(b'a' * 20, None, dict)
+        self.assertEqual(revisions.parse_token(revisions.token), 1)
+        self.assertIsNone(revisions.parse_token("%s-2" % revisions.identifier))
+        self.assertIsNone(revisions.parse_token(DownloadsRevisions().token))
+        self.assertIsNone(revisions.parse_token(None))
@@ -7,7 +7,7 @@ from libtorrent import bencode
 
 from tribler_common.simpledefs import DLSTATUS_SEEDING, DLSTATUS_STOPPED_ON_ERROR
 
-from tribler_core.modules.libtorrent.download_manager import DownloadManager
+from tribler_core.modules.libtorrent.download_manager import CHECKPOINT_BATCH_SIZE, DownloadManager
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
 from tribler_core.notifier import Notifier
 from tribler_core.tests.tools.base_test import MockObject
@@ -75,6 +75,7 @@ class TestDownloadManager(AbstractServer):
         self.tribler_session.config.get_libtorrent_max_conn_download = lambda: 0
         self.tribler_session.config.get_default_number_hops = lambda: 1
         self.tribler_session.config.get_libtorrent_dht_readiness_timeout = lambda: 0
+        self.tribler_session.config.get_libtorrent_metainfo_cache_size = lambda: 1024 * 1024
 
         self.dlmgr = DownloadManager(self.tribler_session)
         self.dlmgr.metadata_tmpdir = mkdtemp(suffix=u'tribler_metainfo_tmpdir')
@@ -184,9 +185,53 @@ class TestDownloadManager(AbstractServer):
         Testing whether cached metainfo is returned, if available
         """
         self.dlmgr.initialize()
-        self.dlmgr.metainfo_cache[b"a" * 20] = {'meta_info': 'test', 'time': 0}
+        await self.dlmgr.metainfo_cache.put(b"a" * 20, {b'info': b'test'})
 
-        self.assertEqual(await self.dlmgr.get_metainfo(b"a" * 20), "test")
+        self.assertEqual(await self.dlmgr.get_metainfo(b"a" * 20), {b'info': b'test'})
+
+    @timeout(20)
+    async def test_get_metainfo_missing(self):
+        """
+        Testing whether a failed metainfo lookup is not retried right away
+        """
+        download_impl = Mock()
+        download_impl.tdef.get_metainfo = lambda: None
+        download_impl.future_metainfo = Future()
+
+        self.dlmgr.initialize()
+        self.dlmgr.start_download = Mock(return_value=download_impl)
+        self.dlmgr.remove_download = Mock(return_value=succeed(None))
+
+        self.assertIsNone(await self.dlmgr.get_metainfo(b"a" * 20, timeout=.01))
+        self.assertIsNone(await self.dlmgr.get_metainfo(b"a" * 20, timeout=.01))
+        self.dlmgr.start_download.assert_called_once()
+
+        # Lookups with a longer timeout or other hops are tried anyway
+        self.assertIsNone(await self.dlmgr.get_metainfo(b"a" * 20, timeout=.02))
+        self.assertIsNone(await self.dlmgr.get_metainfo(b"a" * 20, timeout=.01, hops=2))
+        self.assertEqual(self.dlmgr.start_download.call_count, 3)
+
+    @timeout(20)
+    async def test_get_metainfo_cancelled(self):
+        """
+        Testing whether a cancelled metainfo lookup is cleaned up, and not remembered as failed
+        """
+        download_impl = Mock()
+        download_impl.tdef.get_metainfo = lambda: None
+        download_impl.future_metainfo = Future()
+
+        self.dlmgr.initialize()
+        self.dlmgr.start_download = Mock(return_value=download_impl)
+        self.dlmgr.remove_download = Mock(return_value=succeed(None))
+
+        lookup = ensure_future(self.dlmgr.get_metainfo(b"a" * 20, timeout=10))
+        await sleep(.01)
+        lookup.cancel()
+        self.assertIsNone(await lookup)
+        self.dlmgr.remove_download.assert_called_once()
+        self.assertNotIn(b"a" * 20, self.dlmgr.metainfo_requests)
+        hops = self.tribler_session.config.get_default_number_hops()
+        self.assertFalse(self.dlmgr.metainfo_cache.is_missing(b"a" * 20, 10, hops))
 
     @timeout(20)
     async def test_get_metainfo_with_already_added_torrent(self):
@@ -407,6 +452,44 @@ class TestDownloadManager(AbstractServer):
         self.dlmgr._task_process_alerts()
         self.dlmgr.tribler_session.payout_manager.do_payout.is_called_with(b'a' * 20)
 
+    async def test_states_callback_only_updated(self):
+        """
+        Test whether the download states callback only gets the states of the downloads reported by libtorrent
+        """
+        downloads = {infohash: Mock(lt_status=None, stop=lambda: succeed(None), shutdown=lambda: succeed(None))
+                     for infohash in (b'a' * 20, b'b' * 20)}
+        self.dlmgr.downloads = downloads
+        status = Mock(info_hash=hexlify(b'a' * 20), num_peers=1, total_payload_download=0)
+        state_update_alert = type('state_update_alert', (object,), dict(status=[status]))()
+        self.dlmgr.process_alert(state_update_alert)
+        downloads[b'a' * 20].update_lt_status.assert_called_with(status)
+        downloads[b'b' * 20].update_lt_status.assert_not_called()
+
+        callback = Mock()
+        await self.dlmgr._invoke_states_cb(callback)
+        callback.assert_called_with([downloads[b'a' * 20].get_state()])
+        await self.dlmgr._invoke_states_cb(callback)
+        callback.assert_called_with([])
+
+    def test_update_payout_peers_changed_only(self):
+        """
+        Test whether only the peers of the downloads of which the peers changed are added to the payout manager
+        """
+        fake_peer = {'extended_version': 'Tribler', 'id': hexlify(b'a' * 20), 'dtotal': 1024}
+        downloads = {infohash: Mock(get_peerlist=Mock(return_value=[fake_peer]), config=Mock(get_hops=lambda: 0),
+                                    stop=lambda: succeed(None), shutdown=lambda: succeed(None))
+                     for infohash in (b'a' * 20, b'b' * 20)}
+        self.dlmgr.downloads = downloads
+        self.dlmgr.tribler_session.payout_manager = Mock()
+        handle = Mock(info_hash=lambda: hexlify(b'a' * 20), is_valid=lambda: True)
+        self.dlmgr.process_alert(type('peer_connect_alert', (object,), dict(handle=handle))())
+
+        self.dlmgr.update_payout_peers()
+        downloads[b'b' * 20].get_peerlist.assert_not_called()
+        self.dlmgr.tribler_session.payout_manager.update_peer.assert_called_once_with(b'a' * 20, b'a' * 20, 1024)
+        self.dlmgr.update_payout_peers()
+        self.assertEqual(downloads[b'a' * 20].get_peerlist.call_count, 1)
+
     async def test_post_session_stats(self):
         """
         Test whether post_session_stats actually updates the state of libtorrent readiness for clean shutdown.
@@ -466,19 +549,36 @@ class TestDownloadManager(AbstractServer):
         """
         Test whether we are resuming downloads after loading checkpoints
         """
-        def mocked_load_checkpoint(filename):
-            self.assertTrue(str(filename).endswith('abcd.conf'))
-            mocked_load_checkpoint.called = True
-
-        mocked_load_checkpoint.called = False
         self.dlmgr.get_checkpoint_dir = lambda: self.session_base_dir
+        self.dlmgr.start_download = Mock()
+        self.tribler_session.config.get_state_dir = lambda: self.session_base_dir
 
+        shutil.copyfile(TESTS_DATA_DIR / "config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf",
+                        self.dlmgr.get_checkpoint_dir() / "13a25451c761b1482d3e85432f07c4be05ca8a56.conf")
         with open(self.dlmgr.get_checkpoint_dir() / 'abcd.conf', 'wb') as state_file:
             state_file.write(b"hi")
 
-        self.dlmgr.load_checkpoint = mocked_load_checkpoint
         await self.dlmgr.load_checkpoints()
-        self.assertTrue(mocked_load_checkpoint.called)
+        self.dlmgr.start_download.assert_called_once()
+        self.assertEqual(self.dlmgr.checkpoint_stats['total'], 2)
+        self.assertEqual(self.dlmgr.checkpoint_stats['resumed'], 1)
+        self.assertEqual(self.dlmgr.checkpoint_stats['failed'], 1)
+        self.assertIsNotNone(self.dlmgr.checkpoint_stats['duration'])
+
+    async def test_load_checkpoints_batches(self):
+        """
+        Test whether the checkpoints are parsed and resumed in batches
+        """
+        self.dlmgr.get_checkpoint_dir = lambda: self.session_base_dir
+        self.dlmgr.parse_checkpoint = lambda filename: (Mock(), Mock())
+        self.dlmgr.resume_checkpoint = Mock(return_value=True)
+        for index in range(CHECKPOINT_BATCH_SIZE + 1):
+            with open(self.dlmgr.get_checkpoint_dir() / ('%d.conf' % index), 'wb') as state_file:
+                state_file.write(b"hi")
+
+        await self.dlmgr.load_checkpoints()
+        self.assertEqual(self.dlmgr.resume_checkpoint.call_count, CHECKPOINT_BATCH_SIZE + 1)
+        self.assertEqual(self.dlmgr.checkpoint_stats['resumed'], CHECKPOINT_BATCH_SIZE + 1)
 
     async def test_readd_download_safe_seeding(self):
         """
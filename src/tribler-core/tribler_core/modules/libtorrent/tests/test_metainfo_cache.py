@@ -0,0 +1,85 @@
+import os
+from asyncio import gather
+
+from tribler_core.modules.libtorrent.metainfo_cache import MetainfoCache
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+
+NOW = 1000000
+
+
+class TestMetainfoCache(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestMetainfoCache, self).setUp()
+        self.directory = self.session_base_dir / 'metainfo_cache'
+        self.cache = MetainfoCache(self.directory, max_size=250, negative_ttl=100)
+
+    async def test_load(self):
+        """
+        Test that the directory is only scanned once the cache is used, and only once
+        """
+        self.assertFalse(self.directory.exists())
+        await gather(self.cache.load(), self.cache.get(b'a' * 20))
+        self.assertTrue(self.directory.exists())
+        self.assertEqual(len(self.cache), 0)
+
+    async def test_put_get(self):
+        """
+        Test that stored metainfo is returned, also after a restart
+        """
+        await self.cache.put(b'a' * 20, {b'info': {b'name': b'test'}})
+        self.assertEqual(await self.cache.get(b'a' * 20), {b'info': {b'name': b'test'}})
+        self.assertIsNone(await self.cache.get(b'b' * 20))
+
+        cache = MetainfoCache(self.directory, max_size=250)
+        self.assertEqual(await cache.get(b'a' * 20), {b'info': {b'name': b'test'}})
+        self.assertEqual(cache.size, self.cache.size)
+
+    async def test_evict_least_recently_used(self):
+        """
+        Test that the least recently used metainfo is evicted when the cache grows too large
+        """
+        for index in range(3):
+            await self.cache.put(bytes([index]) * 20, {b'info': b'x' * 70})
+        await self.cache.get(b'\x00' * 20)
+        await self.cache.put(b'\x03' * 20, {b'info': b'x' * 70})
+
+        self.assertLessEqual(self.cache.size, 250)
+        self.assertIn(b'\x00' * 20, self.cache)
+        self.assertNotIn(b'\x01' * 20, self.cache)
+        self.assertEqual(len(os.listdir(self.directory)), len(self.cache))
+
+    async def test_corrupt_file(self):
+        """
+        Test that an unreadable metainfo file is dropped from the cache
+        """
+        await self.cache.put(b'a' * 20, {b'info': b'test'})
+        with open(self.directory / ('61' * 20 + '.torrent'), 'wb') as metainfo_file:
+            metainfo_file.write(b'not bencoded')
+        self.assertIsNone(await self.cache.get(b'a' * 20))
+        self.assertNotIn(b'a' * 20, self.cache)
+
+    async def test_missing(self):
+        """
+        Test that a failed lookup is remembered until it expires, or until the metainfo is found
+        """
+        self.cache.add_missing(b'a' * 20, 20, 1, now=NOW)
+        self.assertTrue(self.cache.is_missing(b'a' * 20, 20, 1, now=NOW + 50))
+        self.assertTrue(self.cache.is_missing(b'a' * 20, 10, 1, now=NOW + 50))
+        self.assertFalse(self.cache.is_missing(b'a' * 20, 60, 1, now=NOW + 50))
+        self.assertFalse(self.cache.is_missing(b'a' * 20, 20, 0, now=NOW + 50))
+        self.assertFalse(self.cache.is_missing(b'a' * 20, 20, 1, now=NOW + 100))
+
+        self.cache.add_missing(b'b' * 20, 20, 1)
+        await self.cache.put(b'b' * 20, {b'info': b'test'})
+        self.assertFalse(self.cache.is_missing(b'b' * 20, 20, 1))
+
+    async def test_put_during_eviction(self):
+        """
+        Test that metainfo that is stored again while it is being evicted keeps its file
+        """
+        await self.cache.put(b'a' * 20, {b'info': b'x' * 200})
+        await gather(self.cache.put(b'b' * 20, {b'info': b'x' * 200}), self.cache.put(b'a' * 20, {b'info': b'test'}))
+
+        self.assertIn(b'a' * 20, self.cache)
+        self.assertEqual(await self.cache.get(b'a' * 20), {b'info': b'test'})
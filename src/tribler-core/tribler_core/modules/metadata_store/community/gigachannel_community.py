@@ -1,4 +1,3 @@
-from asyncio import get_event_loop
 from binascii import unhexlify
 from random import sample
 
@@ -119,10 +118,9 @@ class GigaChannelCommunity(Community):
             )
             md_list = channel_l + list(channel_l[0].get_random_contents(max_entries - 1)) if channel_l else None
             self.gossip_blob = entries_to_chunk(md_list, maximum_payload_size)[0] if md_list else None
-        self.metadata_store.disconnect_thread()
 
     async def prepare_gossip_blob_cache(self):
-        await get_event_loop().run_in_executor(None, self._prepare_gossip_blob_cache)
+        await self.metadata_store.run_read(self._prepare_gossip_blob_cache)
 
     def send_random_to(self, peer):
         """
@@ -146,22 +144,33 @@ class GigaChannelCommunity(Community):
         if self.gossip_blob:
             self.endpoint.send(peer.address, self.ezr_pack(self.NEWS_PUSH_MESSAGE, RawBlobPayload(self.gossip_blob)))
 
-    def _update_db_with_blob(self, raw_blob):
+    def _update_db_with_payloads(self, payload_list):
         result = None
         try:
             with db_session:
                 try:
-                    result = self.metadata_store.process_compressed_mdblob(raw_blob)
+                    result = self.metadata_store.process_payload_list(payload_list)
                 except (TransactionIntegrityError, CacheIndexError) as err:
                     self._logger.error("DB transaction error when tried to process payload: %s", str(err))
         # Unfortunately, we have to catch the exception twice, because Pony can raise them both on the exit from
         # db_session, and on calling the line of code
         except (TransactionIntegrityError, CacheIndexError) as err:
             self._logger.error("DB transaction error when tried to process payload: %s", str(err))
-        finally:
-            self.metadata_store.disconnect_thread()
         return result
 
+    async def _run_payloads_write(self, func):
+        """
+        Run a write that processes received payloads on the DB executor.
+        The executor commits the changes after the write returns, so the errors Pony raises on commit are not
+        caught by _update_db_with_payloads.
+        :return: the result of the write, or (None, None) if the changes could not be committed
+        """
+        try:
+            return await self.metadata_store.run_write(func)
+        except (TransactionIntegrityError, CacheIndexError) as err:
+            self._logger.error("DB transaction error when tried to process payload: %s", str(err))
+            return None, None
+
     @lazy_wrapper(RawBlobPayload)
     async def on_blob(self, peer, blob):
         """
@@ -171,10 +180,12 @@ class GigaChannelCommunity(Community):
         :param blob: payload raw data
         """
 
-        def _process_received_blob():
-            md_results = self._update_db_with_blob(blob.raw_blob)
+        # Signatures are checked before the write is scheduled, so we do not hold the DB writer meanwhile
+        payload_list = await self.metadata_store.verify_compressed_mdblob_threaded(blob.raw_blob)
+
+        def _process_received_payloads():
+            md_results = self._update_db_with_payloads(payload_list)
             if not md_results:
-                self.metadata_store.disconnect_thread()
                 return None, None
             # Update votes counters
             with db_session:
@@ -197,11 +208,9 @@ class GigaChannelCommunity(Community):
                     and md.origin_id == 0
                     and md.num_entries > 0
                 ]
-            result = gen_have_newer_results_blob(md_results), new_channels
-            self.metadata_store.disconnect_thread()
-            return result
+            return gen_have_newer_results_blob(md_results), new_channels
 
-        reply_blob, new_channels = await get_event_loop().run_in_executor(None, _process_received_blob)
+        reply_blob, new_channels = await self._run_payloads_write(_process_received_payloads)
 
         # Notify the discovered torrents and channels to the GUI
         if self.notifier and new_channels:
@@ -287,11 +296,9 @@ class GigaChannelCommunity(Community):
         def _get_search_results():
             with db_session:
                 db_results = self.metadata_store.MetadataNode.get_entries(**request_dict)
-                result = entries_to_chunk(db_results[:max_entries], maximum_payload_size)[0] if db_results else None
-            self.metadata_store.disconnect_thread()
-            return result
+                return entries_to_chunk(db_results[:max_entries], maximum_payload_size)[0] if db_results else None
 
-        result_blob = await get_event_loop().run_in_executor(None, _get_search_results)
+        result_blob = await self.metadata_store.run_read(_get_search_results)
 
         if result_blob:
             self.endpoint.send(
@@ -304,14 +311,15 @@ class GigaChannelCommunity(Community):
         if not search_request_cache or not search_request_cache.process_peer_response(peer):
             return
 
-        def _process_received_blob():
-            md_results = self._update_db_with_blob(response.raw_blob)
+        payload_list = await self.metadata_store.verify_compressed_mdblob_threaded(response.raw_blob)
+
+        def _process_received_payloads():
+            md_results = self._update_db_with_payloads(payload_list)
             if not md_results:
-                self.metadata_store.disconnect_thread()
                 return None, None
 
             with db_session:
-                result = (
+                return (
                     [
                         md.to_simple_dict()
                         for (md, action) in md_results
@@ -323,10 +331,8 @@ class GigaChannelCommunity(Community):
                     ],
                     gen_have_newer_results_blob(md_results),
                 )
-            self.metadata_store.disconnect_thread()
-            return result
 
-        search_results, reply_blob = await get_event_loop().run_in_executor(None, _process_received_blob)
+        search_results, reply_blob = await self._run_payloads_write(_process_received_payloads)
 
         if self.notifier and search_results:
             self.notifier.notify(
@@ -1,3 +1,5 @@
+from unittest.mock import Mock
+
 from ipv8.database import database_blob
 from ipv8.keyvault.crypto import default_eccrypto
 from ipv8.peer import Peer
@@ -5,13 +7,14 @@ from ipv8.test.base import TestBase
 
 from pony.orm import db_session
 
-from tribler_core.modules.metadata_store.community.gigachannel_community import GigaChannelCommunity
+from tribler_core.modules.metadata_store.community.gigachannel_community import GigaChannelCommunity, RawBlobPayload
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import LEGACY_ENTRY, NEW
 from tribler_core.modules.metadata_store.serialization import REGULAR_TORRENT
-from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.modules.metadata_store.store import UNKNOWN_TORRENT, MetadataStore
 from tribler_core.tests.tools.base_test import MockObject
 from tribler_core.utilities.path_util import Path
 from tribler_core.utilities.random_utils import random_infohash
+from tribler_core.utilities.utilities import succeed
 
 EMPTY_BLOB = database_blob(b"")
 
@@ -108,6 +111,29 @@ class TestGigaChannelUnits(TestBase):
             self.assertEqual(channels[0].contents_len, 1)
             self.assertEqual(channels[1].contents_len, 1)
 
+    async def test_on_blob_conflicting_payload(self):
+        """
+        Test that a blob with entries that conflict with the database when they are committed is rejected
+        without breaking the handler
+        """
+        overlay = self.nodes[1].overlay
+        mds = overlay.metadata_store
+        with db_session:
+            id_ = mds.TorrentMetadata(title="torrent", infohash=random_infohash()).id_
+
+        def process_conflicting_payloads(_):
+            # The existing entry is not in the cache of this db_session, so Pony only finds the conflict at commit
+            return [(mds.TorrentMetadata(title="conflict", infohash=random_infohash(), id_=id_), UNKNOWN_TORRENT)]
+
+        mds.verify_compressed_mdblob_threaded = Mock(return_value=succeed([]))
+        mds.process_payload_list = Mock(side_effect=process_conflicting_payloads)
+        overlay.respond_with_updated_metadata = Mock()
+        await overlay.on_blob.__wrapped__(overlay, self.nodes[0].my_peer, RawBlobPayload(b"blob"))
+
+        overlay.respond_with_updated_metadata.assert_called_once_with(self.nodes[0].my_peer, None)
+        with db_session:
+            self.assertListEqual(["torrent"], [torrent.title for torrent in mds.TorrentMetadata.select()])
+
     async def test_send_random_multiple_torrents(self):
         """
         Test whether sending a single channel with a multiple torrents to another peer works correctly
@@ -0,0 +1,199 @@
+"""
+This module contains the executor that runs the threaded calls of the metadata store.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+from pony.orm import db_session
+
+_STOP = object()
+
+
+class DBExecutor(object):
+    """
+    Executor with a fixed set of long-lived threads for the database calls of the metadata store.
+
+    Pony keeps a separate SQLite connection for every thread. The threads of this executor live as long as
+    the executor itself, so their connections and page caches are reused between the calls, instead of being
+    thrown away after every call.
+
+    Reads and writes go to separate queues. Reads are run by several reader threads with read-only connections.
+    Writes are run by a single writer thread, which groups the writes that are queued at the same time
+    into a single transaction. If that transaction fails, the writes are run again one by one, so batched writes
+    must defer their side effects outside of the database with call_after_commit.
+    """
+
+    def __init__(self, db, num_readers=2, write_batch_size=32):
+        """
+        :param db: the Pony database to run the calls for
+        :param num_readers: the number of reader threads
+        :param write_batch_size: the maximum number of writes grouped into a single transaction
+        """
+        self._db = db
+        self.num_readers = num_readers
+        self.write_batch_size = write_batch_size
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._read_queue = Queue()
+        self._write_queue = Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._is_shutdown = False
+        # The calls deferred by the batched write that is running on the writer thread
+        self._local = threading.local()
+
+    def _start_threads(self):
+        for index in range(self.num_readers):
+            self._threads.append(threading.Thread(target=self._read_loop, name="DBReader-%i" % index, daemon=True))
+        self._threads.append(threading.Thread(target=self._write_loop, name="DBWriter", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _submit(self, queue, func, args, batch):
+        future = Future()
+        with self._lock:
+            if self._is_shutdown:
+                raise RuntimeError("Cannot schedule new database calls after shutdown")
+            # The threads are only started when they are needed for the first time
+            if not self._threads:
+                self._start_threads()
+            queue.put((future, func, args, batch))
+        return future
+
+    def submit_read(self, func, *args):
+        """
+        Schedule a call that only reads from the database.
+        :param func: the function to call. It must open its own db_session.
+        :param args: the arguments of the function
+        :return: a concurrent.futures.Future with the result of the call
+        """
+        return self._submit(self._read_queue, func, args, False)
+
+    def submit_write(self, func, *args, batch=True):
+        """
+        Schedule a call that changes the database.
+        :param func: the function to call. Batched calls are run in a db_session, the others must open their own.
+        :param args: the arguments of the function
+        :param batch: whether the call can share a transaction with other writes. Long calls that commit
+            their changes in several steps should not be batched. Batched calls can be run more than once.
+        :return: a concurrent.futures.Future with the result of the call
+        """
+        return self._submit(self._write_queue, func, args, batch)
+
+    def call_after_commit(self, callback, *args):
+        """
+        Defer a side effect of a batched write, like a notification or a counter update, until its transaction
+        is committed. The deferred calls of a transaction that fails are dropped, so they are only made once
+        for every write, even if the write is run again. Outside of a batched write, the callback is called at once.
+        :param callback: the function to call
+        :param args: the arguments of the function
+        """
+        pending = getattr(self._local, "after_commit", None)
+        if pending is None:
+            callback(*args)
+        else:
+            pending.append((callback, args))
+
+    def _run_deferred(self, pending):
+        for callback, args in pending:
+            try:
+                callback(*args)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception("Deferred call after commit failed")
+
+    def _run(self, job):
+        future, func, args, batch = job
+        self._local.after_commit = [] if batch else None
+        try:
+            if batch:
+                with db_session:
+                    result = func(*args)
+            else:
+                result = func(*args)
+        except BaseException as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+        else:
+            self._run_deferred(self._local.after_commit or [])
+            future.set_result(result)
+        finally:
+            self._local.after_commit = None
+
+    def _read_loop(self):
+        # Nothing is ever written through the connection of a reader, so SQLite can enforce that
+        with db_session:
+            self._db.execute("PRAGMA query_only = 1")
+        while True:
+            job = self._read_queue.get()
+            if job is _STOP:
+                break
+            if job[0].set_running_or_notify_cancel():
+                self._run(job)
+        self._db.disconnect()
+
+    def _run_writes(self, jobs):
+        """
+        Run a group of writes in a single transaction. If any of them fails, the whole transaction is rolled back
+        and the writes are run again one by one, so the failure only affects the write that caused it.
+        The calls the writes deferred with call_after_commit are only made once their transaction is committed.
+        :param jobs: the list of write jobs
+        """
+        jobs = [job for job in jobs if job[0].set_running_or_notify_cancel()]
+        if len(jobs) > 1:
+            self._local.after_commit = []
+            try:
+                with db_session:
+                    results = [func(*args) for _, func, args, _ in jobs]
+            except Exception as e:  # pylint: disable=broad-except
+                self._logger.info("Batched transaction of %i writes failed, running them separately: %s", len(jobs), e)
+            else:
+                self._run_deferred(self._local.after_commit)
+                for (future, _, _, _), result in zip(jobs, results):
+                    future.set_result(result)
+                return
+            finally:
+                self._local.after_commit = None
+        for job in jobs:
+            self._run(job)
+
+    def _write_loop(self):
+        job = None
+        while True:
+            job = job or self._write_queue.get()
+            if job is _STOP:
+                break
+            jobs, job = [job], None
+            # Add the writes that are already waiting to the transaction, up to the first one that can not be batched
+            while jobs[0][3] and len(jobs) < self.write_batch_size:
+                try:
+                    job = self._write_queue.get_nowait()
+                except Empty:
+                    break
+                if job is _STOP or not job[3]:
+                    break
+                jobs.append(job)
+                job = None
+            self._run_writes(jobs)
+        self._db.disconnect()
+
+    def shutdown(self):
+        """
+        Cancel the calls that did not start yet and wait for the running ones to finish.
+        """
+        with self._lock:
+            if self._is_shutdown:
+                return
+            self._is_shutdown = True
+            threads, self._threads = self._threads, []
+            for queue in (self._read_queue, self._write_queue):
+                while True:
+                    try:
+                        queue.get_nowait()[0].cancel()
+                    except Empty:
+                        break
+            for _ in range(self.num_readers):
+                self._read_queue.put(_STOP)
+            self._write_queue.put(_STOP)
+        for thread in threads:
+            thread.join()
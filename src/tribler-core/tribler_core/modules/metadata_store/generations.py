@@ -0,0 +1,87 @@
+"""
+This module keeps track of the changes of the tables that the cached query results of the metadata store depend on.
+"""
+import threading
+from collections import defaultdict
+
+from pony.orm.dbproviders.sqlite import SQLiteProvider
+
+# The tables the cached query results depend on
+CHANNEL_NODE_GENERATION = "channel_node_generation"
+TORRENT_STATE_GENERATION = "torrent_state_generation"
+
+
+class TableGenerations(object):
+    """
+    Counts the committed transactions that changed each table, once per transaction.
+
+    The ORM hooks of the tables mark them as changed in the current transaction. The generations of the marked
+    tables are bumped after the transaction is committed, so the results of a query that read the generation
+    before it ran can never be older than that generation. Until then, the transaction that changed a table
+    sees changes that are not committed yet, so it gets no generation for that table at all.
+    """
+
+    def __init__(self):
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+        # The tables changed by the current transaction of every thread
+        self._local = threading.local()
+
+    def _changed_tables(self):
+        if not hasattr(self._local, "changed"):
+            self._local.changed = set()
+        return self._local.changed
+
+    def mark_changed(self, name):
+        """
+        Mark a table as changed by the current transaction of this thread.
+        :param name: the name of the generation of the table
+        """
+        self._changed_tables().add(name)
+
+    def get(self, name):
+        """
+        Get the generation of a table.
+        :param name: the name of the generation of the table
+        :return: the generation, or None if the current transaction of this thread changed the table
+        """
+        if name in self._changed_tables():
+            return None
+        return self._generations[name]
+
+    def on_commit(self):
+        changed = self._changed_tables()
+        if changed:
+            with self._lock:
+                for name in changed:
+                    self._generations[name] += 1
+            changed.clear()
+
+    def on_rollback(self):
+        self._changed_tables().clear()
+
+
+class GenerationsSQLiteProvider(SQLiteProvider):
+    """
+    SQLite provider of Pony that bumps the generations of the tables that a transaction changed when it is committed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(GenerationsSQLiteProvider, self).__init__(*args, **kwargs)
+        self.generations = TableGenerations()
+
+    def commit(self, connection, cache=None):
+        try:
+            super(GenerationsSQLiteProvider, self).commit(connection, cache)
+        except BaseException:
+            self.generations.on_rollback()
+            raise
+        self.generations.on_commit()
+
+    def rollback(self, connection, cache=None):
+        self.generations.on_rollback()
+        super(GenerationsSQLiteProvider, self).rollback(connection, cache)
+
+    def drop(self, connection, cache=None):
+        self.generations.on_rollback()
+        super(GenerationsSQLiteProvider, self).drop(connection, cache)
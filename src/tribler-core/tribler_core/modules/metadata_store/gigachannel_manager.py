@@ -1,5 +1,5 @@
 import asyncio
-from asyncio import CancelledError, get_event_loop, wait_for
+from asyncio import CancelledError, wait_for
 
 from ipv8.database import database_blob
 from ipv8.taskmanager import TaskManager, task
@@ -10,6 +10,7 @@ from tribler_common.simpledefs import DLSTATUS_SEEDING, NTFY
 
 from tribler_core.modules.libtorrent.download_config import DownloadConfig
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
+from tribler_core.modules.metadata_store.generations import CHANNEL_NODE_GENERATION
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import COMMITTED
 from tribler_core.utilities.unicode import hexlify
 
@@ -68,6 +69,8 @@ class GigaChannelManager(TaskManager):
         self.register_task(
             "Process channels download queue and remove cruft", self.service_channels, interval=channels_check_interval
         )
+        fts_maintenance_interval = 60.0  # seconds
+        self.register_task("Maintain the FTS index", self.maintain_fts_index, interval=fts_maintenance_interval)
 
     @task
     async def regenerate_channel_torrent(self, channel_pk, channel_id):
@@ -146,6 +149,23 @@ class GigaChannelManager(TaskManager):
         except Exception:
             self._logger.exception("Error when tried to start processing queued channel torrents changes")
 
+    async def maintain_fts_index(self):
+        """
+        Merge the FTS index segments left by the channel bulk loads, while no channels are being processed.
+        The merging is done in small steps, so it does not hold the database lock for long.
+        """
+        if self.processing or self.channels_processing_queue:
+            return
+
+        def _maintain_fts_index():
+            if self.session.mds.fts_optimize_pending:
+                self.session.mds.optimize_fts_index()
+            else:
+                self.session.mds.merge_fts_index()
+
+        # The maintenance commits its work in small steps, so it should not be batched with other writes
+        await self.session.mds.run_write(_maintain_fts_index, batch=False)
+
     @task
     async def process_queued_channels(self):
         self.processing = True
@@ -280,18 +300,12 @@ class GigaChannelManager(TaskManager):
         return download
 
     async def process_channel_dir_threaded(self, channel):
-        def _process_download():
-            try:
-                channel_dirname = self.session.mds.channels_dir / channel.dirname
-                self.session.mds.process_channel_dir(
-                    channel_dirname, channel.public_key, channel.id_, external_thread=True
-                )
-                self.session.mds._db.disconnect()
-            except Exception as e:
-                self._logger.error("Error when processing channel dir download: %s", e)
-                return
-
-        await get_event_loop().run_in_executor(None, _process_download)
+        # Every blob is processed by a separate write, so the other writes can run in between
+        try:
+            channel_dirname = self.session.mds.channels_dir / channel.dirname
+            await self.session.mds.process_channel_dir_threaded(channel_dirname, channel.public_key, channel.id_)
+        except Exception as e:
+            self._logger.error("Error when processing channel dir download: %s", e)
 
         with db_session:
             channel_upd = self.session.mds.ChannelMetadata.get(public_key=channel.public_key, id_=channel.id_)
@@ -337,5 +351,7 @@ class GigaChannelManager(TaskManager):
                     return
                 channel.local_version = 0
                 channel.contents.delete(bulk=True)
+                # Bulk deletes do not call the ORM hooks that mark the table as changed
+                self.session.mds.generations.mark_changed(CHANNEL_NODE_GENERATION)
         except Exception as e:
             self._logger.warning("Exception while cleaning unsubscribed channel: %", str(e))
@@ -0,0 +1,125 @@
+"""
+This module contains the cache of the names under which the downloads are shown.
+"""
+import time
+from collections import OrderedDict
+
+from ipv8.database import database_blob
+
+from pony.orm import db_session, select
+
+from tribler_common.simpledefs import NTFY
+
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT
+from tribler_core.modules.metadata_store.store import in_chunks
+
+# The number of download names that are kept
+NAME_CACHE_SIZE = 1000
+
+# How long a name is kept, in seconds. Not every change of the metadata is announced through the notifier.
+NAME_CACHE_TTL = 10 * 60
+
+
+class DownloadNameCache(object):
+    """
+    Bounded least-recently-used cache that maps the infohashes of downloads to their display names.
+
+    Torrents are shown with the title of their metadata entry, if there is one, and channels with the title
+    of the channel. The names that are not cached are looked up together on a reader thread of the metadata store.
+    The names are invalidated when the notifier reports that the metadata of a torrent or channel was updated.
+    """
+
+    def __init__(self, mds, notifier=None, max_size=NAME_CACHE_SIZE, ttl=NAME_CACHE_TTL):
+        """
+        :param mds: the metadata store to look up the names in
+        :param notifier: the notifier that reports the metadata updates
+        :param max_size: the maximum number of names that are kept
+        :param ttl: how long a name is kept, in seconds
+        """
+        self.mds = mds
+        self.notifier = notifier
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # infohash -> (name, is channel, expiry time), from the least to the most recently used
+        self._entries = OrderedDict()
+
+        if notifier:
+            notifier.add_observer(NTFY.CHANNEL_ENTITY_UPDATED, self.on_entity_updated)
+
+    def shutdown(self):
+        """
+        Stop following the metadata updates of the notifier, and drop the cached names.
+        """
+        if self.notifier:
+            self.notifier.remove_observer(NTFY.CHANNEL_ENTITY_UPDATED, self.on_entity_updated)
+            self.notifier = None
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def on_entity_updated(self, update_dict):
+        # Health updates do not change any names
+        if not isinstance(update_dict, dict) or "name" not in update_dict:
+            return
+        if update_dict.get("type") == CHANNEL_TORRENT:
+            # An update of a channel changes the names of the downloads of its older versions as well
+            self.invalidate_channels()
+        infohash = update_dict.get("infohash")
+        if infohash:
+            self._entries.pop(bytes.fromhex(infohash), None)
+
+    def invalidate_channels(self):
+        for infohash in [infohash for infohash, entry in self._entries.items() if entry[1]]:
+            del self._entries[infohash]
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_names(self, downloads, now=None):
+        """
+        Get the display names of downloads.
+        :param downloads: a list of (infohash, download name, is channel) tuples
+        :return: a dictionary that maps the infohashes to the display names
+        """
+        now = time.time() if now is None else now
+        names = {}
+        missing = []
+        for infohash, dl_name, is_channel in downloads:
+            entry = self._entries.get(infohash)
+            if entry is not None and entry[1] == is_channel and entry[2] > now:
+                self._entries.move_to_end(infohash)
+                names[infohash] = entry[0]
+            else:
+                missing.append((infohash, dl_name, is_channel))
+
+        if missing:
+            found = await self.mds.run_read(self._lookup_names, missing)
+            for infohash, _, is_channel in missing:
+                self._entries.pop(infohash, None)
+                self._entries[infohash] = (found[infohash], is_channel, now + self.ttl)
+                names[infohash] = found[infohash]
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return names
+
+    def _lookup_names(self, downloads):
+        """
+        Look up the names of downloads in the database. This method is called on a reader thread.
+        """
+        names = {}
+        with db_session:
+            torrents = [infohash for infohash, _, is_channel in downloads if not is_channel]
+            for chunk in in_chunks(torrents):
+                blobs = [database_blob(infohash) for infohash in chunk]
+                for infohash, title in select((g.infohash, g.title) for g in self.mds.TorrentMetadata
+                                              if g.infohash in blobs):
+                    names.setdefault(bytes(infohash), title)
+
+            for infohash, dl_name, is_channel in downloads:
+                if is_channel:
+                    names[infohash] = self.mds.ChannelMetadata.get_channel_name(dl_name, infohash)
+                else:
+                    names[infohash] = names.get(infohash) or dl_name
+        return names
@@ -97,6 +97,37 @@ def entries_to_chunk(metadata_list, chunk_size, start_index=0):
     return chunk, last_entry_index + 1
 
 
+def serialized_entries_to_chunks(serialized_entries, chunk_size):
+    """
+    Pack a stream of serialized entries into consecutive chunks, in the same way entries_to_chunk does it.
+    Every chunk is yielded as soon as it is complete, so only one chunk is kept in memory.
+    :param serialized_entries: an iterable of serialized entries
+    :param chunk_size: the desired chunk size limit, in bytes. The produced chunks' sizes will never exceed this value.
+    :return: a generator of (chunk, number_of_entries) tuples
+    """
+    serialized_entries = iter(serialized_entries)
+    entry = next(serialized_entries, None)
+    while entry is not None:
+        num_entries = 0
+        with lz4.frame.LZ4FrameCompressor(auto_flush=True) as c:
+            header = c.begin()
+            offset = len(header)
+            out_list = [header]  # LZ4 header
+            while entry is not None:
+                blob = c.compress(entry)
+                # Chunk size limit reached?
+                if offset + len(blob) > (chunk_size - LZ4_END_MARK_SIZE):
+                    break
+                offset += len(blob)
+                num_entries += 1
+                out_list.append(blob)
+                entry = next(serialized_entries, None)
+            out_list.append(c.flush())  # LZ4 end mark
+        if not num_entries:
+            raise Exception('Serialized entry size > blob size limit!')
+        yield b''.join(out_list), num_entries
+
+
 def define_binding(db):
     class ChannelMetadata(db.TorrentMetadata, db.CollectionNode):
         """
@@ -132,8 +163,6 @@ def define_binding(db):
         # As channel metadata depends on the public key, we can't include the infohash in nonpersonal_attributes
         nonpersonal_attributes = set(db.CollectionNode.nonpersonal_attributes)
 
-        infohash_to_channel_name_cache = {}
-
         @classmethod
         @db_session
         def get_my_channels(cls):
@@ -173,11 +202,7 @@ def define_binding(db):
             :param key: The public/private key, used to sign the data
             """
 
-            # TODO: optimize this stuff with SQL and better tree traversal algorithms?
             # Cleanup entries marked for deletion
-
-            db.CollectionNode.collapse_deleted_subtrees()
-            # TODO: optimize me: stop calling get_contents_to_commit here
             commit_queue = self.get_contents_to_commit()
             for entry in commit_queue:
                 if entry.status == TODELETE:
@@ -196,16 +221,14 @@ def define_binding(db):
             # Channel should get a new starting timestamp and its contents should get higher timestamps
             start_timestamp = clock.tick()
 
-            def update_timestamps_recursive(node):
-                if issubclass(type(node), db.CollectionNode):
-                    for child in node.contents:
-                        update_timestamps_recursive(child)
-                if node.status in [COMMITTED, UPDATED, NEW]:
-                    node.status = UPDATED
-                    node.timestamp = clock.tick()
-                    node.sign()
-
-            update_timestamps_recursive(self)
+            # The children are updated before their parents
+            nodes = [
+                node for node in self.get_contents_recursive() + [self] if node.status in [COMMITTED, UPDATED, NEW]
+            ]
+            for node in nodes:
+                node.status = UPDATED
+                node.timestamp = clock.tick()
+            db.ChannelNode.sign_entries(nodes)
 
             return self.commit_channel_torrent(new_start_timestamp=start_timestamp)
 
@@ -229,10 +252,12 @@ def define_binding(db):
             existing_contents = sorted(channel_dir.iterdir())
             last_existing_blob_number = get_mdblob_sequence_number(existing_contents[-1]) if existing_contents else None
 
+            # Squash several serialized and signed metadata entries into a single file. The entries are signed and
+            # serialized by worker processes, while the chunks are compressed and written here, one at a time.
             index = 0
-            while index < len(metadata_list):
-                # Squash several serialized and signed metadata entries into a single file
-                data, index = entries_to_chunk(metadata_list, self._CHUNK_SIZE_LIMIT, start_index=index)
+            serialized_entries = self.serialize_entries(metadata_list)
+            for data, num_entries in serialized_entries_to_chunks(serialized_entries, self._CHUNK_SIZE_LIMIT):
+                index += num_entries
                 # Blobs ending with TODELETE entries increase the final timestamp as a workaround for delete commands
                 # possessing no timestamp.
                 if metadata_list[index - 1].status == TODELETE:
@@ -417,15 +442,6 @@ def define_binding(db):
             )
             return result
 
-        @classmethod
-        def get_channel_name_cached(cls, dl_name, infohash):
-            # Querying the database each time is costly so we cache the name request in a dict.
-            chan_name = cls.infohash_to_channel_name_cache.get(infohash)
-            if chan_name is None:
-                chan_name = cls.get_channel_name(dl_name, infohash)
-                cls.infohash_to_channel_name_cache[infohash] = chan_name
-            return chan_name
-
         @classmethod
         @db_session
         def get_channel_name(cls, dl_name, infohash):
@@ -9,11 +9,14 @@ from pony.orm.core import DEFAULT, db_session
 
 from tribler_core.exceptions import InvalidChannelNodeException, InvalidSignatureException
 from tribler_core.modules.metadata_store.discrete_clock import clock
+from tribler_core.modules.metadata_store.generations import CHANNEL_NODE_GENERATION
 from tribler_core.modules.metadata_store.serialization import (
     CHANNEL_NODE,
     ChannelNodePayload,
     DELETED,
     DeletedMetadataPayload,
+    sign_data,
+    sign_or_check_signatures,
 )
 from tribler_core.utilities.path_util import str_path
 from tribler_core.utilities.unicode import hexlify
@@ -80,6 +83,10 @@ def define_binding(db, logger=None, key=None):
         _payload_class = ChannelNodePayload
         _my_key = key
         _logger = logger
+        # The MetadataStore method that runs the batches of signing/checking work on its worker processes
+        _imap_batches = None
+        # The MetadataStore method that runs read-only DB calls on the reader threads of its DB executor
+        _run_read = None
 
         # This attribute holds the names of the class attributes that are used by the serializer for the
         # corresponding payload type. We only initialize it once on class creation as an optimization.
@@ -93,6 +100,16 @@ def define_binding(db, logger=None, key=None):
         # ACHTUNG! On object creation, Pony does not check if discriminator is wrong for the created ORM type!
         nonpersonal_attributes = ('metadata_type',)
 
+        # The changes of the table invalidate the cached query results of MetadataNode (see TableGenerations)
+        def after_insert(self):
+            db.provider.generations.mark_changed(CHANNEL_NODE_GENERATION)
+
+        def after_update(self):
+            db.provider.generations.mark_changed(CHANNEL_NODE_GENERATION)
+
+        def after_delete(self):
+            db.provider.generations.mark_changed(CHANNEL_NODE_GENERATION)
+
         def __init__(self, *args, **kwargs):
             """
             Initialize a metadata object.
@@ -206,6 +223,57 @@ def define_binding(db, logger=None, key=None):
             """
             return b''.join(self._serialized_delete())
 
+        def _signed_data(self):
+            """
+            Serialize the signed part of the object, without signing it
+            :return: serialized_data binary string
+            """
+            return self._payload_class(skip_key_check=True, **self.to_dict())._serialized()[0]
+
+        def _commit_item(self):
+            """
+            Prepare the object for serialization into a channel commit: the entries marked for deletion are committed
+            as delete commands, which are to be signed with the personal key.
+            :return: (public_key, serialized_data, signature or None) tuple
+            """
+            if self.status == TODELETE:
+                my_dict = ChannelNode.to_dict(self)
+                my_dict.update({"metadata_type": DELETED, "delete_signature": self.signature})
+                return self.public_key, DeletedMetadataPayload(skip_key_check=True, **my_dict)._serialized()[0], None
+            payload = self._payload_class(skip_key_check=True, unsigned=(self.signature is None), **self.to_dict())
+            return (payload.public_key,) + payload._serialized()
+
+        @classmethod
+        def serialize_entries(cls, entries):
+            """
+            Serialize a list of entries for a channel commit. The signatures are checked and made in batches,
+            by worker processes for big lists.
+            :param entries: the list of entries
+            :return: a generator of the serialized entries, in the order of the list
+            """
+            for _, serialized in cls._imap_batches(
+                sign_or_check_signatures, entries, lambda entry: entry._commit_item(), key=cls._my_key
+            ):
+                yield serialized
+
+        @classmethod
+        def sign_entries(cls, entries, key=None):
+            """
+            Sign a list of entries. The signatures are made in batches, by worker processes for big lists.
+            :param entries: the list of entries
+            :param key: private key to sign the entries with
+            """
+            if not key:
+                key = cls._my_key
+            public_key = database_blob(key.pub().key_to_bin()[10:])
+
+            def get_signed_data(entry):
+                entry.public_key = public_key
+                return entry._signed_data()
+
+            for entry, signature in cls._imap_batches(sign_data, entries, get_signed_data, key=key):
+                entry.signature = signature
+
         def to_file(self, filename, key=None):
             with open(str_path(filename), 'wb') as output_file:
                 output_file.write(self.serialized(key))
@@ -236,8 +304,9 @@ def define_binding(db, logger=None, key=None):
             return key_correct and signature_correct
 
         @classmethod
-        def from_payload(cls, payload):
-            return cls(**payload.to_dict())
+        def from_payload(cls, payload, **kwargs):
+            # There is no need to check the signature again if the payload was already checked
+            return cls(skip_key_check=payload.signature_checked, **payload.to_dict(), **kwargs)
 
         @classmethod
         def from_dict(cls, dct):
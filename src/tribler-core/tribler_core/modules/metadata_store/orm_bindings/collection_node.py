@@ -4,7 +4,7 @@ from pathlib import Path
 from ipv8.database import database_blob
 
 from pony import orm
-from pony.orm import db_session, select
+from pony.orm import db_session
 
 from tribler_core.exceptions import DuplicateTorrentFileError
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
@@ -19,9 +19,117 @@ from tribler_core.modules.metadata_store.orm_bindings.channel_node import (
     UPDATED,
 )
 from tribler_core.modules.metadata_store.orm_bindings.torrent_metadata import tdef_to_metadata_dict
-from tribler_core.modules.metadata_store.serialization import COLLECTION_NODE, CollectionNodePayload
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, CollectionNodePayload
 from tribler_core.utilities.random_utils import random_infohash
 
+COLLECTION_TYPES = "%i, %i" % (COLLECTION_NODE, CHANNEL_TORRENT)
+
+# The commit engine tracks the personal nodes that must go into the next commit in a dedicated (temporary) table.
+# These are the dirty nodes and all of their ancestors, as every ancestor of a changed node must be re-signed
+# with the updated entries count.
+sql_create_commit_nodes_table = [
+    """
+    CREATE TEMP TABLE IF NOT EXISTS ChannelCommitNode (
+        rowid INTEGER PRIMARY KEY,
+        id_ INTEGER NOT NULL,
+        origin_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS temp.idx_channelcommitnode__origin_id ON ChannelCommitNode (origin_id)",
+]
+
+# Walk up from the dirty nodes. UNION stops the walk as soon as it meets an already visited ancestor.
+sql_fill_commit_nodes_table = f"""
+INSERT INTO temp.ChannelCommitNode
+WITH RECURSIVE commit_node(rowid, origin_id) AS (
+    SELECT rowid, origin_id FROM ChannelNode
+    WHERE public_key = $public_key AND status IN ({NEW}, {TODELETE}, {UPDATED})
+    UNION
+    SELECT parent.rowid, parent.origin_id FROM commit_node
+    JOIN ChannelNode parent ON parent.public_key = $public_key AND parent.id_ = commit_node.origin_id
+    WHERE commit_node.origin_id != 0 AND parent.metadata_type IN ({COLLECTION_TYPES})
+)
+SELECT g.rowid, g.id_, g.origin_id FROM commit_node JOIN ChannelNode g ON g.rowid = commit_node.rowid
+"""
+
+# The parents of the nodes that do not lead to the root (origin_id == 0) are missing, so these nodes are orphans.
+# Pony's select() only accepts the statements starting with SELECT, hence no leading newline.
+sql_select_commit_dead_parents = f"""SELECT DISTINCT origin_id FROM temp.ChannelCommitNode node
+WHERE origin_id != 0 AND NOT EXISTS (
+    SELECT 1 FROM ChannelNode parent WHERE parent.public_key = $public_key AND parent.id_ = node.origin_id
+    AND parent.metadata_type IN ({COLLECTION_TYPES})
+)
+"""
+
+# Walk down from the top-level nodes to split the commit nodes into per-channel queues
+sql_select_commit_forest = """
+WITH RECURSIVE tree(rowid, id_, root_id, depth) AS (
+    SELECT rowid, id_, id_, 0 FROM temp.ChannelCommitNode WHERE origin_id = 0
+    UNION ALL
+    SELECT node.rowid, node.id_, tree.root_id, tree.depth + 1 FROM tree
+    JOIN temp.ChannelCommitNode node ON node.origin_id = tree.id_ AND node.rowid != tree.rowid
+)
+SELECT rowid, root_id, depth FROM tree
+"""
+
+# Count the non-collection entries in the subtree of every commit collection of the given channel.
+# The walk only descends into the collections that are committed too: an untouched collection contributes
+# the num_entries value it got at the last commit, so its subtree is never visited.
+sql_select_commit_subtree_counts = f"""
+WITH RECURSIVE scope(rowid, id_) AS (
+    SELECT rowid, id_ FROM temp.ChannelCommitNode WHERE origin_id = 0 AND id_ = $root_id
+    UNION ALL
+    SELECT node.rowid, node.id_ FROM scope
+    JOIN temp.ChannelCommitNode node ON node.origin_id = scope.id_ AND node.rowid != scope.rowid
+),
+subtree(top, rowid, id_, weight, descend) AS (
+    SELECT g.rowid, g.rowid, g.id_, 0, 1 FROM scope JOIN ChannelNode g ON g.rowid = scope.rowid
+    WHERE g.metadata_type IN ({COLLECTION_TYPES}) AND g.status != {TODELETE}
+    UNION ALL
+    SELECT subtree.top, child.rowid, child.id_,
+        CASE
+            WHEN child.metadata_type != {COLLECTION_NODE} THEN 1
+            WHEN node.rowid IS NULL THEN coalesce(child.num_entries, 0)
+            ELSE 0
+        END,
+        child.metadata_type = {COLLECTION_NODE} AND node.rowid IS NOT NULL
+    FROM subtree
+    JOIN ChannelNode child ON child.public_key = $public_key AND child.origin_id = subtree.id_
+    LEFT JOIN temp.ChannelCommitNode node ON node.rowid = child.rowid
+    WHERE subtree.descend AND child.rowid != subtree.rowid AND child.status != {TODELETE}
+)
+SELECT top, sum(weight) FROM subtree GROUP BY top
+"""
+
+# Select the whole subtree of a node, deepest nodes first
+sql_select_subtree = f"""
+WITH RECURSIVE subtree(rowid, id_, metadata_type, depth) AS (
+    SELECT rowid, id_, metadata_type, 0 FROM ChannelNode WHERE rowid = $rowid
+    UNION ALL
+    SELECT child.rowid, child.id_, child.metadata_type, subtree.depth + 1 FROM subtree
+    JOIN ChannelNode child ON child.public_key = $public_key AND child.origin_id = subtree.id_
+    WHERE subtree.metadata_type IN ({COLLECTION_TYPES}) AND child.rowid != subtree.rowid
+)
+SELECT g.* FROM subtree JOIN ChannelNode g ON g.rowid = subtree.rowid
+WHERE subtree.depth > 0 ORDER BY subtree.depth DESC, g.rowid
+"""
+
+# Select everything below the personal collections marked for deletion.
+# The collections that are not inside other deleted collections are left intact.
+sql_select_deleted_subtrees = f"""
+WITH RECURSIVE deleted(rowid, id_, metadata_type) AS (
+    SELECT child.rowid, child.id_, child.metadata_type FROM ChannelNode g
+    JOIN ChannelNode child ON child.public_key = g.public_key AND child.origin_id = g.id_
+    WHERE g.public_key = $public_key AND g.status = {TODELETE} AND g.metadata_type IN ({COLLECTION_TYPES})
+    AND child.rowid != g.rowid
+    UNION
+    SELECT child.rowid, child.id_, child.metadata_type FROM deleted
+    JOIN ChannelNode child ON child.public_key = $public_key AND child.origin_id = deleted.id_
+    WHERE deleted.metadata_type IN ({COLLECTION_TYPES}) AND child.rowid != deleted.rowid
+)
+SELECT g.* FROM deleted JOIN ChannelNode g ON g.rowid = deleted.rowid
+"""
+
 
 def define_binding(db):
     class CollectionNode(db.MetadataNode):
@@ -165,12 +273,14 @@ def define_binding(db):
 
         @db_session
         def get_contents_recursive(self):
-            results_stack = []
-            for subnode in self.contents:
-                if issubclass(type(subnode), CollectionNode):
-                    results_stack.extend(subnode.get_contents_recursive())
-                results_stack.append(subnode)
-            return results_stack
+            """
+            Get all the nodes in the subtree of this collection with a single recursive query.
+            :return: the list of nodes, sorted so that every node comes before its parent
+            """
+            orm.flush()
+            rowid = self.rowid
+            public_key = database_blob(self.public_key)
+            return db.ChannelNode.select_by_sql(sql_select_subtree)
 
         @db_session
         def add_torrents_from_dir(self, torrents_dir, recursive=False):
@@ -237,85 +347,62 @@ def define_binding(db):
 
         @staticmethod
         @db_session
-        def get_children_dict_to_commit():
+        def fill_commit_nodes_table():
+            """
+            Fill the commit nodes table with the dirty personal nodes and all their ancestors, and delete the orphaned
+            nodes that can never be committed.
+            """
             db.CollectionNode.collapse_deleted_subtrees()
-            upd_dict = {}
-            children = {}
-            # TODO: optimize me by rewriting in pure SQL with recursive CTEs
-
-            def update_node_info(n):
-                # Add the node to its parent's set of children
-                if n.origin_id not in children:
-                    children[n.origin_id] = {n}
-                else:
-                    children[n.origin_id].add(n)
-                upd_dict[n.id_] = n
-
-            dead_parents = set()
-            # First we traverse the tree upwards from changed leaves to find all nodes affected by changes
-            for node in db.ChannelNode.select(
-                lambda g: g.public_key == db.ChannelNode._my_key.pub().key_to_bin()[10:] and g.status in DIRTY_STATUSES
-            ):
-                update_node_info(node)
-                # This process resolves the parents completely.
-                # Therefore, if a parent is already in the dict, its path has already been resolved.
-                while node and (node.origin_id not in upd_dict):
-                    # Add the node to its parent's set of children
-                    update_node_info(node)
-                    # Get parent node
-                    parent = db.CollectionNode.get(public_key=node.public_key, id_=node.origin_id)
-                    if not parent:
-                        dead_parents.add(node.origin_id)
-                    node = parent
-
-            # Normally, dead_parents should consist only of 0 node, which is root. Otherwise, we got some orphans.
-            if 0 in dead_parents:
-                dead_parents.remove(0)
+            orm.flush()
+            public_key = database_blob(db.ChannelNode._my_key.pub().key_to_bin()[10:])
+            for sql in sql_create_commit_nodes_table:
+                db.execute(sql)
+            db.execute("DELETE FROM temp.ChannelCommitNode")
+            db.execute(sql_fill_commit_nodes_table)
+
             # Delete orphans
-            db.ChannelNode.select(
-                lambda g: database_blob(db.ChannelNode._my_key.pub().key_to_bin()[10:]) == g.public_key
-                and g.origin_id in dead_parents
-            ).delete()
-            orm.flush()  # Just in case...
-            if not children or 0 not in children:
-                return {}
-            return children
+            dead_parents = db.select(sql_select_commit_dead_parents)
+            if dead_parents:
+                db.ChannelNode.select(lambda g: public_key == g.public_key and g.origin_id in dead_parents).delete()
+                orm.flush()
+
+        @staticmethod
+        @db_session
+        def get_commit_subtree_counts(root_id):
+            """
+            Count the non-collection entries in the subtrees of the commit collections of a channel.
+            The commit nodes table must be filled by fill_commit_nodes_table first.
+            :param root_id: the id_ of the top-level channel
+            :return: a dictionary mapping the rowids of the collections to their entries counts
+            """
+            orm.flush()
+            public_key = database_blob(db.ChannelNode._my_key.pub().key_to_bin()[10:])
+            # Pony's select() only accepts the statements starting with SELECT, so the CTE goes through execute()
+            return dict(db.execute(sql_select_commit_subtree_counts).fetchall())
 
         @staticmethod
         @db_session
         def get_commit_forest():
-            children = db.CollectionNode.get_children_dict_to_commit()
-            if not children:
+            """
+            Find the personal nodes that must be committed, grouped into a separate commit queue for each top-level
+            channel. Only the dirty nodes and their ancestors are loaded from the database.
+            :return: a dictionary mapping the id_ of every top-level channel to its commit queue. In the queue,
+                every node comes before its parent, and the top-level channel itself is the last element.
+            """
+            db.CollectionNode.fill_commit_nodes_table()
+            tree = db.execute(sql_select_commit_forest).fetchall()
+            if not tree:
                 return {}
-            # We want a separate commit tree/queue for each toplevel channel
-            forest = {}
-            toplevel_nodes = [node for node in children.pop(0)]
-            for root_node in toplevel_nodes:
-                # Tree -> stack -> queue
-                commit_queue = []
-                tree_stack = [root_node]
-                while tree_stack and children.get(tree_stack[-1].id_, None):
-                    # Traverse the tree from top to bottom converting it to a stack
-                    while children.get(tree_stack[-1].id_, None):
-                        node = children[tree_stack[-1].id_].pop()
-                        tree_stack.append(node)
-
-                    while not issubclass(type(tree_stack[-1]), db.CollectionNode):
-                        commit_queue.append(tree_stack.pop())
-                    # Unwind the tree stack until either the stack is empty or we meet a non-empty node
-                    while tree_stack and not children.get(tree_stack[-1].id_, None):
-                        while not issubclass(type(tree_stack[-1]), db.CollectionNode):
-                            commit_queue.append(tree_stack.pop())
-
-                        # It was a terminal collection
-                        collection = tree_stack.pop()
-                        commit_queue.append(collection)
-
-                if not commit_queue or commit_queue[-1] != root_node:
-                    commit_queue.append(root_node)
-                forest[root_node.id_] = tuple(commit_queue)
-
-            return forest
+            nodes = {
+                node.rowid: node
+                for node in db.ChannelNode.select_by_sql(
+                    "SELECT g.* FROM ChannelNode g JOIN temp.ChannelCommitNode node ON node.rowid = g.rowid"
+                )
+            }
+            queues = {}
+            for rowid, root_id, depth in sorted(tree, key=lambda row: -row[2]):
+                queues.setdefault(root_id, []).append(nodes[rowid])
+            return {root_id: tuple(queue) for root_id, queue in queues.items()}
 
         @staticmethod
         def prepare_commit_queue_for_channel(commit_queue):
@@ -327,17 +414,15 @@ def define_binding(db):
             :param commit_queue:
             :return:
             """
+            if not commit_queue:
+                return []
+            subtree_counts = db.CollectionNode.get_commit_subtree_counts(commit_queue[-1].id_)
             for node in commit_queue:
                 # Avoid updating entries that must be deleted:
                 # soft delete payloads require signatures of unmodified entries
                 if issubclass(type(node), db.CollectionNode) and node.status != TODELETE:
                     # Update recursive count of actual non-collection contents
-                    node.num_entries = select(
-                        # For each subnode, if it is a collection, add the count of its contents to the recursive sum.
-                        # Otherwise, add just 1 to the sum (to count the subnode itself).
-                        (g.num_entries if g.metadata_type == COLLECTION_NODE else 1)
-                        for g in node.actual_contents
-                    ).sum()
+                    node.num_entries = subtree_counts.get(node.rowid, 0)
                     node.timestamp = clock.tick()
                     node.sign()
             # This perverted comparator lambda is necessary to ensure that delete entries are always
@@ -360,29 +445,14 @@ def define_binding(db):
             in the future.
             This procedure should be always run _before_ committing personal channels.
             """
-            # TODO: optimize with SQL recursive CTEs
-
-            def get_highest_deleted_parent(node, highest_deleted_parent=None):
-                if node.origin_id == 0:
-                    return highest_deleted_parent
-                parent = db.CollectionNode.get(public_key=node.public_key, id_=node.origin_id)
-                if not parent:
-                    return highest_deleted_parent
-                if parent.status == TODELETE:
-                    highest_deleted_parent = parent
-                return get_highest_deleted_parent(parent, highest_deleted_parent)
-
-            deletion_set = {
-                get_highest_deleted_parent(node, highest_deleted_parent=node).rowid
-                for node in db.CollectionNode.select(
-                    lambda g: g.public_key == db.CollectionNode._my_key.pub().key_to_bin()[10:] and g.status == TODELETE
-                )
-                if node
-            }
-
-            for node in [db.CollectionNode[rowid] for rowid in deletion_set]:
-                for subnode in node.contents:
-                    subnode.delete()
+            orm.flush()
+            public_key = database_blob(db.CollectionNode._my_key.pub().key_to_bin()[10:])
+            for node in db.ChannelNode.select_by_sql(sql_select_deleted_subtrees):
+                if isinstance(node, CollectionNode):
+                    # The contents are already in the list
+                    node.delete(recursive=False)
+                else:
+                    node.delete()
 
         @db_session
         def get_contents_to_commit(self):
@@ -1,14 +1,138 @@
-import threading
-from asyncio import get_event_loop
+import inspect
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime
+from functools import partial
+
+from ipv8.database import database_blob
 
 from pony import orm
 from pony.orm import db_session, desc, raw_sql, select
 
-from tribler_core.modules.metadata_store.orm_bindings.channel_node import LEGACY_ENTRY, TODELETE
+from tribler_core.modules.metadata_store.generations import CHANNEL_NODE_GENERATION, TORRENT_STATE_GENERATION
+from tribler_core.modules.metadata_store.orm_bindings.channel_node import DIRTY_STATUSES, LEGACY_ENTRY, TODELETE
 from tribler_core.modules.metadata_store.orm_bindings.torrent_metadata import NULL_KEY_SUBST
-from tribler_core.modules.metadata_store.serialization import METADATA_NODE, MetadataNodePayload
+from tribler_core.modules.metadata_store.query_cache import QueryResultsCache
+from tribler_core.modules.metadata_store.serialization import (
+    CHANNEL_TORRENT,
+    COLLECTION_NODE,
+    METADATA_NODE,
+    REGULAR_TORRENT,
+    MetadataNodePayload,
+)
 from tribler_core.utilities.unicode import hexlify
 
+# Only this many first results of a query are cached. Pages beyond that (and the total count of such a query)
+# are fetched from the database directly.
+MAX_CACHED_ROWS = 10000
+
+# SQLite limits the number of variables in a single query, so the pages are fetched in chunks of this size
+FETCH_CHUNK_SIZE = 400
+
+
+def encode_cursor(values):
+    """
+    Pack the sort key values of an entry into an opaque URL-safe string.
+    """
+    values = [{"datetime": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('utf-8')
+
+
+def _decode_cursor_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["datetime"])
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, str))):
+        raise ValueError("Wrong cursor format")
+    return value
+
+
+def decode_cursor(cursor):
+    """
+    Unpack the sort key values from a cursor made by encode_cursor.
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode('utf-8')))
+        if not isinstance(values, list):
+            raise ValueError("Wrong cursor format")
+        return [_decode_cursor_value(value) for value in values]
+    except (TypeError, KeyError, UnicodeError) as e:
+        raise ValueError("Wrong cursor format") from e
+
+
+# The columns of the entries and their health that get_simple_values fetches. The date of a torrent is fetched
+# as the number of seconds since the epoch.
+SIMPLE_DICT_COLUMNS = (
+    "g.rowid",
+    "g.metadata_type",
+    "g.id_",
+    "g.origin_id",
+    "g.public_key",
+    "g.title",
+    "g.tags",
+    "g.status",
+    "g.num_entries",
+    "g.infohash",
+    "g.size",
+    "CAST(strftime('%s', g.torrent_date) AS INTEGER)",
+    "g.subscribed",
+    "g.votes",
+    "g.local_version",
+    "g.timestamp",
+    "g.health",
+    "s.seeders",
+    "s.leechers",
+    "s.last_check",
+)
+
+SimpleDictRow = namedtuple(
+    "SimpleDictRow",
+    "rowid metadata_type id_ origin_id public_key title tags status num_entries infohash size torrent_date "
+    "subscribed votes local_version timestamp health seeders leechers last_check",
+)
+
+
+# The keys of the dictionaries that to_simple_dict returns, by the kinds of entries they apply to
+SIMPLE_DICT_BASE_KEYS = ("type", "id", "origin_id", "public_key", "name", "category", "status")
+SIMPLE_DICT_COLLECTION_KEYS = ("torrents", "state", "dirty")
+SIMPLE_DICT_TORRENT_KEYS = ("infohash", "size", "num_seeders", "num_leechers", "last_tracker_check", "updated")
+SIMPLE_DICT_CHANNEL_KEYS = ("subscribed", "votes")
+
+
+def get_simple_dict_keys(metadata_type, include_trackers=False):
+    """
+    Get the keys of the dictionaries that to_simple_dict returns for the entries of the given metadata type,
+    in the order of the values that get_simple_values returns.
+    """
+    keys = list(SIMPLE_DICT_BASE_KEYS)
+    if metadata_type in (COLLECTION_NODE, CHANNEL_TORRENT):
+        keys += SIMPLE_DICT_COLLECTION_KEYS
+    if metadata_type in (REGULAR_TORRENT, CHANNEL_TORRENT):
+        keys += SIMPLE_DICT_TORRENT_KEYS
+        if include_trackers:
+            keys.append("trackers")
+    if metadata_type == CHANNEL_TORRENT:
+        keys += SIMPLE_DICT_CHANNEL_KEYS
+    return keys
+
+
+def get_channel_state(row, is_personal):
+    """
+    Get the state of a channel from its row, like the ChannelMetadata.state property does.
+    """
+    if is_personal:
+        return "Personal"
+    if row.status == LEGACY_ENTRY:
+        return "Legacy"
+    if row.local_version == row.timestamp:
+        return "Complete"
+    if row.local_version > 0:
+        return "Updating"
+    if row.subscribed:
+        return "Downloading"
+    return "Preview"
+
 
 def define_binding(db):
     class MetadataNode(db.ChannelNode):
@@ -36,6 +160,9 @@ def define_binding(db):
         ][1:]
         nonpersonal_attributes = db.ChannelNode.nonpersonal_attributes + ('title', 'tags')
 
+        # Results of get_entries_query, shared by all the classes derived from MetadataNode
+        query_cache = QueryResultsCache()
+
         @classmethod
         def search_keyword(cls, query, lim=100):
             # Requires FTS5 table "FtsIndex" to be generated and populated.
@@ -71,10 +198,13 @@ def define_binding(db):
             category=None,
             attribute_ranges=None,
             id_=None,
+            cursor=None,
         ):
             """
             This method implements REST-friendly way to get entries from the database. It is overloaded by the higher
             level classes to add some more conditions to the query.
+            :param cursor: if given, only return the entries that follow the entry the cursor was made for
+                (see get_cursor). It must have been made with the same sorting arguments.
             :return: PonyORM query object corresponding to the given params.
             """
             # Warning! For Pony magic to work, iteration variable name (e.g. 'g') should be the same everywhere!
@@ -87,11 +217,11 @@ def define_binding(db):
                 except TypeError:
                     pony_query = pony_query.where(lambda g: g.metadata_type == metadata_type)
 
-            pony_query = (
-                pony_query.where(public_key=(b"" if channel_pk == NULL_KEY_SUBST else channel_pk))
-                if channel_pk is not None
-                else pony_query
-            )
+            # Keyword-style where() conditions are not used here, because Pony can not
+            # use such queries as subqueries (see get_entries_rowids)
+            if channel_pk is not None:
+                public_key = b"" if channel_pk == NULL_KEY_SUBST else channel_pk
+                pony_query = pony_query.where(lambda g: g.public_key == public_key)
 
             if attribute_ranges is not None:
                 for attr, left, right in attribute_ranges:
@@ -102,53 +232,364 @@ def define_binding(db):
                         pony_query = pony_query.where(f"g.{attr} < right")
 
             # origin_id can be zero, for e.g. root channel
-            pony_query = pony_query.where(id_=id_) if id_ is not None else pony_query
-            pony_query = pony_query.where(origin_id=origin_id) if origin_id is not None else pony_query
+            pony_query = pony_query.where(lambda g: g.id_ == id_) if id_ is not None else pony_query
+            pony_query = pony_query.where(lambda g: g.origin_id == origin_id) if origin_id is not None else pony_query
             pony_query = pony_query.where(lambda g: g.subscribed) if subscribed is not None else pony_query
             pony_query = pony_query.where(lambda g: g.tags == category) if category else pony_query
             pony_query = pony_query.where(lambda g: g.status != TODELETE) if exclude_deleted else pony_query
             pony_query = pony_query.where(lambda g: g.xxx == 0) if hide_xxx else pony_query
             pony_query = pony_query.where(lambda g: g.status != LEGACY_ENTRY) if exclude_legacy else pony_query
 
+            # The rowid is always the last (ascending) sort key, so the order of the entries is unambiguous,
+            # and a cursor can point at a specific place in the results
+            sort_attributes = cls.get_sort_attributes(sort_by)
+            descending = bool(sort_desc and sort_by)
+            if cursor is not None:
+                pony_query = cls.apply_cursor(pony_query, sort_by, descending, cursor)
+
             # Sort the query
+            sort_expressions = ["g." + attribute for attribute in sort_attributes]
+            if descending:
+                sort_expressions = [desc(expression) for expression in sort_expressions]
+            pony_query = pony_query.sort_by(f"({', '.join(sort_expressions + ['g.rowid'])})")
+
+            return pony_query
+
+        @classmethod
+        def get_sort_attributes(cls, sort_by):
+            """
+            Get the attributes (or attribute paths) the results of get_entries_query are sorted by, before the rowid.
+            """
+            if not sort_by:
+                return []
             if sort_by == "HEALTH":
-                pony_query = (
-                    pony_query.sort_by("(desc(g.health.seeders), desc(g.health.leechers))")
-                    if sort_desc
-                    else pony_query.sort_by("(g.health.seeders, g.health.leechers)")
-                )
-            elif sort_by == "size" and not issubclass(cls, db.ChannelMetadata):
+                return ["health.seeders", "health.leechers"]
+            if sort_by == "size" and not issubclass(cls, db.ChannelMetadata):
                 # TODO: optimize this check to skip cases where size field does not matter
                 # When querying for mixed channels / torrents lists, channels should have priority over torrents
-                sort_expression = "desc(g.num_entries), desc(g.size)" if sort_desc else "g.num_entries, g.size"
-                pony_query = pony_query.sort_by(sort_expression)
-            elif sort_by:
-                sort_expression = "g." + sort_by
-                sort_expression = desc(sort_expression) if sort_desc else sort_expression
-                pony_query = pony_query.sort_by(sort_expression)
+                return ["num_entries", "size"]
+            return [sort_by]
 
-            return pony_query
+        @classmethod
+        def get_sort_attribute_type(cls, attribute):
+            """
+            Get the Python type of the values of an attribute (path) the results can be sorted by.
+            """
+            if attribute == "rowid":
+                return int
+            py_type = cls
+            for name in attribute.split("."):
+                # The attribute may only be defined by one of the subclasses, e.g. the size of a torrent
+                attr = next(
+                    entity._adict_[name] for entity in [py_type, *py_type._subclasses_] if name in entity._adict_
+                )
+                py_type = attr.py_type
+            return py_type
+
+        @classmethod
+        def supports_cursor(cls, sort_by=None):
+            """
+            Check whether the results sorted by sort_by can be paged with cursors. Pony can not compare binary
+            values, such as infohashes, so these results can only be paged with offsets.
+            """
+            return all(
+                cls.get_sort_attribute_type(attribute) in (int, float, str, datetime)
+                for attribute in cls.get_sort_attributes(sort_by)
+            )
+
+        @classmethod
+        def parse_cursor(cls, cursor, sort_by=None):
+            """
+            Unpack the sort key values from a cursor made by get_cursor, for the results sorted by sort_by.
+            :raises ValueError: if the cursor is malformed, or does not match the sort order
+            """
+            values = decode_cursor(cursor)
+            attributes = cls.get_sort_attributes(sort_by) + ["rowid"]
+            if len(values) != len(attributes) or not cls.supports_cursor(sort_by):
+                raise ValueError("The cursor does not match the sort order")
+            for attribute, value in zip(attributes, values):
+                if value is None and attribute != "rowid":
+                    continue
+                py_type = cls.get_sort_attribute_type(attribute)
+                if isinstance(value, bool) or not isinstance(value, (int, float) if py_type is float else py_type):
+                    raise ValueError("The cursor does not match the sort order")
+            return values
+
+        @classmethod
+        def apply_cursor(cls, pony_query, sort_by, descending, cursor):
+            """
+            Restrict the query to the entries that follow the cursor. The condition is written in the form of
+            "a <= x and (a < x or ...)", so SQLite can use it to seek an index on the sort keys instead of scanning
+            all the preceding entries, as LIMIT/OFFSET would.
+
+            The sort keys of some entries are NULL, e.g. the size of a collection. SQLite sorts NULL before any
+            other value, so these entries come first in ascending order, and last in descending order.
+            """
+            sort_attributes = cls.get_sort_attributes(sort_by)
+            values = cls.parse_cursor(cursor, sort_by)
+            op = "<" if descending else ">"
+            variables = {f"cursor_value{index}": value for index, value in enumerate(values)}
+            condition = f"g.rowid > cursor_value{len(sort_attributes)}"
+            for index, attribute in reversed(list(enumerate(sort_attributes))):
+                expression, value = f"g.{attribute}", f"cursor_value{index}"
+                if values[index] is None:
+                    if descending:
+                        condition = f"{expression} is None and ({condition})"
+                    else:
+                        condition = f"{expression} is not None or ({condition})"
+                else:
+                    condition = f"{expression} {op}= {value} and ({expression} {op} {value} or {condition})"
+                    if descending:
+                        condition = f"({condition}) or {expression} is None"
+            return pony_query.where(condition, globals(), variables)
+
+        @classmethod
+        def get_cursor(cls, entry, sort_by=None):
+            """
+            Make a cursor pointing right after the given entry, for the results sorted by sort_by.
+            :return: the cursor string, or None if these results can not be paged with cursors
+            """
+            if not cls.supports_cursor(sort_by):
+                return None
+            values = []
+            for attribute in cls.get_sort_attributes(sort_by) + ["rowid"]:
+                value = entry
+                for name in attribute.split("."):
+                    value = getattr(value, name, None)
+                values.append(value)
+            return encode_cursor(values)
 
         @classmethod
         async def get_entries_threaded(cls, **kwargs):
-            def _get_results():
-                result = cls.get_entries(**kwargs)
-                if not isinstance(threading.current_thread(), threading._MainThread):
-                    db.disconnect()
-                return result
+            return await cls._run_read(partial(cls.get_entries, **kwargs))
+
+        @classmethod
+        def get_query_cache_key(cls, **kwargs):
+            """
+            Normalize the arguments of get_entries_query, so the equivalent queries get the same cache key.
+            """
+            defaults = inspect.signature(cls.get_entries_query).parameters
+            key = [cls.__name__]
+            for name, value in sorted(kwargs.items()):
+                if name in defaults and value == defaults[name].default:
+                    continue
+                if name == "txt_filter":
+                    value = value.strip()
+                elif name == "metadata_type" and isinstance(value, (list, tuple, set)):
+                    value = tuple(sorted(value))
+                elif name == "attribute_ranges":
+                    value = tuple(tuple(attribute_range) for attribute_range in value)
+                key.append((name, value))
+            return tuple(key)
+
+        @classmethod
+        def get_query_generation(cls, sort_by=None):
+            """
+            Get the generation of the database the results of a query depend on.
+            Only the queries sorted by health depend on the TorrentState table.
+            :return: the generation, or None if the current transaction changed the tables the results depend on
+            """
+            # The pending changes of this db_session are only marked when they are flushed
+            orm.flush()
+            generations = db.provider.generations
+            generation = generations.get(CHANNEL_NODE_GENERATION)
+            if sort_by == "HEALTH":
+                torrent_state_generation = generations.get(TORRENT_STATE_GENERATION)
+                if generation is None or torrent_state_generation is None:
+                    return None
+                return generation, torrent_state_generation
+            return generation
+
+        @classmethod
+        @db_session
+        def get_entries_rowids(cls, **kwargs):
+            """
+            Get the ordered list of rowids of the entries get_entries_query returns, from the cache if possible.
+            Only the first MAX_CACHED_ROWS + 1 results are fetched, so a longer list means the results are truncated.
+            :return: a list of rowids
+            """
+            key = cls.get_query_cache_key(**kwargs)
+            # The generation must be read before the query is run. Otherwise, a change committed in between
+            # could be missing from the results that are cached for the new generation.
+            generation = cls.get_query_generation(kwargs.get("sort_by"))
+            # The results that include changes that are not committed yet are not cached
+            rowids = cls.query_cache.get(key, generation) if generation is not None else None
+            if rowids is None:
+                rowids = select(g.rowid for g in cls.get_entries_query(**kwargs))[: MAX_CACHED_ROWS + 1]
+                if generation is not None:
+                    cls.query_cache.put(key, generation, rowids)
+            return rowids
 
-            return await get_event_loop().run_in_executor(None, _get_results)
+        @classmethod
+        @db_session
+        def get_entries_page(cls, first=1, last=None, **kwargs):
+            """
+            Get the rowids of a page of the entries get_entries_query returns. If a cursor is given, first and last
+            are counted from the entry that follows the cursor.
+            :return: a list of rowids
+            """
+            first = (first or 1) - 1
+            if kwargs.get("cursor") is not None:
+                # Pages following a cursor are cheap to fetch directly, and are unlikely to be requested again
+                return select(g.rowid for g in cls.get_entries_query(**kwargs))[first:last]
+            rowids = cls.get_entries_rowids(**kwargs)
+            if len(rowids) > MAX_CACHED_ROWS and (last is None or last > MAX_CACHED_ROWS):
+                return select(g.rowid for g in cls.get_entries_query(**kwargs))[first:last]
+            return rowids[first:last]
 
         @classmethod
         @db_session
         def get_entries(cls, first=1, last=None, **kwargs):
             """
             Get some torrents. Optionally sort the results by a specific field, or filter the channels based
-            on a keyword/whether you are subscribed to it.
+            on a keyword/whether you are subscribed to it. If a cursor is given, first and last are counted
+            from the entry that follows the cursor.
             :return: A list of class members
             """
-            pony_query = cls.get_entries_query(**kwargs)
-            return pony_query[(first or 1) - 1 : last]
+            page = cls.get_entries_page(first, last, **kwargs)
+            entries = {}
+            for start in range(0, len(page), FETCH_CHUNK_SIZE):
+                chunk = page[start : start + FETCH_CHUNK_SIZE]
+                entries.update((g.rowid, g) for g in cls.select(lambda g: g.rowid in chunk))
+            return [entries[rowid] for rowid in page if rowid in entries]
+
+        @classmethod
+        @db_session
+        def get_entries_simple_dicts(cls, include_trackers=False, table=False, **kwargs):
+            """
+            Get a page of entries, serialized by get_simple_dicts.
+            :param table: whether to serialize the entries by get_simple_table instead
+            :return: a tuple of the list of dictionaries (or the table), and the list of the rowids of the entries
+            """
+            rowids = cls.get_entries_page(**kwargs)
+            serialize = db.MetadataNode.get_simple_table if table else db.MetadataNode.get_simple_dicts
+            return serialize(rowids, include_trackers=include_trackers), rowids
+
+        @staticmethod
+        @db_session
+        def get_simple_values(rowids, include_trackers=False):
+            """
+            Get the values of the dictionaries that to_simple_dict returns for the given entries, in the order of
+            the keys get_simple_dict_keys returns for their metadata types. The entries are not loaded one by one:
+            the entries and their health are fetched with a single query, and the trackers with another one.
+            :param rowids: the rowids of the entries
+            :param include_trackers: whether to include the trackers of the torrents
+            :return: a list of lists of values, in the order of the rowids. Entries that do not exist are skipped.
+            """
+            rows = {}
+            for start in range(0, len(rowids), FETCH_CHUNK_SIZE):
+                chunk = ",".join(str(int(rowid)) for rowid in rowids[start : start + FETCH_CHUNK_SIZE])
+                rows.update(
+                    (row[0], row)
+                    for row in db.select(
+                        f"SELECT {', '.join(SIMPLE_DICT_COLUMNS)} FROM ChannelNode g "
+                        f"LEFT JOIN TorrentState s ON s.rowid = g.health WHERE g.rowid IN ({chunk})"
+                    )
+                )
+            rows = [SimpleDictRow(*rows[rowid]) for rowid in rowids if rowid in rows]
+
+            my_public_key = database_blob(db.ChannelNode._my_key.pub().key_to_bin()[10:])
+            dirty_ids = set()
+            personal_collection_ids = [
+                row.id_
+                for row in rows
+                if row.metadata_type in (COLLECTION_NODE, CHANNEL_TORRENT) and bytes(row.public_key) == my_public_key
+            ]
+            for start in range(0, len(personal_collection_ids), FETCH_CHUNK_SIZE):
+                chunk = personal_collection_ids[start : start + FETCH_CHUNK_SIZE]
+                dirty_ids.update(
+                    select(
+                        g.origin_id
+                        for g in db.ChannelNode
+                        if g.public_key == my_public_key
+                        and g.origin_id in chunk
+                        and g.id_ != g.origin_id
+                        and g.status in DIRTY_STATUSES
+                    )
+                )
+
+            trackers = {}
+            if include_trackers:
+                health_ids = [row.health for row in rows if row.health is not None]
+                for start in range(0, len(health_ids), FETCH_CHUNK_SIZE):
+                    chunk = ",".join(str(int(health_id)) for health_id in health_ids[start : start + FETCH_CHUNK_SIZE])
+                    for health_id, url in db.select(
+                        f"SELECT tt.torrentstate, t.url FROM TorrentState_TrackerState tt "
+                        f"JOIN TrackerState t ON t.rowid = tt.trackerstate WHERE tt.torrentstate IN ({chunk})"
+                    ):
+                        trackers.setdefault(health_id, []).append(url)
+
+            values = []
+            for row in rows:
+                is_personal = bytes(row.public_key) == my_public_key
+                row_values = [
+                    row.metadata_type,
+                    row.id_,
+                    row.origin_id,
+                    hexlify(bytes(row.public_key)),
+                    row.title,
+                    row.tags,
+                    row.status,
+                ]
+                if row.metadata_type in (COLLECTION_NODE, CHANNEL_TORRENT):
+                    if row.metadata_type == CHANNEL_TORRENT:
+                        state = get_channel_state(row, is_personal)
+                    else:
+                        state = "Personal" if is_personal else "Preview"
+                    row_values += [row.num_entries, state, row.id_ in dirty_ids if is_personal else False]
+                if row.metadata_type in (REGULAR_TORRENT, CHANNEL_TORRENT):
+                    row_values += [
+                        hexlify(bytes(row.infohash)),
+                        row.size,
+                        row.seeders,
+                        row.leechers,
+                        row.last_check,
+                        row.torrent_date,
+                    ]
+                    if include_trackers:
+                        row_values.append(trackers.get(row.health, []))
+                if row.metadata_type == CHANNEL_TORRENT:
+                    row_values += [bool(row.subscribed), row.votes / db.ChannelMetadata.votes_scaling]
+                values.append(row_values)
+            return values
+
+        @staticmethod
+        def get_simple_dicts(rowids, include_trackers=False):
+            """
+            Get the dictionaries that to_simple_dict returns for the given entries, without loading the entries
+            and their health one by one (see get_simple_values).
+            :param rowids: the rowids of the entries
+            :param include_trackers: whether to include the trackers of the torrents
+            :return: a list of dictionaries, in the order of the rowids. Entries that do not exist are skipped.
+            """
+            keys = {}
+            results = []
+            for row_values in db.MetadataNode.get_simple_values(rowids, include_trackers=include_trackers):
+                metadata_type = row_values[0]
+                if metadata_type not in keys:
+                    keys[metadata_type] = get_simple_dict_keys(metadata_type, include_trackers)
+                results.append(dict(zip(keys[metadata_type], row_values)))
+            return results
+
+        @staticmethod
+        def get_simple_table(rowids, include_trackers=False):
+            """
+            Get the entries in the table format of the REST API: the values of every entry are listed in the order
+            of the keys of its metadata type, which are only listed once. It is cheaper to encode and decode than
+            the dictionaries of get_simple_dicts, and a lot smaller.
+            :param rowids: the rowids of the entries
+            :param include_trackers: whether to include the trackers of the torrents
+            :return: a dictionary with the keys of every metadata type on the page, and the lists of values
+            """
+            rows = db.MetadataNode.get_simple_values(rowids, include_trackers=include_trackers)
+            metadata_types = {row_values[0] for row_values in rows}
+            return {
+                "keys": {
+                    str(metadata_type): get_simple_dict_keys(metadata_type, include_trackers)
+                    for metadata_type in metadata_types
+                },
+                "rows": rows,
+            }
 
         @classmethod
         @db_session
@@ -156,16 +597,20 @@ def define_binding(db):
             """
             Get total count of torrents that would be returned if there would be no pagination/limits/sort
             """
-            for p in ["first", "last", "sort_by", "sort_desc"]:
+            for p in ["first", "last", "cursor"]:
+                kwargs.pop(p, None)
+            # The sorting arguments are kept, so the count comes from the same cache entry as the pages
+            rowids = cls.get_entries_rowids(**kwargs)
+            if len(rowids) <= MAX_CACHED_ROWS:
+                return len(rowids)
+            for p in ["sort_by", "sort_desc"]:
                 kwargs.pop(p, None)
             return cls.get_entries_query(**kwargs).count()
 
         @classmethod
         @db_session
         def get_entries_count(cls, **kwargs):
-            for p in ["first", "last"]:
-                kwargs.pop(p, None)
-            return cls.get_entries_query(**kwargs).count()
+            return cls.get_total_count(**kwargs)
 
         @classmethod
         def get_auto_complete_terms(cls, keyword, max_terms, limit=10):
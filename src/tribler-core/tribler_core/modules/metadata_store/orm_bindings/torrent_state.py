@@ -2,6 +2,8 @@ from ipv8.database import database_blob
 
 from pony import orm
 
+from tribler_core.modules.metadata_store.generations import TORRENT_STATE_GENERATION
+
 
 def define_binding(db):
     class TorrentState(db.Entity):
@@ -17,4 +19,14 @@ def define_binding(db):
         metadata = orm.Set('TorrentMetadata', reverse='health')
         trackers = orm.Set('TrackerState', reverse='torrents')
 
+        # The changes of the table invalidate the cached query results sorted by health (see TableGenerations)
+        def after_insert(self):
+            db.provider.generations.mark_changed(TORRENT_STATE_GENERATION)
+
+        def after_update(self):
+            db.provider.generations.mark_changed(TORRENT_STATE_GENERATION)
+
+        def after_delete(self):
+            db.provider.generations.mark_changed(TORRENT_STATE_GENERATION)
+
     return TorrentState
@@ -0,0 +1,86 @@
+"""
+This module contains the cache for the results of the metadata store queries.
+"""
+import threading
+from collections import OrderedDict
+
+
+class QueryResultsCache(object):
+    """
+    LRU cache for the ordered rowid lists produced by the metadata queries.
+
+    Every entry is stored together with the generation of the database it was computed for. An entry is only
+    returned when the generation it was stored with matches the current one, so bumping the generation on every
+    change of the underlying tables invalidates all the cached results at once.
+    """
+
+    def __init__(self, max_entries=128, max_rows=200000):
+        """
+        :param max_entries: the maximum number of cached queries
+        :param max_rows: the maximum total number of rowids in the cached lists
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._num_rows = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, generation):
+        """
+        Get the cached results of a query.
+        :param key: the normalized query arguments
+        :param generation: the current generation of the database
+        :return: the cached rowid list, or None if there is no valid entry for the query
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, generation, rowids):
+        """
+        Store the results of a query, evicting the least recently used entries if the cache is full.
+        :param key: the normalized query arguments
+        :param generation: the generation of the database the results were computed for
+        :param rowids: the ordered list of rowids the query returned
+        """
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (generation, rowids)
+            self._num_rows += len(rowids)
+            while len(self._entries) > self.max_entries or self._num_rows > self.max_rows:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._num_rows -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._num_rows = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def get_stats(self):
+        return {
+            "entries": len(self._entries),
+            "rows": self._num_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
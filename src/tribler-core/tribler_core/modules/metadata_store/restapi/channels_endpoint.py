@@ -17,6 +17,7 @@ from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import DIRTY_STATUSES, NEW
 from tribler_core.modules.metadata_store.restapi.metadata_endpoint_base import MetadataEndpointBase
 from tribler_core.modules.metadata_store.restapi.metadata_schema import ChannelSchema
+from tribler_core.restapi.query_executor import LONG_QUERY_TIMEOUT
 from tribler_core.restapi.rest_endpoint import HTTP_BAD_REQUEST, HTTP_NOT_FOUND, RESTResponse
 from tribler_core.restapi.schema import HandledErrorSchema
 from tribler_core.utilities import path_util
@@ -64,6 +65,7 @@ class ChannelsEndpoint(ChannelsEndpointBase):
                         'sort_by': String(),
                         'sort_desc': Integer(),
                         'total': Integer(),
+                        'next_cursor': String(),
                     }
                 )
             }
@@ -71,25 +73,37 @@ class ChannelsEndpoint(ChannelsEndpointBase):
     )
     # TODO: DRY it with SpecificChannel endpoint?
     async def get_channels(self, request):
-        sanitized = self.sanitize_parameters(request.query)
+        try:
+            sanitized = self.sanitize_parameters(request.query)
+            self.check_cursor(self.session.mds.ChannelMetadata, sanitized)
+        except (ValueError, KeyError):
+            return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
         sanitized['subscribed'] = None if 'subscribed' not in request.query else bool(int(request.query['subscribed']))
         include_total = request.query.get('include_total', '')
         sanitized.update({"origin_id": 0})
+        table = self.accepts_table(request)
 
-        with db_session:
-            channels = self.session.mds.ChannelMetadata.get_entries(**sanitized)
-            total = self.session.mds.ChannelMetadata.get_total_count(**sanitized) if include_total else None
-            channels_list = [channel.to_simple_dict() for channel in channels]
+        def get_channels_db():
+            with db_session:
+                channels_list, rowids = self.session.mds.ChannelMetadata.get_entries_simple_dicts(
+                    table=table, **sanitized
+                )
+                total = self.session.mds.ChannelMetadata.get_total_count(**sanitized) if include_total else None
+                next_cursor = self.get_next_cursor(self.session.mds.ChannelMetadata, rowids, sanitized)
+            return channels_list, total, next_cursor
+
+        channels_list, total, next_cursor = await self.run_read(get_channels_db)
         response_dict = {
             "results": channels_list,
             "first": sanitized["first"],
             "last": sanitized["last"],
             "sort_by": sanitized["sort_by"],
             "sort_desc": int(sanitized["sort_desc"]),
+            "next_cursor": next_cursor,
         }
         if total is not None:
             response_dict.update({"total": total})
-        return RESTResponse(response_dict)
+        return self.listing_response(response_dict, table)
 
     @docs(
         tags=['Metadata'],
@@ -104,31 +118,43 @@ class ChannelsEndpoint(ChannelsEndpointBase):
                         'sort_by': String(),
                         'sort_desc': Integer(),
                         'total': Integer(),
+                        'next_cursor': String(),
                     }
                 )
             }
         },
     )
     async def get_channel_contents(self, request):
-        sanitized = self.sanitize_parameters(request.query)
+        try:
+            sanitized = self.sanitize_parameters(request.query)
+            self.check_cursor(self.session.mds.MetadataNode, sanitized)
+        except (ValueError, KeyError):
+            return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
         include_total = request.query.get('include_total', '')
         channel_pk, channel_id = self.get_channel_from_request(request)
         sanitized.update({"channel_pk": channel_pk, "origin_id": channel_id})
-        with db_session:
-            contents = self.session.mds.MetadataNode.get_entries(**sanitized)
-            contents_list = [c.to_simple_dict() for c in contents]
-            total = self.session.mds.MetadataNode.get_total_count(**sanitized) if include_total else None
+        table = self.accepts_table(request)
+
+        def get_contents_db():
+            with db_session:
+                contents_list, rowids = self.session.mds.MetadataNode.get_entries_simple_dicts(table=table, **sanitized)
+                next_cursor = self.get_next_cursor(self.session.mds.MetadataNode, rowids, sanitized)
+                total = self.session.mds.MetadataNode.get_total_count(**sanitized) if include_total else None
+            return contents_list, total, next_cursor
+
+        contents_list, total, next_cursor = await self.run_read(get_contents_db)
         response_dict = {
             "results": contents_list,
             "first": sanitized['first'],
             "last": sanitized['last'],
             "sort_by": sanitized['sort_by'],
             "sort_desc": int(sanitized['sort_desc']),
+            "next_cursor": next_cursor,
         }
         if total is not None:
             response_dict.update({"total": total})
 
-        return RESTResponse(response_dict)
+        return self.listing_response(response_dict, table)
 
     @docs(
         tags=['Metadata'],
@@ -149,44 +175,45 @@ class ChannelsEndpoint(ChannelsEndpointBase):
         },
     )
     async def copy_channel(self, request):
-        with db_session:
-            channel_pk, channel_id = self.get_channel_from_request(request)
-            personal_root = channel_id == 0 and channel_pk == self.session.mds.my_key.pub().key_to_bin()[10:]
-            # TODO: better error handling
-            target_collection = self.session.mds.CollectionNode.get(
-                public_key=database_blob(channel_pk), id_=channel_id
-            )
-            try:
-                request_parsed = await request.json()
-            except (ContentTypeError, ValueError):
-                return RESTResponse({"error": "Bad JSON"}, status=HTTP_BAD_REQUEST)
-
-            if not target_collection and not personal_root:
-                return RESTResponse({"error": "Target channel not found"}, status=HTTP_NOT_FOUND)
-            results_list = []
-            for entry in request_parsed:
-                public_key, id_ = database_blob(unhexlify(entry["public_key"])), entry["id"]
-                source = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
-                if not source:
-                    return RESTResponse({"error": "Source entry not found"}, status=HTTP_BAD_REQUEST)
-                # We must upgrade Collections to Channels when moving them to root channel, and, vice-versa,
-                # downgrade Channels to Collections when moving them into existing channels
-                if isinstance(source, self.session.mds.CollectionNode):
-                    src_dict = source.to_dict()
-                    if channel_id == 0:
-                        rslt = self.session.mds.ChannelMetadata.create_channel(title=source.title)
-                    else:
-                        dst_dict = {'origin_id': channel_id, "status": NEW}
-                        for k in self.session.mds.CollectionNode.nonpersonal_attributes:
-                            dst_dict[k] = src_dict[k]
-                        dst_dict.pop("metadata_type")
-                        rslt = self.session.mds.CollectionNode(**dst_dict)
-                    for child in source.actual_contents:
-                        child.make_copy(rslt.id_)
+        channel_pk, channel_id = self.get_channel_from_request(request)
+        personal_root = channel_id == 0 and channel_pk == self.session.mds.my_key.pub().key_to_bin()[10:]
+        try:
+            request_parsed = await request.json()
+        except (ContentTypeError, ValueError):
+            return RESTResponse({"error": "Bad JSON"}, status=HTTP_BAD_REQUEST)
+
+        error, result = await self.run_write(self.copy_entries, channel_pk, channel_id, personal_root, request_parsed)
+        return RESTResponse(result, status=error or 200)
+
+    def copy_entries(self, channel_pk, channel_id, personal_root, entries):
+        # TODO: better error handling
+        target_collection = self.session.mds.CollectionNode.get(public_key=database_blob(channel_pk), id_=channel_id)
+        if not target_collection and not personal_root:
+            return HTTP_NOT_FOUND, {"error": "Target channel not found"}
+        results_list = []
+        for entry in entries:
+            public_key, id_ = database_blob(unhexlify(entry["public_key"])), entry["id"]
+            source = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
+            if not source:
+                return HTTP_BAD_REQUEST, {"error": "Source entry not found"}
+            # We must upgrade Collections to Channels when moving them to root channel, and, vice-versa,
+            # downgrade Channels to Collections when moving them into existing channels
+            if isinstance(source, self.session.mds.CollectionNode):
+                src_dict = source.to_dict()
+                if channel_id == 0:
+                    rslt = self.session.mds.ChannelMetadata.create_channel(title=source.title)
                 else:
-                    rslt = source.make_copy(channel_id)
-                results_list.append(rslt.to_simple_dict())
-            return RESTResponse(results_list)
+                    dst_dict = {'origin_id': channel_id, "status": NEW}
+                    for k in self.session.mds.CollectionNode.nonpersonal_attributes:
+                        dst_dict[k] = src_dict[k]
+                    dst_dict.pop("metadata_type")
+                    rslt = self.session.mds.CollectionNode(**dst_dict)
+                for child in source.actual_contents:
+                    child.make_copy(rslt.id_)
+            else:
+                rslt = source.make_copy(channel_id)
+            results_list.append(rslt.to_simple_dict())
+        return None, results_list
 
     @docs(
         tags=['Metadata'],
@@ -199,12 +226,14 @@ class ChannelsEndpoint(ChannelsEndpointBase):
         },
     )
     async def create_channel(self, request):
-        with db_session:
-            _, channel_id = self.get_channel_from_request(request)
-            request_parsed = await request.json()
-            channel_name = request_parsed.get("name", "New channel")
-            md = self.session.mds.ChannelMetadata.create_channel(channel_name, origin_id=channel_id)
-            return RESTResponse({"results": [md.to_simple_dict()]})
+        _, channel_id = self.get_channel_from_request(request)
+        request_parsed = await request.json()
+        channel_name = request_parsed.get("name", "New channel")
+
+        def create_channel_db():
+            return self.session.mds.ChannelMetadata.create_channel(channel_name, origin_id=channel_id).to_simple_dict()
+
+        return RESTResponse({"results": [await self.run_write(create_channel_db)]})
 
     @docs(
         tags=['Metadata'],
@@ -217,12 +246,15 @@ class ChannelsEndpoint(ChannelsEndpointBase):
         },
     )
     async def create_collection(self, request):
-        with db_session:
-            _, channel_id = self.get_channel_from_request(request)
-            request_parsed = await request.json()
-            collection_name = request_parsed.get("name", "New collection")
+        _, channel_id = self.get_channel_from_request(request)
+        request_parsed = await request.json()
+        collection_name = request_parsed.get("name", "New collection")
+
+        def create_collection_db():
             md = self.session.mds.CollectionNode(origin_id=channel_id, title=collection_name, status=NEW)
-            return RESTResponse({"results": [md.to_simple_dict()]})
+            return md.to_simple_dict()
+
+        return RESTResponse({"results": [await self.run_write(create_collection_db)]})
 
     @docs(
         tags=['Metadata'],
@@ -250,17 +282,34 @@ class ChannelsEndpoint(ChannelsEndpointBase):
     )
     async def add_torrent_to_channel(self, request):
         channel_pk, channel_id = self.get_channel_from_request(request)
-        with db_session:
-            channel = self.session.mds.CollectionNode.get(public_key=database_blob(channel_pk), id_=channel_id)
-        if not channel:
+
+        def get_channel():
+            return self.session.mds.CollectionNode.get(public_key=database_blob(channel_pk), id_=channel_id)
+
+        def unknown_channel():
             return RESTResponse({"error": "Unknown channel"}, status=HTTP_NOT_FOUND)
 
+        @db_session
+        def channel_exists():
+            return get_channel() is not None
+
+        if not await self.run_read(channel_exists):
+            return unknown_channel()
+
         parameters = await request.json()
 
         extra_info = {}
         if parameters.get('description', None):
             extra_info = {'description': parameters['description']}
 
+        # The channel can be removed while the torrent is being fetched, so the calls below check for it again
+        def add_torrent(tdef):
+            channel = get_channel()
+            if channel is None:
+                return False
+            channel.add_torrent_to_channel(tdef, extra_info)
+            return True
+
         # First, check whether we did upload a magnet link or URL
         if parameters.get('uri', None):
             uri = parameters['uri']
@@ -271,15 +320,21 @@ class ChannelsEndpoint(ChannelsEndpointBase):
                 tdef = TorrentDef.load_from_memory(data)
             elif uri.startswith("magnet:"):
                 _, xt, _ = parse_magnetlink(uri)
-                if (
-                    xt
-                    and is_infohash(codecs.encode(xt, 'hex'))
-                    and (
-                        self.session.mds.torrent_exists_in_personal_channel(xt)
-                        or channel.copy_torrent_from_infohash(xt)
-                    )
-                ):
-                    return RESTResponse({"added": 1})
+
+                def copy_torrent():
+                    channel = get_channel()
+                    if channel is None:
+                        return None
+                    if self.session.mds.torrent_exists_in_personal_channel(xt):
+                        return True
+                    return bool(channel.copy_torrent_from_infohash(xt))
+
+                if xt and is_infohash(codecs.encode(xt, 'hex')):
+                    copied = await self.run_write(copy_torrent)
+                    if copied is None:
+                        return unknown_channel()
+                    if copied:
+                        return RESTResponse({"added": 1})
 
                 meta_info = await self.session.dlmgr.get_metainfo(xt, timeout=30, url=uri)
                 if not meta_info:
@@ -290,7 +345,8 @@ class ChannelsEndpoint(ChannelsEndpointBase):
 
             added = 0
             if tdef:
-                channel.add_torrent_to_channel(tdef, extra_info)
+                if not await self.run_write(add_torrent, tdef):
+                    return unknown_channel()
                 added = 1
             return RESTResponse({"added": added})
 
@@ -310,8 +366,21 @@ class ChannelsEndpoint(ChannelsEndpointBase):
                 )
 
         if torrents_dir:
-            torrents_list, errors_list = channel.add_torrents_from_dir(torrents_dir, recursive)
-            return RESTResponse({"added": len(torrents_list), "errors": errors_list})
+
+            @db_session
+            def add_torrents_from_dir():
+                channel = get_channel()
+                if channel is None:
+                    return None
+                torrents_list, errors_list = channel.add_torrents_from_dir(torrents_dir, recursive)
+                return len(torrents_list), errors_list
+
+            # The torrents are added in several transactions, so this call can not share a transaction with others
+            result = await self.run_write(add_torrents_from_dir, batch=False, timeout=LONG_QUERY_TIMEOUT)
+            if result is None:
+                return unknown_channel()
+            added, errors_list = result
+            return RESTResponse({"added": added, "errors": errors_list})
 
         if not parameters.get('torrent', None):
             return RESTResponse({"error": "torrent parameter missing"}, status=HTTP_BAD_REQUEST)
@@ -320,7 +389,8 @@ class ChannelsEndpoint(ChannelsEndpointBase):
         # Any errors will be handled by the error_middleware
         torrent = base64.b64decode(parameters['torrent'])
         torrent_def = TorrentDef.load_from_memory(torrent)
-        channel.add_torrent_to_channel(torrent_def, extra_info)
+        if not await self.run_write(add_torrent, torrent_def):
+            return unknown_channel()
         return RESTResponse({"added": 1})
 
     @docs(
@@ -330,17 +400,23 @@ class ChannelsEndpoint(ChannelsEndpointBase):
     )
     async def post_commit(self, request):
         channel_pk, channel_id = self.get_channel_from_request(request)
-        with db_session:
+
+        @db_session
+        def commit_channels():
             if channel_id == 0:
-                for t in self.session.mds.CollectionNode.commit_all_channels():
-                    self.session.gigachannel_manager.updated_my_channel(TorrentDef.load_from_dict(t))
-            else:
-                coll = self.session.mds.CollectionNode.get(public_key=database_blob(channel_pk), id_=channel_id)
-                if not coll:
-                    return RESTResponse({"success": False}, status=HTTP_NOT_FOUND)
-                torrent_dict = coll.commit_channel_torrent()
-                if torrent_dict:
-                    self.session.gigachannel_manager.updated_my_channel(TorrentDef.load_from_dict(torrent_dict))
+                return list(self.session.mds.CollectionNode.commit_all_channels())
+            coll = self.session.mds.CollectionNode.get(public_key=database_blob(channel_pk), id_=channel_id)
+            if not coll:
+                return None
+            torrent_dict = coll.commit_channel_torrent()
+            return [torrent_dict] if torrent_dict else []
+
+        # Committing writes the channel torrents to disk, so it is not run again as a part of a failed batch
+        torrent_dicts = await self.run_write(commit_channels, batch=False, timeout=LONG_QUERY_TIMEOUT)
+        if torrent_dicts is None:
+            return RESTResponse({"success": False}, status=HTTP_NOT_FOUND)
+        for torrent_dict in torrent_dicts:
+            self.session.gigachannel_manager.updated_my_channel(TorrentDef.load_from_dict(torrent_dict))
 
         return RESTResponse({"success": True})
 
@@ -351,8 +427,11 @@ class ChannelsEndpoint(ChannelsEndpointBase):
     )
     async def is_channel_dirty(self, request):
         channel_pk, _ = self.get_channel_from_request(request)
-        with db_session:
-            dirty = self.session.mds.MetadataNode.exists(
+
+        @db_session
+        def is_dirty():
+            return self.session.mds.MetadataNode.exists(
                 lambda g: g.public_key == database_blob(channel_pk) and g.status in DIRTY_STATUSES
             )
-            return RESTResponse({"dirty": dirty})
+
+        return RESTResponse({"dirty": await self.run_read(is_dirty)})
@@ -86,16 +86,21 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
             request_parsed = await request.json()
         except (ContentTypeError, ValueError):
             return RESTResponse({"error": "Bad JSON"}, status=HTTP_BAD_REQUEST)
-        results_list = []
-        for entry in request_parsed:
-            public_key = database_blob(unhexlify(entry.pop("public_key")))
-            id_ = entry.pop("id")
-            error, result = self.update_entry(public_key, id_, entry)
-            # TODO: handle the results for a list that contains some errors in a smarter way
-            if error:
-                return RESTResponse(result, status=error)
-            results_list.append(result)
-        return RESTResponse(results_list)
+
+        def update_entries():
+            results_list = []
+            for entry in request_parsed:
+                public_key = database_blob(unhexlify(entry.pop("public_key")))
+                id_ = entry.pop("id")
+                error, result = self.update_entry(public_key, id_, entry)
+                # TODO: handle the results for a list that contains some errors in a smarter way
+                if error:
+                    return error, result
+                results_list.append(result)
+            return None, results_list
+
+        error, result = await self.run_write(update_entries)
+        return RESTResponse(result, status=error or 200)
 
     @docs(
         tags=['Metadata'],
@@ -115,19 +120,23 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
         },
     )
     async def delete_channel_entries(self, request):
-        with db_session:
-            request_parsed = await request.json()
+        request_parsed = await request.json()
+
+        def delete_entries():
             results_list = []
             for entry in request_parsed:
                 public_key = database_blob(unhexlify(entry.pop("public_key")))
                 id_ = entry.pop("id")
                 entry = self.session.mds.ChannelNode.get(public_key=public_key, id_=id_)
                 if not entry:
-                    return RESTResponse({"error": "Entry %i not found" % id_}, status=HTTP_BAD_REQUEST)
+                    return HTTP_BAD_REQUEST, {"error": "Entry %i not found" % id_}
                 entry.delete()
                 result = {"public_key": hexlify(public_key), "id": id_, "state": "Deleted"}
                 results_list.append(result)
-            return RESTResponse(results_list)
+            return None, results_list
+
+        error, result = await self.run_write(delete_entries)
+        return RESTResponse(result, status=error or 200)
 
     @docs(
         tags=['Metadata'],
@@ -147,7 +156,7 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
 
         public_key = unhexlify(request.match_info['public_key'])
         id_ = request.match_info['id']
-        error, result = self.update_entry(public_key, id_, parameters)
+        error, result = await self.run_write(self.update_entry, public_key, id_, parameters)
         return RESTResponse(result, status=error or 200)
 
     @docs(
@@ -158,15 +167,18 @@ class MetadataEndpoint(MetadataEndpointBase, UpdateEntryMixin):
     async def get_channel_entries(self, request):
         public_key = unhexlify(request.match_info['public_key'])
         id_ = request.match_info['id']
-        with db_session:
-            entry = self.session.mds.ChannelNode.get(public_key=database_blob(public_key), id_=id_)
 
-            if entry:
-                # TODO: handle costly attributes in a more graceful and generic way for all types of metadata
-                entry_dict = entry.to_simple_dict(include_trackers=isinstance(entry, self.session.mds.TorrentMetadata))
-            else:
-                return RESTResponse({"error": "entry not found in database"}, status=HTTP_NOT_FOUND)
+        @db_session
+        def get_entry_dict():
+            entry = self.session.mds.ChannelNode.get(public_key=database_blob(public_key), id_=id_)
+            if not entry:
+                return None
+            # TODO: handle costly attributes in a more graceful and generic way for all types of metadata
+            return entry.to_simple_dict(include_trackers=isinstance(entry, self.session.mds.TorrentMetadata))
 
+        entry_dict = await self.run_read(get_entry_dict)
+        if entry_dict is None:
+            return RESTResponse({"error": "entry not found in database"}, status=HTTP_NOT_FOUND)
         return RESTResponse(entry_dict)
 
     @docs(
@@ -1,5 +1,10 @@
+from functools import partial
+
+from tribler_common.simpledefs import METADATA_TABLE_MEDIA_TYPE
+
+from tribler_core.modules.metadata_store.orm_bindings.metadata_node import decode_cursor
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
-from tribler_core.restapi.rest_endpoint import RESTEndpoint
+from tribler_core.restapi.rest_endpoint import RESTEndpoint, RESTResponse
 
 json2pony_columns = {
     'category': "tags",
@@ -27,6 +32,27 @@ metadata_type_to_search_scope = {
 
 
 class MetadataEndpointBase(RESTEndpoint):
+    async def run_read(self, func, *args, timeout=None):
+        """
+        Run a query that only reads from the metadata store on a reader thread of its DB executor.
+        :param func: the function to call. It must open its own db_session.
+        :param timeout: the timeout of the query in seconds, or None for the default timeout
+        :return: the result of the call
+        """
+        return await self.query_executor.run(self.session.mds.run_read, func, *args, timeout=timeout)
+
+    async def run_write(self, func, *args, batch=True, timeout=None):
+        """
+        Run a call that changes the metadata store on the writer thread of its DB executor.
+        :param func: the function to call. Calls that are not batched must open their own db_session.
+        :param batch: whether the call can share a transaction with other writes
+        :param timeout: the timeout of the call in seconds, or None for the default timeout
+        :return: the result of the call
+        """
+        return await self.query_executor.run(
+            partial(self.session.mds.run_write, batch=batch), func, *args, timeout=timeout
+        )
+
     @classmethod
     def sanitize_parameters(cls, parameters):
         """
@@ -49,4 +75,45 @@ class MetadataEndpointBase(RESTEndpoint):
             for arg in parameters.getall('metadata_type'):
                 mtypes.extend(metadata_type_to_search_scope[arg])
             sanitized['metadata_type'] = frozenset(mtypes)
+        if parameters.get('cursor'):
+            # Malformed cursors are rejected here, so the query itself never sees them
+            decode_cursor(parameters['cursor'])
+            sanitized['cursor'] = parameters['cursor']
         return sanitized
+
+    @staticmethod
+    def check_cursor(model, sanitized):
+        """
+        Check whether the cursor of a request, if any, matches the sort order of the entries of the given ORM class.
+        :raises ValueError: if it does not
+        """
+        if 'cursor' in sanitized:
+            model.parse_cursor(sanitized['cursor'], sanitized['sort_by'])
+
+    @staticmethod
+    def accepts_table(request):
+        """
+        Check whether the client accepts the results of a listing in the table format (see get_simple_table).
+        """
+        return METADATA_TABLE_MEDIA_TYPE in request.headers.get('Accept', '')
+
+    @staticmethod
+    def listing_response(response_dict, table):
+        """
+        Make the response of a listing, with the media type of the table format if the results are in that format.
+        """
+        return RESTResponse(response_dict, content_type=METADATA_TABLE_MEDIA_TYPE if table else None)
+
+    @staticmethod
+    def get_next_cursor(model, rowids, sanitized):
+        """
+        Make the cursor for fetching the page that follows the given one. This method must be called in a db_session.
+        :param model: the ORM class the entries were queried from
+        :param rowids: the list of rowids of the entries on the current page
+        :param sanitized: the sanitized parameters of the query
+        :return: the cursor string, or None if the current page is the last one or the cursor can't be made
+        """
+        if not rowids or len(rowids) < sanitized["last"] - sanitized["first"] + 1:
+            return None
+        last_entry = model.get(rowid=rowids[-1])
+        return model.get_cursor(last_entry, sanitized["sort_by"]) if last_entry else None
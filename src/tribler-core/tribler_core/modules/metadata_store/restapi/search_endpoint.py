@@ -1,4 +1,3 @@
-import asyncio
 
 from aiohttp import web
 
@@ -10,6 +9,7 @@ from marshmallow.fields import Boolean, Integer, String
 
 from pony.orm import db_session
 
+from tribler_core.exceptions import QueryTimeoutError
 from tribler_core.modules.metadata_store.restapi.metadata_endpoint import MetadataEndpointBase
 from tribler_core.modules.metadata_store.restapi.metadata_schema import MetadataParameters
 from tribler_core.restapi.rest_endpoint import HTTP_BAD_REQUEST, RESTResponse
@@ -51,7 +51,8 @@ class SearchEndpoint(MetadataEndpointBase):
                             'type': String,
                         })
                     ],
-                    'chant_dirty': Boolean
+                    'chant_dirty': Boolean,
+                    'next_cursor': String,
                 })
             }
         }
@@ -60,6 +61,7 @@ class SearchEndpoint(MetadataEndpointBase):
     async def search(self, request):
         try:
             sanitized = self.sanitize_parameters(request.query)
+            self.check_cursor(self.session.mds.MetadataNode, sanitized)
         except (ValueError, KeyError):
             return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
 
@@ -67,17 +69,21 @@ class SearchEndpoint(MetadataEndpointBase):
             return RESTResponse({"error": "Filter parameter missing"}, status=HTTP_BAD_REQUEST)
 
         include_total = request.query.get('include_total', '')
+        table = self.accepts_table(request)
 
         def search_db():
             with db_session:
-                pony_query = self.session.mds.MetadataNode.get_entries(**sanitized)
+                search_results, rowids = self.session.mds.MetadataNode.get_entries_simple_dicts(
+                    table=table, **sanitized
+                )
                 total = self.session.mds.MetadataNode.get_total_count(**sanitized) if include_total else None
-                search_results = [r.to_simple_dict() for r in pony_query]
-            self.session.mds._db.disconnect()  # DB must be disconnected explicitly if run on a thread
-            return search_results, total
+                next_cursor = self.get_next_cursor(self.session.mds.MetadataNode, rowids, sanitized)
+            return search_results, total, next_cursor
 
         try:
-            search_results, total = await asyncio.get_event_loop().run_in_executor(None, search_db)
+            search_results, total, next_cursor = await self.run_read(search_db)
+        except QueryTimeoutError:
+            raise
         except Exception as e:
             self._logger.error("Error while performing DB search: %s", e)
             return RESTResponse(status=HTTP_BAD_REQUEST)
@@ -88,11 +94,12 @@ class SearchEndpoint(MetadataEndpointBase):
             "last": sanitized["last"],
             "sort_by": sanitized["sort_by"],
             "sort_desc": sanitized["sort_desc"],
+            "next_cursor": next_cursor,
         }
         if total is not None:
             response_dict.update({"total": total})
 
-        return RESTResponse(response_dict)
+        return self.listing_response(response_dict, table)
 
     @docs(
         tags=['Metadata'],
@@ -120,5 +127,10 @@ class SearchEndpoint(MetadataEndpointBase):
 
         keywords = args['q'].strip().lower()
         # TODO: add XXX filtering for completion terms
-        results = self.session.mds.TorrentMetadata.get_auto_complete_terms(keywords, max_terms=5)
+
+        @db_session
+        def get_completions():
+            return self.session.mds.TorrentMetadata.get_auto_complete_terms(keywords, max_terms=5)
+
+        results = await self.run_read(get_completions)
         return RESTResponse({"completions": results})
@@ -10,6 +10,8 @@ from ipv8.keyvault.crypto import default_eccrypto
 
 from pony.orm import db_session
 
+from tribler_common.simpledefs import METADATA_TABLE_MEDIA_TYPE
+
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import NEW
 from tribler_core.modules.metadata_store.restapi.tests.test_metadata_endpoint import BaseTestMetadataEndpoint
@@ -133,6 +135,23 @@ class TestSpecificChannelEndpoint(BaseTestMetadataEndpoint):
         self.assertEqual(len(json_dict['results']), 5)
         self.assertIn('status', json_dict['results'][0])
 
+    @timeout(10)
+    async def test_get_channel_contents_table(self):
+        """
+        Test whether the contents of a channel are sent in the table format if the client accepts it
+        """
+        with db_session:
+            chan = self.session.mds.ChannelMetadata.select().first()
+        url = 'channels/%s/123?sort_by=name' % hexlify(chan.public_key)
+        json_dict = await self.do_request(url, expected_code=200)
+        table_dict = await self.do_request(url, expected_code=200, headers={'Accept': METADATA_TABLE_MEDIA_TYPE})
+        table = table_dict.pop('results')
+        self.assertEqual(len(table['rows']), 5)
+        self.assertListEqual(
+            json_dict.pop('results'), [dict(zip(table['keys'][str(row[0])], row)) for row in table['rows']]
+        )
+        self.assertDictEqual(json_dict, table_dict)
+
     @timeout(10)
     async def test_get_channel_contents_by_type(self):
         # Test filtering channel contents by a list of data types
@@ -142,9 +161,9 @@ class TestSpecificChannelEndpoint(BaseTestMetadataEndpoint):
             ).first()
             self.session.mds.CollectionNode(title='some_folder', origin_id=chan.id_, sign_with=self.ext_key)
 
-            json_dict = await self.do_request(
-                'channels/%s/123?metadata_type=220&metadata_type=300' % hexlify(chan.public_key), expected_code=200
-            )
+        json_dict = await self.do_request(
+            'channels/%s/123?metadata_type=220&metadata_type=300' % hexlify(chan.public_key), expected_code=200
+        )
         self.assertEqual(len(json_dict['results']), 6)
         self.assertIn('status', json_dict['results'][0])
 
@@ -265,12 +284,11 @@ class TestSpecificChannelTorrentsEndpoint(BaseTestMyChannelEndpoint):
         """
         with db_session:
             channel = self.create_my_channel()
+            channel_pk, channel_id = channel.public_key, channel.id_
             channel.delete()
-            await self.do_request(
-                'channels/%s/%s/torrents' % (hexlify(channel.public_key), channel.id_),
-                request_type='PUT',
-                expected_code=404,
-            )
+        await self.do_request(
+            'channels/%s/%s/torrents' % (hexlify(channel_pk), channel_id), request_type='PUT', expected_code=404
+        )
 
     @timeout(10)
     async def test_add_torrents_no_dir(self):
@@ -352,16 +370,16 @@ class TestSpecificChannelTorrentsEndpoint(BaseTestMyChannelEndpoint):
             tdef = TorrentDef.load(TORRENT_UBUNTU_FILE)
             my_channel.add_torrent_to_channel(tdef, {'description': 'blabla'})
 
-            with open(TORRENT_UBUNTU_FILE, "rb") as torrent_file:
-                base64_content = base64.b64encode(torrent_file.read()).decode('utf-8')
+        with open(TORRENT_UBUNTU_FILE, "rb") as torrent_file:
+            base64_content = base64.b64encode(torrent_file.read()).decode('utf-8')
 
-                post_params = {'torrent': base64_content}
-                await self.do_request(
-                    'channels/%s/%s/torrents' % (hexlify(channel.public_key), channel.id_),
-                    request_type='PUT',
-                    post_data=post_params,
-                    expected_code=500,
-                )
+        post_params = {'torrent': base64_content}
+        await self.do_request(
+            'channels/%s/%s/torrents' % (hexlify(channel.public_key), channel.id_),
+            request_type='PUT',
+            post_data=post_params,
+            expected_code=500,
+        )
 
     @timeout(10)
     async def test_add_torrent(self):
@@ -438,6 +456,31 @@ class TestSpecificChannelTorrentsEndpoint(BaseTestMyChannelEndpoint):
         )
         self.session.mds.torrent_exists_in_personal_channel.assert_called_once()
 
+    @timeout(10)
+    async def test_add_torrent_from_magnet_channel_removed(self):
+        """
+        Test whether adding a magnet to a channel that is removed while the torrent is fetched results in a 404 error
+        """
+        channel = self.create_my_channel()
+        public_key, id_ = channel.public_key, channel.id_
+
+        def fake_get_metainfo(_, **__):
+            with db_session:
+                self.session.mds.ChannelMetadata.get(public_key=public_key, id_=id_).delete()
+            meta_info = TorrentDef.load(TORRENT_UBUNTU_FILE).get_metainfo()
+            return succeed(meta_info)
+
+        self.session.dlmgr.get_metainfo = fake_get_metainfo
+        self.session.mds.torrent_exists_in_personal_channel = Mock(return_value=False)
+
+        post_params = {'uri': 'magnet:?xt=urn:btih:111111111111111111111111111111111111111111'}
+        await self.do_request(
+            'channels/%s/%s/torrents' % (hexlify(public_key), id_),
+            request_type='PUT',
+            post_data=post_params,
+            expected_code=404,
+        )
+
     @timeout(10)
     async def test_add_torrent_from_magnet_error(self):
         """
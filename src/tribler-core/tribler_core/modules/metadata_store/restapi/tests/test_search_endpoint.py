@@ -2,6 +2,7 @@ from ipv8.database import database_blob
 
 from pony.orm import db_session
 
+from tribler_core.modules.metadata_store.orm_bindings.metadata_node import encode_cursor
 from tribler_core.restapi.base_api_test import AbstractApiTest
 from tribler_core.tests.tools.tools import timeout
 from tribler_core.utilities.random_utils import random_infohash
@@ -66,6 +67,31 @@ class TestSearchEndpoint(AbstractApiTest):
         parsed = await self.do_request('search?txt_filter=hay&include_total=1', expected_code=200)
         self.assertEqual(parsed["total"], 100)
 
+    @timeout(10)
+    async def test_search_cursor(self):
+        """
+        Test paging through the search results with the cursors returned by the endpoint
+        """
+        with db_session:
+            for x in range(0, 10):
+                self.session.mds.TorrentMetadata(title='hay ' + str(x), infohash=random_infohash(), size=x)
+
+        parsed = await self.do_request('search?txt_filter=hay&sort_by=size&first=1&last=6', expected_code=200)
+        self.assertListEqual([9, 8, 7, 6, 5, 4], [r['size'] for r in parsed["results"]])
+        parsed = await self.do_request(
+            'search?txt_filter=hay&sort_by=size&first=1&last=6&cursor=%s' % parsed["next_cursor"], expected_code=200
+        )
+        self.assertListEqual([3, 2, 1, 0], [r['size'] for r in parsed["results"]])
+        # The last page is not full, so there is nothing to continue from
+        self.assertIsNone(parsed["next_cursor"])
+
+        await self.do_request('search?txt_filter=hay&cursor=garbage', expected_code=400)
+        # Cursors of the wrong shape, or with values of the wrong types for the sort order, are rejected as well
+        for values in ([[1], 2, 3], [1, 2], ["a", 2, 3]):
+            await self.do_request(
+                'search?txt_filter=hay&sort_by=size&cursor=%s' % encode_cursor(values), expected_code=400
+            )
+
     @timeout(10)
     async def test_completions_no_query(self):
         """
@@ -80,3 +106,12 @@ class TestSearchEndpoint(AbstractApiTest):
         """
         json_response = await self.do_request('search/completions?q=tribler', expected_code=200)
         self.assertEqual(json_response['completions'], [])
+
+    @timeout(10)
+    async def test_completions_timeout(self):
+        """
+        Testing whether the API returns an error 503 if the database query takes too long
+        """
+        self.session.api_manager.root_endpoint.query_executor.timeout = 0
+        json_response = await self.do_request('search/completions?q=tribler', expected_code=503)
+        self.assertEqual(json_response['error']['code'], 'QueryTimeoutError')
@@ -1,7 +1,6 @@
 import struct
 from datetime import datetime, timedelta
 
-from ipv8.database import database_blob
 from ipv8.keyvault.crypto import default_eccrypto
 from ipv8.messaging.payload import Payload
 from ipv8.messaging.serialization import default_serializer
@@ -56,17 +55,66 @@ class UnknownBlobTypeException(Exception):
     pass
 
 
-def read_payload_with_offset(data, offset=0):
+VARLEN_I_HEADER = struct.Struct('>I')
+
+
+def compile_layout(format_list):
+    """
+    Precompile a payload format list into a layout for unpack_with_layout.
+    Consecutive fixed-size formats are merged into a single precompiled struct, while
+    variable-length ('varlenI') fields are marked with None.
+    :param format_list: the list of ipv8 serializer format names, e.g. ['H', 'H', '64s', 'varlenI']
+    :return: a list of struct.Struct objects and None markers
+    """
+    layout = []
+    fixed_formats = ''
+    for fmt in format_list:
+        if fmt == 'varlenI':
+            if fixed_formats:
+                layout.append(struct.Struct('>' + fixed_formats))
+                fixed_formats = ''
+            layout.append(None)
+        else:
+            fixed_formats += fmt
+    if fixed_formats:
+        layout.append(struct.Struct('>' + fixed_formats))
+    return layout
+
+
+def unpack_with_layout(layout, data, offset=0):
+    """
+    Unpack the fields of a serialized payload in a single pass over the data.
+    :param layout: the layout produced by compile_layout
+    :param data: bytes or memoryview containing the serialized payload
+    :param offset: the offset of the payload in the data
+    :return: a tuple of (<list of unpacked values>, <offset of the end of the unpacked data>)
+    """
+    values = []
+    for step in layout:
+        if step is None:
+            (length,) = VARLEN_I_HEADER.unpack_from(data, offset)
+            offset += VARLEN_I_HEADER.size
+            if offset + length > len(data):
+                raise struct.error("varlenI field is longer than the remaining data")
+            values.append(bytes(data[offset : offset + length]))
+            offset += length
+        else:
+            values.extend(step.unpack_from(data, offset))
+            offset += step.size
+    return values, offset
+
+
+def read_payload_with_offset(data, offset=0, check_signature=True):
     # First we have to determine the actual payload type
-    metadata_type = struct.unpack_from('>H', database_blob(data), offset=offset)[0]
+    metadata_type = struct.unpack_from('>H', data, offset=offset)[0]
     if metadata_type == DELETED:
-        return DeletedMetadataPayload.from_signed_blob_with_offset(data, offset=offset)
+        return DeletedMetadataPayload.from_signed_blob_with_offset(data, check_signature=check_signature, offset=offset)
     elif metadata_type == REGULAR_TORRENT:
-        return TorrentMetadataPayload.from_signed_blob_with_offset(data, offset=offset)
+        return TorrentMetadataPayload.from_signed_blob_with_offset(data, check_signature=check_signature, offset=offset)
     elif metadata_type == COLLECTION_NODE:
-        return CollectionNodePayload.from_signed_blob_with_offset(data, offset=offset)
+        return CollectionNodePayload.from_signed_blob_with_offset(data, check_signature=check_signature, offset=offset)
     elif metadata_type == CHANNEL_TORRENT:
-        return ChannelMetadataPayload.from_signed_blob_with_offset(data, offset=offset)
+        return ChannelMetadataPayload.from_signed_blob_with_offset(data, check_signature=check_signature, offset=offset)
 
     # Unknown metadata type, raise exception
     raise UnknownBlobTypeException
@@ -76,6 +124,124 @@ def read_payload(data):
     return read_payload_with_offset(data)[0]
 
 
+def split_signed_blob(data):
+    """
+    Split a raw blob of concatenated payloads into separate payloads without checking their signatures.
+    The signed parts of the payloads reference the blob's memory instead of copying it.
+    :param data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+    :return: a list of unchecked payloads
+    """
+    data = memoryview(data)
+    offset = 0
+    result = []
+    while offset < len(data):
+        payload, offset = read_payload_with_offset(data, offset, check_signature=False)
+        result.append(payload)
+    return result
+
+
+def iter_signed_blob(chunks):
+    """
+    Split a stream of concatenated payloads into separate payloads without checking their signatures.
+    Every payload is yielded as soon as all of its bytes arrive, so only the unfinished tail of the stream is buffered.
+    :param chunks: an iterable of bytes objects, the consecutive parts of the stream
+    :return: a generator of unchecked payloads
+    """
+    buffer = b''
+    offset = 0
+    for chunk in chunks:
+        buffer = buffer[offset:] + chunk
+        offset = 0
+        data = memoryview(buffer)
+        while offset < len(data):
+            try:
+                payload, end_offset = read_payload_with_offset(data, offset, check_signature=False)
+            except struct.error:
+                # The payload is not complete yet
+                break
+            if end_offset > len(data):
+                # The signature is not complete yet
+                break
+            yield payload
+            offset = end_offset
+    # Whatever is left is handled in the same way split_signed_blob handles a truncated blob
+    data = memoryview(buffer)
+    while offset < len(data):
+        payload, offset = read_payload_with_offset(data, offset, check_signature=False)
+        yield payload
+
+
+def check_signatures(signed_items):
+    """
+    Check the signatures of a batch of serialized payloads. This function does not depend on any state,
+    so it can be executed by a worker process.
+    :param signed_items: a list of tuples of (<public key>, <signed data>, <signature>)
+    :return: a list of booleans, True for every item that has a valid signature
+    """
+    results = []
+    for public_key, signed_data, signature in signed_items:
+        # Free-for-all entries are only valid with the null signature
+        if public_key == NULL_KEY:
+            results.append(signature == NULL_SIG)
+            continue
+        key_bin = b"LibNaCLPK:" + public_key
+        if not default_eccrypto.is_valid_public_bin(key_bin):
+            results.append(False)
+            continue
+        key = default_eccrypto.key_from_public_bin(key_bin)
+        results.append(default_eccrypto.is_valid_signature(key, bytes(signed_data), signature))
+    return results
+
+
+# The private key of a worker process. It is set once, when the process is started (see init_signing_worker).
+_worker_key = None
+
+
+def init_signing_worker(private_key_bin):
+    """
+    Keep the private key in a worker process, so it is not sent along with every batch of data to sign.
+    :param private_key_bin: the binary form of the private key to sign the data with
+    """
+    global _worker_key
+    _worker_key = default_eccrypto.key_from_private_bin(private_key_bin)
+
+
+def call_with_worker_key(func, args):
+    """
+    Call a signing function with the private key of the worker process.
+    :param func: a module-level function that takes the private key and a list of arguments
+    :param args: the list of arguments
+    :return: the result of the function
+    """
+    return func(_worker_key, args)
+
+
+def sign_data(key, data_list):
+    """
+    Sign a batch of serialized payloads. This function does not depend on any state,
+    so it can be executed by a worker process.
+    :param key: the private key to sign the data with
+    :param data_list: a list of the signed parts of the payloads
+    :return: a list of signatures
+    """
+    return [default_eccrypto.create_signature(key, data) for data in data_list]
+
+
+def sign_or_check_signatures(key, signed_items):
+    """
+    Finalize a batch of serialized payloads: check the existing signatures and make the missing ones.
+    This function does not depend on any state, so it can be executed by a worker process.
+    :param key: the private key to make the missing signatures with
+    :param signed_items: a list of tuples of (<public key>, <signed data>, <signature or None>)
+    :return: a list of the serialized payloads with their signatures
+    :raises InvalidSignatureException: if any of the existing signatures is wrong
+    """
+    if not all(check_signatures([item for item in signed_items if item[2] is not None])):
+        raise InvalidSignatureException("Tried to serialize payload with wrong signature")
+    missing = iter(sign_data(key, [data for _, data, signature in signed_items if signature is None]))
+    return [data + (signature if signature is not None else next(missing)) for _, data, signature in signed_items]
+
+
 class SignedPayload(Payload):
     """
     Payload for metadata.
@@ -83,12 +249,21 @@ class SignedPayload(Payload):
 
     format_list = ['H', 'H', '64s']
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.layout = compile_layout(cls.format_list)
+
     def __init__(self, metadata_type, reserved_flags, public_key, **kwargs):
         super(SignedPayload, self).__init__()
         self.metadata_type = metadata_type
         self.reserved_flags = reserved_flags
         self.public_key = bytes(public_key)
         self.signature = bytes(kwargs["signature"]) if "signature" in kwargs and kwargs["signature"] else None
+        # Set to True once the signature is known to match the payload's contents
+        self.signature_checked = False
+        # The signed part of the serialized payload, if the payload was read from a blob.
+        # It is used instead of serializing the payload again.
+        self.signed_data = kwargs.get("signed_data")
 
         # Special case: free-for-all entries are allowed to go with zero key and without sig check
         if "unsigned" in kwargs and kwargs["unsigned"]:
@@ -106,18 +281,23 @@ class SignedPayload(Payload):
             else:
                 raise InvalidSignatureException("Tried to create FFA payload with non-null signature")
 
-        serialized_data = default_serializer.pack_multiple(self.to_pack_list())[0]
+        if self.signed_data is not None:
+            serialized_data = bytes(self.signed_data)
+        else:
+            serialized_data = default_serializer.pack_multiple(self.to_pack_list())[0]
         if "key" in kwargs and kwargs["key"]:
             key = kwargs["key"]
             if self.public_key != key.pub().key_to_bin()[10:]:
                 raise KeysMismatchException(self.public_key, key.pub().key_to_bin()[10:])
             self.signature = default_eccrypto.create_signature(key, serialized_data)
+            self.signature_checked = True
         elif "signature" in kwargs:
             # This check ensures that an entry with a wrong signature will not proliferate further
             if not default_eccrypto.is_valid_signature(
                 default_eccrypto.key_from_public_bin(b"LibNaCLPK:" + self.public_key), serialized_data, self.signature
             ):
                 raise InvalidSignatureException("Tried to create payload with wrong signature")
+            self.signature_checked = True
         else:
             raise InvalidSignatureException("Tried to create payload without signature")
 
@@ -135,13 +315,13 @@ class SignedPayload(Payload):
 
     @classmethod
     def from_signed_blob_with_offset(cls, data, check_signature=True, offset=0):
-        # TODO: stop serializing/deserializing stuff twice
-        unpack_list, end_offset = default_serializer.unpack_multiple(cls.format_list, data, offset=offset)
-        if check_signature:
-            signature = data[end_offset : end_offset + SIGNATURE_SIZE]
-            payload = cls.from_unpack_list(*unpack_list, signature=signature)
-        else:
-            payload = cls.from_unpack_list(*unpack_list, skip_key_check=True)
+        data = memoryview(data)
+        unpack_list, end_offset = unpack_with_layout(cls.layout, data, offset=offset)
+        signed_data = data[offset:end_offset]
+        signature = bytes(data[end_offset : end_offset + SIGNATURE_SIZE])
+        payload = cls.from_unpack_list(
+            *unpack_list, signature=signature, signed_data=signed_data, skip_key_check=not check_signature
+        )
         return payload, end_offset + SIGNATURE_SIZE
 
     def to_dict(self):
@@ -153,6 +333,8 @@ class SignedPayload(Payload):
         }
 
     def _serialized(self):
+        if self.signed_data is not None:
+            return bytes(self.signed_data), self.signature
         serialized_data = default_serializer.pack_multiple(self.to_pack_list())[0]
         return serialized_data, self.signature
 
@@ -165,6 +347,9 @@ class SignedPayload(Payload):
             return cls.from_signed_blob(f.read())
 
 
+SignedPayload.layout = compile_layout(SignedPayload.format_list)
+
+
 # fmt: off
 class ChannelNodePayload(SignedPayload):
     format_list = SignedPayload.format_list + ['Q', 'Q', 'Q']
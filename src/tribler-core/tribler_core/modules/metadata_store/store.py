@@ -1,7 +1,14 @@
 import logging
+import multiprocessing
+import os
 import threading
-from asyncio import get_event_loop
+from asyncio import get_event_loop, wrap_future
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
 from time import sleep
 
 from ipv8.database import database_blob
@@ -12,7 +19,9 @@ from pony import orm
 from pony.orm import CacheIndexError, TransactionIntegrityError, db_session
 
 from tribler_core.exceptions import InvalidSignatureException
-from tribler_core.modules.category_filter.l2_filter import is_forbidden
+from tribler_core.modules.category_filter.l2_filter import classify_many
+from tribler_core.modules.metadata_store.db_executor import DBExecutor
+from tribler_core.modules.metadata_store.generations import GenerationsSQLiteProvider
 from tribler_core.modules.metadata_store.orm_bindings import (
     channel_metadata,
     channel_node,
@@ -34,7 +43,11 @@ from tribler_core.modules.metadata_store.serialization import (
     DELETED,
     NULL_KEY,
     REGULAR_TORRENT,
-    read_payload_with_offset,
+    call_with_worker_key,
+    check_signatures,
+    init_signing_worker,
+    iter_signed_blob,
+    split_signed_blob,
 )
 from tribler_core.utilities.path_util import str_path
 from tribler_core.utilities.unicode import hexlify
@@ -76,6 +89,153 @@ sql_add_fts_trigger_update = """
         INSERT INTO FtsIndex(rowid, title) VALUES (new.rowid, new.title);
     END;"""
 
+# The query results cache of MetadataNode used to be invalidated by these triggers, which updated MiscData for
+# every changed row. The generations are kept by GenerationsSQLiteProvider now, once per transaction.
+LEGACY_GENERATION_TRIGGERS = [
+    f"{table}_generation_{suffix}" for table in ("ChannelNode", "TorrentState") for suffix in ("ai", "ad", "au")
+]
+
+# Indexes matching the sort orders of the channel contents listings (the rowid is implicitly the last column).
+# They let the cursor-based pagination of MetadataNode.get_entries_query seek directly to the requested page.
+sql_create_sort_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_channelnode__pk_origin ON ChannelNode (public_key, origin_id)",
+    "CREATE INDEX IF NOT EXISTS idx_channelnode__pk_origin_title ON ChannelNode (public_key, origin_id, title)",
+    "CREATE INDEX IF NOT EXISTS idx_channelnode__pk_origin_size "
+    "ON ChannelNode (public_key, origin_id, num_entries, size)",
+    "CREATE INDEX IF NOT EXISTS idx_channelnode__pk_origin_date ON ChannelNode (public_key, origin_id, torrent_date)",
+]
+
+# Indexes for the queries of the torrent checker, which looks for the stalest and the most popular torrents
+sql_create_health_indexes = [
+    "CREATE INDEX IF NOT EXISTS idx_torrentstate__last_check ON TorrentState (last_check)",
+    "CREATE INDEX IF NOT EXISTS idx_torrentstate__seeders ON TorrentState (seeders)",
+]
+
+# While a channel is bulk-loaded, the FTS index is not updated on every insert. Instead, the triggers are replaced
+# with versions that only maintain the rows that were indexed before the bulk load started (rowids up to the
+# watermark), and the rows added in the meantime are indexed in one pass when the bulk load is finished.
+# ChannelNode rowids are AUTOINCREMENT, so the new rows always get rowids above the watermark.
+sql_add_fts_bulk_trigger_delete = """
+    CREATE TRIGGER IF NOT EXISTS fts_ad AFTER DELETE ON ChannelNode WHEN old.rowid <= {watermark:d}
+    BEGIN
+        DELETE FROM FtsIndex WHERE rowid = old.rowid;
+    END;"""
+
+sql_add_fts_bulk_trigger_update = """
+    CREATE TRIGGER IF NOT EXISTS fts_au AFTER UPDATE ON ChannelNode WHEN old.rowid <= {watermark:d} BEGIN
+        DELETE FROM FtsIndex WHERE rowid = old.rowid;
+        INSERT INTO FtsIndex(rowid, title) VALUES (new.rowid, new.title);
+    END;"""
+
+sql_index_fts_rowid_range = """
+    INSERT INTO FtsIndex(rowid, title) SELECT rowid, title FROM ChannelNode WHERE rowid > $watermark ORDER BY rowid"""
+
+# The watermark of an unfinished bulk load is kept in MiscData, so it can be finished after a crash
+FTS_BULK_LOAD_WATERMARK = "fts_bulk_load_watermark"
+
+# The number of pages merged by a single FTS5 'merge' command during idle-time index maintenance
+FTS_MERGE_PAGES = 500
+
+# mdblob files are read and decompressed in parts of this size, so the memory used for a blob does not depend on
+# the size of the blob
+MDBLOB_READ_CHUNK_SIZE = 1 << 16
+
+# SQLite limits the number of variables in a single query, so big IN (...) lists are split into chunks
+IN_QUERY_CHUNK_SIZE = 400
+
+TORRENT_TYPES = (REGULAR_TORRENT, CHANNEL_TORRENT)
+
+
+def in_chunks(values, chunk_size=IN_QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        yield values[start : start + chunk_size]
+
+
+class CorruptedMdblobError(Exception):
+    """
+    Raised when the compressed data of a metadata blob file can not be decompressed.
+    """
+
+
+def decompress_lz4_stream(compressed_chunks, max_length=MDBLOB_READ_CHUNK_SIZE):
+    """
+    Decompress a stream of LZ4 frame data part by part.
+    :param compressed_chunks: an iterable of bytes objects, the consecutive parts of the compressed stream
+    :param max_length: the maximum size of a single part of decompressed data
+    :return: a generator of decompressed parts
+    :raises RuntimeError: if the data could not be decompressed, or the stream ended before the end of the frame
+    """
+    decompressor = lz4.frame.LZ4FrameDecompressor()
+    for chunk in compressed_chunks:
+        yield decompressor.decompress(chunk, max_length=max_length)
+        while not (decompressor.eof or decompressor.needs_input):
+            yield decompressor.decompress(b'', max_length=max_length)
+        if decompressor.eof:
+            return
+    raise RuntimeError("The LZ4 frame is truncated")
+
+
+class NodesIndex(object):
+    """
+    In-memory index of the entries that can be affected by processing a batch of payloads.
+    It must be kept up to date while the batch is processed, so the lookups give the same answers
+    as the corresponding database queries would.
+    """
+
+    def __init__(self, torrent_state_cls):
+        self.torrent_state_cls = torrent_state_cls
+        self.by_signature = {}
+        self.by_id = {}
+        self.by_infohash = {}
+        self.health = {}
+
+    def add(self, node):
+        public_key = bytes(node.public_key)
+        if node.signature is not None:
+            self.by_signature[bytes(node.signature)] = node
+        self.by_id[(public_key, node.id_)] = node
+        if node.metadata_type in TORRENT_TYPES:
+            infohash = bytes(node.infohash)
+            self.by_infohash.setdefault((public_key, infohash), node)
+            if node.health:
+                self.health.setdefault(infohash, node.health)
+
+    def add_all(self, nodes):
+        for node in nodes:
+            self.add(node)
+
+    def remove(self, node):
+        public_key = bytes(node.public_key)
+        keys = [(self.by_id, (public_key, node.id_))]
+        if node.signature is not None:
+            keys.append((self.by_signature, bytes(node.signature)))
+        if node.metadata_type in TORRENT_TYPES:
+            keys.append((self.by_infohash, (public_key, bytes(node.infohash))))
+        for dct, key in keys:
+            if dct.get(key) is node:
+                dct.pop(key)
+
+    def get_by_signature(self, signature, public_key):
+        node = self.by_signature.get(bytes(signature))
+        return node if node and bytes(node.public_key) == public_key else None
+
+    def get_by_id(self, public_key, id_):
+        return self.by_id.get((public_key, id_))
+
+    def get_torrent_by_id(self, public_key, id_):
+        node = self.by_id.get((public_key, id_))
+        return node if node and node.metadata_type in TORRENT_TYPES else None
+
+    def get_torrent_by_infohash(self, public_key, infohash):
+        return self.by_infohash.get((public_key, infohash))
+
+    def get_health(self, infohash):
+        health = self.health.get(infohash)
+        if not health:
+            health = self.health[infohash] = self.torrent_state_cls(infohash=infohash)
+        return health
+
 
 class MetadataStore(object):
     def __init__(self, db_filename, channels_dir, my_key, disable_sync=False):
@@ -89,6 +249,20 @@ class MetadataStore(object):
         self.reference_timedelta = timedelta(milliseconds=100)
         self.sleep_on_external_thread = 0.05  # sleep this amount of seconds between batches executed on external thread
 
+        # Signatures of blobs with fewer payloads than this are checked (or made) on the calling thread.
+        # Bigger blobs are split into batches that are processed by a pool of worker processes.
+        self.verification_pool_threshold = 100
+        self.verification_batch_size = 250
+        self.verification_workers = os.cpu_count() or 1
+        self._verification_pool = None
+        self._verification_pool_lock = threading.Lock()
+
+        # Nested bulk loads share the watermark of the outermost one
+        self._fts_bulk_load_depth = 0
+        self._fts_bulk_load_lock = threading.Lock()
+        # Set after a bulk load, so the idle-time maintenance knows the FTS index is worth optimizing
+        self.fts_optimize_pending = False
+
         create_db = str(db_filename) == ":memory:" or not self.db_filename.is_file()
 
         # We have to dynamically define/init ORM-managed entities here to be able to support
@@ -103,7 +277,7 @@ class MetadataStore(object):
             # This attribute is internally called by Pony on startup, though pylint cannot detect it
             # with the static analysis.
             # pylint: disable=unused-variable
-            @self._db.on_connect(provider='sqlite')
+            @self._db.on_connect
             def sqlite_disable_sync(_, connection):
                 cursor = connection.cursor()
                 cursor.execute("PRAGMA synchronous = 0")
@@ -111,6 +285,16 @@ class MetadataStore(object):
 
             # pylint: enable=unused-variable
 
+        # With the write-ahead log, the readers of the DB executor do not have to wait for its writer
+        if str(db_filename) != ":memory:":
+            # pylint: disable=unused-variable
+            @self._db.on_connect
+            def sqlite_enable_wal(_, connection):
+                cursor = connection.cursor()
+                cursor.execute("PRAGMA journal_mode = WAL")
+
+            # pylint: enable=unused-variable
+
         self.MiscData = misc.define_binding(self._db)
 
         self.TrackerState = tracker_state.define_binding(self._db)
@@ -127,22 +311,39 @@ class MetadataStore(object):
         self.Vsids = vsids.define_binding(self._db)
 
         self.ChannelMetadata._channels_dir = channels_dir
+        self.ChannelNode._imap_batches = self.imap_batches
+        self.ChannelNode._run_read = self.run_read
 
-        self._db.bind(provider='sqlite', filename=str(db_filename), create_db=str(create_db), timeout=120.0)
+        self.db_executor = DBExecutor(self._db)
+
+        # The provider keeps the generations of the tables the cached query results depend on (see TableGenerations)
+        self._db.bind(
+            provider=GenerationsSQLiteProvider, filename=str(db_filename), create_db=str(create_db), timeout=120.0
+        )
+        self.generations = self._db.provider.generations
         if create_db:
             with db_session:
                 self._db.execute(sql_create_fts_table)
         self._db.generate_mapping(create_tables=create_db)  # Must be run out of session scope
         if create_db:
             with db_session:
-                self._db.execute(sql_add_fts_trigger_insert)
-                self._db.execute(sql_add_fts_trigger_delete)
-                self._db.execute(sql_add_fts_trigger_update)
+                self._set_fts_triggers()
+        else:
+            with db_session:
+                if self.MiscData.get(name=FTS_BULK_LOAD_WATERMARK):
+                    self._logger.info("Finishing the FTS index update of an interrupted bulk load")
+                    self._finish_fts_bulk_load()
 
         if create_db:
             with db_session:
                 self.MiscData(name="db_version", value=str(CURRENT_DB_VERSION))
 
+        with db_session:
+            for trigger in LEGACY_GENERATION_TRIGGERS:
+                self._db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            for sql in sql_create_sort_indexes + sql_create_health_indexes:
+                self._db.execute(sql)
+
         with db_session:
             default_vsids = self.Vsids.get(rowid=0)
             if not default_vsids:
@@ -172,13 +373,114 @@ class MetadataStore(object):
 
     def shutdown(self):
         self._shutting_down = True
+        self.db_executor.shutdown()
+        with self._verification_pool_lock:
+            if self._verification_pool:
+                self._verification_pool.shutdown()
+                self._verification_pool = None
         self._db.disconnect()
 
-    def disconnect_thread(self):
-        # Ugly workaround for closing threadpool connections
-        # TODO: subclass ThreadPoolExecutor to handle this automatically
-        if not isinstance(threading.current_thread(), threading._MainThread):
-            self._db.disconnect()
+    async def run_read(self, func, *args):
+        """
+        Run a read-only database call on a reader thread of the DB executor.
+        :param func: the function to call. It must open its own db_session.
+        :param args: the arguments of the function
+        :return: the result of the call
+        """
+        return await wrap_future(self.db_executor.submit_read(func, *args))
+
+    async def run_write(self, func, *args, batch=True):
+        """
+        Run a database call that changes the database on the writer thread of the DB executor.
+        :param func: the function to call
+        :param args: the arguments of the function
+        :param batch: whether the call can share a transaction with other writes
+        :return: the result of the call
+        """
+        return await wrap_future(self.db_executor.submit_write(func, *args, batch=batch))
+
+    def call_after_commit(self, callback, *args):
+        """
+        Defer a side effect of a batched write until its changes are committed (see DBExecutor.call_after_commit).
+        """
+        self.db_executor.call_after_commit(callback, *args)
+
+    def _set_fts_triggers(self, watermark=None):
+        """
+        (Re)create the triggers that keep the FTS index in sync with the ChannelNode table.
+        :param watermark: if given, create the bulk load versions of the triggers, that only maintain the FTS rows
+            with rowids up to the watermark
+        """
+        for trigger in ("fts_ai", "fts_ad", "fts_au"):
+            self._db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        if watermark is None:
+            self._db.execute(sql_add_fts_trigger_insert)
+            self._db.execute(sql_add_fts_trigger_delete)
+            self._db.execute(sql_add_fts_trigger_update)
+        else:
+            self._db.execute(sql_add_fts_bulk_trigger_delete.format(watermark=watermark))
+            self._db.execute(sql_add_fts_bulk_trigger_update.format(watermark=watermark))
+
+    @db_session
+    def _start_fts_bulk_load(self):
+        watermark = self._db.select("SELECT coalesce(max(rowid), 0) FROM ChannelNode")[0]
+        self.MiscData(name=FTS_BULK_LOAD_WATERMARK, value=str(watermark))
+        self._set_fts_triggers(watermark)
+
+    @db_session
+    def _finish_fts_bulk_load(self):
+        watermark_entry = self.MiscData.get(name=FTS_BULK_LOAD_WATERMARK)
+        watermark = int(watermark_entry.value)  # pylint: disable=unused-variable
+        self._db.execute(sql_index_fts_rowid_range)
+        self._set_fts_triggers()
+        watermark_entry.delete()
+        self.fts_optimize_pending = True
+
+    def begin_fts_bulk_load(self):
+        """
+        Defer the FTS index maintenance for the rows inserted until the matching end_fts_bulk_load call.
+        """
+        with self._fts_bulk_load_lock:
+            if not self._fts_bulk_load_depth:
+                self._start_fts_bulk_load()
+            self._fts_bulk_load_depth += 1
+
+    def end_fts_bulk_load(self):
+        with self._fts_bulk_load_lock:
+            self._fts_bulk_load_depth -= 1
+            if not self._fts_bulk_load_depth:
+                self._finish_fts_bulk_load()
+
+    @contextmanager
+    def fts_bulk_load(self):
+        """
+        Context manager that defers the FTS index maintenance for the rows inserted within it.
+        The new rows are indexed in a single pass on exit, so they are not searchable until then.
+        """
+        self.begin_fts_bulk_load()
+        try:
+            yield
+        finally:
+            self.end_fts_bulk_load()
+
+    def merge_fts_index(self, pages=FTS_MERGE_PAGES):
+        """
+        Do a bounded amount of incremental merging of the FTS index segments.
+        :param pages: the (approximate) number of pages to write
+        :return: True if there was something to merge, False otherwise
+        """
+        with db_session:
+            changes_before = self._db.select("SELECT total_changes()")[0]
+            self._db.execute("INSERT INTO FtsIndex(FtsIndex, rank) VALUES('merge', $pages)")
+            return self._db.select("SELECT total_changes()")[0] != changes_before
+
+    def optimize_fts_index(self):
+        """
+        Merge all the FTS index segments into one, which makes the subsequent searches faster.
+        """
+        with db_session:
+            self._db.execute("INSERT INTO FtsIndex(FtsIndex) VALUES('optimize')")
+        self.fts_optimize_pending = False
 
     def process_channel_dir(self, dirname, public_key, id_, **kwargs):
         """
@@ -190,142 +492,296 @@ class MetadataStore(object):
         :param public_key: public_key of the channel.
         :param id_: id_ of the channel.
         """
-        # We use multiple separate db_sessions here to limit the memory and reactor time impact,
-        # but we must check the existence of the channel every time to avoid race conditions
+        if not self._log_channel_dir_progress("Starting", dirname, public_key, id_):
+            return
+
+        # The FTS index is updated in one pass after all the blobs are processed, instead of on every insert
+        with self.fts_bulk_load():
+            for full_filename in sorted(dirname.iterdir()):
+                if not self.process_channel_blob(full_filename, public_key, id_, **kwargs):
+                    return
+
+        self._log_channel_dir_progress("Finished", dirname, public_key, id_)
+
+    async def process_channel_dir_threaded(self, dirname, public_key, id_, **kwargs):
+        """
+        Load all metadata blobs in a given directory on the writer thread of the DB executor. Every blob is loaded
+        by a separate write, so the other writes do not have to wait until the whole channel is loaded.
+        See process_channel_dir for the parameters.
+        """
+        if not await self.run_write(self._log_channel_dir_progress, "Starting", dirname, public_key, id_, batch=False):
+            return
+        filenames = await get_event_loop().run_in_executor(None, lambda: sorted(dirname.iterdir()))
+
+        await self.run_write(self.begin_fts_bulk_load, batch=False)
+        try:
+            for full_filename in filenames:
+                process_blob = partial(self.process_channel_blob, full_filename, public_key, id_, **kwargs)
+                if not await self.run_write(process_blob, batch=False):
+                    return
+        finally:
+            await self.run_write(self.end_fts_bulk_load, batch=False)
+
+        await self.run_write(self._log_channel_dir_progress, "Finished", dirname, public_key, id_, batch=False)
+
+    def _log_channel_dir_progress(self, stage, dirname, public_key, id_):
+        """
+        :return: False if the channel does not exist (anymore), True otherwise
+        """
         with db_session:
             channel = self.ChannelMetadata.get(public_key=public_key, id_=id_)
             if not channel:
-                return
+                return False
             self._logger.debug(
-                "Starting processing channel dir %s. Channel %s local/max version %i/%i",
+                "%s processing channel dir %s. Channel %s local/max version %i/%i",
+                stage,
                 dirname,
-                hexlify(channel.public_key),
+                hexlify(bytes(channel.public_key)),
                 channel.local_version,
                 channel.timestamp,
             )
+        return True
 
-        for full_filename in sorted(dirname.iterdir()):
-            blob_sequence_number = get_mdblob_sequence_number(full_filename.name)
+    def process_channel_blob(self, full_filename, public_key, id_, **kwargs):
+        """
+        Load a metadata blob of a channel directory, if it holds the next part of the channel, and track the local
+        version of the channel. Other files are skipped.
+        :param full_filename: the path to the blob
+        :return: False if the processing of the channel directory should stop, True otherwise
+        """
+        blob_sequence_number = get_mdblob_sequence_number(full_filename.name)
+        if blob_sequence_number is None:
+            return True
 
-            if blob_sequence_number is not None:
-                # Skip blobs containing data we already have and those that are
-                # ahead of the channel version known to us
-                # ==================|          channel data       |===
-                # ===start_timestamp|---local_version----timestamp|===
-                # local_version is essentially a cursor pointing into the current state of update process
-                with db_session:
-                    channel = self.ChannelMetadata.get(public_key=public_key, id_=id_)
-                    if not channel:
-                        return
-                    if (
-                        blob_sequence_number <= channel.start_timestamp
-                        or blob_sequence_number <= channel.local_version
-                        or blob_sequence_number > channel.timestamp
-                    ):
-                        continue
-                try:
-                    self.process_mdblob_file(str(full_filename), **kwargs)
-                    # If we stopped mdblob processing due to shutdown flag, we should stop
-                    # processing immediately, so that channel local version will not increase
-                    if self._shutting_down:
-                        return
-                    # We track the local version of the channel while reading blobs
-                    with db_session:
-                        channel = self.ChannelMetadata.get_for_update(public_key=public_key, id_=id_)
-                        if not channel:
-                            return
-                        channel.local_version = blob_sequence_number
-                except InvalidSignatureException:
-                    self._logger.error("Not processing metadata located at %s: invalid signature", full_filename)
+        # We use multiple separate db_sessions here to limit the memory and reactor time impact,
+        # but we must check the existence of the channel every time to avoid race conditions
 
+        # Skip blobs containing data we already have and those that are
+        # ahead of the channel version known to us
+        # ==================|          channel data       |===
+        # ===start_timestamp|---local_version----timestamp|===
+        # local_version is essentially a cursor pointing into the current state of update process
         with db_session:
             channel = self.ChannelMetadata.get(public_key=public_key, id_=id_)
             if not channel:
-                return
-            self._logger.debug(
-                "Finished processing channel dir %s. Channel %s local/max version %i/%i",
-                dirname,
-                hexlify(bytes(channel.public_key)),
-                channel.local_version,
-                channel.timestamp,
-            )
+                return False
+            if (
+                blob_sequence_number <= channel.start_timestamp
+                or blob_sequence_number <= channel.local_version
+                or blob_sequence_number > channel.timestamp
+            ):
+                return True
+        try:
+            self.process_mdblob_file(str(full_filename), collect_results=False, **kwargs)
+            # If we stopped mdblob processing due to shutdown flag, we should stop
+            # processing immediately, so that channel local version will not increase
+            if self._shutting_down:
+                return False
+            # We track the local version of the channel while reading blobs
+            with db_session:
+                channel = self.ChannelMetadata.get_for_update(public_key=public_key, id_=id_)
+                if not channel:
+                    return False
+                channel.local_version = blob_sequence_number
+        except InvalidSignatureException:
+            self._logger.error("Not processing metadata located at %s: invalid signature", full_filename)
+        return True
 
     def process_mdblob_file(self, filepath, **kwargs):
         """
-        Process a file with metadata in a channel directory.
+        Process a file with metadata in a channel directory. The file is read, decompressed and processed
+        part by part, so the memory use does not depend on the size of the file. Consequently, if a payload with
+        a wrong signature, or corrupted compressed data, is found in the file, the payloads that precede it are
+        already added to the database.
         :param filepath: The path to the file
         :param skip_personal_metadata_payload: if this is set to True, personal torrent metadata payload received
                 through gossip will be ignored. The default value is True.
         :param external_thread: indicate to the lower lever that we're running in the backround thread,
             to possibly pace down the upload process
+        :param collect_results: if this is set to False, nothing is returned, to avoid keeping the processed
+            entries in memory
         :return: a list of tuples of (<metadata or payload>, <action type>)
+        :raises InvalidSignatureException: if any of the payloads in the file has a wrong signature
         """
+        def _read_chunks(f):
+            chunks = iter(partial(f.read, MDBLOB_READ_CHUNK_SIZE), b'')
+            if not str(filepath).endswith('.lz4'):
+                yield from chunks
+                return
+            try:
+                yield from decompress_lz4_stream(chunks)
+            except RuntimeError as e:
+                # Stop the stream, so the incomplete payload that was being decompressed is not parsed
+                raise CorruptedMdblobError(filepath) from e
+
         with open(str_path(filepath), 'rb') as f:
-            serialized_data = f.read()
+            payloads = self.verify_payload_stream(iter_signed_blob(_read_chunks(f)))
+            try:
+                return self.process_payload_list(payloads, **kwargs)
+            except CorruptedMdblobError:
+                self._logger.warning("Unable to decompress mdblob %s", filepath)
+                return []
 
-        if str(filepath).endswith('.lz4'):
-            return self.process_compressed_mdblob(serialized_data, **kwargs)
-        return self.process_squashed_mdblob(serialized_data, **kwargs)
+    async def verify_compressed_mdblob_threaded(self, compressed_data):
+        """
+        Check the signatures of a compressed mdblob on the default executor. No database access is involved, so
+        this does not take a thread of the DB executor.
+        """
+        return await get_event_loop().run_in_executor(None, self.verify_compressed_mdblob, compressed_data)
 
     async def process_compressed_mdblob_threaded(self, compressed_data, **kwargs):
-        def _process_blob():
+        # Signatures are checked before the write is scheduled, so we do not hold the writer meanwhile
+        payload_list = await self.verify_compressed_mdblob_threaded(compressed_data)
+
+        def _process_payloads():
             result = None
             try:
                 with db_session:
                     try:
-                        result = self.process_compressed_mdblob(compressed_data, **kwargs)
+                        result = self.process_payload_list(payload_list, **kwargs)
                     except (TransactionIntegrityError, CacheIndexError) as err:
                         self._logger.error("DB transaction error when tried to process compressed mdblob: %s", str(err))
             # Unfortunately, we have to catch the exception twice, because Pony can raise them both on the exit from
             # db_session, and on calling the line of code
             except (TransactionIntegrityError, CacheIndexError) as err:
                 self._logger.error("DB transaction error when tried to process compressed mdblob: %s", str(err))
-            finally:
-                self.disconnect_thread()
             return result
 
-        return await get_event_loop().run_in_executor(None, _process_blob)
+        return await self.run_write(_process_payloads)
 
-    def process_compressed_mdblob(self, compressed_data, **kwargs):
+    def _get_verification_pool(self):
+        with self._verification_pool_lock:
+            if not self._verification_pool:
+                # We use "spawn" to avoid forking the threads and the DB connections of the main process.
+                # The workers get our private key once, when they start, so it is not sent along with the batches.
+                self._verification_pool = ProcessPoolExecutor(
+                    max_workers=self.verification_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_signing_worker,
+                    initargs=(self.my_key.key_to_bin(),),
+                )
+            return self._verification_pool
+
+    def imap_batches(self, func, items, get_args, key=None):
+        """
+        Apply a function to a stream of items in batches, in the order of the items. Full batches are processed
+        by the pool of worker processes. A limited number of batches is processed at the same time,
+        so only a bounded part of the stream is kept in memory.
+
+        :param func: a module-level function that takes a list of arguments and returns the list of results
+        :param items: an iterable of items
+        :param get_args: the function that makes the argument for func out of an item. It is called on the
+            calling thread, and its results must be picklable.
+        :param key: the private key to sign with, or None if func does not sign. When set, func takes the key
+            as its first argument. Only our own key is known to the worker processes, so the batches that are
+            signed with another key are processed on the calling thread.
+        :return: a generator of (item, result) tuples
+        """
+        items = iter(items)
+        pending = deque()
+        use_pool = key is None or key.key_to_bin() == self.my_key.key_to_bin()
+
+        def _finish_oldest_batch():
+            batch, results = pending.popleft()
+            return zip(batch, results if isinstance(results, list) else results.result())
+
+        while True:
+            batch = list(islice(items, self.verification_batch_size))
+            if not batch:
+                break
+            args = [get_args(item) for item in batch]
+            if not use_pool or len(batch) < self.verification_pool_threshold:
+                results = func(args) if key is None else func(key, args)
+            elif key is not None:
+                results = self._get_verification_pool().submit(call_with_worker_key, func, args)
+            else:
+                results = self._get_verification_pool().submit(func, args)
+            pending.append((batch, results))
+            # Keep all the workers busy, but do not read ahead further than that
+            while len(pending) > 2 * self.verification_workers:
+                yield from _finish_oldest_batch()
+        while pending:
+            yield from _finish_oldest_batch()
+
+    def verify_payload_stream(self, payloads):
+        """
+        Check the signatures of a stream of payloads with imap_batches.
+
+        :param payloads: an iterable of payloads with unchecked signatures
+        :return: a generator of the same payloads, with checked signatures
+        :raises InvalidSignatureException: if a payload with a wrong signature is encountered
+        """
+        # Worker processes can only receive picklable data, so we have to copy the signed parts
+        for payload, valid in self.imap_batches(
+            check_signatures, payloads, lambda p: (p.public_key, bytes(p.signed_data), p.signature)
+        ):
+            if not valid:
+                raise InvalidSignatureException("Tried to process mdblob containing payload with wrong signature")
+            payload.signature_checked = True
+            yield payload
+
+    def verify_squashed_mdblob(self, chunk_data):
+        """
+        Split raw concatenated payloads blob into payloads and check their signatures. Big blobs are checked
+        in batches by a pool of worker processes. This routine does not touch the database, so it should be called
+        outside of db_session to avoid holding the DB lock while the signatures are checked.
+
+        :param chunk_data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+        :return: a list of payloads with checked signatures
+        :raises InvalidSignatureException: if any of the payloads in the blob has a wrong signature
+        """
+        return list(self.verify_payload_stream(split_signed_blob(chunk_data)))
+
+    def verify_compressed_mdblob(self, compressed_data):
         try:
             decompressed_data = lz4.frame.decompress(compressed_data)
         except RuntimeError:
             self._logger.warning("Unable to decompress mdblob")
             return []
-        return self.process_squashed_mdblob(decompressed_data, **kwargs)
+        return self.verify_squashed_mdblob(decompressed_data)
+
+    def process_compressed_mdblob(self, compressed_data, **kwargs):
+        return self.process_payload_list(self.verify_compressed_mdblob(compressed_data), **kwargs)
 
-    def process_squashed_mdblob(self, chunk_data, external_thread=False, peer_vote_for_channels=None, **kwargs):
+    def process_squashed_mdblob(self, chunk_data, **kwargs):
         """
-        Process raw concatenated payloads blob. This routine breaks the database access into smaller batches.
-        It uses a congestion-control like algorithm to determine the optimal batch size, targeting the
-        batch processing time value of self.reference_timedelta.
+        Process raw concatenated payloads blob.
 
         :param chunk_data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+        :return: a list of tuples of (<metadata or payload>, <action type>)
+        """
+        return self.process_payload_list(self.verify_squashed_mdblob(chunk_data), **kwargs)
+
+    def process_payload_list(
+        self, payload_list, external_thread=False, peer_vote_for_channels=None, collect_results=True, **kwargs
+    ):
+        """
+        Process a list of payloads with checked signatures. This routine breaks the database access into smaller
+        batches. It uses a congestion-control like algorithm to determine the optimal batch size, targeting the
+        batch processing time value of self.reference_timedelta.
+
+        :param payload_list: the list (or any other iterable) of payloads, as produced by verify_squashed_mdblob
+            or verify_payload_stream. The payloads are taken from it one batch at a time.
         :param external_thread: if this is set to True, we add some sleep between batches to allow other threads
             to get the database lock. This is an ugly workaround for Python and asynchronous programming (locking)
             imperfections. It only makes sense to use it when this routine runs on a non-reactor thread.
         :peer_vote_for_channels: Channel entries found in the blob will be vote bumped for the corresponding peer
+        :param collect_results: if this is set to False, the results are not collected and None is returned
         :return: a list of tuples of (<metadata or payload>, <action type>)
         """
-
-        offset = 0
-        payload_list = []
-        while offset < len(chunk_data):
-            payload, offset = read_payload_with_offset(chunk_data, offset)
-            payload_list.append(payload)
-
         result = []
-        total_size = len(payload_list)
-        start = 0
-        while start < total_size:
-            end = start + self.batch_size
-            batch = payload_list[start:end]
+        payloads = iter(payload_list)
+        while True:
+            batch = list(islice(payloads, self.batch_size))
+            if not batch:
+                break
             batch_start_time = datetime.now()
 
             # We separate the sessions to minimize database locking.
             with db_session:
-                for payload in batch:
-                    result.extend(self.process_payload(payload, **kwargs))
+                batch_result = self.process_payloads_batch(batch, **kwargs)
+            if collect_results:
+                result.extend(batch_result)
             if external_thread:
                 sleep(self.sleep_on_external_thread)
 
@@ -345,7 +801,6 @@ class MetadataStore(object):
                     (self.batch_size, float(batch_end_time.total_seconds())),
                 )
             )
-            start = end
             if self._shutting_down:
                 break
 
@@ -355,7 +810,7 @@ class MetadataStore(object):
                 peer = peer_vote_for_channels
                 for c in [md for md, _ in result if md and (md.metadata_type == CHANNEL_TORRENT)]:
                     self.vote_bump(c.public_key, c.id_, peer.public_key.key_to_bin()[10:])
-        return result
+        return result if collect_results else None
 
     @db_session
     def process_payload(self, payload, skip_personal_metadata_payload=True):
@@ -369,11 +824,88 @@ class MetadataStore(object):
                 through gossip will be ignored. The default value is True.
         :return: a list of tuples of (<metadata or payload>, <action type>)
         """
+        return self.process_payloads_batch([payload], skip_personal_metadata_payload=skip_personal_metadata_payload)
 
+    def prefetch_nodes(self, payloads):
+        """
+        Fetch all the entries that can be affected by processing the given payloads, using a few set-based queries
+        instead of looking up the entries one by one.
+        :param payloads: the list of payloads to fetch the entries for
+        :return: a NodesIndex object with the fetched entries
+        """
+        signatures = set()
+        public_keys = set()
+        ids = set()
+        infohashes = set()
+        for payload in payloads:
+            public_keys.add(payload.public_key)
+            if payload.metadata_type == DELETED:
+                signatures.add(payload.delete_signature)
+                continue
+            signatures.add(payload.signature)
+            if payload.metadata_type in (CHANNEL_TORRENT, REGULAR_TORRENT, COLLECTION_NODE):
+                ids.update((payload.id_, payload.origin_id))
+            if payload.metadata_type in (CHANNEL_TORRENT, REGULAR_TORRENT):
+                infohashes.add(payload.infohash)
+        # Free-for-all entries are stored with an empty public key
+        public_keys.add(b"")
+        public_keys = [database_blob(pk) for pk in public_keys]
+
+        # Only the rowids are selected first, so every entry is loaded just once even if several conditions match it
+        rowids = set()
+        for chunk in in_chunks(signatures):
+            rowids.update(orm.select(g.rowid for g in self.ChannelNode if g.signature in chunk))
+        for chunk in in_chunks(ids):
+            rowids.update(
+                orm.select(g.rowid for g in self.ChannelNode if g.public_key in public_keys and g.id_ in chunk)
+            )
+        for chunk in in_chunks(infohashes):
+            rowids.update(
+                orm.select(g.rowid for g in self.TorrentMetadata if g.public_key in public_keys and g.infohash in chunk)
+            )
+
+        index = NodesIndex(self.TorrentState)
+        for chunk in in_chunks(rowids):
+            index.add_all(self.ChannelNode.select(lambda g: g.rowid in chunk))
+        # Health entries of the infohashes that are already known locally were indexed together with the nodes
+        for chunk in in_chunks(infohashes.difference(index.health)):
+            index.health.update(
+                (bytes(state.infohash), state) for state in self.TorrentState.select(lambda g: g.infohash in chunk)
+            )
+        return index
+
+    @db_session
+    def process_payloads_batch(self, payloads, skip_personal_metadata_payload=True):
+        """
+        Process a batch of payloads. All the entries that can be affected by the batch are fetched from the database
+        at once, and the decisions for the individual payloads are made in memory. The payloads are processed in
+        order, so the results are the same as if the payloads were processed one by one.
+        :param payloads: the list of payloads to work on
+        :param skip_personal_metadata_payload: if this is set to True, personal torrent metadata payload received
+                through gossip will be ignored. The default value is True.
+        :return: a list of tuples of (<metadata or payload>, <action type>)
+        """
+        index = self.prefetch_nodes(payloads)
+        # The whole batch is checked against the offending words stop-list at once
+        forbidden = classify_many(
+            payload.title + payload.tags
+            if payload.metadata_type in [CHANNEL_TORRENT, REGULAR_TORRENT, COLLECTION_NODE]
+            else ""
+            for payload in payloads
+        )
+        result = []
+        for payload, is_forbidden in zip(payloads, forbidden):
+            result.extend(
+                self._process_payload_with_index(payload, index, skip_personal_metadata_payload, is_forbidden)
+            )
+        return result
+
+    def _process_payload_with_index(self, payload, index, skip_personal_metadata_payload, is_forbidden):
         if payload.metadata_type == DELETED:
             # We only allow people to delete their own entries, thus PKs must match
-            node = self.ChannelNode.get_for_update(signature=payload.delete_signature, public_key=payload.public_key)
+            node = index.get_by_signature(payload.delete_signature, payload.public_key)
             if node:
+                index.remove(node)
                 node.delete()
                 return [(None, DELETED_METADATA)]
 
@@ -394,7 +926,7 @@ class MetadataStore(object):
             return []
 
         # Check for offending words stop-list
-        if is_forbidden(payload.title + payload.tags):
+        if is_forbidden:
             return [(None, NO_ACTION)]
 
         # FFA payloads get special treatment:
@@ -402,35 +934,37 @@ class MetadataStore(object):
             if payload.metadata_type == REGULAR_TORRENT:
                 node = self.TorrentMetadata.add_ffa_from_dict(payload.to_dict())
                 if node:
+                    index.add(node)
                     return [(node, UNKNOWN_TORRENT)]
             return [(None, NO_ACTION)]
 
         # Check if we already have this payload
-        node = self.ChannelNode.get(signature=payload.signature, public_key=payload.public_key)
+        node = index.get_by_signature(payload.signature, payload.public_key)
         if node:
             return [(node, NO_ACTION)]
 
         result = []
         if payload.metadata_type in [CHANNEL_TORRENT, REGULAR_TORRENT]:
             # Signed entry > FFA entry. Old FFA entry > new FFA entry
-            ffa_node = self.TorrentMetadata.get(public_key=database_blob(b""), infohash=database_blob(payload.infohash))
+            ffa_node = index.get_torrent_by_infohash(b"", payload.infohash)
             if ffa_node:
+                index.remove(ffa_node)
                 ffa_node.delete()
 
             def check_update_opportunity():
                 # Check for possible update sending opportunity.
-                node = self.TorrentMetadata.get(
-                    lambda g: g.public_key == database_blob(payload.public_key)
-                    and g.id_ == payload.id_
-                    and g.timestamp > payload.timestamp
-                )
-                return [(node, GOT_NEWER_VERSION)] if node else [(None, NO_ACTION)]
+                node = index.get_torrent_by_id(payload.public_key, payload.id_)
+                if node and node.timestamp > payload.timestamp:
+                    return [(node, GOT_NEWER_VERSION)]
+                return [(None, NO_ACTION)]
 
             # Check if the received payload is a deleted entry from a channel that we already have
-            parent_channel = self.ChannelMetadata.get(
-                public_key=database_blob(payload.public_key), id_=payload.origin_id
-            )
-            if parent_channel and parent_channel.local_version > payload.timestamp:
+            parent_channel = index.get_by_id(payload.public_key, payload.origin_id)
+            if (
+                parent_channel
+                and parent_channel.metadata_type == CHANNEL_TORRENT
+                and parent_channel.local_version > payload.timestamp
+            ):
                 return check_update_opportunity()
 
             # If we received a metadata payload signed by ourselves we simply ignore it since we are the only
@@ -441,11 +975,10 @@ class MetadataStore(object):
                 return check_update_opportunity()
 
             # Check for a node with the same infohash
-            node = self.TorrentMetadata.get_for_update(
-                public_key=database_blob(payload.public_key), infohash=database_blob(payload.infohash)
-            )
+            node = index.get_torrent_by_infohash(payload.public_key, payload.infohash)
             if node:
                 if node.timestamp < payload.timestamp:
+                    index.remove(node)
                     node.delete()
                     result.append((None, DELETED_METADATA))
                 elif node.timestamp > payload.timestamp:
@@ -456,10 +989,12 @@ class MetadataStore(object):
                 # Otherwise, we got the same version locally and do nothing.
 
         # Check for the older version of the same node
-        node = self.ChannelNode.get_for_update(public_key=database_blob(payload.public_key), id_=payload.id_)
+        node = index.get_by_id(payload.public_key, payload.id_)
         if node:
             if node.timestamp < payload.timestamp:
+                index.remove(node)
                 node.set(**payload.to_dict())
+                index.add(node)
                 result.append((node, UPDATED_OUR_VERSION))
                 return result
             elif node.timestamp > payload.timestamp:
@@ -473,11 +1008,15 @@ class MetadataStore(object):
             return result
 
         if payload.metadata_type == REGULAR_TORRENT:
-            result.append((self.TorrentMetadata.from_payload(payload), UNKNOWN_TORRENT))
+            node = self.TorrentMetadata.from_payload(payload, health=index.get_health(payload.infohash))
+            result.append((node, UNKNOWN_TORRENT))
         elif payload.metadata_type == CHANNEL_TORRENT:
-            result.append((self.ChannelMetadata.from_payload(payload), UNKNOWN_CHANNEL))
+            node = self.ChannelMetadata.from_payload(payload, health=index.get_health(payload.infohash))
+            result.append((node, UNKNOWN_CHANNEL))
         elif payload.metadata_type == COLLECTION_NODE:
-            result.append((self.CollectionNode.from_payload(payload), UNKNOWN_COLLECTION))
+            node = self.CollectionNode.from_payload(payload)
+            result.append((node, UNKNOWN_COLLECTION))
+        index.add(node)
         return result
 
     @db_session
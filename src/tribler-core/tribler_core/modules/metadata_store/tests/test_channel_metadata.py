@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import os
+import pickle
 from binascii import unhexlify
 from datetime import datetime
 from itertools import combinations
@@ -16,7 +17,11 @@ from six.moves import xrange
 
 from tribler_core.exceptions import DuplicateTorrentFileError
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
-from tribler_core.modules.metadata_store.orm_bindings.channel_metadata import CHANNEL_DIR_NAME_LENGTH, entries_to_chunk
+from tribler_core.modules.metadata_store.orm_bindings.channel_metadata import (
+    CHANNEL_DIR_NAME_LENGTH,
+    entries_to_chunk,
+    serialized_entries_to_chunks,
+)
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import COMMITTED, NEW, TODELETE, UPDATED
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler_core.modules.metadata_store.store import MetadataStore
@@ -370,6 +375,127 @@ class TestChannelMetadata(TriblerCoreTest):
         self.mds.process_channel_dir(my_dir, chan.public_key, chan.id_, skip_personal_metadata_payload=False)
         self.assertEqual(chan.num_entries, 363)
 
+    @db_session
+    def test_commit_forest_incremental(self):
+        """
+        Test that the commit queue consists of the dirty nodes and their ancestors only, and that the entries counts
+        of the untouched subtrees are reused
+        """
+        chan = self.mds.ChannelMetadata.create_channel('root', 'test')
+        coll0 = self.mds.CollectionNode(origin_id=chan.id_, status=NEW)
+        coll1 = self.mds.CollectionNode(origin_id=coll0.id_, status=NEW)
+        coll2 = self.mds.CollectionNode(origin_id=coll0.id_, status=NEW)
+        torrents = [
+            self.mds.TorrentMetadata(origin_id=parent.id_, infohash=random_infohash(), status=NEW)
+            for parent in (chan, coll0, coll1, coll1, coll2, coll2, coll2)
+        ]
+        self.mds.CollectionNode.commit_all_channels()
+        self.assertEqual(7, chan.num_entries)
+        self.assertEqual(6, coll0.num_entries)
+
+        # Change entries in several branches of the tree
+        torrents[2].status = UPDATED
+        torrents[1].status = UPDATED
+        torrents[0].soft_delete()
+        new_torrent = self.mds.TorrentMetadata(origin_id=coll1.id_, infohash=random_infohash(), status=NEW)
+
+        queue = self.mds.CollectionNode.get_commit_forest()[chan.id_]
+        self.assertEqual(chan, queue[-1])
+        self.assertSetEqual({torrents[0], torrents[1], torrents[2], new_torrent, coll0, coll1, chan}, set(queue))
+        # Every node comes before its parent
+        self.assertLess(queue.index(coll1), queue.index(coll0))
+
+        self.mds.ChannelMetadata.prepare_commit_queue_for_channel(queue)
+        self.assertEqual(3, coll1.num_entries)
+        self.assertEqual(3, coll2.num_entries)
+        self.assertEqual(7, coll0.num_entries)
+        self.assertEqual(7, chan.num_entries)
+
+    @db_session
+    def test_collapse_deleted_subtrees(self):
+        """
+        Test that the contents of the deleted collections are removed, while the top deleted collections are kept
+        """
+        chan = self.mds.ChannelMetadata.create_channel('root', 'test')
+        coll0 = self.mds.CollectionNode(origin_id=chan.id_, status=TODELETE)
+        coll1 = self.mds.CollectionNode(origin_id=coll0.id_, status=TODELETE)
+        self.mds.TorrentMetadata(origin_id=coll0.id_, infohash=random_infohash())
+        self.mds.TorrentMetadata(origin_id=coll1.id_, infohash=random_infohash())
+        kept = self.mds.TorrentMetadata(origin_id=chan.id_, infohash=random_infohash())
+
+        self.mds.CollectionNode.collapse_deleted_subtrees()
+        self.assertSetEqual({chan, coll0, kept}, set(self.mds.ChannelNode.select()[:]))
+
+    @db_session
+    def test_commit_channel_torrent_parallel(self):
+        """
+        Test that the entries of a big commit are signed and serialized by the worker processes
+        """
+        self.mds.verification_pool_threshold = 2
+        self.mds.verification_batch_size = 3
+        self.mds.verification_workers = 2
+        channel = self.mds.ChannelMetadata.create_channel('test', 'test')
+        torrents = [
+            self.mds.TorrentMetadata(origin_id=channel.id_, infohash=random_infohash(), status=NEW) for _ in range(10)
+        ]
+        channel.commit_channel_torrent()
+        torrents[0].soft_delete()
+
+        # The chunks are the same as the ones made on the calling thread
+        commit_list = channel.get_contents_to_commit()
+        chunks, index = [], 0
+        while index < len(commit_list):
+            chunk, index = entries_to_chunk(commit_list, 1000, start_index=index)
+            chunks.append(chunk)
+        serialized_entries = self.mds.ChannelNode.serialize_entries(commit_list)
+        self.assertListEqual(chunks, [chunk for chunk, _ in serialized_entries_to_chunks(serialized_entries, 1000)])
+
+        torrents[1].title = 'changed'
+        changed_infohash = torrents[1].infohash
+        self.mds.ChannelNode.sign_entries(torrents[1:])
+        self.assertTrue(all(torrent.has_valid_signature() for torrent in torrents[1:]))
+
+        # Read the channel back from disk
+        channel.consolidate_channel_torrent()
+        self.mds.TorrentMetadata.select(lambda g: g.metadata_type == REGULAR_TORRENT).delete()
+        channel.local_version = 0
+        my_dir = path_util.abspath(self.mds.ChannelMetadata._channels_dir / channel.dirname)
+        self.mds.process_channel_dir(my_dir, channel.public_key, channel.id_, skip_personal_metadata_payload=False)
+        self.assertEqual(9, channel.contents_len)
+        self.assertEqual('changed', self.mds.TorrentMetadata.get(infohash=changed_infohash).title)
+
+    @db_session
+    def test_sign_entries_key_not_sent(self):
+        """
+        Test that the private key is not sent to the worker processes along with the batches they sign
+        """
+        self.mds.verification_pool_threshold = 2
+        self.mds.verification_batch_size = 3
+        self.mds.verification_workers = 2
+        channel = self.mds.ChannelMetadata.create_channel('test', 'test')
+        torrents = [
+            self.mds.TorrentMetadata(origin_id=channel.id_, infohash=random_infohash(), status=NEW) for _ in range(10)
+        ]
+        pool = self.mds._get_verification_pool()
+        submitted = []
+
+        def submit(*args):
+            submitted.append(pickle.dumps(args))
+            return pool.submit(*args)
+
+        with patch.object(self.mds, '_get_verification_pool', return_value=Mock(submit=submit)):
+            self.mds.ChannelNode.sign_entries(torrents)
+            self.assertTrue(all(torrent.has_valid_signature() for torrent in torrents))
+            self.assertTrue(submitted)
+            self.assertFalse(any(self.mds.my_key.key_to_bin() in args for args in submitted))
+
+            # Only our own key is known to the workers, so the entries signed with another key are signed here
+            submitted.clear()
+            other_key = default_eccrypto.generate_key('curve25519')
+            self.mds.ChannelNode.sign_entries(torrents, key=other_key)
+            self.assertTrue(all(torrent.has_valid_signature() for torrent in torrents))
+            self.assertFalse(submitted)
+
     @db_session
     def test_consolidate_channel_torrent(self):
         """
@@ -452,15 +578,10 @@ class TestChannelMetadata(TriblerCoreTest):
         dirname = chan.dirname
 
         self.assertEqual(title, self.mds.ChannelMetadata.get_channel_name(dirname, infohash))
-        self.assertEqual(title, self.mds.ChannelMetadata.get_channel_name_cached(dirname, infohash))
         chan.infohash = b"\x11" * 20
         self.assertEqual("OLD:" + title, self.mds.ChannelMetadata.get_channel_name(dirname, infohash))
         chan.delete()
         self.assertEqual(dirname, self.mds.ChannelMetadata.get_channel_name(dirname, infohash))
-        # Check that the cached version of the name is returned even if the channel has been deleted
-        self.mds.ChannelMetadata.get_channel_name = Mock()
-        self.assertEqual(title, self.mds.ChannelMetadata.get_channel_name_cached(dirname, infohash))
-        self.mds.ChannelMetadata.get_channel_name.assert_not_called()
 
     @db_session
     def check_add(self, torrents_in_dir, errors, recursive):
@@ -0,0 +1,145 @@
+import os
+import threading
+from unittest.mock import Mock
+
+from ipv8.keyvault.crypto import default_eccrypto
+
+from pony.orm import count, db_session
+
+from tribler_core.modules.metadata_store.orm_bindings.channel_node import NEW
+from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+from tribler_core.tests.tools.tools import timeout
+from tribler_core.utilities.random_utils import random_infohash
+
+
+class TestDBExecutor(TriblerCoreTest):
+    async def setUp(self):
+        await super(TestDBExecutor, self).setUp()
+        # The threads of the executor would not see an in-memory database
+        self.mds = MetadataStore(
+            self.session_base_dir / 'test.db', self.session_base_dir, default_eccrypto.generate_key(u"curve25519")
+        )
+
+    async def tearDown(self):
+        self.mds.shutdown()
+        await super(TestDBExecutor, self).tearDown()
+
+    def add_peer(self, public_key, fail=False):
+        self.mds.ChannelPeer(public_key=public_key)
+        if fail:
+            raise ValueError("write failed")
+        return public_key
+
+    @db_session
+    def count_peers(self):
+        return count(p for p in self.mds.ChannelPeer)
+
+    @timeout(10)
+    async def test_batched_writes(self):
+        """
+        Test that the writes queued at the same time share a transaction, and that a failing write
+        does not affect the others
+        """
+        executor = self.mds.db_executor
+        writer_blocked = threading.Event()
+        executor.submit_write(writer_blocked.wait, batch=False)
+
+        futures = [
+            executor.submit_write(self.add_peer, b"1" * 64),
+            executor.submit_write(self.add_peer, b"2" * 64, True),
+            executor.submit_write(self.add_peer, b"3" * 64),
+        ]
+        writer_blocked.set()
+
+        self.assertEqual(b"1" * 64, futures[0].result())
+        self.assertRaises(ValueError, futures[1].result)
+        self.assertEqual(b"3" * 64, futures[2].result())
+        self.assertEqual(2, await self.mds.run_read(self.count_peers))
+
+    @timeout(10)
+    async def test_call_after_commit(self):
+        """
+        Test that the deferred side effects of batched writes are only made once, after their changes are committed
+        """
+        executor = self.mds.db_executor
+        committed = []
+
+        def add_peer(public_key, fail=False):
+            self.mds.call_after_commit(committed.append, public_key)
+            return self.add_peer(public_key, fail)
+
+        writer_blocked = threading.Event()
+        executor.submit_write(writer_blocked.wait, batch=False)
+        futures = [
+            executor.submit_write(add_peer, b"1" * 64),
+            executor.submit_write(add_peer, b"2" * 64, True),
+            executor.submit_write(add_peer, b"3" * 64),
+        ]
+        writer_blocked.set()
+        for future in futures:
+            future.exception()
+
+        self.assertListEqual([b"1" * 64, b"3" * 64], committed)
+
+        # Outside of a batched write, the call is made right away
+        self.mds.call_after_commit(committed.append, b"4" * 64)
+        self.assertEqual(b"4" * 64, committed[-1])
+
+    @timeout(10)
+    async def test_process_channel_dir_threaded(self):
+        """
+        Test that a channel directory is loaded by a separate write for every blob
+        """
+        self.mds.ChannelMetadata._CHUNK_SIZE_LIMIT = 500
+        with db_session:
+            channel = self.mds.ChannelMetadata.create_channel('testchan')
+            md_list = [
+                self.mds.TorrentMetadata(
+                    origin_id=channel.id_, title='test' + str(x), status=NEW, infohash=random_infohash()
+                )
+                for x in range(0, 10)
+            ]
+            channel.commit_channel_torrent()
+            channel.local_version = 0
+            for md in md_list:
+                md.delete()
+            public_key, id_, timestamp = channel.public_key, channel.id_, channel.timestamp
+        channel_dir = self.mds.ChannelMetadata._channels_dir / channel.dirname
+        self.mds.process_channel_blob = Mock(wraps=self.mds.process_channel_blob)
+
+        await self.mds.process_channel_dir_threaded(
+            channel_dir, public_key, id_, skip_personal_metadata_payload=False
+        )
+
+        self.assertEqual(len(os.listdir(channel_dir)), self.mds.process_channel_blob.call_count)
+        self.assertGreater(self.mds.process_channel_blob.call_count, 1)
+        with db_session:
+            channel = self.mds.ChannelMetadata.get(public_key=public_key, id_=id_)
+            self.assertEqual(10, len(channel.contents))
+            self.assertEqual(timestamp, channel.local_version)
+
+    @timeout(10)
+    async def test_read_only_readers(self):
+        """
+        Test that the reads are run on the reader threads, which can not change the database
+        """
+
+        @db_session
+        def _write():
+            self.add_peer(b"1" * 64)
+
+        self.assertTrue((await self.mds.run_read(lambda: threading.current_thread().name)).startswith("DBReader"))
+        with self.assertRaises(Exception):
+            await self.mds.run_read(_write)
+        self.assertEqual(0, await self.mds.run_read(self.count_peers))
+
+    @timeout(10)
+    async def test_shutdown(self):
+        """
+        Test that no calls can be scheduled after the executor is shut down
+        """
+        await self.mds.run_write(self.add_peer, b"1" * 64)
+        self.mds.db_executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            await self.mds.run_read(self.count_peers)
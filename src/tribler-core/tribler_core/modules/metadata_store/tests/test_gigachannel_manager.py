@@ -382,3 +382,28 @@ class TestGigaChannelManager(TriblerCoreTest):
             self.mock_session.dlmgr.get_metainfo = mock_get_metainfo_good
             await self.chanman.download_channel(channel)
             self.assertTrue(self.initiated_download)
+
+    async def test_maintain_fts_index(self):
+        """
+        Test that the FTS index is optimized after bulk loads, merged otherwise, and left alone while
+        channels are being processed
+        """
+        # The maintenance runs on a separate thread, which would not see the in-memory database
+        mds = self.mock_session.mds
+        mds.optimize_fts_index = Mock()
+        mds.merge_fts_index = Mock()
+
+        self.chanman.processing = True
+        await self.chanman.maintain_fts_index()
+        self.chanman.processing = False
+        mds.optimize_fts_index.assert_not_called()
+        mds.merge_fts_index.assert_not_called()
+
+        mds.fts_optimize_pending = True
+        await self.chanman.maintain_fts_index()
+        mds.optimize_fts_index.assert_called_once()
+        mds.merge_fts_index.assert_not_called()
+
+        mds.fts_optimize_pending = False
+        await self.chanman.maintain_fts_index()
+        mds.merge_fts_index.assert_called_once()
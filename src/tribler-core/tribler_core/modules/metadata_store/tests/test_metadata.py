@@ -1,5 +1,8 @@
+import struct
+
 from ipv8.database import database_blob
 from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.messaging.serialization import default_serializer
 
 from pony import orm
 from pony.orm import db_session
@@ -8,12 +11,18 @@ from tribler_core.exceptions import InvalidChannelNodeException, InvalidSignatur
 from tribler_core.modules.metadata_store.serialization import (
     CHANNEL_NODE,
     ChannelNodePayload,
+    DeletedMetadataPayload,
     KeysMismatchException,
     NULL_KEY,
     NULL_SIG,
+    TorrentMetadataPayload,
+    iter_signed_blob,
+    split_signed_blob,
+    unpack_with_layout,
 )
 from tribler_core.modules.metadata_store.store import MetadataStore
 from tribler_core.tests.tools.base_test import TriblerCoreTest
+from tribler_core.utilities.random_utils import random_infohash
 from tribler_core.utilities.unicode import hexlify
 
 
@@ -147,3 +156,48 @@ class TestMetadata(TriblerCoreTest):
         orm.flush()
         metadata_payload = ChannelNodePayload(**metadata_dict)
         self.assertTrue(self.mds.ChannelNode.from_payload(metadata_payload))
+
+    @db_session
+    def test_unpack_with_layout(self):
+        """
+        Test that the precompiled layouts unpack the payloads in the same way as the generic serializer
+        """
+        channel = self.mds.ChannelMetadata.create_channel('test', 'test')
+        entries = [
+            channel,
+            self.mds.TorrentMetadata(title='test torrent', tags='video', infohash=random_infohash()),
+            self.mds.CollectionNode(title='test collection'),
+        ]
+        for md in entries:
+            serialized = md.serialized()
+            self.assertEqual(
+                default_serializer.unpack_multiple(md._payload_class.format_list, serialized)[0],
+                unpack_with_layout(md._payload_class.layout, serialized)[0],
+            )
+            payload = md._payload_class.from_signed_blob(serialized)
+            self.assertIsInstance(payload.signed_data, memoryview)
+            self.assertEqual(serialized, payload.serialized())
+
+        serialized_delete = channel.serialized_delete()
+        payload = DeletedMetadataPayload.from_signed_blob(serialized_delete)
+        self.assertEqual(channel.signature, payload.delete_signature)
+        self.assertEqual(serialized_delete, payload.serialized())
+
+        # Truncated variable-length fields should not be silently accepted
+        self.assertRaises(struct.error, TorrentMetadataPayload.from_signed_blob, entries[1].serialized()[:-80])
+
+    @db_session
+    def test_iter_signed_blob(self):
+        """
+        Test that a blob fed in small parts is split into the same payloads as the whole blob
+        """
+        entries = [self.mds.TorrentMetadata(title='test %i' % i, infohash=random_infohash()) for i in range(5)]
+        blob = b''.join(md.serialized() for md in entries)
+        for part_size in (1, 7, 100, len(blob)):
+            parts = (blob[start : start + part_size] for start in range(0, len(blob), part_size))
+            self.assertListEqual(
+                [p.serialized() for p in split_signed_blob(blob)], [p.serialized() for p in iter_signed_blob(parts)]
+            )
+
+        # Truncated blobs should not be silently accepted
+        self.assertRaises(struct.error, list, iter_signed_blob([blob[:-120]]))
@@ -0,0 +1,112 @@
+from unittest.mock import Mock
+
+from ipv8.keyvault.crypto import default_eccrypto
+
+from pony.orm import db_session
+
+from tribler_common.simpledefs import NTFY
+
+from tribler_core.modules.metadata_store.name_cache import DownloadNameCache
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, REGULAR_TORRENT
+from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.notifier import Notifier
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+from tribler_core.utilities.random_utils import random_infohash
+from tribler_core.utilities.unicode import hexlify
+
+
+class TestDownloadNameCache(TriblerCoreTest):
+    async def setUp(self):
+        await super(TestDownloadNameCache, self).setUp()
+        # The threads of the executor would not see an in-memory database
+        self.mds = MetadataStore(
+            self.session_base_dir / 'test.db', self.session_base_dir, default_eccrypto.generate_key(u"curve25519")
+        )
+        self.notifier = Notifier()
+        self.cache = DownloadNameCache(self.mds, self.notifier, max_size=3, ttl=100)
+
+    async def tearDown(self):
+        self.cache.shutdown()
+        self.mds.shutdown()
+        await super(TestDownloadNameCache, self).tearDown()
+
+    @db_session
+    def add_torrent(self, title):
+        return bytes(self.mds.TorrentMetadata(title=title, infohash=random_infohash()).infohash)
+
+    async def test_get_names_bulk(self):
+        """
+        Test that the names of torrents are taken from the metadata store, or from the download otherwise
+        """
+        infohash1 = self.add_torrent("title 1")
+        infohash2 = self.add_torrent("title 2")
+        infohash3 = random_infohash()
+        names = await self.cache.get_names(
+            [(infohash1, "dl 1", False), (infohash2, "dl 2", False), (infohash3, "dl 3", False)]
+        )
+        self.assertDictEqual(names, {infohash1: "title 1", infohash2: "title 2", infohash3: "dl 3"})
+        self.assertEqual(len(self.cache), 3)
+
+    async def test_get_names_cached(self):
+        """
+        Test that cached names are not looked up again until they expire
+        """
+        infohash = self.add_torrent("title")
+        lookup_names = self.cache._lookup_names
+        self.cache._lookup_names = Mock(side_effect=lookup_names)
+        for now in (0, 50):
+            self.assertDictEqual(await self.cache.get_names([(infohash, "dl", False)], now=now), {infohash: "title"})
+        self.assertEqual(self.cache._lookup_names.call_count, 1)
+        await self.cache.get_names([(infohash, "dl", False)], now=150)
+        self.assertEqual(self.cache._lookup_names.call_count, 2)
+
+    async def test_bounded(self):
+        """
+        Test that the cache evicts the least recently used names
+        """
+        infohashes = [random_infohash() for _ in range(4)]
+        await self.cache.get_names([(infohash, "dl", False) for infohash in infohashes[:3]], now=0)
+        await self.cache.get_names([(infohashes[0], "dl", False)], now=1)
+        await self.cache.get_names([(infohashes[3], "dl", False)], now=2)
+        self.assertEqual(len(self.cache), 3)
+        self.assertNotIn(infohashes[1], self.cache._entries)
+        self.assertIn(infohashes[0], self.cache._entries)
+
+    async def test_invalidate_on_update(self):
+        """
+        Test that the name of a torrent is looked up again when the notifier reports an update of its metadata
+        """
+        infohash = self.add_torrent("title")
+        await self.cache.get_names([(infohash, "dl", False)])
+        self.notifier.notify(NTFY.CHANNEL_ENTITY_UPDATED, {"infohash": hexlify(infohash), "num_seeders": 3})
+        self.assertEqual(len(self.cache), 1)
+        self.notifier.notify(
+            NTFY.CHANNEL_ENTITY_UPDATED, {"type": REGULAR_TORRENT, "infohash": hexlify(infohash), "name": "title"}
+        )
+        self.assertEqual(len(self.cache), 0)
+
+    async def test_shutdown(self):
+        """
+        Test that the cache stops following the notifier when it is shut down
+        """
+        infohash = self.add_torrent("title")
+        await self.cache.get_names([(infohash, "dl", False)])
+        self.cache.shutdown()
+        self.assertListEqual([], self.notifier.observers[NTFY.CHANNEL_ENTITY_UPDATED])
+        self.assertEqual(len(self.cache), 0)
+
+    async def test_channel_names(self):
+        """
+        Test that the downloads of channels are shown with the title of the channel, and invalidated together
+        """
+        with db_session:
+            channel = self.mds.ChannelMetadata.create_channel("channel title")
+            channel.infohash = random_infohash()
+            infohash, dirname = bytes(channel.infohash), channel.dirname
+        names = await self.cache.get_names([(infohash, dirname, True)])
+        self.assertEqual(names[infohash], "channel title")
+
+        self.notifier.notify(
+            NTFY.CHANNEL_ENTITY_UPDATED, {"type": CHANNEL_TORRENT, "infohash": hexlify(random_infohash()), "name": "c"}
+        )
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,37 @@
+from tribler_core.modules.metadata_store.query_cache import QueryResultsCache
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+
+
+class TestQueryResultsCache(TriblerCoreTest):
+    def test_generation(self):
+        """
+        Test that the cached results are only returned for the generation they were stored with
+        """
+        cache = QueryResultsCache()
+        cache.put("query", 1, [1, 2, 3])
+        self.assertListEqual([1, 2, 3], cache.get("query", 1))
+        self.assertIsNone(cache.get("query", 2))
+        self.assertIsNone(cache.get("other query", 1))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+        self.assertAlmostEqual(1.0 / 3, cache.hit_rate)
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used entries are evicted when the cache is full
+        """
+        cache = QueryResultsCache(max_entries=2, max_rows=5)
+        cache.put("a", 1, [1])
+        cache.put("b", 1, [2])
+        cache.get("a", 1)
+        cache.put("c", 1, [3])
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+
+        # Entries are also evicted when there are too many rows in total
+        cache.put("d", 1, [4, 5, 6, 7, 8])
+        self.assertIsNone(cache.get("a", 1))
+        self.assertIsNone(cache.get("c", 1))
+        self.assertDictEqual(
+            {"entries": 1, "rows": 5, "hits": 2, "misses": 3, "evictions": 3, "hit_rate": 0.4}, cache.get_stats()
+        )
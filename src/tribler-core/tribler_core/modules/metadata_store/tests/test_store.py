@@ -3,13 +3,17 @@ import random
 import string
 from binascii import unhexlify
 from datetime import datetime
+from unittest.mock import patch
 
 from ipv8.database import database_blob
 from ipv8.keyvault.crypto import default_eccrypto
 from ipv8.keyvault.private.libnaclkey import LibNaCLSK
 
+import lz4.frame
+
 from pony.orm import db_session, flush
 
+from tribler_core.exceptions import InvalidSignatureException
 from tribler_core.modules.metadata_store.discrete_clock import clock
 from tribler_core.modules.metadata_store.orm_bindings.channel_metadata import CHANNEL_DIR_NAME_LENGTH, entries_to_chunk
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import NEW
@@ -18,9 +22,11 @@ from tribler_core.modules.metadata_store.serialization import (
     DeletedMetadataPayload,
     SignedPayload,
     UnknownBlobTypeException,
+    split_signed_blob,
 )
 from tribler_core.modules.metadata_store.store import (
     DELETED_METADATA,
+    FTS_BULK_LOAD_WATERMARK,
     GOT_NEWER_VERSION,
     MetadataStore,
     NO_ACTION,
@@ -160,6 +166,100 @@ class TestMetadataStore(TriblerCoreTest):
             ],
         )
 
+    def test_verify_mdblob_with_process_pool(self):
+        """
+        Test that big blobs get their signatures checked in batches by the worker processes
+        """
+        self.mds.verification_pool_threshold = 2
+        self.mds.verification_batch_size = 3
+        self.mds.verification_workers = 2
+        with db_session:
+            md_list = [
+                self.mds.TorrentMetadata(title='test' + str(x), infohash=database_blob(random_infohash()))
+                for x in range(0, 10)
+            ]
+            chunk, _ = entries_to_chunk(md_list, chunk_size=self.mds.ChannelMetadata._CHUNK_SIZE_LIMIT)
+            signatures = [md.signature for md in md_list]
+            for md in md_list:
+                md.delete()
+
+        payload_list = self.mds.verify_compressed_mdblob(chunk)
+        self.assertListEqual(signatures, [payload.signature for payload in payload_list])
+        self.assertTrue(all(payload.signature_checked for payload in payload_list))
+
+        with db_session:
+            results = self.mds.process_payload_list(payload_list, skip_personal_metadata_payload=False)
+            self.assertListEqual([UNKNOWN_TORRENT] * 10, [action for _, action in results])
+
+    @db_session
+    def test_verify_mdblob_wrong_signature(self):
+        """
+        Test that a blob is rejected entirely if any of its payloads has a wrong signature
+        """
+        md_list = [
+            self.mds.TorrentMetadata(title='test' + str(x), infohash=database_blob(random_infohash()))
+            for x in range(0, 3)
+        ]
+        blob = b''.join(md.serialized() for md in md_list)
+        broken_blob = blob[:-5] + b"\xee" * 5
+        for md in md_list:
+            md.delete()
+
+        self.assertRaises(InvalidSignatureException, self.mds.process_squashed_mdblob, broken_blob)
+        self.mds.verification_pool_threshold = 1
+        self.assertRaises(InvalidSignatureException, self.mds.verify_squashed_mdblob, broken_blob)
+        self.assertEqual(0, self.mds.TorrentMetadata.select().count())
+
+    def test_process_mdblob_file_streaming(self):
+        """
+        Test that mdblob files are processed part by part, and the signatures are not checked ahead of time
+        """
+        with db_session:
+            md_list = [
+                self.mds.TorrentMetadata(title='test' + str(x), infohash=database_blob(random_infohash()))
+                for x in range(0, 20)
+            ]
+            chunk, _ = entries_to_chunk(md_list, chunk_size=self.mds.ChannelMetadata._CHUNK_SIZE_LIMIT)
+            for md in md_list:
+                md.delete()
+        filepath = self.session_base_dir / "1.mdblob.lz4"
+        with open(filepath, "wb") as f:
+            f.write(chunk)
+
+        with patch("tribler_core.modules.metadata_store.store.MDBLOB_READ_CHUNK_SIZE", 10):
+            results = self.mds.process_mdblob_file(filepath, skip_personal_metadata_payload=False)
+            self.assertListEqual([UNKNOWN_TORRENT] * 20, [action for _, action in results])
+            self.assertIsNone(self.mds.process_mdblob_file(filepath, collect_results=False))
+
+        # The verification reads at most two batches per worker ahead of the ones it yields
+        self.mds.verification_batch_size = 2
+        self.mds.verification_workers = 1
+        consumed = []
+        blob = lz4.frame.decompress(chunk)
+        payloads = self.mds.verify_payload_stream(consumed.append(p) or p for p in split_signed_blob(blob))
+        self.assertEqual(1, len([next(payloads)]))
+        self.assertLessEqual(len(consumed), 3 * self.mds.verification_batch_size)
+
+    def test_process_corrupted_mdblob_file(self):
+        """
+        Test that the rest of a multi-block mdblob file is not parsed once its compressed data turns out corrupted
+        """
+        with db_session:
+            md_list = [
+                self.mds.TorrentMetadata(title='test' + str(x), infohash=database_blob(random_infohash()))
+                for x in range(0, 3000)
+            ]
+            blob = b''.join(md.serialized() for md in md_list)
+            for md in md_list:
+                md.delete()
+        chunk = lz4.frame.compress(blob, block_size=lz4.frame.BLOCKSIZE_MAX64KB)
+
+        for data in (chunk[: len(chunk) * 3 // 4], chunk[: len(chunk) * 3 // 4] + b'\xff' * (len(chunk) // 4)):
+            filepath = self.session_base_dir / "1.mdblob.lz4"
+            with open(filepath, "wb") as f:
+                f.write(data)
+            self.assertListEqual([], self.mds.process_mdblob_file(filepath, skip_personal_metadata_payload=False))
+
     @db_session
     def test_multiple_squashed_commit_and_read(self):
         """
@@ -243,6 +343,62 @@ class TestMetadataStore(TriblerCoreTest):
         self.assertEqual(channel.timestamp, 1565621688015)
         self.assertEqual(channel.local_version, channel.timestamp)
 
+    def test_process_channel_dir_fts_index(self):
+        """
+        Test that the entries loaded from a channel directory are added to the FTS index in bulk
+        """
+        with db_session:
+            payload = ChannelMetadataPayload.from_file(CHANNEL_METADATA)
+            channel = self.mds.process_payload(payload)[0][0]
+            public_key, id_ = channel.public_key, channel.id_
+        self.mds.process_channel_dir(CHANNEL_DIR, public_key, id_)
+
+        with db_session:
+            channel = self.mds.ChannelMetadata.get(public_key=public_key, id_=id_)
+            for entry in channel.contents:
+                self.assertIn(entry, self.mds.MetadataNode.search_keyword('"%s"' % entry.title)[:])
+            self.assertFalse(self.mds.MiscData.get(name=FTS_BULK_LOAD_WATERMARK))
+            triggers = self.mds._db.select("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'fts%'")
+            self.assertEqual({"fts_ai", "fts_ad", "fts_au"}, set(triggers))
+        self.assertTrue(self.mds.fts_optimize_pending)
+
+    def test_fts_bulk_load(self):
+        """
+        Test that the entries inserted during a bulk load are indexed only when the bulk load is finished
+        """
+        with self.mds.fts_bulk_load():
+            with self.mds.fts_bulk_load():
+                with db_session:
+                    self.mds.TorrentMetadata(title="bulk loaded", infohash=random_infohash())
+            with db_session:
+                self.assertFalse(self.mds.TorrentMetadata.search_keyword("bulk")[:])
+        with db_session:
+            self.assertEqual(1, self.mds.TorrentMetadata.search_keyword("bulk").count())
+            self.mds.TorrentMetadata(title="regular", infohash=random_infohash())
+            flush()
+            self.assertEqual(1, self.mds.TorrentMetadata.search_keyword("regular").count())
+
+        self.assertTrue(self.mds.merge_fts_index() in (True, False))
+        self.mds.optimize_fts_index()
+        self.assertFalse(self.mds.fts_optimize_pending)
+
+    def test_finish_interrupted_fts_bulk_load(self):
+        """
+        Test that the FTS index update of an interrupted bulk load is finished on the next start
+        """
+        db_path = self.session_base_dir / "test.db"
+        mds = MetadataStore(db_path, self.session_base_dir, TEST_PERSONAL_KEY)
+        mds._start_fts_bulk_load()
+        with db_session:
+            mds.TorrentMetadata(title="interrupted", infohash=random_infohash())
+        mds.shutdown()
+
+        mds = MetadataStore(db_path, self.session_base_dir, TEST_PERSONAL_KEY)
+        with db_session:
+            self.assertEqual(1, mds.TorrentMetadata.search_keyword("interrupted").count())
+            self.assertFalse(mds.MiscData.get(name=FTS_BULK_LOAD_WATERMARK))
+        mds.shutdown()
+
     @db_session
     def test_process_payload(self):
         def get_payloads(entity_class):
@@ -278,6 +434,37 @@ class TestMetadataStore(TriblerCoreTest):
         self.assertEqual(UNKNOWN_CHANNEL, result[0][1])
         self.assertEqual(node_dict['metadata_type'], result[0][0].to_dict()['metadata_type'])
 
+    @db_session
+    def test_process_payloads_batch(self):
+        """
+        Test that processing a batch of interdependent payloads gives the same results as processing them one by one
+        """
+        torrent = self.mds.TorrentMetadata(title='torrent', infohash=database_blob(random_infohash()))
+        torrent_v1 = torrent._payload_class.from_signed_blob(torrent.serialized())
+        torrent_v2 = torrent._payload_class(
+            **dict(torrent_v1.to_dict(), title="renamed torrent", timestamp=torrent_v1.timestamp + 1),
+            key=TEST_PERSONAL_KEY,
+        )
+
+        deleted = self.mds.TorrentMetadata(title='deleted torrent', infohash=database_blob(random_infohash()))
+        deleted_payload = deleted._payload_class.from_signed_blob(deleted.serialized())
+        delete_command = DeletedMetadataPayload.from_signed_blob(deleted.serialized_delete())
+
+        torrent.delete()
+        deleted.delete()
+        flush()
+
+        results = self.mds.process_payloads_batch(
+            [torrent_v1, torrent_v2, deleted_payload, delete_command, torrent_v1], skip_personal_metadata_payload=False
+        )
+        self.assertListEqual(
+            # The newer version of the torrent replaces the older entry with the same infohash
+            [UNKNOWN_TORRENT, DELETED_METADATA, UNKNOWN_TORRENT, UNKNOWN_TORRENT, DELETED_METADATA, GOT_NEWER_VERSION],
+            [action for _, action in results],
+        )
+        self.assertEqual(1, self.mds.TorrentMetadata.select().count())
+        self.assertEqual("renamed torrent", self.mds.TorrentMetadata.get(id_=torrent_v1.id_).title)
+
     @db_session
     def test_process_payload_ffa(self):
         infohash = b"1" * 20
@@ -5,13 +5,14 @@ from ipv8.database import database_blob
 from ipv8.keyvault.crypto import default_eccrypto
 
 from pony import orm
-from pony.orm import db_session
+from pony.orm import db_session, rollback
 
 from tribler_core.modules.libtorrent.torrentdef import TorrentDef
 from tribler_core.modules.metadata_store.discrete_clock import clock
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import TODELETE
+from tribler_core.modules.metadata_store.orm_bindings.metadata_node import encode_cursor
 from tribler_core.modules.metadata_store.orm_bindings.torrent_metadata import tdef_to_metadata_dict
-from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, REGULAR_TORRENT
+from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler_core.modules.metadata_store.store import MetadataStore
 from tribler_core.tests.tools.base_test import TriblerCoreTest
 from tribler_core.tests.tools.common import TORRENT_UBUNTU_FILE
@@ -268,6 +269,174 @@ class TestTorrentMetadata(TriblerCoreTest):
         torrents = self.mds.TorrentMetadata.get_entries(first=1, last=10, **args)
         self.assertListEqual(list(torrents), [entry])
 
+    def test_get_entries_cached(self):
+        """
+        Test that the pages and the counts of a query come from the cache until a change of the database is committed
+        """
+        with db_session:
+            for ind in range(5):
+                self.mds.TorrentMetadata(title='torrent%d' % ind, infohash=random_infohash(), size=ind)
+        cache = self.mds.TorrentMetadata.query_cache
+        args = dict(txt_filter='torrent*', sort_by='size', sort_desc=True)
+
+        def get_titles(**kwargs):
+            with db_session:
+                return [torrent.title for torrent in self.mds.TorrentMetadata.get_entries(**kwargs)]
+
+        self.assertListEqual(['torrent4', 'torrent3', 'torrent2'], get_titles(first=1, last=3, **args))
+        self.assertEqual(0, cache.hits)
+        self.assertListEqual(['torrent1', 'torrent0'], get_titles(first=4, last=10, **args))
+        self.assertEqual(5, self.mds.TorrentMetadata.get_total_count(**args))
+        # Equivalent arguments are normalized to the same cache entry
+        self.assertEqual(5, self.mds.TorrentMetadata.get_entries_count(txt_filter=' torrent* ', sort_by='size'))
+        self.assertEqual(3, cache.hits)
+
+        # The transaction that changed the database does not use the cache, and its results are not cached
+        with db_session:
+            self.mds.TorrentMetadata(title='torrent5', infohash=random_infohash(), size=5)
+            self.assertEqual('torrent5', self.mds.TorrentMetadata.get_entries(first=1, last=1, **args)[0].title)
+            rollback()
+        self.assertListEqual(['torrent4'], get_titles(first=1, last=1, **args))
+        self.assertEqual(4, cache.hits)
+
+        # Committing a change invalidates the cached results
+        with db_session:
+            self.mds.TorrentMetadata(title='torrent5', infohash=random_infohash(), size=5)
+        self.assertListEqual(['torrent5'], get_titles(first=1, last=1, **args))
+        self.assertEqual(4, cache.hits)
+
+        # The results sorted by health are invalidated by health updates too, but the other results are not
+        health_args = dict(txt_filter='torrent*', sort_by='HEALTH')
+        self.assertEqual(6, len(get_titles(**health_args)))
+        with db_session:
+            self.mds.TorrentMetadata.get(title='torrent2').health.seeders = 100
+        self.assertEqual('torrent2', get_titles(**health_args)[0])
+        self.assertEqual(4, cache.hits)
+        self.assertEqual(6, self.mds.TorrentMetadata.get_total_count(**args))
+        self.assertEqual(5, cache.hits)
+
+    @db_session
+    def test_get_entries_cursor(self):
+        """
+        Test that paging through the results with cursors gives the same results as paging with offsets
+        """
+        for ind in range(10):
+            torrent = self.mds.TorrentMetadata(
+                title='torrent%d' % (ind % 4),
+                infohash=random_infohash(),
+                size=ind % 3,
+                torrent_date=datetime(2000 + ind % 5, 1, 1),
+            )
+            torrent.health.seeders = ind % 2
+
+        for sort_by, sort_desc in (
+            (None, False),
+            ('title', False),
+            ('size', True),
+            ('HEALTH', True),
+            ('torrent_date', True),
+            ('torrent_date', False),
+        ):
+            args = dict(sort_by=sort_by, sort_desc=sort_desc)
+            expected = self.mds.TorrentMetadata.get_entries(first=1, last=10, **args)
+            results, cursor = [], None
+            while len(results) < len(expected):
+                page = self.mds.TorrentMetadata.get_entries(first=1, last=3, cursor=cursor, **args)
+                results.extend(page)
+                cursor = self.mds.TorrentMetadata.get_cursor(page[-1], sort_by)
+            self.assertListEqual(expected, results)
+            self.assertFalse(self.mds.TorrentMetadata.get_entries(first=1, last=3, cursor=cursor, **args))
+
+        self.assertRaises(ValueError, self.mds.TorrentMetadata.get_entries, cursor='garbage', sort_by='title')
+
+    @db_session
+    def test_get_entries_cursor_null_keys(self):
+        """
+        Test that paging with cursors includes the entries that have no value for the sort keys, e.g. collections
+        """
+        channel = self.mds.ChannelMetadata.create_channel("my channel")
+        for ind in range(6):
+            self.mds.TorrentMetadata(
+                title='torrent%d' % ind,
+                infohash=random_infohash(),
+                origin_id=channel.id_,
+                size=ind % 3,
+                torrent_date=datetime(2000 + ind % 2, 1, 1),
+            )
+        for ind in range(4):
+            self.mds.CollectionNode(title='collection%d' % ind, origin_id=channel.id_)
+
+        # The listings sorted by health only hold the entries that have a health, so they are not tested here
+        for sort_by in (None, 'title', 'size', 'torrent_date'):
+            for sort_desc in (False, True):
+                args = dict(origin_id=channel.id_, sort_by=sort_by, sort_desc=sort_desc)
+                expected = self.mds.MetadataNode.get_entries(first=1, last=20, **args)
+                self.assertEqual(len(expected), 10)
+                results, cursor = [], None
+                for _ in range(5):
+                    page = self.mds.MetadataNode.get_entries(first=1, last=3, cursor=cursor, **args)
+                    results.extend(page)
+                    if not page:
+                        break
+                    cursor = self.mds.MetadataNode.get_cursor(page[-1], sort_by)
+                self.assertListEqual(expected, results, (sort_by, sort_desc))
+
+    @db_session
+    def test_parse_cursor(self):
+        """
+        Test that only the cursors with values of the right types for the sort order are accepted
+        """
+        self.assertEqual(self.mds.MetadataNode.parse_cursor(encode_cursor([None, 3]), 'torrent_date'), [None, 3])
+        self.assertEqual(
+            self.mds.MetadataNode.parse_cursor(encode_cursor([datetime(2000, 1, 1), 3]), 'torrent_date'),
+            [datetime(2000, 1, 1), 3],
+        )
+        for values in ([[1], 3], [1, 3], [datetime(2000, 1, 1), None], [datetime(2000, 1, 1)], [{"a": 1}, 3]):
+            self.assertRaises(ValueError, self.mds.MetadataNode.parse_cursor, encode_cursor(values), 'torrent_date')
+        self.assertRaises(ValueError, self.mds.MetadataNode.parse_cursor, encode_cursor([True, 3]), 'size')
+        self.assertEqual(self.mds.MetadataNode.parse_cursor(encode_cursor([5, 1, 3]), 'size'), [5, 1, 3])
+
+        # Binary values can not be compared in queries, so the results sorted by infohash are paged with offsets
+        torrent = self.mds.TorrentMetadata(title='torrent', infohash=random_infohash())
+        self.assertIsNone(self.mds.TorrentMetadata.get_cursor(torrent, 'infohash'))
+        self.assertRaises(ValueError, self.mds.MetadataNode.parse_cursor, encode_cursor(['aa', 3]), 'infohash')
+
+    @db_session
+    def test_get_simple_dicts(self):
+        """
+        Test that the entries serialized in bulk are the same as the ones serialized one by one
+        """
+        channel = self.mds.ChannelMetadata.create_channel("my channel")
+        collection = self.mds.CollectionNode(title="collection", origin_id=channel.id_)
+        torrent = self.mds.TorrentMetadata(
+            title="torrent", infohash=random_infohash(), origin_id=channel.id_, torrent_date=datetime(2010, 5, 6, 7)
+        )
+        torrent.health.seeders, torrent.health.leechers, torrent.health.last_check = 10, 20, 30
+        torrent.health.trackers.add(self.mds.TrackerState(url="http://tracker.org/announce"))
+        self.mds.TorrentMetadata(title="other torrent", infohash=random_infohash(), origin_id=collection.id_)
+        key = default_eccrypto.generate_key(u"curve25519")
+        self.mds.ChannelMetadata(title="other channel", infohash=random_infohash(), sign_with=key, local_version=3)
+        orm.flush()
+
+        entries = self.mds.MetadataNode.get_entries(sort_by="title")
+        rowids = [entry.rowid for entry in entries]
+        for include_trackers in (False, True):
+            self.assertListEqual(
+                [entry.to_simple_dict(include_trackers=include_trackers) if isinstance(entry, self.mds.TorrentMetadata)
+                 else entry.to_simple_dict() for entry in entries],
+                self.mds.MetadataNode.get_simple_dicts(rowids, include_trackers=include_trackers),
+            )
+        table = self.mds.MetadataNode.get_simple_table(rowids, include_trackers=True)
+        self.assertSetEqual(set(table["keys"]), {str(COLLECTION_NODE), str(CHANNEL_TORRENT), str(REGULAR_TORRENT)})
+        self.assertListEqual(
+            [dict(zip(table["keys"][str(row[0])], row)) for row in table["rows"]],
+            self.mds.MetadataNode.get_simple_dicts(rowids, include_trackers=True),
+        )
+
+        dicts, page = self.mds.TorrentMetadata.get_entries_simple_dicts(first=1, last=2, sort_by="title")
+        self.assertListEqual(page, rowids[:2])
+        self.assertListEqual([simple_dict["name"] for simple_dict in dicts], ["torrent", "other torrent"])
+
     @db_session
     def test_metadata_conflicting(self):
         tdict = dict(rnd_torrent(), title="lakes sheep", tags="video", infohash=b'\x00\xff')
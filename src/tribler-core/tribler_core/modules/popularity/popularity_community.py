@@ -1,17 +1,19 @@
 import random
-from asyncio import get_event_loop
 from binascii import unhexlify
 
 from ipv8.community import Community
+from ipv8.database import database_blob
 from ipv8.lazy_community import lazy_wrapper
 from ipv8.peer import Peer
 
 from pony.orm import db_session
 
+from tribler_core.modules.metadata_store.store import in_chunks
 from tribler_core.modules.popularity.payload import TorrentsHealthPayload
 from tribler_core.utilities.unicode import hexlify
 
 PUBLISH_INTERVAL = 5
+HEALTH_FLUSH_WINDOW = 2  # How long the received health info is collected before it is stored, in seconds
 
 
 class PopularityCommunity(Community):
@@ -31,6 +33,13 @@ class PopularityCommunity(Community):
 
         self.add_message_handler(TorrentsHealthPayload, self.on_torrents_health)
 
+        # The health info received from all peers is collected, and stored in a single transaction
+        self._health_buffer = {}
+        self._health_flush_scheduled = False
+        self.num_health_updates_received = 0
+        self.num_health_updates_coalesced = 0
+        self.num_health_updates_applied = 0
+
         self.logger.info('Popularity Community initialized (peer mid %s)', hexlify(self.my_peer.mid))
         self.register_task("publish", self.gossip_torrents_health, interval=PUBLISH_INTERVAL)
 
@@ -42,33 +51,76 @@ class PopularityCommunity(Community):
         if not self.get_peers() or not self.torrent_checker:
             return
 
-        num_torrents_checked = len(self.torrent_checker.torrents_checked)
-        random_torrents_checked = random.sample(self.torrent_checker.torrents_checked, min(num_torrents_checked, 5))
-        popular_torrents_checked = sorted(self.torrent_checker.torrents_checked - set(random_torrents_checked),
-                                          key=lambda tup: tup[1], reverse=True)[:5]
+        random_torrents_checked = self.torrent_checker.torrents_checked.get_random(5)
+        popular_torrents_checked = self.torrent_checker.torrents_checked.get_popular(5, exclude=random_torrents_checked)
 
         random_peer = random.choice(self.get_peers())
 
         self.ez_send(random_peer, TorrentsHealthPayload.create(random_torrents_checked, popular_torrents_checked))
 
     @lazy_wrapper(TorrentsHealthPayload)
-    async def on_torrents_health(self, _, payload):
+    def on_torrents_health(self, _, payload):
         self.logger.info("Received torrent health information for %d random torrents and %d checked torrents",
                          len(payload.random_torrents), len(payload.torrents_checked))
-        all_torrents = payload.random_torrents + payload.torrents_checked
-
-        def _put_health_entries_in_db():
-            with db_session:
-                for infohash, seeders, leechers, last_check in all_torrents:
-                    torrent_state = self.metadata_store.TorrentState.get(infohash=infohash)
-                    if torrent_state and last_check > torrent_state.last_check:
-                        # Replace current information
-                        torrent_state.seeders = seeders
-                        torrent_state.leechers = leechers
-                        torrent_state.last_check = last_check
-                    elif not torrent_state:
-                        _ = self.metadata_store.TorrentState(infohash=infohash, seeders=seeders,
-                                                             leechers=leechers, last_check=last_check)
-
-            self.metadata_store.disconnect_thread()
-        await get_event_loop().run_in_executor(None, _put_health_entries_in_db)
+
+        # Only the newest health info of every torrent is kept
+        for infohash, seeders, leechers, last_check in payload.random_torrents + payload.torrents_checked:
+            self.num_health_updates_received += 1
+            buffered = self._health_buffer.get(infohash)
+            if buffered is not None:
+                self.num_health_updates_coalesced += 1
+                if buffered[2] >= last_check:
+                    continue
+            self._health_buffer[infohash] = (seeders, leechers, last_check)
+
+        if self._health_buffer and not self._health_flush_scheduled:
+            self._health_flush_scheduled = True
+            self.register_anonymous_task("flush_health", self.flush_health_updates, delay=HEALTH_FLUSH_WINDOW)
+
+    async def flush_health_updates(self):
+        """
+        Store the collected health info.
+        """
+        updates, self._health_buffer = self._health_buffer, {}
+        self._health_flush_scheduled = False
+        if updates:
+            self.num_health_updates_applied += await self.metadata_store.run_write(self._apply_health_updates, updates)
+
+    def _apply_health_updates(self, updates):
+        """
+        Store health info that is newer than the health info in the database. The torrent states are looked up
+        all at once.
+        :param updates: a dictionary of infohash -> (seeders, leechers, last_check)
+        :return: the number of torrent states that were added or updated
+        """
+        torrent_states = {}
+        for chunk in in_chunks([database_blob(infohash) for infohash in updates]):
+            torrent_states.update((bytes(torrent_state.infohash), torrent_state) for torrent_state
+                                  in self.metadata_store.TorrentState.select(lambda g: g.infohash in chunk))
+
+        num_applied = 0
+        for infohash, (seeders, leechers, last_check) in updates.items():
+            torrent_state = torrent_states.get(infohash)
+            if torrent_state and last_check > torrent_state.last_check:
+                # Replace current information
+                torrent_state.seeders = seeders
+                torrent_state.leechers = leechers
+                torrent_state.last_check = last_check
+            elif not torrent_state:
+                self.metadata_store.TorrentState(infohash=infohash, seeders=seeders, leechers=leechers,
+                                                 last_check=last_check)
+            else:
+                continue
+            num_applied += 1
+        return num_applied
+
+    def get_health_update_statistics(self):
+        """
+        Return the number of received health entries, the number of entries that were coalesced with another entry
+        for the same torrent before they were stored, and the number of torrent states that were updated.
+        """
+        return {
+            "received": self.num_health_updates_received,
+            "coalesced": self.num_health_updates_coalesced,
+            "applied": self.num_health_updates_applied,
+        }
@@ -7,7 +7,9 @@ from ipv8.test.mocking.ipv8 import MockIPv8
 from pony.orm import db_session
 
 from tribler_core.modules.metadata_store.store import MetadataStore
+from tribler_core.modules.popularity.payload import TorrentsHealthPayload
 from tribler_core.modules.popularity.popularity_community import PopularityCommunity
+from tribler_core.modules.torrent_checker.torrents_checked_store import TorrentsCheckedStore
 from tribler_core.tests.tools.base_test import MockObject
 from tribler_core.utilities.path_util import Path
 
@@ -26,7 +28,7 @@ class TestPopularityCommunity(TestBase):
                             default_eccrypto.generate_key(u"curve25519"))
 
         torrent_checker = MockObject()
-        torrent_checker.torrents_checked = set()
+        torrent_checker.torrents_checked = TorrentsCheckedStore()
 
         return MockIPv8(u"curve25519", PopularityCommunity, metadata_store=mds, torrent_checker=torrent_checker)
 
@@ -48,6 +50,7 @@ class TestPopularityCommunity(TestBase):
         self.nodes[0].overlay.gossip_torrents_health()
 
         await self.deliver_messages()
+        await self.nodes[1].overlay.flush_health_updates()
 
         # Check whether node 1 has new torrent health information
         with db_session:
@@ -66,8 +69,29 @@ class TestPopularityCommunity(TestBase):
         self.nodes[0].overlay.gossip_torrents_health()
 
         await self.deliver_messages(timeout=0.5)
+        await self.nodes[1].overlay.flush_health_updates()
 
         # Check whether node 1 has new torrent health information
         with db_session:
             state = self.nodes[1].overlay.metadata_store.TorrentState.get(infohash=b'0' * 20)
             self.assertIsNot(state.last_check, 0)
+
+    async def test_torrents_health_coalesced(self):
+        """
+        Test whether the health information from several messages is stored at once, keeping the newest entries
+        """
+        self.fill_database(self.nodes[1].overlay.metadata_store)
+        await self.introduce_nodes()
+        overlay = self.nodes[1].overlay
+        now = int(time.time())
+        for last_check, seeders in ((now - 10, 100), (now, 200), (now - 20, 300)):
+            payload = TorrentsHealthPayload.create([(b'0' * 20, seeders, 0, last_check)], [(b'z' * 20, 1, 0, now)])
+            self.nodes[0].overlay.ez_send(self.nodes[0].overlay.get_peers()[0], payload)
+        await self.deliver_messages()
+
+        await overlay.flush_health_updates()
+
+        with db_session:
+            self.assertEqual(overlay.metadata_store.TorrentState.get(infohash=b'0' * 20).seeders, 200)
+            self.assertEqual(overlay.metadata_store.TorrentState.get(infohash=b'z' * 20).seeders, 1)
+        self.assertDictEqual(overlay.get_health_update_statistics(), {"received": 6, "coalesced": 4, "applied": 2})
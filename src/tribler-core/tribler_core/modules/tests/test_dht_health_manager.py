@@ -1,6 +1,9 @@
+import os
 from asyncio import Future
 from binascii import unhexlify
 
+from ipv8.dht.routing import distance
+
 from tribler_core.modules.dht_health_manager import DHTHealthManager
 from tribler_core.tests.tools.base_test import MockObject, TriblerCoreTest
 from tribler_core.tests.tools.tools import timeout
@@ -91,3 +94,19 @@ class TestDHTHealthManager(TriblerCoreTest):
                                                       bf_peers=bytearray(b'\xff' * 256))
         self.assertEqual(self.dht_health_manager.bf_seeders[infohash], bytearray(b'\xee' * 256))
         self.assertEqual(self.dht_health_manager.bf_peers[infohash], bytearray(b'\xff' * 256))
+
+    def test_closest_infohash(self):
+        """
+        Test whether the pending lookup that is the closest to a node ID is found
+        """
+        lookup_futures = self.dht_health_manager.lookup_futures
+        self.assertIsNone(lookup_futures.closest(b'a' * 20))
+
+        infohashes = [os.urandom(20) for _ in range(50)] + [b'\x00' * 20, b'\x03' + b'\x00' * 19]
+        for infohash in infohashes:
+            lookup_futures[infohash] = Future()
+        del lookup_futures[infohashes[0]]
+        lookup_futures.pop(infohashes[1])
+        for node_id in [os.urandom(20) for _ in range(50)] + [b'\x04' + b'\x00' * 19]:
+            expected = min(infohashes[2:], key=lambda infohash: distance(infohash, node_id))
+            self.assertEqual(lookup_futures.closest(node_id), expected)
@@ -0,0 +1,212 @@
+"""
+This module contains the scheduler that decides which torrents the torrent checker checks next.
+"""
+import heapq
+import math
+import time
+
+DHT = u"DHT"
+
+# Checks that are older than this, in seconds, do not make a torrent any more urgent
+MAX_STALENESS = 7 * 24 * 3600
+
+# How much more urgent a torrent is right after the user asked for its health, and how fast that wears off
+INTEREST_BOOST = 4
+INTEREST_HALF_LIFE = 3600
+
+# The requests per second to a tracker without failures. Every failure in a row halves the rate.
+TRACKER_REQUEST_RATE = 1 / 60
+TRACKER_REQUEST_BURST = 2
+
+# The DHT lookups per second for the torrents without a usable tracker
+DHT_REQUEST_RATE = 1 / 60
+DHT_REQUEST_BURST = 3
+
+# How often the queue is rebuilt from the database, in seconds
+REFILL_INTERVAL = 600
+
+# How many torrents at the top of the queue are considered for the next batch
+MAX_BATCH_LOOKAHEAD = 100
+
+
+class TokenBucket(object):
+    """
+    Token bucket that limits the rate of the requests, while allowing short bursts.
+    """
+
+    def __init__(self, rate, capacity, now=None):
+        """
+        :param rate: the number of tokens added per second
+        :param capacity: the maximum number of tokens in the bucket
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.timestamp = time.time() if now is None else now
+
+    def consume(self, tokens=1, now=None):
+        """
+        Take tokens from the bucket, if it has enough of them.
+        :return: whether the tokens were taken
+        """
+        now = time.time() if now is None else now
+        if now > self.timestamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class HealthCheckScheduler(object):
+    """
+    Priority queue of the torrents that are due for a health check.
+
+    The torrents are scored by how stale their health info is, how popular they are, whether the user recently
+    asked for them and how often their trackers failed. The checks are grouped by tracker, and a token bucket
+    per tracker limits how often it is contacted. The bucket of a failing tracker fills slower.
+
+    The queue is rebuilt from the database every few minutes, using the candidates given to load().
+    A candidate is an (infohash, last_check, seeders, leechers, trackers) tuple, where trackers is a tuple of
+    the (url, failures) tuples of the usable trackers of the torrent.
+    """
+
+    def __init__(self, min_check_interval, max_batch_size, refill_interval=REFILL_INTERVAL):
+        """
+        :param min_check_interval: the minimal time between two checks of a torrent, in seconds
+        :param max_batch_size: the maximum number of torrents checked with a single tracker request
+        :param refill_interval: how often the queue should be rebuilt from the database, in seconds
+        """
+        self.min_check_interval = min_check_interval
+        self.max_batch_size = max_batch_size
+        self.refill_interval = refill_interval
+
+        # Heap of (-score, infohash) tuples. The entries of torrents that were removed or scored again are skipped.
+        self._heap = []
+        # infohash -> (score, candidate) of the queued torrents
+        self._queued = {}
+        # tracker url -> set of the infohashes of the queued torrents that have the tracker
+        self._by_tracker = {}
+        self._buckets = {}
+        # infohash -> the last time the user asked for the health of the torrent
+        self._interest = {}
+        self._last_refill = None
+
+    def __len__(self):
+        return len(self._queued)
+
+    def score(self, candidate, now):
+        """
+        Get the priority of a torrent. A torrent that is not due for a check yet has priority 0.
+        """
+        infohash, last_check, seeders, leechers, trackers = candidate
+        staleness = min(now - last_check, MAX_STALENESS)
+        if staleness < self.min_check_interval:
+            return 0
+        popularity = math.log2(2 + seeders + leechers)
+        interest = 1
+        if infohash in self._interest:
+            interest += INTEREST_BOOST * 0.5 ** ((now - self._interest[infohash]) / INTEREST_HALF_LIFE)
+        failures = min((tracker_failures for _, tracker_failures in trackers), default=0)
+        return staleness / self.min_check_interval * popularity * interest / 2 ** failures
+
+    def needs_refill(self, now):
+        return not self._queued or self._last_refill is None or now - self._last_refill >= self.refill_interval
+
+    def get_interesting_infohashes(self):
+        """
+        Get the infohashes of the torrents the user recently asked for, which should be among the candidates.
+        """
+        return list(self._interest)
+
+    def add_interest(self, infohash, now=None):
+        """
+        Remember that the user asked for the health of a torrent, so it gets checked sooner in the future.
+        """
+        now = time.time() if now is None else now
+        self._interest[infohash] = now
+        if infohash in self._queued:
+            self._push(self._queued[infohash][1], now)
+
+    def load(self, candidates, now):
+        """
+        Rebuild the queue from a list of candidates.
+        """
+        # The interest in a torrent only lasts for a few half-lives
+        self._interest = {infohash: timestamp for infohash, timestamp in self._interest.items()
+                          if now - timestamp < 10 * INTEREST_HALF_LIFE}
+        self._heap = []
+        self._queued = {}
+        self._by_tracker = {}
+        for candidate in candidates:
+            self._push(candidate, now)
+        self._last_refill = now
+
+    def _push(self, candidate, now):
+        infohash = candidate[0]
+        score = self.score(candidate, now)
+        if not score:
+            self._remove(infohash)
+            return
+        self._queued[infohash] = (score, candidate)
+        heapq.heappush(self._heap, (-score, infohash))
+        for url, _ in candidate[4]:
+            self._by_tracker.setdefault(url, set()).add(infohash)
+
+    def _remove(self, infohash):
+        entry = self._queued.pop(infohash, None)
+        if entry is None:
+            return
+        for url, _ in entry[1][4]:
+            queued = self._by_tracker.get(url)
+            if queued is not None:
+                queued.discard(infohash)
+                if not queued:
+                    del self._by_tracker[url]
+
+    def _get_bucket(self, url, failures, now):
+        if url == DHT:
+            rate, capacity = DHT_REQUEST_RATE, DHT_REQUEST_BURST
+        else:
+            rate, capacity = TRACKER_REQUEST_RATE / 2 ** failures, TRACKER_REQUEST_BURST
+        bucket = self._buckets.get(url)
+        if bucket is None:
+            bucket = self._buckets[url] = TokenBucket(rate, capacity, now)
+        bucket.rate = rate
+        return bucket
+
+    def next_batch(self, now=None):
+        """
+        Take the next batch of torrents to check from the queue. The batch holds the torrent with the highest
+        priority that has a tracker with a token left, and the torrents with the highest priority that share
+        that tracker.
+        :return: a (tracker url, list of infohashes) tuple, or None if no torrent can be checked now.
+            The tracker url is DHT for a torrent without usable trackers.
+        """
+        now = time.time() if now is None else now
+        batch = None
+        skipped = []
+        while self._heap and batch is None and len(skipped) < MAX_BATCH_LOOKAHEAD:
+            neg_score, infohash = heapq.heappop(self._heap)
+            entry = self._queued.get(infohash)
+            if entry is None or entry[0] != -neg_score:
+                continue
+            trackers = sorted(entry[1][4], key=lambda tracker: tracker[1]) or [(DHT, 0)]
+            for url, failures in trackers:
+                if self._get_bucket(url, failures, now).consume(now=now):
+                    batch = (url, self._take_batch(url, infohash))
+                    break
+            else:
+                skipped.append((neg_score, infohash))
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        return batch
+
+    def _take_batch(self, url, infohash):
+        others = self._by_tracker.get(url, set()) - {infohash} if url != DHT else ()
+        infohashes = [infohash] + heapq.nlargest(self.max_batch_size - 1, others,
+                                                 key=lambda other: self._queued[other][0])
+        for batch_infohash in infohashes:
+            self._remove(batch_infohash)
+        return infohashes
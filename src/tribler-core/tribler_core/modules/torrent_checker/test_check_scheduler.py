@@ -0,0 +1,104 @@
+from tribler_core.modules.torrent_checker.check_scheduler import DHT, HealthCheckScheduler, TokenBucket
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+
+NOW = 1000000
+TRACKER1 = "http://tracker1.com/announce"
+TRACKER2 = "udp://tracker2.com:80"
+
+
+class TestTokenBucket(TriblerCoreTest):
+
+    def test_consume(self):
+        """
+        Test that a bucket allows a burst, and then one request per refilled token
+        """
+        bucket = TokenBucket(0.1, 2, now=NOW)
+        self.assertTrue(bucket.consume(now=NOW))
+        self.assertTrue(bucket.consume(now=NOW))
+        self.assertFalse(bucket.consume(now=NOW + 5))
+        self.assertTrue(bucket.consume(now=NOW + 10))
+        self.assertFalse(bucket.consume(now=NOW + 10))
+
+    def test_capacity(self):
+        """
+        Test that a bucket does not collect more tokens than its capacity
+        """
+        bucket = TokenBucket(1, 2, now=NOW)
+        bucket.consume(now=NOW + 1000)
+        self.assertEqual(bucket.tokens, 1)
+
+
+class TestHealthCheckScheduler(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestHealthCheckScheduler, self).setUp()
+        self.scheduler = HealthCheckScheduler(900, 3)
+
+    def test_score(self):
+        """
+        Test that staler, more popular and interesting torrents get a higher score, and failing trackers a lower one
+        """
+        score = self.scheduler.score((b'a' * 20, NOW - 3600, 10, 10, ((TRACKER1, 0),)), NOW)
+        self.assertGreater(self.scheduler.score((b'a' * 20, NOW - 7200, 10, 10, ((TRACKER1, 0),)), NOW), score)
+        self.assertGreater(self.scheduler.score((b'a' * 20, NOW - 3600, 100, 10, ((TRACKER1, 0),)), NOW), score)
+        self.assertLess(self.scheduler.score((b'a' * 20, NOW - 3600, 10, 10, ((TRACKER1, 2),)), NOW), score)
+        self.assertEqual(self.scheduler.score((b'a' * 20, NOW - 60, 10, 10, ((TRACKER1, 0),)), NOW), 0)
+
+        self.scheduler.add_interest(b'a' * 20, now=NOW)
+        self.assertGreater(self.scheduler.score((b'a' * 20, NOW - 3600, 10, 10, ((TRACKER1, 0),)), NOW), score)
+
+    def test_load(self):
+        """
+        Test that only the torrents that are due for a check are queued
+        """
+        self.assertTrue(self.scheduler.needs_refill(NOW))
+        self.scheduler.load([(b'a' * 20, 0, 0, 0, ()), (b'b' * 20, NOW - 60, 0, 0, ())], NOW)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertFalse(self.scheduler.needs_refill(NOW))
+        self.assertTrue(self.scheduler.needs_refill(NOW + self.scheduler.refill_interval))
+
+    def test_next_batch_grouped(self):
+        """
+        Test that a batch holds the most urgent torrents of the tracker of the most urgent torrent
+        """
+        self.scheduler.load([
+            (b'a' * 20, 0, 100, 0, ((TRACKER1, 0),)),
+            (b'b' * 20, 0, 50, 0, ((TRACKER2, 0),)),
+            (b'c' * 20, 0, 10, 0, ((TRACKER1, 0), (TRACKER2, 0))),
+            (b'd' * 20, 0, 5, 0, ((TRACKER1, 0),)),
+            (b'e' * 20, 0, 0, 0, ((TRACKER1, 0),)),
+        ], NOW)
+        self.assertEqual(self.scheduler.next_batch(NOW), (TRACKER1, [b'a' * 20, b'c' * 20, b'd' * 20]))
+        self.assertEqual(self.scheduler.next_batch(NOW), (TRACKER2, [b'b' * 20]))
+        self.assertEqual(self.scheduler.next_batch(NOW), (TRACKER1, [b'e' * 20]))
+        self.assertIsNone(self.scheduler.next_batch(NOW))
+
+    def test_next_batch_rate_limited(self):
+        """
+        Test that a tracker without tokens left is skipped until its bucket is refilled
+        """
+        self.scheduler.load([(bytes([index]) * 20, 0, 100 - index, 0, ((TRACKER1, 0),)) for index in range(4)]
+                            + [(b'z' * 20, 0, 0, 0, ((TRACKER2, 0),))], NOW)
+        self.scheduler.max_batch_size = 1
+        self.assertEqual(self.scheduler.next_batch(NOW)[0], TRACKER1)
+        self.assertEqual(self.scheduler.next_batch(NOW)[0], TRACKER1)
+        self.assertEqual(self.scheduler.next_batch(NOW), (TRACKER2, [b'z' * 20]))
+        self.assertIsNone(self.scheduler.next_batch(NOW))
+        self.assertEqual(self.scheduler.next_batch(NOW + 60), (TRACKER1, [b'\x02' * 20]))
+
+    def test_next_batch_dht(self):
+        """
+        Test that torrents without trackers are checked one by one through the DHT
+        """
+        self.scheduler.load([(b'a' * 20, 0, 0, 0, ()), (b'b' * 20, 0, 0, 0, ())], NOW)
+        self.assertEqual(self.scheduler.next_batch(NOW)[0], DHT)
+        self.assertEqual(len(self.scheduler), 1)
+
+    def test_add_interest(self):
+        """
+        Test that a torrent the user asked for moves up in the queue
+        """
+        self.scheduler.load([(b'a' * 20, 0, 10, 0, ((TRACKER1, 0),)), (b'b' * 20, 0, 0, 0, ((TRACKER2, 0),))], NOW)
+        self.scheduler.add_interest(b'b' * 20, now=NOW)
+        self.assertEqual(self.scheduler.get_interesting_infohashes(), [b'b' * 20])
+        self.assertEqual(self.scheduler.next_batch(NOW), (TRACKER2, [b'b' * 20]))
@@ -1,4 +1,3 @@
-import os
 import socket
 import time
 from unittest.mock import Mock
@@ -8,7 +7,6 @@ from pony.orm import db_session
 from tribler_core.modules.torrent_checker.torrent_checker import TorrentChecker
 from tribler_core.modules.torrent_checker.torrentchecker_session import HttpTrackerSession, UdpSocketManager
 from tribler_core.modules.tracker_manager import TrackerManager
-from tribler_core.tests.tools.base_test import MockObject
 from tribler_core.tests.tools.test_as_server import TestAsServer
 from tribler_core.tests.tools.tools import timeout
 from tribler_core.utilities.unicode import hexlify
@@ -51,8 +49,7 @@ class TestTorrentChecker(TestAsServer):
         Test the initialization of the torrent checker
         """
         await self.torrent_checker.initialize()
-        self.assertTrue(self.torrent_checker.is_pending_task_active("tracker_check"))
-        self.assertTrue(self.torrent_checker.is_pending_task_active("torrent_check"))
+        self.assertTrue(self.torrent_checker.is_pending_task_active("scheduled_check"))
 
     async def test_create_socket_fail(self):
         """
@@ -98,51 +95,76 @@ class TestTorrentChecker(TestAsServer):
         self.assertEqual(result['db']['leechers'], 10)
 
     @timeout(10)
-    async def test_task_select_no_tracker(self):
+    async def test_scheduled_check_no_torrents(self):
         """
-        Test whether we are not checking a random tracker if there are no trackers in the database.
+        Test whether we are not checking anything if there are no torrents in the database.
         """
-        result = await self.torrent_checker.check_random_tracker()
+        result = await self.torrent_checker.check_scheduled_torrents()
         self.assertFalse(result)
 
     @timeout(10)
-    async def test_check_random_tracker_shutdown(self):
+    async def test_scheduled_check_shutdown(self):
         """
-        Test whether we are not performing a tracker check if we are shutting down.
+        Test whether we are not performing a scheduled check if we are shutting down.
         """
         await self.torrent_checker.shutdown()
-        result = await self.torrent_checker.check_random_tracker()
+        result = await self.torrent_checker.check_scheduled_torrents()
         self.assertFalse(result)
 
-    @timeout(10)
-    async def test_check_random_tracker_not_alive(self):
+    @db_session
+    def test_check_candidates_dead_tracker(self):
         """
-        Test whether we correctly update the tracker state when the number of failures is too large.
+        Test whether dead trackers are not used for the scheduled checks
         """
-        with db_session:
-            self.session.mds.TrackerState(url="http://localhost/tracker", failures=1000, alive=True)
-
-        result = await self.torrent_checker.check_random_tracker()
-        self.assertFalse(result)
+        tracker = self.session.mds.TrackerState(url="http://localhost/tracker", failures=1000, alive=False)
+        self.session.mds.TorrentState(infohash=b'a' * 20, trackers={tracker})
 
-        with db_session:
-            tracker = self.session.tracker_manager.tracker_store.get()
-            self.assertFalse(tracker.alive)
+        candidates = self.torrent_checker.get_check_candidates(time.time())
+        self.assertEqual(candidates, [(b'a' * 20, 0, 0, 0, ())])
 
     @timeout(10)
-    async def test_task_select_tracker(self):
+    async def test_scheduled_check_tracker(self):
+        """
+        Test whether the scheduler checks the torrents of a tracker in a single session
+        """
         with db_session:
             tracker = self.session.mds.TrackerState(url="http://localhost/tracker")
             self.session.mds.TorrentState(infohash=b'a' * 20, seeders=5, leechers=10, trackers={tracker})
+            self.session.mds.TorrentState(infohash=b'b' * 20, seeders=5, leechers=10, trackers={tracker})
 
         controlled_session = HttpTrackerSession("127.0.0.1", ("localhost", 8475), "/announce", 5)
         controlled_session.connect_to_tracker = lambda: succeed(None)
 
         self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
-        result = await self.torrent_checker.check_random_tracker()
+        result = await self.torrent_checker.check_scheduled_torrents()
         self.assertFalse(result)
 
-        self.assertEqual(len(controlled_session.infohash_list), 1)
+        self.assertEqual(len(controlled_session.infohash_list), 2)
+        await controlled_session.cleanup()
+
+    @timeout(10)
+    async def test_check_tracker_results(self):
+        """
+        Test whether the results of a tracker check are stored
+        """
+        with db_session:
+            tracker = self.session.mds.TrackerState(url="http://localhost/tracker")
+            self.session.mds.TorrentState(infohash=b'a' * 20, trackers={tracker})
+
+        controlled_session = HttpTrackerSession("http://localhost/tracker", ("localhost", 80), "/announce", 5)
+        response = {"http://localhost/tracker": [{'infohash': hexlify(b'a' * 20), 'seeders': 5, 'leechers': 10}]}
+        controlled_session.connect_to_tracker = lambda: succeed(response)
+
+        self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
+        self.torrent_checker._session_list["http://localhost/tracker"] = [controlled_session]
+        result = await self.torrent_checker.check_tracker("http://localhost/tracker", [b'a' * 20])
+        self.assertTrue(result)
+
+        with db_session:
+            torrent = self.session.mds.TorrentState.get(infohash=b'a' * 20)
+            self.assertEqual((torrent.seeders, torrent.leechers), (5, 10))
+            self.assertTrue(torrent.last_check)
+        self.assertEqual(len(self.torrent_checker.torrents_checked), 1)
 
     @timeout(30)
     async def test_tracker_test_error_resolve(self):
@@ -151,9 +173,8 @@ class TestTorrentChecker(TestAsServer):
         """
         with db_session:
             tracker = self.session.mds.TrackerState(url="http://localhost/tracker")
-            self.session.mds.TorrentState(infohash=b'a' * 20, seeders=5, leechers=10, trackers={tracker},
-                                          last_check=int(time.time()))
-        result = await self.torrent_checker.check_random_tracker()
+            self.session.mds.TorrentState(infohash=b'a' * 20, seeders=5, leechers=10, trackers={tracker})
+        result = await self.torrent_checker.check_tracker("http://localhost/tracker", [b'a' * 20])
         self.assertFalse(result)
 
         # Verify whether we successfully cleaned up the session after an error
@@ -162,35 +183,12 @@ class TestTorrentChecker(TestAsServer):
     @timeout(10)
     async def test_tracker_no_infohashes(self):
         """
-        Test the check of a tracker without associated torrents
+        Test the scheduled check of a tracker without associated torrents
         """
         self.session.tracker_manager.add_tracker('http://trackertest.com:80/announce')
-        result = await self.torrent_checker.check_random_tracker()
+        result = await self.torrent_checker.check_scheduled_torrents()
         self.assertFalse(result)
 
-    def test_get_valid_next_tracker_for_auto_check(self):
-        """
-        Test if only valid tracker url are used for auto check
-        """
-        mock_tracker_state_invalid = MockObject()
-        mock_tracker_state_invalid.url = "http://anno nce.torrentsmd.com:8080/announce"
-        mock_tracker_state_valid = MockObject()
-        mock_tracker_state_valid.url = "http://announce.torrentsmd.com:8080/announce"
-        tracker_states = [mock_tracker_state_invalid, mock_tracker_state_valid]
-
-        def get_next_tracker_for_auto_check():
-            return tracker_states[0] if tracker_states else None
-
-        def remove_tracker(_):
-            tracker_states.remove(mock_tracker_state_invalid)
-
-        self.torrent_checker.get_next_tracker_for_auto_check = get_next_tracker_for_auto_check
-        self.torrent_checker.remove_tracker = remove_tracker
-
-        next_tracker = self.torrent_checker.get_valid_next_tracker_for_auto_check()
-        self.assertEqual(len(tracker_states), 1)
-        self.assertEqual(next_tracker.url, "http://announce.torrentsmd.com:8080/announce")
-
     def test_on_health_check_completed(self):
         tracker1 = 'udp://localhost:2801'
         tracker2 = "http://badtracker.org/announce"
@@ -241,21 +239,21 @@ class TestTorrentChecker(TestAsServer):
         self.assertEqual(1, len(self.torrent_checker.torrents_checked))
         self.assertEqual(0, list(self.torrent_checker.torrents_checked)[0][1])
 
-    @db_session
-    def test_check_random_torrent(self):
+    @timeout(10)
+    async def test_scheduled_check_dht(self):
         """
-        Test that the random torrent health checking mechanism picks the right torrents
+        Test whether the scheduler checks the stalest torrent without trackers through the DHT
         """
-        for ind in range(1, 20):
-            torrent = self.session.mds.TorrentMetadata(title='torrent1', infohash=os.urandom(20))
-            torrent.health.last_check = ind
+        with db_session:
+            for ind in range(1, 20):
+                torrent = self.session.mds.TorrentMetadata(title='torrent1', infohash=bytes([ind]) * 20)
+                torrent.health.last_check = ind
 
-        self.torrent_checker.check_torrent_health = lambda _: succeed(None)
+        checked = []
 
-        random_infohashes = self.torrent_checker.check_random_torrent()
-        self.assertTrue(random_infohashes)
+        async def check_torrent_health(infohash, **kwargs):
+            checked.append((infohash, kwargs))
 
-        # Now we should only check a single torrent
-        self.torrent_checker.torrents_checked.add((b'a' * 20, 5, 5, int(time.time())))
-        random_infohashes = self.torrent_checker.check_random_torrent()
-        self.assertEqual(len(random_infohashes), 1)
+        self.torrent_checker.check_torrent_health = check_torrent_health
+        self.assertTrue(await self.torrent_checker.check_scheduled_torrents())
+        self.assertEqual(checked, [(b'\x01' * 20, {'scrape_now': True, 'scheduled': True})])
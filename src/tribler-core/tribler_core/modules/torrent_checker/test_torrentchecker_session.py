@@ -1,8 +1,9 @@
 import socket
 import struct
-from asyncio import CancelledError, DatagramProtocol, Future, ensure_future, get_event_loop, start_server
+from asyncio import CancelledError, DatagramProtocol, Future, ensure_future, gather, get_event_loop, start_server
 from unittest.mock import Mock
 
+from aiohttp import web
 from aiohttp.web_exceptions import HTTPBadRequest
 
 from libtorrent import bencode
@@ -11,8 +12,12 @@ from tribler_core.config.tribler_config import TriblerConfig
 from tribler_core.modules.torrent_checker.torrentchecker_session import (
     FakeBep33DHTSession,
     FakeDHTSession,
+    HttpTrackerConnectionManager,
     HttpTrackerSession,
+    TrackerConnectionManager,
+    UDP_TRACKER_INIT_CONNECTION_ID,
     UdpSocketManager,
+    UdpTrackerConnectionManager,
     UdpTrackerSession,
 )
 from tribler_core.session import Session
@@ -34,6 +39,182 @@ class FakeUdpSocketManager(object):
         return succeed(self.response)
 
 
+class FakeUdpTracker(object):
+    """
+    Socket manager that answers the UDP tracker requests itself. The seeders of an infohash are its first byte.
+    """
+    transport = 1
+
+    def __init__(self):
+        self.tracker_sessions = {}
+        self.requests = []
+        self.error = None
+
+    def send_request(self, data, _):
+        connection_id, action, transaction_id = struct.unpack_from('!qii', data)
+        self.requests.append((action, connection_id))
+        if self.error:
+            return succeed(struct.pack('!ii', 3, transaction_id) + self.error)
+        if action == 0:
+            return succeed(struct.pack('!iiq', 0, transaction_id, 42))
+        infohashes = [data[offset:offset + 20] for offset in range(16, len(data), 20)]
+        return succeed(struct.pack('!ii', 2, transaction_id) +
+                       b''.join(struct.pack('!iii', infohash[0], 0, 1) for infohash in infohashes))
+
+
+class TestUdpTrackerConnectionManager(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestUdpTrackerConnectionManager, self).setUp()
+        self.socket_mgr = FakeUdpTracker()
+        self.connection_mgr = UdpTrackerConnectionManager(batch_window=0.01)
+
+    async def tearDown(self):
+        await self.connection_mgr.shutdown_task_manager()
+        await super(TestUdpTrackerConnectionManager, self).tearDown()
+
+    async def scrape(self, infohashes):
+        session = UdpTrackerSession("udp://127.0.0.1:4782", ("127.0.0.1", 4782), "/announce", 5, self.socket_mgr,
+                                    connection_mgr=self.connection_mgr)
+        session.infohash_list = infohashes
+        try:
+            return await session.connect_to_tracker()
+        finally:
+            await session.cleanup()
+
+    @timeout(5)
+    async def test_scrape_batched(self):
+        """
+        Test that the infohashes of concurrent sessions for the same tracker are scraped with one request
+        """
+        results = await gather(self.scrape([b'\x01' * 20, b'\x02' * 20]), self.scrape([b'\x03' * 20]))
+        self.assertEqual([[result['seeders'] for result in response["udp://127.0.0.1:4782"]] for response in results],
+                         [[1, 2], [3]])
+        self.assertEqual(self.socket_mgr.requests, [(0, UDP_TRACKER_INIT_CONNECTION_ID), (2, 42)])
+
+    @timeout(5)
+    async def test_connection_id_cached(self):
+        """
+        Test that the connection ID and the resolved address are reused by the next scrape
+        """
+        await self.scrape([b'\x01' * 20])
+        await self.scrape([b'\x02' * 20])
+        self.assertEqual(self.socket_mgr.requests, [(0, UDP_TRACKER_INIT_CONNECTION_ID), (2, 42), (2, 42)])
+        self.assertEqual(list(self.connection_mgr._dns_cache), ["127.0.0.1"])
+
+    @timeout(5)
+    async def test_scrape_split(self):
+        """
+        Test that no more than 74 infohashes are scraped with one request
+        """
+        infohashes = [bytes([index]) * 20 for index in range(100)]
+        results = await gather(self.scrape(infohashes[:50]), self.scrape(infohashes[50:]))
+        self.assertEqual([result['seeders'] for response in results for result in response["udp://127.0.0.1:4782"]],
+                         list(range(100)))
+        self.assertEqual([action for action, _ in self.socket_mgr.requests].count(2), 2)
+
+    @timeout(5)
+    async def test_scrape_error(self):
+        """
+        Test that an error response fails all the waiting sessions and drops the connection ID
+        """
+        await self.scrape([b'\x01' * 20])
+        self.socket_mgr.error = b"connection ID mismatch"
+        with self.assertRaises(ValueError):
+            await gather(self.scrape([b'\x02' * 20]), self.scrape([b'\x03' * 20]))
+        self.assertFalse(self.connection_mgr._connection_ids)
+
+
+    @timeout(5)
+    async def test_scrape_error_failed_session(self):
+        """
+        Test that a scrape error is raised for a session that already failed before
+        """
+        self.socket_mgr.error = b"connection ID mismatch"
+        session = UdpTrackerSession("udp://127.0.0.1:4782", ("127.0.0.1", 4782), "/announce", 5, self.socket_mgr,
+                                    connection_mgr=self.connection_mgr)
+        session.infohash_list = [b'\x01' * 20]
+        session.is_failed = True
+        with self.assertRaises(ValueError):
+            await self.connection_mgr.scrape(session)
+        await session.cleanup()
+
+class TestHttpTrackerConnectionManager(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestHttpTrackerConnectionManager, self).setUp()
+        self.requests = []
+        app = web.Application()
+        app.router.add_get('/scrape', self.handle_scrape)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.connection_mgr = HttpTrackerConnectionManager(batch_window=0.01)
+
+    async def tearDown(self):
+        await self.connection_mgr.shutdown_task_manager()
+        await self.runner.cleanup()
+        await super(TestHttpTrackerConnectionManager, self).tearDown()
+
+    async def handle_scrape(self, request):
+        self.requests.append((request.transport.get_extra_info('peername'), request.url.raw_query_string))
+        infohashes = [value.encode('latin-1') for value in request.query.getall('info_hash', [])]
+        files = {infohash: {'complete': infohash[0], 'incomplete': 0} for infohash in infohashes}
+        return web.Response(body=bencode({'files': files}))
+
+    async def scrape(self, infohashes):
+        session = HttpTrackerSession("http://127.0.0.1:%d/announce" % self.port, ("127.0.0.1", self.port),
+                                     "/announce", 5, connection_mgr=self.connection_mgr)
+        session.infohash_list = infohashes
+        try:
+            return await session.connect_to_tracker()
+        finally:
+            await session.cleanup()
+
+    @timeout(10)
+    async def test_scrape_batched(self):
+        """
+        Test that the infohashes of concurrent sessions for the same tracker are scraped with one request
+        """
+        url = "http://127.0.0.1:%d/announce" % self.port
+        results = await gather(self.scrape([b'\x01' * 20, b'\x02' * 20]), self.scrape([b'\x03' * 20]))
+        self.assertEqual([[result['seeders'] for result in response[url]] for response in results], [[1, 2], [3]])
+        self.assertEqual(len(self.requests), 1)
+
+    @timeout(10)
+    async def test_connection_reused(self):
+        """
+        Test that the next scrape reuses the connection to the tracker
+        """
+        await self.scrape([b'\x01' * 20])
+        await self.scrape([b'\x02' * 20])
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[0][0], self.requests[1][0])
+
+    @timeout(10)
+    async def test_scrape_unmatched_infohash(self):
+        """
+        Test that an infohash the tracker did not report on gets an empty result
+        """
+        url = "http://127.0.0.1:%d/announce" % self.port
+
+        async def send_scrape(_, session):
+            return {url: [{'infohash': hexlify(b'\x01' * 20), 'seeders': 1, 'leechers': 0}]}
+
+        self.connection_mgr._send_scrape = send_scrape
+        response = await self.scrape([b'\x01' * 20, b'\x02' * 20])
+        self.assertEqual([(result['seeders'], result['leechers']) for result in response[url]], [(1, 0), (0, 0)])
+
+    def test_abstract_manager(self):
+        """
+        Test that the base class of the connection managers can not be created
+        """
+        with self.assertRaises(TypeError):
+            TrackerConnectionManager()
+
+
 class TestTorrentCheckerSession(TestAsServer):
 
     async def setUp(self):
@@ -0,0 +1,55 @@
+from tribler_core.modules.torrent_checker.torrents_checked_store import TorrentsCheckedStore
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+
+NOW = 1000000
+
+
+def health(index, seeders, last_check=NOW):
+    return index.to_bytes(20, 'big'), seeders, 0, last_check
+
+
+class TestTorrentsCheckedStore(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestTorrentsCheckedStore, self).setUp()
+        self.store = TorrentsCheckedStore(top_size=3, sample_size=10, ttl=100)
+
+    def test_newer_check_replaces_older(self):
+        """
+        Test that a torrent is stored once, with its newest check
+        """
+        self.store.add(health(1, 5, NOW - 10))
+        self.store.add(health(1, 7, NOW))
+        self.store.add(health(1, 9, NOW - 20))
+        self.assertEqual(list(self.store), [health(1, 7, NOW)])
+        self.assertEqual(self.store.get_random(5, now=NOW), [health(1, 7, NOW)])
+        self.assertEqual(self.store.get_popular(5, now=NOW), [health(1, 7, NOW)])
+
+    def test_bounded(self):
+        """
+        Test that the store keeps a bounded number of checks, including the ones with the most seeders
+        """
+        for index in range(1000):
+            self.store.add(health(index, index % 100))
+        self.assertLessEqual(len(self.store), 13)
+        self.assertLessEqual(len(self.store._top_heap), 6)
+        self.assertEqual([check[1] for check in self.store.get_popular(3, now=NOW)], [99, 99, 99])
+        self.assertEqual(len(set(self.store.get_random(5, now=NOW))), 5)
+
+    def test_get_popular_exclude(self):
+        """
+        Test that the popular checks do not include the excluded ones
+        """
+        for index in range(5):
+            self.store.add(health(index, index))
+        self.assertEqual(self.store.get_popular(2, exclude=[health(4, 4)], now=NOW), [health(3, 3), health(2, 2)])
+
+    def test_expiry(self):
+        """
+        Test that the checks older than the time-to-live are not returned anymore
+        """
+        self.store.add(health(1, 10, NOW - 200))
+        self.store.add(health(2, 5, NOW))
+        self.assertEqual(self.store.get_random(5, now=NOW), [health(2, 5)])
+        self.assertEqual(self.store.get_popular(5, now=NOW), [health(2, 5)])
+        self.assertEqual(len(self.store), 1)
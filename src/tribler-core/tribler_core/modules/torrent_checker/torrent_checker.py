@@ -1,33 +1,34 @@
 import asyncio
 import logging
-import random
 import socket
 import time
 from asyncio import CancelledError, gather
+from binascii import unhexlify
 
 from ipv8.database import database_blob
 from ipv8.taskmanager import TaskManager, task
 
-from pony.orm import db_session, select
+from pony.orm import db_session, desc
 
 from tribler_common.simpledefs import NTFY
 
+from tribler_core.modules.torrent_checker.check_scheduler import DHT, HealthCheckScheduler
+from tribler_core.modules.torrent_checker.torrents_checked_store import TorrentsCheckedStore
 from tribler_core.modules.torrent_checker.torrentchecker_session import (
     FakeBep33DHTSession,
     FakeDHTSession,
+    HttpTrackerConnectionManager,
     UdpSocketManager,
+    UdpTrackerConnectionManager,
     create_tracker_session,
 )
-from tribler_core.modules.tracker_manager import MAX_TRACKER_FAILURES
 from tribler_core.utilities.tracker_utils import MalformedTrackerURLException
 from tribler_core.utilities.unicode import hexlify
 from tribler_core.utilities.utilities import has_bep33_support, is_valid_url
 
-TRACKER_SELECTION_INTERVAL = 20    # The interval for querying a random tracker
-TORRENT_SELECTION_INTERVAL = 120   # The interval for checking the health of a random torrent
 MIN_TORRENT_CHECK_INTERVAL = 900   # How much time we should wait before checking a torrent again
-TORRENT_CHECK_RETRY_INTERVAL = 30  # Interval when the torrent was successfully checked for the last time
 MAX_TORRENTS_CHECKED_PER_SESSION = 50
+CHECK_CANDIDATES_LIMIT = 1000      # How many of the stalest and of the most popular torrents the scheduler considers
 
 class TorrentChecker(TaskManager):
 
@@ -40,14 +41,19 @@ class TorrentChecker(TaskManager):
         self._session_list = {'DHT': []}
 
         self.socket_mgr = self.udp_transport = None
+        # Share the HTTP client, DNS lookups, connection IDs and scrape requests of the tracker sessions
+        self.http_connection_mgr = HttpTrackerConnectionManager()
+        self.udp_connection_mgr = UdpTrackerConnectionManager()
 
         # We keep track of the results of popular torrents checked by you.
         # The popularity community gossips this information around.
-        self.torrents_checked = set()
+        self.torrents_checked = TorrentsCheckedStore()
+
+        self.scheduler = HealthCheckScheduler(MIN_TORRENT_CHECK_INTERVAL, MAX_TORRENTS_CHECKED_PER_SESSION)
 
     async def initialize(self):
-        self.register_task("tracker_check", self.check_random_tracker, interval=TRACKER_SELECTION_INTERVAL)
-        self.register_task("torrent_check", self.check_random_torrent, interval=TORRENT_SELECTION_INTERVAL)
+        interval = 60 / self.tribler_session.config.get_torrent_checking_batches_per_minute()
+        self.register_task("scheduled_check", self.check_scheduled_torrents, interval=interval)
         self.socket_mgr = UdpSocketManager()
         await self.create_socket_or_schedule()
 
@@ -80,62 +86,67 @@ class TorrentChecker(TaskManager):
             self.udp_transport.close()
             self.udp_transport = None
 
+        await self.http_connection_mgr.shutdown_task_manager()
+        await self.udp_connection_mgr.shutdown_task_manager()
         await self.shutdown_task_manager()
 
-    async def check_random_tracker(self):
+    async def check_scheduled_torrents(self):
         """
-        Calling this method will fetch a random tracker from the database, select some torrents that have this
-        tracker, and perform a request to these trackers.
+        Check the health of the next batch of torrents from the scheduler.
         Return whether the check was successful.
         """
         if self._should_stop:
-            self._logger.warning("Not performing tracker check since we are shutting down")
-            return False
-
-        tracker = self.get_valid_next_tracker_for_auto_check()
-        if tracker is None:
-            self._logger.warning(u"No tracker to select from, skip")
+            self._logger.warning("Not performing a scheduled check since we are shutting down")
             return False
 
-        self._logger.debug(u"Start selecting torrents on tracker %s.", tracker.url)
+        now = time.time()
+        if self.scheduler.needs_refill(now):
+            self.scheduler.load(self.get_check_candidates(now), now)
 
-        # get the torrents that should be checked
-        with db_session:
-            dynamic_interval = TORRENT_CHECK_RETRY_INTERVAL * (2 ** tracker.failures)
-            # FIXME: this is a really dumb fix for update_tracker_info not being called in some cases
-            if tracker.failures >= MAX_TRACKER_FAILURES:
-                self.update_tracker_info(tracker.url, False)
-                return False
-            torrents = select(ts for ts in tracker.torrents if ts.last_check + dynamic_interval < int(time.time()))
-            infohashes = [t.infohash for t in torrents[:MAX_TORRENTS_CHECKED_PER_SESSION]]
-
-        if len(infohashes) == 0:
-            # We have no torrent to recheck for this tracker. Still update the last_check for this tracker.
-            self._logger.info("No torrent to check for tracker %s", tracker.url)
-            self.update_tracker_info(tracker.url, True)
+        batch = self.scheduler.next_batch(now)
+        if batch is None:
+            self._logger.debug("No torrent to check")
             return False
 
+        tracker_url, infohashes = batch
+        if tracker_url == DHT:
+            await self.check_torrent_health(infohashes[0], scrape_now=True, scheduled=True)
+            return True
+        return await self.check_tracker(tracker_url, infohashes)
+
+    async def check_tracker(self, tracker_url, infohashes):
+        """
+        Check the health of some torrents on a single tracker, and store the results.
+        Return whether the check was successful.
+        """
         try:
-            session = self._create_session_for_request(tracker.url, timeout=30)
+            session = self._create_session_for_request(tracker_url, timeout=30)
         except MalformedTrackerURLException as e:
             # Remove the tracker from the database
-            self.remove_tracker(tracker.url)
+            self.remove_tracker(tracker_url)
             self._logger.error(e)
             return False
 
-        # We shuffle the list so that different infohashes are checked on subsequent scrape requests if the total
-        # number of infohashes exceeds the maximum number of infohashes we check.
-        random.shuffle(infohashes)
         for infohash in infohashes:
             session.add_infohash(infohash)
 
-        self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker.url)
+        self._logger.info(u"Selected %d torrents to check on tracker: %s", len(infohashes), tracker_url)
         try:
-            await self.connect_to_tracker(session)
-            return True
-        except:
+            result = await self.connect_to_tracker(session)
+        except Exception:
+            return False
+        if not result:
             return False
 
+        last_check = int(time.time())
+        with db_session:
+            for response in result[session.tracker_url]:
+                torrent_update_dict = {'infohash': unhexlify(response['infohash']), 'seeders': response['seeders'],
+                                       'leechers': response['leechers'], 'last_check': last_check}
+                self._update_torrent_result(torrent_update_dict)
+                self.update_torrents_checked(torrent_update_dict)
+        return True
+
     async def connect_to_tracker(self, session):
         try:
             info_dict = await session.connect_to_tracker()
@@ -151,47 +162,36 @@ class TorrentChecker(TaskManager):
             raise e
 
     @db_session
-    def check_random_torrent(self):
+    def get_check_candidates(self, now):
         """
-        Perform a full health check on a random torrent in the database.
-        We prioritize torrents that have no health info attached.
+        Get the torrents the scheduler chooses from: the stalest ones, the most popular ones that are due
+        for a check, and the ones the user recently asked for.
+        :return: a list of (infohash, last_check, seeders, leechers, trackers) tuples, where trackers is a tuple of
+            the (url, failures) tuples of the usable trackers of the torrent
         """
-        random_torrents = list(self.tribler_session.mds.TorrentState.select().
-                               order_by(lambda g: g.last_check).limit(10))
-
-        if not random_torrents:
-            self._logger.info("Could not find any eligible torrent for random torrent check")
-            return None
-
-        if not self.torrents_checked:
-            # We have not checked any torrent yet - pick three torrents to health check
-            random_torrents = random.sample(random_torrents, min(3, len(random_torrents)))
-            infohashes = []
-            for random_torrent in random_torrents:
-                self.check_torrent_health(bytes(random_torrent.infohash))
-                infohashes.append(random_torrent.infohash)
-            return infohashes
-
-        random_torrent = random.choice(random_torrents)
-        self.check_torrent_health(bytes(random_torrent.infohash))
-        return [bytes(random_torrent.infohash)]
-
-    def get_valid_next_tracker_for_auto_check(self):
-        tracker = self.get_next_tracker_for_auto_check()
-        while tracker and not is_valid_url(tracker.url):
-            self.remove_tracker(tracker.url)
-            tracker = self.get_next_tracker_for_auto_check()
-        return tracker
-
-    def get_next_tracker_for_auto_check(self):
-        return self.tribler_session.tracker_manager.get_next_tracker_for_auto_check()
+        torrent_state = self.tribler_session.mds.TorrentState
+        due = int(now) - MIN_TORRENT_CHECK_INTERVAL
+        queries = (
+            torrent_state.select(lambda g: g.last_check < due).order_by(torrent_state.last_check),
+            torrent_state.select(lambda g: g.last_check < due).order_by(desc(torrent_state.seeders)),
+        )
+        torrents = {}
+        for query in queries:
+            for torrent in query.prefetch(torrent_state.trackers).limit(CHECK_CANDIDATES_LIMIT):
+                torrents[torrent.rowid] = torrent
+        for infohash in self.scheduler.get_interesting_infohashes():
+            torrent = torrent_state.get(infohash=database_blob(infohash))
+            if torrent:
+                torrents[torrent.rowid] = torrent
+
+        return [(bytes(torrent.infohash), torrent.last_check, torrent.seeders, torrent.leechers,
+                 tuple((tracker.url, tracker.failures) for tracker in torrent.trackers
+                       if tracker.alive and is_valid_url(tracker.url) and not self.is_blacklisted_tracker(tracker.url)))
+                for torrent in torrents.values()]
 
     def remove_tracker(self, tracker_url):
         self.tribler_session.tracker_manager.remove_tracker(tracker_url)
 
-    def update_tracker_info(self, tracker_url, is_successful):
-        self.tribler_session.tracker_manager.update_tracker_info(tracker_url, is_successful)
-
     def is_blacklisted_tracker(self, tracker_url):
         return tracker_url in self.tribler_session.tracker_manager.blacklist
 
@@ -204,7 +204,7 @@ class TorrentChecker(TaskManager):
 
     def update_torrents_checked(self, new_result):
         """
-        Update the set with torrents that we have checked ourselves.
+        Update the store with torrents that we have checked ourselves.
         """
         new_result_tuple = (new_result['infohash'], new_result['seeders'],
                             new_result['leechers'], new_result['last_check'])
@@ -255,13 +255,18 @@ class TorrentChecker(TaskManager):
         return final_response
 
     @task
-    async def check_torrent_health(self, infohash, timeout=20, scrape_now=False):
+    async def check_torrent_health(self, infohash, timeout=20, scrape_now=False, scheduled=False):
         """
         Check the health of a torrent with a given infohash.
         :param infohash: Torrent infohash.
         :param timeout: The timeout to use in the performed requests
         :param scrape_now: Flag whether we want to force scraping immediately
+        :param scheduled: Flag whether the check was started by the scheduler, rather than asked for
         """
+        if not scheduled:
+            # The torrents the user asks for are checked sooner by the scheduler as well
+            self.scheduler.add_interest(infohash)
+
         tracker_set = []
 
         # We first check whether the torrent is already in the database and checked before
@@ -306,7 +311,9 @@ class TorrentChecker(TaskManager):
         return self.on_torrent_health_check_completed(infohash, res)
 
     def _create_session_for_request(self, tracker_url, timeout=20):
-        session = create_tracker_session(tracker_url, timeout, self.socket_mgr)
+        session = create_tracker_session(tracker_url, timeout, self.socket_mgr,
+                                         http_connection_manager=self.http_connection_mgr,
+                                         udp_connection_manager=self.udp_connection_mgr)
 
         if tracker_url not in self._session_list:
             self._session_list[tracker_url] = []
@@ -5,9 +5,9 @@ import struct
 import sys
 import time
 from abc import ABCMeta, abstractmethod
-from asyncio import DatagramProtocol, Future, TimeoutError, ensure_future, get_event_loop
+from asyncio import DatagramProtocol, Future, TimeoutError, ensure_future, gather, get_event_loop, shield
 
-from aiohttp import ClientResponseError, ClientSession, ClientTimeout
+from aiohttp import ClientResponseError, ClientSession, ClientTimeout, TCPConnector
 
 from async_timeout import timeout
 
@@ -30,19 +30,42 @@ UDP_TRACKER_INIT_CONNECTION_ID = 0x41727101980
 
 MAX_INFOHASHES_IN_SCRAPE = 60
 
+# BEP15: a UDP scrape request fits about 74 infohashes
+MAX_INFOHASHES_IN_UDP_SCRAPE = 74
 
-def create_tracker_session(tracker_url, timeout, socket_manager):
+# BEP15: a connection ID can be used for one minute after it has been received
+UDP_CONNECTION_ID_TTL = 60
+
+# How long resolved tracker hostnames are cached, in seconds
+DNS_CACHE_TTL = 300
+
+# How long the infohashes for the same tracker are collected before they are scraped together, in seconds
+SCRAPE_BATCH_WINDOW = 0.1
+
+# The maximum number of open connections to a single HTTP tracker
+HTTP_CONNECTIONS_PER_HOST = 2
+
+# How long idle connections to HTTP trackers are kept open, in seconds
+HTTP_KEEPALIVE_TIMEOUT = 60
+
+
+def create_tracker_session(tracker_url, timeout, socket_manager, http_connection_manager=None,
+                           udp_connection_manager=None):
     """
     Creates a tracker session with the given tracker URL.
     :param tracker_url: The given tracker URL.
     :param timeout: The timeout for the session.
+    :param http_connection_manager: The HttpTrackerConnectionManager used by HTTP tracker sessions, if any.
+    :param udp_connection_manager: The UdpTrackerConnectionManager used by UDP tracker sessions, if any.
     :return: The tracker session.
     """
     tracker_type, tracker_address, announce_page = parse_tracker_url(tracker_url)
 
     if tracker_type == u'udp':
-        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout, socket_manager)
-    return HttpTrackerSession(tracker_url, tracker_address, announce_page, timeout)
+        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout, socket_manager,
+                                 connection_mgr=udp_connection_manager)
+    return HttpTrackerSession(tracker_url, tracker_address, announce_page, timeout,
+                              connection_mgr=http_connection_manager)
 
 
 class TrackerSession(TaskManager):
@@ -109,9 +132,12 @@ class TrackerSession(TaskManager):
 
 
 class HttpTrackerSession(TrackerSession):
-    def __init__(self, tracker_url, tracker_address, announce_page, timeout):
+    def __init__(self, tracker_url, tracker_address, announce_page, timeout, connection_mgr=None, client_session=None):
         super(HttpTrackerSession, self).__init__(u'http', tracker_url, tracker_address, announce_page, timeout)
-        self._session = ClientSession(raise_for_status=True, timeout=ClientTimeout(total=self.timeout))
+        self.connection_mgr = connection_mgr
+        # A session that is given a shared HTTP client must leave it open
+        self._owns_session = client_session is None and connection_mgr is None
+        self._session = ClientSession(raise_for_status=True) if self._owns_session else client_session
 
     async def connect_to_tracker(self):
         # create the HTTP GET message
@@ -120,6 +146,15 @@ class HttpTrackerSession(TrackerSession):
         #       which has some sort of 'key' as parameter, so we need to use the add_url_params
         #       utility function to handle such cases.
 
+        if self.connection_mgr:
+            # no more requests can be appended to this session
+            self.is_initiated = True
+            try:
+                async with timeout(self.timeout):
+                    return await self.connection_mgr.scrape(self)
+            except TimeoutError:
+                self.failed(msg='request timed out')
+
         url = add_url_params("http://%s:%s%s" %
                              (self.tracker_address[0], self.tracker_address[1],
                               self.announce_page.replace(u'announce', u'scrape')),
@@ -131,9 +166,9 @@ class HttpTrackerSession(TrackerSession):
 
         try:
             self._logger.debug(u"%s HTTP SCRAPE message sent: %s", self, url)
-            async with self._session:
-                async with self._session.get(url.encode('ascii').decode('utf-8')) as response:
-                    body = await response.read()
+            async with self._session.get(url.encode('ascii').decode('utf-8'),
+                                         timeout=ClientTimeout(total=self.timeout)) as response:
+                body = await response.read()
         except UnicodeEncodeError as e:
             raise e
         except ClientResponseError as e:
@@ -196,7 +231,8 @@ class HttpTrackerSession(TrackerSession):
         Cleans the session by cancelling all deferreds and closing sockets.
         :return: A deferred that fires once the cleanup is done.
         """
-        await self._session.close()
+        if self._owns_session:
+            await self._session.close()
         await super(HttpTrackerSession, self).cleanup()
 
 
@@ -243,7 +279,7 @@ class UdpTrackerSession(TrackerSession):
     # A list of transaction IDs that have been used in order to avoid conflict.
     _active_session_dict = dict()
 
-    def __init__(self, tracker_url, tracker_address, announce_page, timeout, socket_mgr):
+    def __init__(self, tracker_url, tracker_address, announce_page, timeout, socket_mgr, connection_mgr=None):
         super(UdpTrackerSession, self).__init__(u'udp', tracker_url, tracker_address, announce_page, timeout)
 
         self._logger.setLevel(logging.INFO)
@@ -252,6 +288,7 @@ class UdpTrackerSession(TrackerSession):
         self.port = tracker_address[1]
         self.ip_address = None
         self.socket_mgr = socket_mgr
+        self.connection_mgr = connection_mgr
 
         # prepare connection message
         self._connection_id = UDP_TRACKER_INIT_CONNECTION_ID
@@ -306,6 +343,9 @@ class UdpTrackerSession(TrackerSession):
 
         try:
             async with timeout(self.timeout):
+                if self.connection_mgr:
+                    return await self.connection_mgr.scrape(self)
+
                 # Resolve the hostname to an IP address if not done already
                 coro = get_event_loop().getaddrinfo(self.tracker_address[0], 0, family=socket.AF_INET)
                 if isinstance(coro, Future):
@@ -347,11 +387,22 @@ class UdpTrackerSession(TrackerSession):
                               self, repr(response), repr(error_message))
             self.failed(msg=error_message.decode('utf8', errors='ignore'))
 
+        self.set_connection_id(struct.unpack_from('!q', response, 8)[0])
+        self.last_contact = int(time.time())
+
+    def set_connection_id(self, connection_id):
+        """
+        Prepares the session for a scrape with the connection ID that was received from the tracker.
+        :param connection_id: The connection ID.
+        """
         # update action and IDs
-        self._connection_id = struct.unpack_from('!q', response, 8)[0]
+        self._connection_id = connection_id
         self.action = TRACKER_ACTION_SCRAPE
         self.generate_transaction_id()
-        self.last_contact = int(time.time())
+
+    @property
+    def connection_id(self):
+        return self._connection_id
 
     async def scrape(self):
         # pack and send the message
@@ -409,6 +460,236 @@ class UdpTrackerSession(TrackerSession):
         return {self.tracker_url: response_list}
 
 
+class ScrapeBatch(object):
+    """
+    The infohashes that are scraped together from a tracker, and the futures of the sessions waiting for them.
+    """
+
+    def __init__(self, session):
+        # The session that started the batch. Its tracker details are used for the scrape request.
+        self.session = session
+        self.futures = {}
+        self.task = None
+
+
+class TrackerConnectionManager(TaskManager, metaclass=ABCMeta):
+    """
+    Base class for the managers that share the work of the tracker sessions for the same tracker.
+
+    The infohashes that are requested from the same tracker within a short window are combined into a single
+    scrape request, and the results are handed back to the sessions that requested them.
+    """
+
+    max_infohashes_in_scrape = MAX_INFOHASHES_IN_SCRAPE
+
+    def __init__(self, batch_window=SCRAPE_BATCH_WINDOW):
+        super(TrackerConnectionManager, self).__init__()
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.batch_window = batch_window
+        # batch key -> ScrapeBatch that is still collecting infohashes
+        self._batches = {}
+
+    async def scrape(self, session):
+        """
+        Scrapes the infohashes of a tracker session, together with the infohashes of the other sessions for
+        the same tracker.
+        :param session: The tracker session.
+        :return: A dictionary containing seed/leech information per infohash
+        """
+        futures = [self._add_to_batch(session, infohash) for infohash in session.infohash_list]
+        try:
+            # A session that times out must not cancel the requests of the other sessions
+            results = await gather(*[shield(future) for future in futures])
+        except (ValueError, socket.error) as e:
+            session.failed(msg=str(e))
+            # The session already failed before, so failed() did not raise
+            raise
+
+        session.last_contact = int(time.time())
+        session.is_finished = True
+        return {session.tracker_url: [dict(result) for result in results]}
+
+    def _get_batch_key(self, session):
+        return session.tracker_url
+
+    def _add_to_batch(self, session, infohash):
+        key = self._get_batch_key(session)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = ScrapeBatch(session)
+            batch.task = self.register_anonymous_task("scrape", self._scrape_batch, key, batch,
+                                                      delay=self.batch_window)
+
+        future = batch.futures.get(infohash)
+        if future is None:
+            future = batch.futures[infohash] = Future()
+            if len(batch.futures) >= self.max_infohashes_in_scrape:
+                # The batch is full, so it is scraped right away
+                del self._batches[key]
+                batch.task.cancel()
+                batch.task = self.register_anonymous_task("scrape", self._scrape_batch, key, batch)
+        return future
+
+    @abstractmethod
+    def _create_batch_session(self, batch):
+        """
+        Creates the session that sends the scrape request of a batch, so the requests of the waiting sessions
+        are not affected.
+        """
+
+    async def _send_scrape(self, key, session):
+        """
+        Sends the scrape request of a batch.
+        :return: A dictionary containing seed/leech information per infohash
+        """
+        return await session.connect_to_tracker()
+
+    async def _scrape_batch(self, key, batch):
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+
+        session = self._create_batch_session(batch)
+        session.infohash_list = list(batch.futures)
+        try:
+            response = await self._send_scrape(key, session)
+        except Exception as e:
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            futures = {hexlify(infohash): future for infohash, future in batch.futures.items()}
+            for result in response[session.tracker_url]:
+                future = futures.get(result['infohash'])
+                if future and not future.done():
+                    future.set_result(result)
+            # As with a single scrape, the infohashes the tracker did not report on have no seeders or leechers
+            for infohash, future in futures.items():
+                if not future.done():
+                    future.set_result({'infohash': infohash, 'seeders': 0, 'leechers': 0})
+        finally:
+            # The futures are only left unresolved when the batch task itself is cancelled
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(ValueError("the scrape of %s was cancelled" % session.tracker_url))
+            await session.cleanup()
+
+    async def shutdown_task_manager(self):
+        # The batches that are still collecting infohashes are never scraped
+        for batch in self._batches.values():
+            for future in batch.futures.values():
+                future.cancel()
+        self._batches.clear()
+        await super(TrackerConnectionManager, self).shutdown_task_manager()
+
+
+class HttpTrackerConnectionManager(TrackerConnectionManager):
+    """
+    The HttpTrackerConnectionManager owns the HTTP client that is shared by the HTTP tracker sessions, so
+    the connections to the trackers are kept alive and the resolved tracker hostnames are reused.
+    """
+
+    def __init__(self, batch_window=SCRAPE_BATCH_WINDOW):
+        super(HttpTrackerConnectionManager, self).__init__(batch_window=batch_window)
+        self._client_session = None
+
+    def get_client_session(self):
+        """
+        Gets the shared HTTP client, and creates it if it does not exist yet.
+        """
+        if self._client_session is None or self._client_session.closed:
+            connector = TCPConnector(limit_per_host=HTTP_CONNECTIONS_PER_HOST, ttl_dns_cache=DNS_CACHE_TTL,
+                                     keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT)
+            self._client_session = ClientSession(connector=connector, raise_for_status=True)
+        return self._client_session
+
+    def _create_batch_session(self, batch):
+        return HttpTrackerSession(batch.session.tracker_url, batch.session.tracker_address,
+                                  batch.session.announce_page, batch.session.timeout,
+                                  client_session=self.get_client_session())
+
+    async def shutdown_task_manager(self):
+        await super(HttpTrackerConnectionManager, self).shutdown_task_manager()
+        if self._client_session:
+            await self._client_session.close()
+
+
+class UdpTrackerConnectionManager(TrackerConnectionManager):
+    """
+    The UdpTrackerConnectionManager shares the work of the UDP tracker sessions for the same tracker.
+
+    Besides combining the scrape requests, it caches the resolved tracker hostnames and the connection IDs of
+    the trackers, so a session only resolves the hostname and performs the CONNECT handshake if no other session
+    did so recently.
+    """
+
+    max_infohashes_in_scrape = MAX_INFOHASHES_IN_UDP_SCRAPE
+
+    def __init__(self, dns_ttl=DNS_CACHE_TTL, batch_window=SCRAPE_BATCH_WINDOW):
+        super(UdpTrackerConnectionManager, self).__init__(batch_window=batch_window)
+        self.dns_ttl = dns_ttl
+        # hostname -> (expiration time, future of the getaddrinfo result)
+        self._dns_cache = {}
+        # (ip address, port) -> (expiration time, connection ID)
+        self._connection_ids = {}
+
+    async def resolve(self, hostname):
+        """
+        Resolves a tracker hostname to an IPv4 address. Concurrent lookups of the same hostname share one request.
+        :param hostname: The hostname of the tracker.
+        :return: The IP address.
+        """
+        entry = self._dns_cache.get(hostname)
+        if entry is None or entry[0] <= time.time():
+            lookup = get_event_loop().getaddrinfo(hostname, 0, family=socket.AF_INET)
+            entry = (time.time() + self.dns_ttl, self.register_anonymous_task("resolve", ensure_future(lookup)))
+            self._dns_cache[hostname] = entry
+        try:
+            infos = await shield(entry[1])
+        except Exception:
+            # Failed lookups are not cached
+            if self._dns_cache.get(hostname) is entry:
+                del self._dns_cache[hostname]
+            raise
+        return infos[0][-1][0]
+
+    async def scrape(self, session):
+        session.ip_address = await self.resolve(session.tracker_address[0])
+        return await super(UdpTrackerConnectionManager, self).scrape(session)
+
+    def _get_batch_key(self, session):
+        return session.ip_address, session.port
+
+    def _create_batch_session(self, batch):
+        session = UdpTrackerSession(batch.session.tracker_url, batch.session.tracker_address,
+                                    batch.session.announce_page, batch.session.timeout, batch.session.socket_mgr)
+        session.ip_address = batch.session.ip_address
+        return session
+
+    async def _connect(self, key, session):
+        """
+        Gets a connection ID for a session, from the cache or with a CONNECT handshake.
+        """
+        cached = self._connection_ids.get(key)
+        if cached and cached[0] > time.time():
+            session.set_connection_id(cached[1])
+            return
+        await session.connect()
+        self._connection_ids[key] = (time.time() + UDP_CONNECTION_ID_TTL, session.connection_id)
+
+    async def _send_scrape(self, key, session):
+        try:
+            try:
+                async with timeout(session.timeout):
+                    await self._connect(key, session)
+                    return await session.scrape()
+            except TimeoutError:
+                session.failed(msg='request timed out')
+        except Exception:
+            # The tracker might not accept the cached connection ID anymore
+            self._connection_ids.pop(key, None)
+            raise
+
+
 class FakeDHTSession(TrackerSession):
     """
     Fake TrackerSession that manages DHT requests
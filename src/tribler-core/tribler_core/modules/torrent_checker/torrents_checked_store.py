@@ -0,0 +1,152 @@
+"""
+This module contains the bounded store of the health checks that are gossiped by the popularity community.
+"""
+import heapq
+import random
+import time
+
+# How many of the checks with the most seeders are kept
+TOP_SIZE = 10
+
+# How many checks are kept in the random sample
+SAMPLE_SIZE = 500
+
+# How long a check is gossiped, in seconds
+CHECK_TTL = 24 * 3600
+
+
+class TorrentsCheckedStore(object):
+    """
+    Store of the (infohash, seeders, leechers, last_check) tuples of the torrents that we checked ourselves.
+
+    The store does not grow with the uptime. It keeps the checks with the most seeders in a min-heap, and a uniform
+    random sample of all the checks in a reservoir. A newer check of a torrent replaces the older one, and the checks
+    that are older than the time-to-live expire.
+    """
+
+    def __init__(self, top_size=TOP_SIZE, sample_size=SAMPLE_SIZE, ttl=CHECK_TTL):
+        """
+        :param top_size: the number of checks with the most seeders that are kept
+        :param sample_size: the number of checks that are kept in the random sample
+        :param ttl: the time after which a check expires, in seconds
+        """
+        self.top_size = top_size
+        self.sample_size = sample_size
+        self.ttl = ttl
+
+        # infohash -> health tuple of the checks with the most seeders
+        self._top = {}
+        # Min-heap of (seeders, last_check, infohash) tuples of the checks in _top. Replaced checks are skipped.
+        self._top_heap = []
+        # The reservoir, and the index of every infohash in it
+        self._sample = []
+        self._sample_index = {}
+        # The number of different torrents that have been offered to the reservoir
+        self._num_sampled = 0
+
+    def __len__(self):
+        return len(self._top) + sum(1 for infohash in self._sample_index if infohash not in self._top)
+
+    def __iter__(self):
+        yield from self._top.values()
+        for health in self._sample:
+            if health[0] not in self._top:
+                yield health
+
+    def add(self, health):
+        """
+        Add the result of a health check.
+        :param health: an (infohash, seeders, leechers, last_check) tuple
+        """
+        self._add_to_sample(health)
+        self._add_to_top(health)
+
+    def _add_to_sample(self, health):
+        infohash = health[0]
+        index = self._sample_index.get(infohash)
+        if index is not None:
+            if self._sample[index][3] <= health[3]:
+                self._sample[index] = health
+            return
+
+        # Reservoir sampling: the n-th torrent replaces a random check with probability sample_size/n
+        self._num_sampled += 1
+        if len(self._sample) < self.sample_size:
+            self._sample_index[infohash] = len(self._sample)
+            self._sample.append(health)
+            return
+        index = random.randrange(self._num_sampled)
+        if index < self.sample_size:
+            del self._sample_index[self._sample[index][0]]
+            self._sample[index] = health
+            self._sample_index[infohash] = index
+
+    def _remove_from_sample(self, index):
+        # Move the last check into the gap, so the indexes of the other checks stay valid
+        del self._sample_index[self._sample[index][0]]
+        last = self._sample.pop()
+        if index < len(self._sample):
+            self._sample[index] = last
+            self._sample_index[last[0]] = index
+
+    def _peek_top(self):
+        """
+        Get the heap entry of the check in the top with the fewest seeders.
+        """
+        while self._top_heap:
+            seeders, last_check, infohash = self._top_heap[0]
+            health = self._top.get(infohash)
+            if health and health[1] == seeders and health[3] == last_check:
+                return self._top_heap[0]
+            heapq.heappop(self._top_heap)
+        return None
+
+    def _add_to_top(self, health):
+        infohash, seeders, _, last_check = health
+        current = self._top.get(infohash)
+        if current is not None and current[3] > last_check:
+            return
+        if current is None and len(self._top) >= self.top_size:
+            smallest = self._peek_top()
+            if seeders <= smallest[0]:
+                return
+            heapq.heappop(self._top_heap)
+            del self._top[smallest[2]]
+
+        self._top[infohash] = health
+        heapq.heappush(self._top_heap, (seeders, last_check, infohash))
+        # The replaced checks stay in the heap until they reach the root, so the heap is rebuilt now and then
+        if len(self._top_heap) > 2 * self.top_size:
+            self._top_heap = [(health[1], health[3], infohash) for infohash, health in self._top.items()]
+            heapq.heapify(self._top_heap)
+
+    def get_random(self, count, now=None):
+        """
+        Get random checks that did not expire.
+        :param count: the maximum number of checks
+        :return: a list of health tuples
+        """
+        deadline = (time.time() if now is None else now) - self.ttl
+        while True:
+            indexes = random.sample(range(len(self._sample)), min(count, len(self._sample)))
+            expired = [index for index in indexes if self._sample[index][3] < deadline]
+            if not expired:
+                return [self._sample[index] for index in indexes]
+            # Remove the expired checks and pick again. Removing from the highest index down keeps the
+            # other indexes valid.
+            for index in sorted(expired, reverse=True):
+                self._remove_from_sample(index)
+
+    def get_popular(self, count, exclude=(), now=None):
+        """
+        Get the checks with the most seeders that did not expire.
+        :param count: the maximum number of checks
+        :param exclude: the health tuples that should not be returned
+        :return: a list of health tuples, ordered by the number of seeders from high to low
+        """
+        deadline = (time.time() if now is None else now) - self.ttl
+        for infohash in [infohash for infohash, health in self._top.items() if health[3] < deadline]:
+            del self._top[infohash]
+        exclude = set(exclude)
+        candidates = [health for health in self._top.values() if health not in exclude]
+        return heapq.nlargest(count, candidates, key=lambda health: health[1])
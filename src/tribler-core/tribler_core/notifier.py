@@ -20,6 +20,12 @@ class Notifier(object):
         self.observers[subject].append(callback)
         self._logger.debug(f"Add observer topic {subject} callback {callback}")
 
+    def remove_observer(self, subject, callback):
+        callbacks = self.observers.get(subject, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            self._logger.debug(f"Remove observer topic {subject} callback {callback}")
+
     def notify(self, subject, *args):
         if subject not in self.observers:
             self._logger.warning(f"Called notification on a non-existing subject {subject}")
@@ -0,0 +1,113 @@
+"""
+This module contains the executor that runs the database queries of the REST API handlers.
+"""
+from asyncio import CancelledError, Semaphore, TimeoutError as AsyncTimeoutError, get_event_loop, wait_for
+from threading import Lock
+
+from tribler_core.exceptions import QueryTimeoutError
+
+# The maximum number of queries of the REST API that run at the same time
+MAX_CONCURRENT_QUERIES = 4
+
+# How long a query of the REST API may take, including the time it waits for its turn, in seconds
+QUERY_TIMEOUT = 30
+
+# The timeout of the calls that change many entries at once, such as channel commits
+LONG_QUERY_TIMEOUT = 10 * 60
+
+
+class QueryExecutor(object):
+    """
+    Runs the database queries of the REST API handlers away from the event loop.
+
+    The queries themselves are run by the DB executor of the metadata store, or by another thread pool. This executor
+    limits how many of them run at the same time, so a burst of requests does not fill the queues of those threads
+    and delay the queries of the overlays. A query that takes too long raises a QueryTimeoutError. When the handler
+    is cancelled, because the client disconnected or the query timed out, the query is cancelled as well if it did
+    not start yet. A query that already started keeps its slot until its thread is done with it.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_QUERIES, timeout=QUERY_TIMEOUT):
+        """
+        :param max_concurrent: the maximum number of queries that run at the same time
+        :param timeout: the default timeout of a query, in seconds
+        """
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+
+        # The semaphore is created on first use, so it belongs to the event loop that runs the queries
+        self._semaphore = None
+
+        self.num_running = 0
+        self.num_waiting = 0
+        self.num_timeouts = 0
+        self.num_cancelled = 0
+
+    def _release(self):
+        self.num_running -= 1
+        self._semaphore.release()
+
+    async def _run(self, submit, func, args):
+        if self._semaphore is None:
+            self._semaphore = Semaphore(self.max_concurrent)
+        self.num_waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.num_waiting -= 1
+        self.num_running += 1
+
+        loop = get_event_loop()
+        # Whether the query started on its thread, was given up on before it started, or gave back its slot
+        state_lock = Lock()
+        state = {'started': False, 'abandoned': False, 'released': False}
+
+        def release_threadsafe():
+            with state_lock:
+                if state['released']:
+                    return
+                state['released'] = True
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # The event loop is closed, so nobody is waiting for the slot anymore
+                pass
+
+        def call():
+            with state_lock:
+                if state['abandoned']:
+                    return None
+                state['started'] = True
+            try:
+                return func(*args)
+            finally:
+                # The slot is only given back once the thread is done with the query, even if the request timed out
+                release_threadsafe()
+
+        try:
+            return await submit(call)
+        finally:
+            with state_lock:
+                if not state['started']:
+                    state['abandoned'] = True
+                    state['released'] = True
+                    self._release()
+
+    async def run(self, submit, func, *args, timeout=None):
+        """
+        Run a query.
+        :param submit: the function that schedules a call on another thread. It returns an awaitable with the result.
+        :param func: the function that runs the query
+        :param args: the arguments of the function
+        :param timeout: the timeout of the query in seconds, or None for the default timeout
+        :return: the result of the query
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await wait_for(self._run(submit, func, args), timeout)
+        except AsyncTimeoutError:
+            self.num_timeouts += 1
+            raise QueryTimeoutError("The database query did not finish within %.1f seconds" % timeout)
+        except CancelledError:
+            self.num_cancelled += 1
+            raise
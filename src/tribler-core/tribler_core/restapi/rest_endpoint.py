@@ -1,13 +1,19 @@
 import json
 import logging
+from asyncio import get_event_loop
+from functools import partial
 
 from aiohttp import web
 
+from tribler_core.restapi.query_executor import QueryExecutor
+
+HTTP_NOT_MODIFIED = 304
 HTTP_BAD_REQUEST = 400
 HTTP_UNAUTHORIZED = 401
 HTTP_NOT_FOUND = 404
 HTTP_CONFLICT = 409
 HTTP_INTERNAL_SERVER_ERROR = 500
+HTTP_SERVICE_UNAVAILABLE = 503
 
 
 class RESTEndpoint:
@@ -17,6 +23,8 @@ class RESTEndpoint:
         self.app = web.Application(middlewares=middlewares)
         self.session = session
         self.endpoints = {}
+        # Child endpoints share the query executor of their parent, see add_endpoint
+        self.query_executor = QueryExecutor()
         self.setup_routes()
 
     def setup_routes(self):
@@ -24,8 +32,24 @@ class RESTEndpoint:
 
     def add_endpoint(self, prefix, endpoint):
         self.endpoints[prefix] = endpoint
+        if isinstance(endpoint, RESTEndpoint):
+            endpoint.set_query_executor(self.query_executor)
         self.app.add_subapp(prefix, endpoint.app)
 
+    def set_query_executor(self, query_executor):
+        self.query_executor = query_executor
+        for endpoint in self.endpoints.values():
+            if isinstance(endpoint, RESTEndpoint):
+                endpoint.set_query_executor(query_executor)
+
+    async def run_query(self, func, *args):
+        """
+        Run a blocking call, such as a query of a database that is not the metadata store, on the default thread pool.
+        The call is limited and timed out by the query executor.
+        :return: the result of the call
+        """
+        return await self.query_executor.run(partial(get_event_loop().run_in_executor, None), func, *args)
+
 
 class RESTResponse(web.Response):
 
@@ -34,7 +58,7 @@ class RESTResponse(web.Response):
             status = getattr(status, 'status_code')
         if isinstance(body, (dict, list)):
             body = json.dumps(body)
-            content_type = 'application/json'
+            content_type = content_type or 'application/json'
         super(RESTResponse, self).__init__(body=body, headers=headers,
                                            content_type=content_type, status=status, **kwargs)
 
@@ -8,7 +8,13 @@ from aiohttp_apispec import AiohttpApiSpec
 
 from apispec.core import VALID_METHODS_OPENAPI_V2
 
-from tribler_core.restapi.rest_endpoint import HTTP_INTERNAL_SERVER_ERROR, HTTP_UNAUTHORIZED, RESTResponse
+from tribler_core.exceptions import QueryTimeoutError
+from tribler_core.restapi.rest_endpoint import (
+    HTTP_INTERNAL_SERVER_ERROR,
+    HTTP_SERVICE_UNAVAILABLE,
+    HTTP_UNAUTHORIZED,
+    RESTResponse,
+)
 from tribler_core.restapi.root_endpoint import RootEndpoint
 from tribler_core.version import version_id
 
@@ -41,6 +47,13 @@ async def error_middleware(request, handler):
         if os.environ.get('TRIBLER_SHUTTING_DOWN', "FALSE") == "TRUE":
             raise Exception('Tribler is shutting down')
         response = await handler(request)
+    except QueryTimeoutError as e:
+        logger.warning(e)
+        return RESTResponse({"error": {
+            "handled": True,
+            "code": e.__class__.__name__,
+            "message": e.args[0]
+        }}, status=HTTP_SERVICE_UNAVAILABLE)
     except Exception as e:
         logger.exception(e)
         return RESTResponse({"error": {
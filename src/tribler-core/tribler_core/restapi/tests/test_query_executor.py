@@ -0,0 +1,85 @@
+import threading
+from asyncio import ensure_future, get_event_loop, sleep
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from tribler_core.exceptions import QueryTimeoutError
+from tribler_core.restapi.query_executor import QueryExecutor
+from tribler_core.tests.tools.base_test import TriblerCoreTest
+from tribler_core.tests.tools.tools import timeout
+
+
+class TestQueryExecutor(TriblerCoreTest):
+
+    async def setUp(self):
+        await super(TestQueryExecutor, self).setUp()
+        self.executor = QueryExecutor(max_concurrent=2, timeout=5)
+        self.thread_pool = ThreadPoolExecutor(max_workers=1)
+        self.submit = partial(get_event_loop().run_in_executor, self.thread_pool)
+
+    async def tearDown(self):
+        self.thread_pool.shutdown()
+        await super(TestQueryExecutor, self).tearDown()
+
+    @timeout(10)
+    async def test_run(self):
+        """
+        Test that the executor returns the result of a query
+        """
+        self.assertEqual(3, await self.executor.run(self.submit, lambda a, b: a + b, 1, 2))
+
+    @timeout(10)
+    async def test_concurrency_limit(self):
+        """
+        Test that the executor does not run more than the maximum number of queries at the same time
+        """
+        done = threading.Event()
+        submit = partial(get_event_loop().run_in_executor, None)
+
+        tasks = [ensure_future(self.executor.run(submit, done.wait)) for _ in range(5)]
+        await sleep(0.05)
+        self.assertEqual(self.executor.num_running, 2)
+        self.assertEqual(self.executor.num_waiting, 3)
+
+        done.set()
+        for task in tasks:
+            await task
+        await sleep(0.01)
+        self.assertEqual(self.executor.num_running, 0)
+        self.assertEqual(self.executor.num_waiting, 0)
+
+    @timeout(10)
+    async def test_timeout(self):
+        """
+        Test that a query that takes too long raises a QueryTimeoutError, but keeps its slot until its thread is done
+        """
+        done = threading.Event()
+        with self.assertRaises(QueryTimeoutError):
+            await self.executor.run(self.submit, done.wait, timeout=0.05)
+        self.assertEqual(self.executor.num_timeouts, 1)
+        self.assertEqual(self.executor.num_running, 1)
+
+        done.set()
+        await sleep(0.05)
+        self.assertEqual(self.executor.num_running, 0)
+
+    @timeout(10)
+    async def test_cancel(self):
+        """
+        Test that cancelling the request, e.g. when the client disconnects, cancels the query that did not start yet
+        """
+        done = threading.Event()
+        blocker = self.submit(done.wait)
+        calls = []
+        task = ensure_future(self.executor.run(self.submit, calls.append, 1))
+        await sleep(0.01)
+        task.cancel()
+        await sleep(0.01)
+        self.assertEqual(self.executor.num_cancelled, 1)
+        self.assertEqual(self.executor.num_running, 0)
+
+        done.set()
+        await blocker
+        await sleep(0.01)
+        self.assertListEqual([], calls)
+        self.assertEqual(self.executor.num_running, 0)
@@ -2,6 +2,7 @@ import logging
 import math
 from binascii import unhexlify
 from distutils.version import LooseVersion
+from threading import Lock
 
 from aiohttp import web
 
@@ -153,6 +154,9 @@ class TrustViewEndpoint(RESTEndpoint):
         self.trustchain_db = None
         self.trust_graph = None
         self.public_key = None
+        # The trust graph is shared by the requests, so their worker threads update it one at a time. The lock is held
+        # by the thread, so a request that timed out keeps it until its update is done.
+        self.graph_lock = Lock()
 
     def setup_routes(self):
         self.app.add_routes([web.get('', self.get_view)])
@@ -208,39 +212,11 @@ class TrustViewEndpoint(RESTEndpoint):
         if not self.trust_graph:
             self.initialize_graph()
 
-        def get_bandwidth_blocks(public_key, limit=5):
-            return self.trustchain_db.get_latest_blocks(public_key, limit=limit, block_types=[b'tribler_bandwidth'])
-
-        def get_friends(public_key, limit=5):
-            return self.trustchain_db.get_connected_users(public_key, limit=limit)
-
         depth = 0
         if 'depth' in request.query:
             depth = int(request.query['depth'])
 
-        # If depth is zero or not provided then fetch all depth levels
-        fetch_all = depth == 0
-
-        try:
-            if fetch_all:
-                self.trust_graph.reset(hexlify(self.public_key))
-            if fetch_all or depth == 1:
-                self.trust_graph.add_blocks(get_bandwidth_blocks(self.public_key, limit=100))
-            if fetch_all or depth == 2:
-                for friend in get_friends(self.public_key):
-                    self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(friend['public_key']), limit=10))
-            if fetch_all or depth == 3:
-                for friend in get_friends(self.public_key):
-                    self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(friend['public_key'])))
-                    for fof in get_friends(unhexlify(friend['public_key'])):
-                        self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(fof['public_key'])))
-            if fetch_all or depth == 4:
-                for user_block in self.trustchain_db.get_users():
-                    self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(user_block['public_key'])))
-        except TrustGraphException as tgex:
-            self.logger.warning(tgex)
-
-        graph_data = self.trust_graph.compute_node_graph()
+        graph_data = await self.run_query(self.update_graph, depth)
 
         return RESTResponse(
             {
@@ -252,6 +228,44 @@ class TrustViewEndpoint(RESTEndpoint):
             }
         )
 
+    def update_graph(self, depth):
+        """
+        Add the bandwidth blocks up to the given depth to the trust graph. This method is called on a worker thread.
+        :param depth: the depth level, or 0 for all depths
+        :return: the nodes and edges of the graph
+        """
+
+        def get_bandwidth_blocks(public_key, limit=5):
+            return self.trustchain_db.get_latest_blocks(public_key, limit=limit, block_types=[b'tribler_bandwidth'])
+
+        def get_friends(public_key, limit=5):
+            return self.trustchain_db.get_connected_users(public_key, limit=limit)
+
+        # If depth is zero or not provided then fetch all depth levels
+        fetch_all = depth == 0
+
+        with self.graph_lock:
+            try:
+                if fetch_all:
+                    self.trust_graph.reset(hexlify(self.public_key))
+                if fetch_all or depth == 1:
+                    self.trust_graph.add_blocks(get_bandwidth_blocks(self.public_key, limit=100))
+                if fetch_all or depth == 2:
+                    for friend in get_friends(self.public_key):
+                        self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(friend['public_key']), limit=10))
+                if fetch_all or depth == 3:
+                    for friend in get_friends(self.public_key):
+                        self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(friend['public_key'])))
+                        for fof in get_friends(unhexlify(friend['public_key'])):
+                            self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(fof['public_key'])))
+                if fetch_all or depth == 4:
+                    for user_block in self.trustchain_db.get_users():
+                        self.trust_graph.add_blocks(get_bandwidth_blocks(unhexlify(user_block['public_key'])))
+            except TrustGraphException as tgex:
+                self.logger.warning(tgex)
+
+            return self.trust_graph.compute_node_graph()
+
     def get_bootstrap_info(self):
         if self.session.bootstrap.download and self.session.bootstrap.download.get_state():
             state = self.session.bootstrap.download.get_state()
@@ -47,6 +47,7 @@ from tribler_common.simpledefs import (
 import tribler_core.utilities.permid as permid_module
 from tribler_core.modules.bootstrap import Bootstrap
 from tribler_core.modules.metadata_store.gigachannel_manager import GigaChannelManager
+from tribler_core.modules.metadata_store.name_cache import DownloadNameCache
 from tribler_core.modules.metadata_store.store import MetadataStore
 from tribler_core.modules.payout_manager import PayoutManager
 from tribler_core.modules.resource_monitor import ResourceMonitor
@@ -142,6 +143,7 @@ class Session(TaskManager):
         self.dht_community = None
         self.payout_manager = None
         self.mds = None  # Metadata Store
+        self.download_name_cache = None
 
     def load_ipv8_overlays(self):
         if self.config.get_trustchain_testnet():
@@ -416,6 +418,7 @@ class Session(TaskManager):
             metadata_db_name = 'metadata.db' if not self.config.get_chant_testnet() else 'metadata_testnet.db'
             database_path = self.config.get_state_dir() / 'sqlite' / metadata_db_name
             self.mds = MetadataStore(database_path, channels_dir, self.trustchain_keypair)
+            self.download_name_cache = DownloadNameCache(self.mds, self.notifier)
 
         # IPv8
         if self.config.get_ipv8_enabled():
@@ -577,6 +580,9 @@ class Session(TaskManager):
             self.notify_shutdown_state("Shutting down Metadata Store...")
             self.mds.shutdown()
         self.mds = None
+        if self.download_name_cache is not None:
+            self.download_name_cache.shutdown()
+        self.download_name_cache = None
 
         # We close the API manager as late as possible during shutdown.
         if self.api_manager:
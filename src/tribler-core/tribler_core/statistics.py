@@ -22,6 +22,8 @@ class TriblerStatistics(object):
         stats_dict = {"db_size": db_size,
                       "num_channels": self.session.mds.get_num_channels(),
                       "num_torrents": self.session.mds.get_num_torrents()}
+        if self.session.popularity_community:
+            stats_dict["health_updates"] = self.session.popularity_community.get_health_update_statistics()
 
         return stats_dict
 
@@ -25,3 +25,10 @@ class TriblerCoreTestNotifier(TriblerCoreTest):
         notifier.notify(NTFY.TORRENT_FINISHED)
         await self.test_future
         self.assertTrue(self.called_callback)
+
+    def test_remove_observer(self):
+        notifier = Notifier()
+        notifier.add_observer(NTFY.TORRENT_FINISHED, self.callback_func)
+        notifier.remove_observer(NTFY.TORRENT_FINISHED, self.callback_func)
+        notifier.notify(NTFY.TORRENT_FINISHED)
+        self.assertFalse(self.called_callback)
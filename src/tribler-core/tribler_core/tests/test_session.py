@@ -190,6 +190,7 @@ class TestLaunchFullSession(TestAsServer):
         self.session.dlmgr.initialize()
         self.session.dlmgr.state_cb_count = 4
         self.session.dlmgr.downloads = {b'aaaa': fake_download}
+        self.session.dlmgr.changed_peers = {b'aaaa'}
         await self.session.dlmgr.sesscb_states_callback([dl_state])
 
         self.assertTrue(self.session.payout_manager.tribler_peers)
@@ -5,6 +5,8 @@ DEFAULT_API_PROTOCOL = "http"
 DEFAULT_API_HOST = "localhost"
 DEFAULT_API_PORT = 8085
 
+HTTP_NOT_MODIFIED = 304
+
 # Define stacked widget page indices
 PAGE_EDIT_CHANNEL = 0
 PAGE_SEARCH_RESULTS = 1
@@ -9,7 +9,13 @@ from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest
 
 import tribler_core.utilities.json_util as json
 
-from tribler_gui.defs import BUTTON_TYPE_NORMAL, DEFAULT_API_HOST, DEFAULT_API_PORT, DEFAULT_API_PROTOCOL
+from tribler_gui.defs import (
+    BUTTON_TYPE_NORMAL,
+    DEFAULT_API_HOST,
+    DEFAULT_API_PORT,
+    DEFAULT_API_PROTOCOL,
+    HTTP_NOT_MODIFIED,
+)
 from tribler_gui.dialogs.confirmationdialog import ConfirmationDialog
 
 
@@ -108,6 +114,8 @@ class TriblerRequestManager(QNetworkAccessManager):
         qt_request.setPriority(request.priority)
         qt_request.setHeader(QNetworkRequest.ContentTypeHeader, "application/x-www-form-urlencoded")
         qt_request.setRawHeader(b'X-Api-Key', self.key)
+        if request.accept:
+            qt_request.setRawHeader(b'Accept', request.accept.encode('utf8'))
 
         buf = QBuffer()
         if request.raw_data:
@@ -145,6 +153,7 @@ class TriblerNetworkRequest(QObject):
         priority=QNetworkRequest.NormalPriority,
         on_cancel=lambda: None,
         decode_json_response=True,
+        accept=None,
     ):
         QObject.__init__(self)
 
@@ -159,6 +168,8 @@ class TriblerNetworkRequest(QObject):
         url += ("?" + tribler_urlencode(url_params)) if url_params else ""
 
         self.decode_json_response = decode_json_response
+        # The media type the Core may send the response in, instead of plain JSON
+        self.accept = accept
         self.time = time()
         self.url = url
         self.priority = priority
@@ -191,6 +202,11 @@ class TriblerNetworkRequest(QObject):
                 self.received_json.emit(None, self.reply.error())
                 return
 
+            if status_code == HTTP_NOT_MODIFIED:
+                # The resource did not change since the revision in the request, so there is no body to decode
+                self.received_json.emit({}, self.reply.error())
+                return
+
             data = self.reply.readAll()
             if not self.decode_json_response:
                 self.received_json.emit(data, self.reply.error())
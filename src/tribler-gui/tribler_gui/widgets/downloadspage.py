@@ -54,7 +54,10 @@ class DownloadsPage(QWidget):
         self.export_dir = None
         self.filter = DOWNLOADS_FILTER_ALL
         self.download_widgets = {}  # key: infohash, value: QTreeWidgetItem
+        self.download_infos = {}  # key: infohash, value: the last download JSON received from the core
         self.downloads = None
+        self.downloads_url = None
+        self.downloads_revision = None  # The revision of the downloads in download_infos
         self.downloads_timer = QTimer()
         self.downloads_timeout_timer = QTimer()
         self.downloads_last_update = 0
@@ -139,6 +142,12 @@ class DownloadsPage(QWidget):
         elif self.window().download_details_widget.currentIndex() == 1:
             url += "&get_files=1"
 
+        # The core only sends the downloads that changed since our revision, as long as we ask for the same details
+        if url != self.downloads_url:
+            self.downloads_url = url
+            self.downloads_revision = None
+        url += "&revision=%s" % (self.downloads_revision or "")
+
         isactive = not self.isHidden() or self.window().video_player_page.needsupdate
 
         if isactive or (time.time() - self.downloads_last_update > 30):
@@ -150,22 +159,33 @@ class DownloadsPage(QWidget):
             self.rest_request = TriblerNetworkRequest(url, self.on_received_downloads, priority=priority)
 
     def on_received_downloads(self, downloads):
-        if not downloads or "downloads" not in downloads:
+        if downloads is None:
             return  # This might happen when closing Tribler
+        if "downloads" not in downloads:
+            # None of the downloads changed since our revision
+            self.schedule_downloads_timer()
+            return
         loading_widget_index = self.window().downloads_list.indexOfTopLevelItem(self.loading_message_widget)
         if loading_widget_index > -1:
             self.window().downloads_list.takeTopLevelItem(loading_widget_index)
             self.window().downloads_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
-        self.downloads = downloads
-
-        self.total_download = 0
-        self.total_upload = 0
-
-        download_infohashes = set()
+        self.downloads_revision = downloads.get("revision")
+        if downloads.get("delta"):
+            removed_infohashes = set(downloads["removed"])
+        else:
+            # We got all downloads, so the ones we do not get anymore were removed
+            received_infohashes = {download["infohash"] for download in downloads["downloads"]}
+            removed_infohashes = set(self.download_infos) - received_infohashes
 
         items = []
         for download in downloads["downloads"]:
+            previous = self.download_infos.get(download["infohash"])
+            if previous and "pieces" in previous and "pieces" not in download:
+                # The core only sends the pieces when they changed
+                download["pieces"] = previous["pieces"]
+            self.download_infos[download["infohash"]] = download
+
             if download["infohash"] in self.download_widgets:
                 item = self.download_widgets[download["infohash"]]
             else:
@@ -180,11 +200,6 @@ class DownloadsPage(QWidget):
             if video_infohash != "" and download["infohash"] == video_infohash:
                 self.window().video_player_page.update_with_download_info(download)
 
-            self.total_download += download["speed_down"]
-            self.total_upload += download["speed_up"]
-
-            download_infohashes.add(download["infohash"])
-
             if (
                 self.window().download_details_widget.current_download is not None
                 and self.window().download_details_widget.current_download["infohash"] == download["infohash"]
@@ -196,12 +211,17 @@ class DownloadsPage(QWidget):
         for item in items:
             self.window().downloads_list.setItemWidget(item, 2, item.bar_container)
 
-        # Check whether there are download that should be removed
-        for infohash, item in list(self.download_widgets.items()):
-            if infohash not in download_infohashes:
+        # Remove the downloads that were removed in the core
+        for infohash in removed_infohashes:
+            self.download_infos.pop(infohash, None)
+            item = self.download_widgets.pop(infohash, None)
+            if item is not None:
                 index = self.window().downloads_list.indexOfTopLevelItem(item)
                 self.window().downloads_list.takeTopLevelItem(index)
-                del self.download_widgets[infohash]
+
+        self.downloads = {"downloads": list(self.download_infos.values())}
+        self.total_download = sum(download["speed_down"] for download in self.download_infos.values())
+        self.total_upload = sum(download["speed_up"] for download in self.download_infos.values())
 
         self.window().tray_set_tooltip(
             "Down: %s, Up: %s" % (format_speed(self.total_download), format_speed(self.total_upload))
@@ -213,7 +233,7 @@ class DownloadsPage(QWidget):
         if len(self.window().downloads_list.selectedItems()) > 0:
             self.on_download_item_clicked()
 
-        self.received_downloads.emit(downloads)
+        self.received_downloads.emit(self.downloads)
 
     def update_download_visibility(self):
         for i in range(self.window().downloads_list.topLevelItemCount()):
@@ -3,7 +3,7 @@ import uuid
 
 from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
 
-from tribler_common.simpledefs import CHANNELS_VIEW_UUID
+from tribler_common.simpledefs import CHANNELS_VIEW_UUID, METADATA_TABLE_MEDIA_TYPE
 
 from tribler_core.modules.metadata_store.orm_bindings.channel_node import NEW
 from tribler_core.modules.metadata_store.serialization import CHANNEL_TORRENT, COLLECTION_NODE
@@ -20,6 +20,19 @@ def get_item_uid(item):
     return item['infohash']
 
 
+def decode_results(results):
+    """
+    Decode the results of a listing of the Core. The Core sends them in its table format if we accept it: the lists of
+    values of the items, with the keys listed once for every metadata type. Other results are lists of items already.
+    :param results: the results in the response
+    :return: list(item)
+    """
+    if not isinstance(results, dict):
+        return results
+    keys = results["keys"]
+    return [dict(zip(keys[str(values[0])], values)) for values in results["rows"]]
+
+
 class RemoteTableModel(QAbstractTableModel):
     info_changed = pyqtSignal(list)
     """
@@ -53,10 +66,15 @@ class RemoteTableModel(QAbstractTableModel):
         # last one. In a sense, the queries' UUIDs play the role of "subscription topics" for the model.
         self.remote_queries = set()
 
+        # Opaque position of the last locally fetched item, returned by the Core with every full page of results.
+        # Continuing from it instead of an offset keeps the pages stable while the remote results are added on top.
+        self.next_cursor = None
+
     def reset(self):
         self.beginResetModel()
         self.data_items = []
         self.item_uid_map = {}
+        self.next_cursor = None
         self.endResetModel()
         self.perform_query()
 
@@ -169,7 +187,10 @@ class RemoteTableModel(QAbstractTableModel):
         Fetch results for a given query.
         """
         if 'first' not in kwargs or 'last' not in kwargs:
-            kwargs["first"], kwargs['last'] = self.rowCount() + 1, self.rowCount() + self.item_load_batch
+            if self.next_cursor:
+                kwargs.update({"cursor": self.next_cursor, "first": 1, "last": self.item_load_batch})
+            else:
+                kwargs["first"], kwargs['last'] = self.rowCount() + 1, self.rowCount() + self.item_load_batch
 
         if self.sort_by is not None:
             kwargs.update({"sort_by": self.sort_by, "sort_desc": self.sort_desc})
@@ -181,7 +202,9 @@ class RemoteTableModel(QAbstractTableModel):
             kwargs.update({"hide_xxx": self.hide_xxx})
         rest_endpoint_url = kwargs.pop("rest_endpoint_url") if "rest_endpoint_url" in kwargs else self.endpoint_url
 
-        TriblerNetworkRequest(rest_endpoint_url, self.on_query_results, url_params=kwargs)
+        TriblerNetworkRequest(
+            rest_endpoint_url, self.on_query_results, url_params=kwargs, accept=METADATA_TABLE_MEDIA_TYPE
+        )
 
     def on_query_results(self, response, remote=False, on_top=False):
         """
@@ -194,8 +217,12 @@ class RemoteTableModel(QAbstractTableModel):
         # TODO: count remote results
         if not response:
             return False
+        if "results" in response:
+            response["results"] = decode_results(response["results"])
 
         if not remote or (uuid.UUID(response.get('uuid')) in self.remote_queries):
+            if not remote and "next_cursor" in response:
+                self.next_cursor = response["next_cursor"]
             self.add_items(response['results'], on_top=remote or on_top)
             if "total" in response:
                 self.channel_info["total"] = response["total"]